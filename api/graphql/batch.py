@@ -0,0 +1,156 @@
+"""
+Batched GraphQL requests: a POST of a JSON list of operations
+({query, variables, operationName}), which returns a list of results in the
+same order. The operations share a context, so their loaders (and hence their
+database queries) are batched together too.
+
+Only queries can be batched: the operations are executed concurrently on one
+connection, so mutations (which open transactions, and change what the shared
+loaders have cached) must be sent on their own.
+
+The request body may be gzip compressed (with Content-Encoding: gzip), and the
+response is gzip compressed if the client accepts it. The size of the request
+body is capped (both as sent, and once decompressed), so a small compressed body
+can't expand to exhaust the server's memory.
+"""
+
+import asyncio
+import gzip
+import json
+import zlib
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from graphql import GraphQLError, OperationDefinitionNode, OperationType, parse
+
+from api.graphql.loaders import GraphQLContext, get_context
+from api.graphql.schema import schema
+
+# operations accepted in one batch
+MAX_BATCH_SIZE = 100
+# bytes accepted in the request body (as sent, and once decompressed)
+MAX_BODY_SIZE = 10 * 1024 * 1024
+# responses smaller than this aren't worth compressing
+GZIP_MINIMUM_SIZE = 1024
+
+GraphQLBatchRouter = APIRouter()
+
+
+def is_query(query: str) -> bool:
+    """Does the GraphQL document only contain query operations"""
+    try:
+        document = parse(query)
+    except GraphQLError:
+        # the syntax error is reported when the operation is executed
+        return True
+    return all(
+        definition.operation == OperationType.QUERY
+        for definition in document.definitions
+        if isinstance(definition, OperationDefinitionNode)
+    )
+
+
+def request_too_large(max_size: int, decompressed: bool = False) -> HTTPException:
+    """Error for a request body that is larger than max_size bytes"""
+    size = f'{max_size:,} bytes' + (' decompressed' if decompressed else '')
+    return HTTPException(413, f'Request body is too large (> {size})')
+
+
+def decompress_gzip(body: bytes, max_size: int) -> bytes:
+    """Decompress a gzip compressed body, without it expanding past max_size"""
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    try:
+        # one byte more than allowed, to tell if the body is too large
+        decompressed = decompressor.decompress(body, max_size + 1)
+    except zlib.error as e:
+        raise ValueError('Invalid gzip compressed request body') from e
+    if len(decompressed) > max_size:
+        raise request_too_large(max_size, decompressed=True)
+    if not decompressor.eof or decompressor.unused_data:
+        raise ValueError('Invalid gzip compressed request body')
+    return decompressed
+
+
+def parse_batch(
+    body: bytes, content_encoding: str | None, max_body_size: int = MAX_BODY_SIZE
+) -> list[dict[str, Any]]:
+    """Parse (and validate the shape of) the body of a batched request"""
+    if len(body) > max_body_size:
+        raise request_too_large(max_body_size)
+    if content_encoding == 'gzip':
+        body = decompress_gzip(body, max_body_size)
+    elif content_encoding and content_encoding != 'identity':
+        raise ValueError(f'Unsupported Content-Encoding: {content_encoding}')
+
+    operations = json.loads(body)
+    if not isinstance(operations, list):
+        raise ValueError('Expected a list of GraphQL operations')
+    if len(operations) > MAX_BATCH_SIZE:
+        raise ValueError(
+            f'Too many operations in batch ({len(operations)} > {MAX_BATCH_SIZE})'
+        )
+    for operation in operations:
+        if not isinstance(operation, dict) or not isinstance(
+            operation.get('query'), str
+        ):
+            raise ValueError('Each GraphQL operation must have a query')
+    for idx, operation in enumerate(operations):
+        if not is_query(operation['query']):
+            raise ValueError(
+                f'Only queries can be batched, operation {idx} is a mutation '
+                'or subscription'
+            )
+    return operations
+
+
+async def execute_operation(
+    operation: dict[str, Any], context: GraphQLContext
+) -> dict[str, Any]:
+    """Execute one operation of the batch, in the shape of a GraphQL response"""
+    result = await schema.execute(
+        operation['query'],
+        variable_values=operation.get('variables'),
+        operation_name=operation.get('operationName'),
+        context_value=context,
+    )
+    response: dict[str, Any] = {'data': result.data}
+    if result.errors:
+        response['errors'] = [error.formatted for error in result.errors]
+    return response
+
+
+async def read_body(request: Request, max_size: int) -> bytes:
+    """Read the request body, rejecting it once it's larger than max_size"""
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > max_size:
+        raise request_too_large(max_size)
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > max_size:
+            raise request_too_large(max_size)
+    return bytes(body)
+
+
+@GraphQLBatchRouter.post('/batch', operation_id='graphqlBatch')
+async def graphql_batch(
+    request: Request, context: GraphQLContext = Depends(get_context)
+) -> Response:
+    """Execute a batch of GraphQL operations"""
+    operations = parse_batch(
+        await read_body(request, MAX_BODY_SIZE),
+        request.headers.get('content-encoding'),
+    )
+    results = await asyncio.gather(
+        *(execute_operation(operation, context) for operation in operations)
+    )
+
+    body = json.dumps(results, default=str).encode()
+    headers = {}
+    if len(body) >= GZIP_MINIMUM_SIZE and 'gzip' in request.headers.get(
+        'accept-encoding', ''
+    ):
+        body = gzip.compress(body)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(content=body, media_type='application/json', headers=headers)
@@ -18,6 +18,7 @@ from db.python.layers import (
     AnalysisLayer,
     AssayLayer,
     AuditLogLayer,
+    CohortLayer,
     FamilyLayer,
     ParticipantLayer,
     SampleLayer,
@@ -37,6 +38,7 @@ from db.python.utils import NotFoundError
 from models.models import (
     AnalysisInternal,
     AssayInternal,
+    CohortTemplateInternal,
     FamilyInternal,
     ParticipantInternal,
     Project,
@@ -45,7 +47,11 @@ from models.models import (
     SequencingGroupInternal,
 )
 from models.models.audit_log import AuditLogInternal
-from models.models.comment import CommentEntityType, DiscussionInternal
+from models.models.comment import (
+    CommentEntityType,
+    CommentVersionInternal,
+    DiscussionInternal,
+)
 from models.models.family import PedRowInternal
 
 
@@ -62,6 +68,7 @@ class LoaderKeys(enum.Enum):
 
     ANALYSES_FOR_PROJECTS = 'analyses_for_projects'
     ANALYSES_FOR_SEQUENCING_GROUPS = 'analyses_for_sequencing_groups'
+    ANALYSES_FOR_COHORTS = 'analyses_for_cohorts'
 
     ASSAYS_FOR_IDS = 'assays_for_ids'
     ASSAYS_FOR_SAMPLES = 'sequences_for_samples'
@@ -88,6 +95,9 @@ class LoaderKeys(enum.Enum):
     SEQUENCING_GROUPS_FOR_PROJECTS = 'sequencing_groups_for_projects'
     SEQUENCING_GROUPS_FOR_ANALYSIS = 'sequencing_groups_for_analysis'
     SEQUENCING_GROUPS_COUNTS_FOR_PROJECT = 'sequencing_groups_counts_for_project'
+    SEQUENCING_GROUPS_FOR_COHORTS = 'sequencing_groups_for_cohorts'
+
+    COHORT_TEMPLATES_FOR_COHORTS = 'cohort_templates_for_cohorts'
 
     COMMENTS_FOR_SAMPLE_IDS = 'comments_for_sample_ids'
     COMMENTS_FOR_PARTICIPANT_IDS = 'comments_for_participant_ids'
@@ -95,6 +105,7 @@ class LoaderKeys(enum.Enum):
     COMMENTS_FOR_PROJECT_IDS = 'comments_for_project_ids'
     COMMENTS_FOR_SEQUENCING_GROUP_IDS = 'comments_for_sequencing_group_ids'
     COMMENTS_FOR_FAMILY_IDS = 'comments_for_family_ids'
+    COMMENT_VERSIONS_FOR_COMMENT_IDS = 'comment_versions_for_comment_ids'
 
 
 loaders: dict[LoaderKeys, Any] = {}
@@ -406,6 +417,44 @@ async def load_sequencing_groups_for_project_ids(
     return seq_group_map
 
 
+@connected_data_loader_with_params(
+    LoaderKeys.SEQUENCING_GROUPS_FOR_COHORTS, default_factory=list
+)
+async def load_sequencing_groups_for_cohorts(
+    ids: list[int], filter_: SequencingGroupFilter, connection: Connection
+) -> dict[int, list[SequencingGroupInternal]]:
+    """
+    DataLoader: get the sequencing groups of cohorts, the sequencing group IDs of
+    every cohort are fetched in one query, then the sequencing groups in another
+    """
+    sg_ids_by_cohort = await CohortLayer(
+        connection
+    ).get_cohort_sequencing_group_ids_by_cohort_ids(ids)
+    sg_ids = sorted({sg for sgs in sg_ids_by_cohort.values() for sg in sgs})
+    if not sg_ids:
+        return {}
+
+    _filter = copy.copy(filter_)
+    _filter.id = GenericFilter(in_=sg_ids)
+    sequencing_groups = await SequencingGroupLayer(connection).query(filter_=_filter)
+    sg_map = {sg.id: sg for sg in sequencing_groups}
+    return {
+        cohort_id: [sg_map[sg] for sg in cohort_sg_ids if sg in sg_map]
+        for cohort_id, cohort_sg_ids in sg_ids_by_cohort.items()
+    }
+
+
+@connected_data_loader(LoaderKeys.COHORT_TEMPLATES_FOR_COHORTS)
+async def load_cohort_templates_for_cohorts(
+    cohort_ids: list[int], connection: Connection
+) -> list[CohortTemplateInternal | None]:
+    """
+    DataLoader: get the template of each cohort (None if it has no template)
+    """
+    templates = await CohortLayer(connection).get_templates_by_cohort_ids(cohort_ids)
+    return [templates.get(cid) for cid in cohort_ids]
+
+
 @connected_data_loader(LoaderKeys.PROJECTS_FOR_IDS)
 async def load_projects_for_ids(
     project_ids: list[int], connection: Connection
@@ -502,6 +551,27 @@ async def load_analyses_for_sequencing_groups(
     return by_sg_id
 
 
+@connected_data_loader_with_params(
+    LoaderKeys.ANALYSES_FOR_COHORTS, default_factory=list
+)
+async def load_analyses_for_cohorts(
+    ids: list[int],
+    filter_: AnalysisFilter,
+    connection: Connection,
+) -> dict[int, list[AnalysisInternal]]:
+    """
+    Data loader for loading the analyses of cohorts
+    """
+    _filter = copy.copy(filter_)
+    _filter.cohort_id = GenericFilter(in_=ids)
+    analyses = await AnalysisLayer(connection).query(_filter)
+    by_cohort_id: dict[int, list[AnalysisInternal]] = defaultdict(list)
+    for a in analyses:
+        for cohort_id in a.cohort_ids or []:
+            by_cohort_id[cohort_id].append(a)
+    return by_cohort_id
+
+
 @connected_data_loader(LoaderKeys.PHENOTYPES_FOR_PARTICIPANTS)
 async def load_phenotypes_for_participants(
     participant_ids: list[int], connection: Connection
@@ -649,6 +719,18 @@ async def load_comments_for_sequencing_group_ids(
     return comments
 
 
+@connected_data_loader(LoaderKeys.COMMENT_VERSIONS_FOR_COMMENT_IDS)
+async def load_comment_versions_for_comment_ids(
+    comment_ids: list[int], connection: Connection
+) -> list[list[CommentVersionInternal]]:
+    """
+    DataLoader: load_comment_versions_for_comment_ids
+    """
+    clayer = CommentLayer(connection)
+    versions = await clayer.get_versions_for_comment_ids(comment_ids)
+    return [versions.get(cid, []) for cid in comment_ids]
+
+
 class GraphQLContext(TypedDict):
     """Basic dict type for GraphQL context to be passed to resolvers"""
 
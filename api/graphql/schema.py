@@ -140,9 +140,10 @@ class GraphQLCohort:
         self, info: Info[GraphQLContext, 'Query'], root: 'GraphQLCohort'
     ) -> 'GraphQLCohortTemplate':
         connection = info.context['connection']
-        template = await CohortLayer(connection).get_template_by_cohort_id(
-            cohort_id_transform_to_raw(root.id)
-        )
+        loader = info.context['loaders'][LoaderKeys.COHORT_TEMPLATES_FOR_COHORTS]
+        template = await loader.load(cohort_id_transform_to_raw(root.id))
+        if not template:
+            raise ValueError(f'Cohort with ID {root.id} does not have a template')
 
         projects = connection.get_and_check_access_to_projects_for_ids(
             project_ids=(
@@ -163,30 +164,26 @@ class GraphQLCohort:
         root: 'GraphQLCohort',
         active_only: GraphQLFilter[bool] | None = None,
     ) -> list['GraphQLSequencingGroup']:
-        connection = info.context['connection']
-        cohort_layer = CohortLayer(connection)
-        sg_ids = await cohort_layer.get_cohort_sequencing_group_ids(
-            cohort_id_transform_to_raw(root.id)
-        )
-
-        sg_layer = SequencingGroupLayer(connection)
-        filter = SequencingGroupFilter(
-            id=GenericFilter(in_=sg_ids),
-            active_only=active_only.to_internal_filter() if active_only else None,
+        loader = info.context['loaders'][LoaderKeys.SEQUENCING_GROUPS_FOR_COHORTS]
+        sequencing_groups = await loader.load(
+            {
+                'id': cohort_id_transform_to_raw(root.id),
+                'filter_': SequencingGroupFilter(
+                    active_only=(
+                        active_only.to_internal_filter() if active_only else None
+                    ),
+                ),
+            }
         )
-        sequencing_groups = await sg_layer.query(filter_=filter)
-
         return [GraphQLSequencingGroup.from_internal(sg) for sg in sequencing_groups]
 
     @strawberry.field()
     async def analyses(
         self, info: Info[GraphQLContext, 'Query'], root: 'GraphQLCohort'
     ) -> list['GraphQLAnalysis']:
-        connection = info.context['connection']
-        internal_analysis = await AnalysisLayer(connection).query(
-            AnalysisFilter(
-                cohort_id=GenericFilter(in_=[cohort_id_transform_to_raw(root.id)]),
-            )
+        loader = info.context['loaders'][LoaderKeys.ANALYSES_FOR_COHORTS]
+        internal_analysis = await loader.load(
+            {'id': cohort_id_transform_to_raw(root.id), 'filter_': AnalysisFilter()}
         )
         return [GraphQLAnalysis.from_internal(a) for a in internal_analysis]
 
@@ -289,7 +286,21 @@ class GraphQLComment:
     comment_entity_id: strawberry.Private[int]
     status: strawberry.enum(CommentStatus)  # type: ignore
     thread: list['GraphQLComment']
-    versions: list[GraphQLCommentVersion]
+    internal_versions: strawberry.Private[list[CommentVersionInternal] | None]
+
+    @strawberry.field()
+    async def versions(
+        self, info: Info[GraphQLContext, 'Query'], root: 'GraphQLComment'
+    ) -> list[GraphQLCommentVersion]:
+        # discussions are loaded without the comment history, so only load it if
+        # it's requested
+        versions = root.internal_versions
+        if versions is None:
+            loader = info.context['loaders'][
+                LoaderKeys.COMMENT_VERSIONS_FOR_COMMENT_IDS
+            ]
+            versions = await loader.load(root.id)
+        return [GraphQLCommentVersion.from_internal(v) for v in versions]
 
     @strawberry.field()
     async def entity(
@@ -345,9 +356,7 @@ class GraphQLComment:
             comment_entity_id=internal.comment_entity_id,
             thread=[GraphQLComment.from_internal(c) for c in internal.thread],
             status=internal.status,
-            versions=[
-                GraphQLCommentVersion.from_internal(v) for v in internal.versions
-            ],
+            internal_versions=internal.versions,
         )
 
 
@@ -381,6 +390,10 @@ class GraphQLProject:
         repository: GraphQLFilter[str] | None = None,
         access_level: GraphQLFilter[str] | None = None,
         environment: GraphQLFilter[str] | None = None,
+        timestamp: GraphQLFilter[datetime.datetime] | None = None,
+        limit: int | None = None,
+        after: str | None = None,
+        include_heavy_fields: bool = True,
     ) -> list['GraphQLAnalysisRunner']:
         connection = info.context['connection']
         alayer = AnalysisRunnerLayer(connection)
@@ -391,8 +404,14 @@ class GraphQLProject:
             repository=repository.to_internal_filter() if repository else None,
             access_level=access_level.to_internal_filter() if access_level else None,
             environment=environment.to_internal_filter() if environment else None,
+            timestamp=timestamp.to_internal_filter() if timestamp else None,
+        )
+        analysis_runners = await alayer.query(
+            filter_,
+            limit=limit,
+            after=after,
+            include_heavy_fields=include_heavy_fields,
         )
-        analysis_runners = await alayer.query(filter_)
         return [GraphQLAnalysisRunner.from_internal(ar) for ar in analysis_runners]
 
     @strawberry.field()
@@ -1251,11 +1270,13 @@ class GraphQLAnalysisRunner:
     driver_image: str
     config_path: str | None
     cwd: str | None
-    environment: str
+    environment: str | None
     hail_version: str | None
     batch_url: str
     submitting_user: str
-    meta: strawberry.scalars.JSON
+    meta: strawberry.scalars.JSON | None
+    # pass as `after` to get the logs submitted before this one
+    cursor: str
 
     internal_project: strawberry.Private[int]
 
@@ -1278,6 +1299,7 @@ class GraphQLAnalysisRunner:
             submitting_user=internal.submitting_user,
             meta=internal.meta,
             output_path=internal.output_path,
+            cursor=internal.cursor,
             # internal
             internal_project=internal.project,
         )
@@ -1,10 +1,12 @@
 # pylint: disable=dangerous-default-value
 import csv
 import io
+import json
 from datetime import date
-from typing import Annotated, Any
+from typing import Annotated, Any, AsyncIterator
 
 from fastapi import APIRouter
+from fastapi.encoders import jsonable_encoder
 from fastapi.params import Body, Query
 from pydantic import BaseModel
 from starlette.responses import StreamingResponse
@@ -21,12 +23,12 @@ from db.python.layers.analysis import AnalysisLayer
 from db.python.layers.analysis_runner import AnalysisRunnerLayer
 from db.python.tables.analysis import AnalysisFilter
 from db.python.tables.analysis_runner import AnalysisRunnerFilter
+from db.python.tables.project import ProjectPermissionsTable
 from models.enums import AnalysisStatus
 from models.models.analysis import Analysis, ProportionalDateTemporalMethod
 from models.models.analysis_runner import AnalysisRunner
 from models.models.project import FullWriteAccessRoles, ReadAccessRoles
 from models.utils.sequencing_group_id_format import (
-    sequencing_group_id_format,
     sequencing_group_id_format_list,
     sequencing_group_id_transform_to_raw_list,
 )
@@ -299,27 +301,19 @@ async def get_sample_reads_map(
 
     at = AnalysisLayer(connection)
     assert connection.project_id
-    objs = await at.get_sample_cram_path_map_for_seqr(
+    pages = at.iterate_sample_cram_path_map_for_seqr(
         project=connection.project_id, sequencing_types=sequencing_types
     )
 
-    for r in objs:
-        r['sequencing_group_id'] = sequencing_group_id_format(r['sequencing_group_id'])
-
     if export_type == ExportType.JSON:
-        return objs
-
-    keys = ['participant_id', 'output', 'sequencing_group_id']
-    rows = [[r[k] for k in keys] for r in objs]
-
-    output = io.StringIO()
-    writer = csv.writer(output, delimiter=export_type.get_delimiter())
-    writer.writerows(rows)
+        return StreamingResponse(
+            _cram_path_map_json_chunks(pages), media_type='application/json'
+        )
 
     basefn = f'{connection.project_id}-seqr-igv-paths-{date.today().isoformat()}'
 
     return StreamingResponse(
-        iter([output.getvalue()]),
+        _cram_path_map_delimited_chunks(pages, export_type.get_delimiter()),
         media_type=export_type.get_mime_type(),
         headers={
             'Content-Disposition': f'filename={basefn}{export_type.get_extension()}'
@@ -327,6 +321,39 @@ async def get_sample_reads_map(
     )
 
 
+def _format_cram_path_map_page(page: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    sg_ids = sequencing_group_id_format_list(r['sequencing_group_id'] for r in page)
+    for row, sg_id in zip(page, sg_ids):
+        row['sequencing_group_id'] = sg_id
+    return page
+
+
+async def _cram_path_map_json_chunks(
+    pages: AsyncIterator[list[dict[str, Any]]],
+) -> AsyncIterator[str]:
+    """Stream the pages of the cram path map as one JSON list"""
+    separator = '['
+    async for page in pages:
+        rows = jsonable_encoder(_format_cram_path_map_page(page))
+        if not rows:
+            continue
+        yield separator + ','.join(json.dumps(row) for row in rows)
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+async def _cram_path_map_delimited_chunks(
+    pages: AsyncIterator[list[dict[str, Any]]], delimiter: str
+) -> AsyncIterator[str]:
+    """Stream the pages of the cram path map as delimited rows"""
+    keys = ['participant_id', 'output', 'sequencing_group_id']
+    async for page in pages:
+        output = io.StringIO()
+        writer = csv.writer(output, delimiter=delimiter)
+        writer.writerows([r[k] for k in keys] for r in _format_cram_path_map_page(page))
+        yield output.getvalue()
+
+
 @router.post(
     '/cram-proportionate-map',
     operation_id='getProportionateMap',
@@ -368,3 +395,24 @@ async def get_proportionate_map(
     )
 
     return {k.value: v for k, v in results.items()}
+
+
+@router.post(
+    '/cram-proportionate-map/refresh',
+    operation_id='refreshProportionateMap',
+)
+async def refresh_proportionate_map(
+    connection: Connection = get_projectless_db_connection,
+) -> dict[str, int]:
+    """
+    Refresh the precomputed project sizes behind the proportionate map through
+    yesterday, intended to be run on a schedule. Returns the number of projects
+    that were refreshed for each temporal method.
+    """
+    # this computes sizes across all projects
+    ptable = ProjectPermissionsTable(connection)
+    await ptable.check_project_creator_permissions(author=connection.author)
+
+    at = AnalysisLayer(connection)
+    refreshed = await at.refresh_storage_proportions()
+    return {k.value: v for k, v in refreshed.items()}
@@ -65,16 +65,26 @@ async def create_analysis_runner_log(  # pylint: disable=too-many-arguments
 
 
 @router.get('/{project}/', operation_id='getAnalysisRunnerLogs')
-async def get_analysis_runner_logs(
+async def get_analysis_runner_logs(  # pylint: disable=too-many-arguments
     project: str,
     ar_guid: str | None = None,
     submitting_user: str | None = None,
     repository: str | None = None,
     access_level: str | None = None,
     environment: str | None = None,
+    submitted_after: datetime.datetime | None = None,
+    submitted_before: datetime.datetime | None = None,
+    limit: int | None = None,
+    after: str | None = None,
+    include_heavy_fields: bool = True,
     connection: Connection = get_project_db_connection(ReadAccessRoles),
 ) -> list[AnalysisRunner]:
-    """Get analysis runner logs"""
+    """
+    Get analysis runner logs, most recently submitted first. To page through
+    logs, set a limit, and pass the cursor of the last log as "after" to get the
+    next page. Set include_heavy_fields=false to omit the (large) environment,
+    config_path and meta fields.
+    """
 
     atable = AnalysisRunnerLayer(connection)
 
@@ -88,8 +98,14 @@ async def get_analysis_runner_logs(
         access_level=GenericFilter(eq=access_level),
         environment=GenericFilter(eq=environment),
         project=GenericFilter(eq=connection.project_id),
+        timestamp=GenericFilter(gte=submitted_after, lt=submitted_before),
     )
 
-    logs = await atable.query(filter_)
+    logs = await atable.query(
+        filter_,
+        limit=limit,
+        after=after,
+        include_heavy_fields=include_heavy_fields,
+    )
 
     return [log.to_external({connection.project_id: project}) for log in logs]
@@ -41,7 +41,9 @@ async def import_individual_metadata_manifest(
     )
     headers = next(csvreader)
 
-    await player.generic_individual_metadata_importer(
-        headers, list(csvreader), extra_participants_method=extra_participants_method
+    # the upload is read (and written) in chunks of rows, so it's never fully
+    # materialised in memory
+    summary = await player.generic_individual_metadata_importer(
+        headers, csvreader, extra_participants_method=extra_participants_method
     )
-    return {'success': True}
+    return {'success': True, **summary}
@@ -17,7 +17,7 @@ from db.python.layers.participant import ParticipantLayer
 from models.base import SMBase
 from models.models.participant import ParticipantUpsert
 from models.models.project import FullWriteAccessRoles, ReadAccessRoles
-from models.models.sequencing_group import sequencing_group_id_format
+from models.utils.sequencing_group_id_format import sequencing_group_id_format_list
 
 router = APIRouter(prefix='/participant', tags=['participant'])
 
@@ -143,7 +143,10 @@ async def get_external_participant_id_to_sequencing_group_id(
         project=connection.project_id, sequencing_type=sequencing_type
     )
 
-    rows = [[pid, sequencing_group_id_format(sgid)] for pid, sgid in m]
+    rows = [
+        [pid, sgid]
+        for (pid, _), sgid in zip(m, sequencing_group_id_format_list(s for _, s in m))
+    ]
     if flip_columns:
         rows = [r[::-1] for r in rows]
 
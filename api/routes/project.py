@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException
 
 from api.utils.db import (
@@ -5,8 +7,13 @@ from api.utils.db import (
     get_project_db_connection,
     get_projectless_db_connection,
 )
+from db.python.tables.bulk_operation import (
+    BulkOperation,
+    BulkOperationTable,
+    run_in_background,
+)
 from db.python.tables.project import ProjectPermissionsTable
-from db.python.utils import Forbidden
+from db.python.utils import Forbidden, NotFoundError
 from models.models.project import (
     FullWriteAccessRoles,
     Project,
@@ -106,6 +113,7 @@ async def update_project(
 @router.delete('/{project}', operation_id='deleteProjectData')
 async def delete_project_data(
     delete_project: bool = False,
+    wait: bool = True,
     connection: Connection = get_project_db_connection(
         {ProjectMemberRole.project_admin}
     ),
@@ -114,6 +122,10 @@ async def delete_project_data(
     Delete all data in a project by project name.
     Can optionally delete the project itself.
     Requires READ access + project-creator permissions
+
+    Data is deleted in batches, and the deletion continues if the request is
+    dropped. Set wait=False to return straight away, and poll the progress with
+    the returned operation_id. Deleting again resumes an unfinished deletion.
     """
     if delete_project:
         # stop allowing delete project with analysis-runner entries
@@ -121,9 +133,40 @@ async def delete_project_data(
 
     ptable = ProjectPermissionsTable(connection)
 
+    project = connection.project
+    assert project
+    operation = await ptable.start_delete_project_data(project=project)
+    task = run_in_background(
+        operation, ptable.delete_project_data(project=project, operation=operation)
+    )
+    if not wait:
+        return {'success': True, 'operation_id': operation.id}
+
+    # shield, so a client disconnecting doesn't stop the deletion
+    success = await asyncio.shield(task)
+    return {'success': success, 'operation_id': operation.id}
+
+
+@router.get(
+    '/{project}/operations/{operation_id}',
+    operation_id='getProjectBulkOperation',
+    response_model=BulkOperation,
+)
+async def get_project_bulk_operation(
+    operation_id: int,
+    connection: Connection = get_project_db_connection(ReadAccessRoles),
+):
+    """
+    Get the progress of a long running operation on the project (eg: deleting the
+    project's data), including the rows written by each step
+    """
     assert connection.project
-    success = await ptable.delete_project_data(project=connection.project)
-    return {'success': success}
+    operation = await BulkOperationTable(connection).get_operation(operation_id)
+    if operation.project != connection.project.id:
+        raise NotFoundError(
+            f'Bulk operation {operation_id} does not exist in {connection.project.name}'
+        )
+    return operation
 
 
 @router.patch('/{project}/members', operation_id='updateProjectMembers')
@@ -12,6 +12,7 @@ from models.models.project import FullWriteAccessRoles, ReadAccessRoles
 from models.models.sample import SampleUpsert
 from models.utils.sample_id_format import (  # Sample,
     sample_id_format,
+    sample_id_format_list,
     sample_id_transform_to_raw,
     sample_id_transform_to_raw_list,
 )
@@ -70,7 +71,7 @@ async def get_sample_id_map_by_external(
     result = await st.get_sample_id_map_by_external_ids(
         external_ids, allow_missing=(allow_missing or False)
     )
-    return {k: sample_id_format(v) for k, v in result.items()}
+    return dict(zip(result.keys(), sample_id_format_list(result.values())))
 
 
 @router.post('/id-map/internal', operation_id='getSampleIdMapByInternal')
@@ -85,7 +86,7 @@ async def get_sample_id_map_by_internal(
     st = SampleLayer(connection)
     internal_ids_raw = sample_id_transform_to_raw_list(internal_ids)
     result = await st.get_internal_to_external_sample_id_map(internal_ids_raw)
-    return {sample_id_format(k): v for k, v in result.items()}
+    return dict(zip(sample_id_format_list(result.keys()), result.values()))
 
 
 @router.get(
@@ -100,7 +101,7 @@ async def get_all_sample_id_map_by_internal(
     result = await st.get_all_sample_id_map_by_internal_ids(
         project=connection.project_id
     )
-    return {sample_id_format(k): v for k, v in result.items()}
+    return dict(zip(sample_id_format_list(result.keys()), result.values()))
 
 
 @router.get(
@@ -193,7 +194,7 @@ async def get_samples_create_date(
     # Convert to raw ids and query the start dates for all of them
     result = await st.get_samples_create_date(sample_ids_raw)
 
-    return {sample_id_format(k): v for k, v in result.items()}
+    return dict(zip(sample_id_format_list(result.keys()), result.values()))
 
 
 # endregion GETS
@@ -19,7 +19,7 @@ from api.utils.db import (
 from api.utils.export import ExportType
 from db.python.filters.web import ProjectParticipantGridFilter
 from db.python.layers.search import SearchLayer
-from db.python.layers.seqr import SeqrLayer
+from db.python.layers.seqr import SEQR_MAX_CONCURRENT_PROJECTS, SeqrLayer
 from db.python.layers.web import WebLayer
 from models.base import SMBase
 from models.enums.web import MetaSearchEntityPrefix, SeqrDatasetType
@@ -284,6 +284,7 @@ async def sync_seqr_project(
     sync_saved_variants: bool = True,
     sync_cram_map: bool = True,
     post_slack_notification: bool = True,
+    skip_unchanged: bool = True,
     connection: Connection = get_project_db_connection(FullWriteAccessRoles),
 ):
     """
@@ -302,6 +303,7 @@ async def sync_seqr_project(
             sync_saved_variants=sync_saved_variants,
             sync_cram_map=sync_cram_map,
             post_slack_notification=post_slack_notification,
+            skip_unchanged=skip_unchanged,
         )
         return {'success': 'errors' not in data, **data}
     except Exception as e:
@@ -309,6 +311,44 @@ async def sync_seqr_project(
         # return {'success': False, 'message': str(e)}
 
 
+@router.post('/seqr/sync-datasets', operation_id='syncSeqrProjects')
+async def sync_seqr_projects(
+    sequencing_types: list[str],
+    es_index_types: list[SeqrDatasetType],
+    project_names: list[str] | None = None,
+    max_concurrent_projects: int = SEQR_MAX_CONCURRENT_PROJECTS,
+    sync_families: bool = True,
+    sync_individual_metadata: bool = True,
+    sync_individuals: bool = True,
+    sync_es_index: bool = True,
+    sync_saved_variants: bool = True,
+    sync_cram_map: bool = True,
+    post_slack_notification: bool = True,
+    skip_unchanged: bool = True,
+    connection: Connection = get_projectless_db_connection,
+):
+    """
+    Sync many metamist projects with their seqr projects at once (all seqr
+    projects if no project_names are provided), for each of the sequencing types
+    """
+    seqr = SeqrLayer(connection)
+    results = await seqr.sync_datasets(
+        sequencing_types=sequencing_types,
+        project_names=project_names,
+        max_concurrent_projects=max_concurrent_projects,
+        sync_families=sync_families,
+        sync_individual_metadata=sync_individual_metadata,
+        sync_individuals=sync_individuals,
+        sync_es_index=sync_es_index,
+        es_index_types=es_index_types,
+        sync_saved_variants=sync_saved_variants,
+        sync_cram_map=sync_cram_map,
+        post_slack_notification=post_slack_notification,
+        skip_unchanged=skip_unchanged,
+    )
+    return {'success': all(r['success'] for r in results), 'results': results}
+
+
 @router.get(
     '/{project}/{sequencing_type}/seqr-family-guid-map',
     operation_id='getSeqrFamilyGuidMap',
@@ -12,6 +12,7 @@ from pydantic import ValidationError
 from starlette.responses import FileResponse
 
 from api import routes
+from api.graphql.batch import GraphQLBatchRouter
 from api.graphql.schema import MetamistGraphQLRouter  # type: ignore
 from api.settings import (
     PROFILE_REQUESTS,
@@ -121,11 +122,15 @@ class SPAStaticFiles(StaticFiles):
 
 @app.middleware('http')
 async def add_process_time_header(request: Request, call_next):
-    """Add X-Process-Time to all requests for logging"""
+    """
+    Add X-Process-Time to all requests for logging, and X-Metamist-Version
+    (so the python client can use the schema cached for this version)
+    """
     start_time = time.time()
     response = await call_next(request)
     process_time = time.time() - start_time
     response.headers['X-Process-Time'] = f'{round(process_time * 1000, 1)}ms'
+    response.headers['X-Metamist-Version'] = _VERSION
     return response
 
 
@@ -196,6 +201,7 @@ async def exception_handler(request: Request, e: Exception):
 
 
 # graphql
+app.include_router(GraphQLBatchRouter, prefix='/graphql', include_in_schema=False)
 app.include_router(MetamistGraphQLRouter, prefix='/graphql', include_in_schema=False)
 
 for route in routes.__dict__.values():
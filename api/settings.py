@@ -18,6 +18,14 @@ IGNORE_GCP_CREDENTIALS_ERROR = os.getenv('SM_IGNORE_GCP_CREDENTIALS_ERROR') in T
 MEMBERS_CACHE_LOCATION = os.getenv('SM_MEMBERS_CACHE_LOCATION')
 METAMIST_GCP_PROJECT = os.getenv('METAMIST_GCP_PROJECT')
 
+# local directory to keep parquet export snapshots in, snapshots are disabled if unset
+PARQUET_SNAPSHOT_DIR = os.getenv('SM_PARQUET_SNAPSHOT_DIR')
+# serve an out-of-date snapshot (while rebuilding it in the background) if it
+# was built less than this many seconds ago, 0 always serves the latest data
+PARQUET_SNAPSHOT_MAX_STALENESS = int(
+    os.getenv('SM_PARQUET_SNAPSHOT_MAX_STALENESS', '0')
+)
+
 SEQR_URL = os.getenv('SM_SEQR_URL')
 SEQR_AUDIENCE = os.getenv('SM_SEQR_AUDIENCE')
 SEQR_MAP_LOCATION = os.getenv('SM_SEQR_MAP_LOCATION')
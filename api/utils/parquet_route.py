@@ -1,12 +1,17 @@
+import inspect
 import os
 from functools import wraps
-from io import BytesIO
 from typing import Awaitable, Callable, ParamSpec
 
-from fastapi import APIRouter, Response
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
+from api.utils.parquet_snapshot import get_parquet_snapshot_store
+from db.python.tables.meta_table import EntityExport
+
+PARQUET_MEDIA_TYPE = 'application/vnd.apache.parquet'
+
 
 class TableError(BaseModel):
     """Simple error model for table routes"""
@@ -17,47 +22,150 @@ class TableError(BaseModel):
 P = ParamSpec('P')
 
 
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Check whether an If-None-Match header matches the etag (weak comparison)
+
+    >>> etag_matches('"abc", W/"def"', '"def"')
+    True
+    >>> etag_matches('*', '"def"')
+    True
+    >>> etag_matches('"abc"', '"def"')
+    False
+    >>> etag_matches(None, '"def"')
+    False
+    """
+    if not if_none_match:
+        return False
+    candidates = [
+        c.strip().removeprefix('W/') for c in if_none_match.split(',') if c.strip()
+    ]
+    return '*' in candidates or etag in candidates
+
+
+def _snapshot_response(path: str, etag: str, headers: dict[str, str]) -> Response:
+    """
+    Serve a snapshot file, FileResponse sets the Content-Length, Last-Modified and
+    Accept-Ranges headers, and handles Range / If-Range requests (including 416s)
+    """
+    return FileResponse(
+        path,
+        media_type=PARQUET_MEDIA_TYPE,
+        headers={**headers, 'ETag': etag},
+    )
+
+
+def _table_not_found_response() -> Response:
+    return JSONResponse(
+        status_code=404,
+        content={'error': 'Table empty or not found'},
+    )
+
+
 def parquet_table_route(router: APIRouter, path: str, operation_id: str):
     """
     Decorator for routes that return a parquet table, this is intended to reduce
     a bunch of boilerplate around setting the response headers, handling range requests
-    and handling 404s when there's no data for a table
+    and handling 404s when there's no data for a table.
+
+    Responses carry an ETag derived from the table version, so clients sending
+    If-None-Match get a 304 when nothing has changed. If a snapshot store is
+    configured, exports are kept on local disk and re-served until the table changes.
+    Range and HEAD requests are always served from a snapshot, so remote readers
+    can fetch only the footer and row groups they need.
     """
 
-    def decorator(func: Callable[P, Awaitable[BytesIO | None]]):
-        @router.api_route(
+    def decorator(func: Callable[P, Awaitable[EntityExport]]):
+        @wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> Response:
+            request: Request = kwargs.pop('_parquet_request')  # type: ignore
+            export = await func(*args, **kwargs)
+
+            filename = os.path.basename(path)
+            headers = {
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                # clients may cache, but must revalidate with the etag
+                'Cache-Control': 'no-cache',
+            }
+
+            if_none_match = request.headers.get('if-none-match')
+            if etag_matches(if_none_match, export.etag):
+                return Response(status_code=304, headers={'ETag': export.etag})
+
+            # range and HEAD requests (eg: from DuckDB / arrow reading the footer,
+            # then individual row groups) need the complete file to seek into
+            random_access = request.method == 'HEAD' or 'range' in request.headers
+
+            store = get_parquet_snapshot_store(random_access=random_access)
+            if store:
+                if_range = request.headers.get('if-range')
+                if random_access and if_range:
+                    # keep serving the snapshot the client started reading from
+                    if pinned_path := store.get_by_etag(export, if_range):
+                        return _snapshot_response(pinned_path, if_range, headers)
+
+                if snapshot_path := store.get(export):
+                    return _snapshot_response(snapshot_path, export.etag, headers)
+
+                if stale_path := store.get_servable_stale(export):
+                    store.build_in_background(export)
+                    stale_etag = store.etag_for_path(stale_path)
+                    if etag_matches(if_none_match, stale_etag):
+                        return Response(status_code=304, headers={'ETag': stale_etag})
+                    return _snapshot_response(stale_path, stale_etag, headers)
+
+                if random_access:
+                    if snapshot_path := await store.get_or_build(export):
+                        return _snapshot_response(snapshot_path, export.etag, headers)
+                    return _table_not_found_response()
+
+            table_chunks = await export.generate()
+
+            if table_chunks is None:
+                return _table_not_found_response()
+
+            if store:
+                # write the snapshot as the export is streamed to this client
+                table_chunks = store.tee(export, table_chunks)
+
+            # stream each row group to the client as it's written, the length isn't
+            # known yet, but subsequent range requests will be served from a snapshot
+            return StreamingResponse(
+                content=table_chunks,
+                media_type=PARQUET_MEDIA_TYPE,
+                headers={**headers, 'ETag': export.etag, 'Accept-Ranges': 'bytes'},
+            )
+
+        # add the request to the signature FastAPI sees, so we can inspect
+        # the conditional request headers without each route declaring it
+        signature = inspect.signature(func)
+        wrapper.__signature__ = signature.replace(  # type: ignore
+            parameters=[
+                *signature.parameters.values(),
+                inspect.Parameter(
+                    '_parquet_request',
+                    inspect.Parameter.KEYWORD_ONLY,
+                    annotation=Request,
+                ),
+            ]
+        )
+
+        # HEAD is registered separately to avoid a duplicate operation_id
+        router.api_route(
+            path, methods=['HEAD'], include_in_schema=False, response_class=Response
+        )(wrapper)
+        return router.api_route(
             path,
             methods=['GET'],
             operation_id=operation_id,
             responses={
-                200: {'content': {'application/vnd.apache.parquet': {}}},
+                200: {'content': {PARQUET_MEDIA_TYPE: {}}},
+                206: {'description': 'Requested byte range of the parquet file'},
+                304: {'description': 'Table unchanged since the provided ETag'},
                 404: {'model': TableError},
+                416: {'description': 'Requested range not satisfiable'},
             },
             response_class=Response,
-        )
-        @wraps(func)
-        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> Response:
-            table_bytes = await func(*args, **kwargs)
-
-            if table_bytes is None:
-                return JSONResponse(
-                    status_code=404,
-                    content={'error': 'Table empty or not found'},
-                )
-
-            filename = os.path.basename(path)
-
-            headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
-
-            table_bytes.seek(0)
-            result = table_bytes.getvalue()
-
-            return Response(
-                content=result,
-                media_type='application/vnd.apache.parquet',
-                headers=headers,
-            )
-
-        return wrapper
+        )(wrapper)
 
     return decorator
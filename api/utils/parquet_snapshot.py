@@ -0,0 +1,192 @@
+import asyncio
+import glob
+import logging
+import os
+import tempfile
+import time
+from typing import AsyncIterator
+
+from api.settings import PARQUET_SNAPSHOT_DIR, PARQUET_SNAPSHOT_MAX_STALENESS
+from db.python.tables.meta_table import EntityExport
+
+# Superseded snapshots are kept for this long before being removed, so that
+# responses still streaming the old file aren't cut off
+SUPERSEDED_SNAPSHOT_GRACE_SECONDS = 600
+
+
+class ParquetSnapshotStore:
+    """
+    Keeps the most recent parquet export of each (table, project) on local disk,
+    named by the export's ETag, so repeated requests for an unchanged table can be
+    served straight from the file (and the OS page cache) without touching the
+    database beyond the version check.
+    """
+
+    def __init__(self, directory: str, max_staleness: int = 0):
+        self.directory = directory
+        self.max_staleness = max_staleness
+        # paths currently being rebuilt in the background
+        self._rebuilding: dict[str, asyncio.Task] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _prefix(self, export: EntityExport) -> str:
+        return os.path.join(self.directory, f'{export.table_name}-{export.project}-')
+
+    def path_for(self, export: EntityExport) -> str:
+        """Path of the snapshot for the current version of the export"""
+        return self._prefix(export) + export.etag.strip('"') + '.parquet'
+
+    @staticmethod
+    def etag_for_path(path: str) -> str:
+        """Recover the ETag a snapshot was built for from its path"""
+        return '"' + os.path.basename(path).rsplit('-', 1)[-1].split('.')[0] + '"'
+
+    def get(self, export: EntityExport) -> str | None:
+        """Get the snapshot for the current version of the export, if it exists"""
+        path = self.path_for(export)
+        if not os.path.exists(path):
+            return None
+        self._remove_superseded_snapshots(export, current=path)
+        return path
+
+    def get_by_etag(self, export: EntityExport, etag: str) -> str | None:
+        """
+        Get the snapshot of this table built for a specific etag (which may no
+        longer be current), so clients reading ranges of a snapshot over multiple
+        requests keep reading the same file while it's still available
+        """
+        if not (etag.startswith('"') and etag.endswith('"')):
+            return None
+        name = etag.strip('"')
+        if not name.isalnum():
+            return None
+        path = self._prefix(export) + name + '.parquet'
+        return path if os.path.exists(path) else None
+
+    def get_servable_stale(self, export: EntityExport) -> str | None:
+        """
+        Get an out-of-date snapshot for this table that's recent enough to serve
+        (according to max_staleness), if there is one
+        """
+        if self.max_staleness <= 0:
+            return None
+        now = time.time()
+        for path in sorted(
+            glob.glob(glob.escape(self._prefix(export)) + '*.parquet'),
+            key=os.path.getmtime,
+            reverse=True,
+        ):
+            if now - os.path.getmtime(path) <= self.max_staleness:
+                return path
+        return None
+
+    def _remove_superseded_snapshots(self, export: EntityExport, current: str):
+        """
+        Remove the other snapshots of this table, once the current snapshot
+        has existed for longer than the grace period
+        """
+        try:
+            superseded_for = time.time() - os.path.getmtime(current)
+        except FileNotFoundError:
+            return
+        if superseded_for <= SUPERSEDED_SNAPSHOT_GRACE_SECONDS:
+            return
+        for path in glob.glob(glob.escape(self._prefix(export)) + '*.parquet'):
+            if path != current:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    async def tee(
+        self, export: EntityExport, chunks: AsyncIterator[bytes]
+    ) -> AsyncIterator[bytes]:
+        """
+        Pass the parquet chunks through, while also writing them to a snapshot,
+        the snapshot is only kept if every chunk was written
+        """
+        path = self.path_for(export)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        completed = False
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                async for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            completed = True
+        finally:
+            if completed:
+                os.replace(tmp_path, path)
+            else:
+                os.remove(tmp_path)
+
+    async def build(self, export: EntityExport) -> str | None:
+        """Build the snapshot for the export, returns None if the table is empty"""
+        chunks = await export.generate()
+        if chunks is None:
+            return None
+        async for _ in self.tee(export, chunks):
+            pass
+        return self.path_for(export)
+
+    def build_in_background(self, export: EntityExport) -> asyncio.Task:
+        """Rebuild the snapshot for the export, unless it's already being rebuilt"""
+        path = self.path_for(export)
+        if task := self._rebuilding.get(path):
+            return task
+
+        async def _build():
+            try:
+                return await self.build(export)
+            except Exception:
+                logging.exception(f'Failed to rebuild parquet snapshot {path}')
+                raise
+            finally:
+                self._rebuilding.pop(path, None)
+
+        task = asyncio.create_task(_build())
+        # the exception is logged above, don't warn if no request awaits it
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._rebuilding[path] = task
+        return task
+
+    async def get_or_build(self, export: EntityExport) -> str | None:
+        """
+        Get the snapshot for the current version of the export, building it if
+        required (sharing the build with any other requests for the same version).
+        Returns None if the table is empty.
+        """
+        if path := self.get(export):
+            return path
+        # shield, so a client disconnecting doesn't cancel the shared build
+        return await asyncio.shield(self.build_in_background(export))
+
+
+_snapshot_store: ParquetSnapshotStore | None = None
+_random_access_store: ParquetSnapshotStore | None = None
+
+
+def get_parquet_snapshot_store(
+    random_access: bool = False,
+) -> ParquetSnapshotStore | None:
+    """
+    Get the configured snapshot store (or None if snapshots are disabled).
+
+    Range and HEAD requests need the complete file up front, so if random_access
+    is requested and no snapshot directory is configured, fall back to a store
+    in the system temporary directory.
+    """
+    # pylint: disable=global-statement
+    global _snapshot_store, _random_access_store
+    if _snapshot_store is None and PARQUET_SNAPSHOT_DIR:
+        _snapshot_store = ParquetSnapshotStore(
+            PARQUET_SNAPSHOT_DIR, max_staleness=PARQUET_SNAPSHOT_MAX_STALENESS
+        )
+    if _snapshot_store or not random_access:
+        return _snapshot_store
+
+    if _random_access_store is None:
+        _random_access_store = ParquetSnapshotStore(
+            os.path.join(tempfile.gettempdir(), 'metamist-parquet-snapshots')
+        )
+    return _random_access_store
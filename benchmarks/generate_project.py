@@ -0,0 +1,418 @@
+"""
+Generate a large synthetic project directly in the database, eg: 1M samples with
+their participants, families, sequencing groups, assays, analyses, output files
+and comments.
+
+Rows are written with multi-row INSERTs using pre-allocated IDs, rather than
+through the layers, as going through the layers takes hours at this scale.
+"""
+
+import datetime
+import itertools
+import json
+import random
+from typing import Iterable
+
+from db.python.connect import Connection
+from db.python.tables.base import insert_many
+from models.models import PRIMARY_EXTERNAL_ORG
+from models.models.project import ProjectId
+
+# rows per multi-row INSERT
+INSERT_CHUNK_SIZE = 2000
+
+SEQUENCING_TYPES = ['genome', 'exome']
+# fraction of samples with a comment
+COMMENT_FRACTION = 0.01
+
+
+def participant_external_id(idx: int) -> str:
+    """External ID of the idx-th generated participant"""
+    return f'BPT{idx:07d}'
+
+
+def sample_external_id(idx: int) -> str:
+    """External ID of the idx-th generated sample"""
+    return f'BSM{idx:07d}'
+
+
+def family_external_id(idx: int) -> str:
+    """External ID of the idx-th generated family"""
+    return f'BFM{idx:07d}'
+
+
+async def insert_rows(
+    connection: Connection,
+    table: str,
+    columns: list[str],
+    rows: Iterable[tuple],
+) -> int:
+    """Insert the rows with multi-row INSERTs, returns the number of rows"""
+    # count the rows as they're inserted, rather than holding them all
+    counter = itertools.count()
+    await insert_many(
+        connection.connection,
+        table,
+        columns,
+        (row for row, _ in zip(rows, counter)),
+        chunk_size=INSERT_CHUNK_SIZE,
+    )
+    return next(counter)
+
+
+async def _next_id(connection: Connection, table: str) -> int:
+    return (
+        await connection.connection.fetch_val(
+            f'SELECT COALESCE(MAX(id), 0) FROM {table}'
+        )
+    ) + 1
+
+
+async def generate_project(
+    connection: Connection,
+    project: ProjectId,
+    n_samples: int,
+    n_es_indices: int = 3,
+    seed: int = 42,
+) -> dict[str, int]:
+    """
+    Generate n_samples samples in the project, each with a participant (in trios),
+    a sequencing group, an assay and a completed cram (with an output file).
+    Every sequencing group is also in n_es_indices es-index analyses, and ~1% of
+    samples have a comment. Returns the number of rows written to each table.
+    """
+    rng = random.Random(seed)
+    audit_log_id = await connection.audit_log_id()
+    today = datetime.date.today()
+
+    participant_start = await _next_id(connection, 'participant')
+    sample_start = await _next_id(connection, 'sample')
+    sg_start = await _next_id(connection, 'sequencing_group')
+    assay_start = await _next_id(connection, 'assay')
+    family_start = await _next_id(connection, 'family')
+    analysis_start = await _next_id(connection, 'analysis')
+    file_start = await _next_id(connection, 'output_file')
+    comment_start = await _next_id(connection, 'comment')
+
+    n_families = (n_samples + 2) // 3
+    sequencing_types = [
+        SEQUENCING_TYPES[0] if rng.random() < 0.8 else SEQUENCING_TYPES[1]
+        for _ in range(n_samples)
+    ]
+    cram_sizes = [rng.randrange(10, 40) * 1_000_000_000 for _ in range(n_samples)]
+    completed = [
+        datetime.datetime.combine(
+            today - datetime.timedelta(days=rng.randrange(1, 3 * 365)),
+            datetime.time(),
+        )
+        for _ in range(n_samples)
+    ]
+
+    counts: dict[str, int] = {}
+
+    counts['participant'] = await insert_rows(
+        connection,
+        'participant',
+        ['id', 'project', 'reported_sex', 'meta', 'audit_log_id'],
+        (
+            (
+                participant_start + i,
+                project,
+                rng.choice([1, 2]),
+                json.dumps({'cohort': f'C{i % 20}'}),
+                audit_log_id,
+            )
+            for i in range(n_samples)
+        ),
+    )
+    counts['participant_external_id'] = await insert_rows(
+        connection,
+        'participant_external_id',
+        ['project', 'participant_id', 'name', 'external_id', 'audit_log_id'],
+        (
+            (
+                project,
+                participant_start + i,
+                PRIMARY_EXTERNAL_ORG,
+                participant_external_id(i),
+                audit_log_id,
+            )
+            for i in range(n_samples)
+        ),
+    )
+
+    counts['family'] = await insert_rows(
+        connection,
+        'family',
+        ['id', 'project', 'description', 'coded_phenotype', 'meta', 'audit_log_id'],
+        (
+            (family_start + f, project, None, None, '{}', audit_log_id)
+            for f in range(n_families)
+        ),
+    )
+    counts['family_external_id'] = await insert_rows(
+        connection,
+        'family_external_id',
+        ['project', 'family_id', 'name', 'external_id', 'audit_log_id'],
+        (
+            (
+                project,
+                family_start + f,
+                PRIMARY_EXTERNAL_ORG,
+                family_external_id(f),
+                audit_log_id,
+            )
+            for f in range(n_families)
+        ),
+    )
+
+    def _family_participant_rows():
+        for i in range(n_samples):
+            is_proband = i % 3 == 0
+            has_parents = is_proband and i + 2 < n_samples
+            yield (
+                family_start + i // 3,
+                participant_start + i,
+                participant_start + i + 1 if has_parents else None,
+                participant_start + i + 2 if has_parents else None,
+                2 if is_proband else 1,
+                audit_log_id,
+            )
+
+    counts['family_participant'] = await insert_rows(
+        connection,
+        'family_participant',
+        [
+            'family_id',
+            'participant_id',
+            'paternal_participant_id',
+            'maternal_participant_id',
+            'affected',
+            'audit_log_id',
+        ],
+        _family_participant_rows(),
+    )
+
+    counts['sample'] = await insert_rows(
+        connection,
+        'sample',
+        ['id', 'project', 'participant_id', 'type', 'meta', 'active', 'audit_log_id'],
+        (
+            (
+                sample_start + i,
+                project,
+                participant_start + i,
+                'blood',
+                json.dumps({'collection_site': f'site-{i % 7}'}),
+                True,
+                audit_log_id,
+            )
+            for i in range(n_samples)
+        ),
+    )
+    counts['sample_external_id'] = await insert_rows(
+        connection,
+        'sample_external_id',
+        ['project', 'sample_id', 'name', 'external_id', 'audit_log_id'],
+        (
+            (
+                project,
+                sample_start + i,
+                PRIMARY_EXTERNAL_ORG,
+                sample_external_id(i),
+                audit_log_id,
+            )
+            for i in range(n_samples)
+        ),
+    )
+
+    counts['sequencing_group'] = await insert_rows(
+        connection,
+        'sequencing_group',
+        [
+            'id',
+            'sample_id',
+            'type',
+            'technology',
+            'platform',
+            'meta',
+            'archived',
+            'audit_log_id',
+        ],
+        (
+            (
+                sg_start + i,
+                sample_start + i,
+                sequencing_types[i],
+                'short-read',
+                'illumina',
+                '{}',
+                False,
+                audit_log_id,
+            )
+            for i in range(n_samples)
+        ),
+    )
+    counts['assay'] = await insert_rows(
+        connection,
+        'assay',
+        ['id', 'sample_id', 'type', 'meta', 'audit_log_id'],
+        (
+            (
+                assay_start + i,
+                sample_start + i,
+                'sequencing',
+                json.dumps(
+                    {
+                        'sequencing_type': sequencing_types[i],
+                        'sequencing_technology': 'short-read',
+                        'sequencing_platform': 'illumina',
+                        'reads': [f'gs://bucket/{sample_external_id(i)}_R1.fq.gz'],
+                    }
+                ),
+                audit_log_id,
+            )
+            for i in range(n_samples)
+        ),
+    )
+    counts['sequencing_group_assay'] = await insert_rows(
+        connection,
+        'sequencing_group_assay',
+        ['sequencing_group_id', 'assay_id', 'audit_log_id'],
+        ((sg_start + i, assay_start + i, audit_log_id) for i in range(n_samples)),
+    )
+
+    # a cram for every sequencing group, then the es-indices
+    es_index_ids = [analysis_start + n_samples + e for e in range(n_es_indices)]
+    es_index_dates = sorted(
+        datetime.datetime.combine(
+            today - datetime.timedelta(days=rng.randrange(1, 3 * 365)),
+            datetime.time(),
+        )
+        for _ in range(n_es_indices)
+    )
+    counts['analysis'] = await insert_rows(
+        connection,
+        'analysis',
+        [
+            'id',
+            'type',
+            'status',
+            'meta',
+            'project',
+            'active',
+            'timestamp_completed',
+            'audit_log_id',
+        ],
+        [
+            *(
+                (
+                    analysis_start + i,
+                    'cram',
+                    'completed',
+                    json.dumps(
+                        {'sequencing_type': sequencing_types[i], 'size': cram_sizes[i]}
+                    ),
+                    project,
+                    True,
+                    completed[i],
+                    audit_log_id,
+                )
+                for i in range(n_samples)
+            ),
+            *(
+                (
+                    es_index_id,
+                    'es-index',
+                    'completed',
+                    json.dumps({'sequencing_type': SEQUENCING_TYPES[0]}),
+                    project,
+                    True,
+                    es_index_date,
+                    audit_log_id,
+                )
+                for es_index_id, es_index_date in zip(es_index_ids, es_index_dates)
+            ),
+        ],
+    )
+    counts['analysis_sequencing_group'] = await insert_rows(
+        connection,
+        'analysis_sequencing_group',
+        ['analysis_id', 'sequencing_group_id', 'audit_log_id'],
+        [
+            *(
+                (analysis_start + i, sg_start + i, audit_log_id)
+                for i in range(n_samples)
+            ),
+            *(
+                (es_index_id, sg_start + i, audit_log_id)
+                for es_index_id in es_index_ids
+                for i in range(n_samples)
+                if sequencing_types[i] == SEQUENCING_TYPES[0]
+            ),
+        ],
+    )
+
+    def _cram_path(i: int) -> str:
+        return f'gs://cpg-benchmark-main/cram/{sample_external_id(i)}.cram'
+
+    counts['output_file'] = await insert_rows(
+        connection,
+        'output_file',
+        [
+            'id',
+            'path',
+            'basename',
+            'dirname',
+            'nameroot',
+            'nameext',
+            'size',
+            'valid',
+        ],
+        (
+            (
+                file_start + i,
+                _cram_path(i),
+                f'{sample_external_id(i)}.cram',
+                'gs://cpg-benchmark-main/cram',
+                sample_external_id(i),
+                '.cram',
+                cram_sizes[i],
+                True,
+            )
+            for i in range(n_samples)
+        ),
+    )
+    counts['analysis_outputs'] = await insert_rows(
+        connection,
+        'analysis_outputs',
+        ['analysis_id', 'file_id', 'json_structure', 'output'],
+        ((analysis_start + i, file_start + i, None, None) for i in range(n_samples)),
+    )
+
+    commented = [i for i in range(n_samples) if rng.random() < COMMENT_FRACTION]
+    counts['comment'] = await insert_rows(
+        connection,
+        'comment',
+        ['id', 'content', 'status', 'audit_log_id'],
+        (
+            (
+                comment_start + c,
+                f'Re-sequence {sample_external_id(i)}',
+                'active',
+                audit_log_id,
+            )
+            for c, i in enumerate(commented)
+        ),
+    )
+    counts['sample_comment'] = await insert_rows(
+        connection,
+        'sample_comment',
+        ['comment_id', 'sample_id', 'audit_log_id'],
+        (
+            (comment_start + c, sample_start + i, audit_log_id)
+            for c, i in enumerate(commented)
+        ),
+    )
+
+    return counts
@@ -0,0 +1,137 @@
+"""
+Benchmark the es-index proportionate map engine on synthetic data, eg:
+
+    python -m benchmarks.proportionate_map --sequencing-groups 500000 --years 5
+
+By default the previous (per day, per SG) implementation is also timed on a
+subset of the data, and extrapolated, as it's far too slow to run in full.
+"""
+
+import datetime
+import random
+import time
+
+import click
+
+from db.python.proportionate_map import cumulative_project_sizes_by_day
+
+
+def generate_data(
+    n_sequencing_groups: int,
+    n_years: int,
+    n_projects: int,
+    n_es_index_days: int,
+    seed: int = 42,
+):
+    """
+    Generate SGs spread over es-index days, where ~10% of SGs have their cram
+    re-generated (with a new size) at a later date
+    """
+    rng = random.Random(seed)
+    start = datetime.date(2020, 1, 1)
+    n_days = 365 * n_years
+    days = sorted(
+        {start}
+        | {
+            start + datetime.timedelta(days=rng.randrange(1, n_days))
+            for _ in range(n_es_index_days)
+        }
+    )
+
+    sg_to_project: dict[int, int] = {}
+    sg_first_seen: dict[int, datetime.date] = {}
+    sizes_by_sg: dict[int, list[tuple[datetime.date, int]]] = {}
+    for sg in range(n_sequencing_groups):
+        first_seen = days[int(len(days) * rng.random() ** 2)]
+        sg_to_project[sg] = rng.randrange(n_projects)
+        sg_first_seen[sg] = first_seen
+        sizes = [(first_seen, rng.randrange(10, 40) * 1_000_000_000)]
+        if rng.random() < 0.1:
+            sizes.append(
+                (
+                    first_seen + datetime.timedelta(days=rng.randrange(1, n_days)),
+                    rng.randrange(10, 40) * 1_000_000_000,
+                )
+            )
+        sizes_by_sg[sg] = sizes
+
+    return days, sg_first_seen, sizes_by_sg, sg_to_project
+
+
+def naive_project_sizes_by_day(days, sg_first_seen, sizes_by_sg, sg_to_project):
+    """The previous implementation, re-walking every SG seen for each day"""
+
+    def get_cram_size_for(sg_id, date):
+        sg_sizes = sizes_by_sg.get(sg_id)
+        if not sg_sizes:
+            return None
+        if len(sg_sizes) == 1:
+            return sg_sizes[0][1]
+        for dt, size in sg_sizes[::-1]:
+            if dt <= date:
+                return size
+        return None
+
+    sgs_by_day: dict[datetime.date, set[int]] = {}
+    for sg, day in sg_first_seen.items():
+        sgs_by_day.setdefault(day, set()).add(sg)
+
+    results = []
+    sgs_seen: set[int] = set()
+    for day in days:
+        sgs_seen |= sgs_by_day.get(day, set())
+        by_project: dict[int, int] = {}
+        for sg in sgs_seen:
+            if sg not in sg_to_project:
+                continue
+            if cram_size := get_cram_size_for(sg, day):
+                project = sg_to_project[sg]
+                by_project[project] = by_project.get(project, 0) + cram_size
+        results.append(by_project)
+    return results
+
+
+@click.command()
+@click.option('--sequencing-groups', default=500_000)
+@click.option('--years', default=5)
+@click.option('--projects', default=100)
+@click.option('--es-index-days', default=500)
+@click.option(
+    '--naive-sample',
+    default=5_000,
+    help='Number of SGs to time the previous implementation on (0 to skip)',
+)
+def main(
+    sequencing_groups: int,
+    years: int,
+    projects: int,
+    es_index_days: int,
+    naive_sample: int,
+):
+    """Time the proportionate map engine"""
+    start = time.perf_counter()
+    days, sg_first_seen, sizes_by_sg, sg_to_project = generate_data(
+        sequencing_groups, years, projects, es_index_days
+    )
+    print(
+        f'Generated {sequencing_groups:,} SGs over {len(days)} es-index days '
+        f'in {time.perf_counter() - start:.2f}s'
+    )
+
+    start = time.perf_counter()
+    cumulative_project_sizes_by_day(days, sg_first_seen, sizes_by_sg, sg_to_project)
+    print(f'Engine: {time.perf_counter() - start:.2f}s')
+
+    if naive_sample:
+        sample = dict(list(sg_first_seen.items())[:naive_sample])
+        start = time.perf_counter()
+        naive_project_sizes_by_day(days, sample, sizes_by_sg, sg_to_project)
+        elapsed = time.perf_counter() - start
+        print(
+            f'Previous implementation: {elapsed:.2f}s for {naive_sample:,} SGs, '
+            f'~{elapsed * sequencing_groups / naive_sample:.0f}s extrapolated'
+        )
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,493 @@
+"""
+End-to-end benchmarks of the hot paths, on synthetic projects generated directly
+into the test MariaDB container (the same one test/testbase.py uses), eg:
+
+    python -m benchmarks.suite --samples 10000 --samples 100000 \\
+        --output benchmark-results.json --baseline previous-results.json
+
+Run from the root of the repository (the schema is applied with liquibase).
+Generated projects are saved as snapshot databases (keyed by the schema and the
+number of samples), and restored by copying on later runs against the same
+server, eg: an existing server set with SM_TEST_DB_HOST (see testdb_container).
+Results are written as JSON, keyed by project size and benchmark, so runs on
+different commits can be compared with --baseline.
+"""
+
+import asyncio
+import dataclasses
+import datetime
+import itertools
+import json
+import platform
+import statistics
+import subprocess
+import time
+from typing import Awaitable, Callable
+
+import click
+
+from benchmarks.generate_project import (
+    generate_project,
+    participant_external_id,
+    sample_external_id,
+)
+from db.python.connect import Connection
+from db.python.filters import GenericFilter
+from db.python.filters.participant import ParticipantFilter
+from db.python.layers import (
+    AnalysisLayer,
+    ParticipantLayer,
+    SampleLayer,
+    SearchLayer,
+    WebLayer,
+)
+from db.python.layers.project_insights import (
+    _PROJECT_INSIGHTS_CACHE,
+    ProjectInsightsLayer,
+)
+from models.models import (
+    PRIMARY_EXTERNAL_ORG,
+    AssayUpsertInternal,
+    ParticipantUpsertInternal,
+    ProportionalDateTemporalMethod,
+    SampleUpsertInternal,
+    SequencingGroupUpsertInternal,
+)
+from models.models.project import Project
+from test.testbase import DbTest, run_as_sync
+from test.testdb_clone import (
+    changelog_digest,
+    clone_database,
+    copy_rows,
+    create_database as create_empty_database,
+    database_exists,
+    make_root_connection,
+)
+from test.testdb_container import TestDatabaseContainer
+
+# participants fetched per page of the web participant grid / GraphQL query
+PAGE_SIZE = 50
+# participants written by each upsert
+UPSERT_BATCH_SIZE = 100
+# bump when generate_project changes, so old snapshots aren't restored
+SNAPSHOT_VERSION = 1
+
+
+@dataclasses.dataclass
+class BenchmarkContext:
+    """The generated project a benchmark runs against"""
+
+    db: DbTest
+    connection: Connection
+    project: Project
+    n_samples: int
+    counter: itertools.count = dataclasses.field(default_factory=itertools.count)
+
+
+Benchmark = Callable[[BenchmarkContext], Awaitable[object]]
+BENCHMARKS: dict[str, Benchmark] = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark of a hot path"""
+
+    def decorator(f: Benchmark) -> Benchmark:
+        BENCHMARKS[name] = f
+        return f
+
+    return decorator
+
+
+@benchmark('web_participant_grid')
+async def bench_web_participant_grid(ctx: BenchmarkContext):
+    """The first page of the web participant grid, with the total count"""
+    wlayer = WebLayer(ctx.connection)
+    pfilter = ParticipantFilter(project=GenericFilter(eq=ctx.project.id))
+    return await asyncio.gather(
+        wlayer.query_participants(pfilter, limit=PAGE_SIZE, skip=0),
+        wlayer.count_participants(pfilter),
+    )
+
+
+@benchmark('graphql_nested_project')
+async def bench_graphql_nested_project(ctx: BenchmarkContext):
+    """A page of participants, with their families, samples, SGs, assays and analyses"""
+    external_ids = [
+        participant_external_id(i)
+        for i in range(0, ctx.n_samples, max(1, ctx.n_samples // PAGE_SIZE))
+    ]
+    return await ctx.db.run_graphql_query_async(
+        """
+        query BenchmarkNestedProject($project: String!, $eids: [String!]!) {
+          project(name: $project) {
+            participants(externalId: {in_: $eids}) {
+              id
+              externalId
+              families { id externalId }
+              samples {
+                id
+                sequencingGroups {
+                  id
+                  type
+                  assays { id meta }
+                  analyses { id type status }
+                }
+              }
+            }
+          }
+        }
+        """,
+        variables={'project': ctx.project.name, 'eids': external_ids},
+    )
+
+
+async def _consume_export(export) -> int:
+    chunks = await export.generate()
+    if chunks is None:
+        return 0
+    n_bytes = 0
+    async for chunk in chunks:
+        n_bytes += len(chunk)
+    return n_bytes
+
+
+@benchmark('parquet_export_participants')
+async def bench_parquet_export_participants(ctx: BenchmarkContext):
+    """Generate the participant parquet export"""
+    export = await ParticipantLayer(ctx.connection).export_participant_table(
+        ctx.project.id
+    )
+    return await _consume_export(export)
+
+
+@benchmark('parquet_export_samples')
+async def bench_parquet_export_samples(ctx: BenchmarkContext):
+    """Generate the sample parquet export"""
+    export = await SampleLayer(ctx.connection).export_sample_table(ctx.project.id)
+    return await _consume_export(export)
+
+
+@benchmark('search')
+async def bench_search(ctx: BenchmarkContext):
+    """Search for a sample and a participant by external ID"""
+    slayer = SearchLayer(ctx.connection)
+    return await asyncio.gather(
+        slayer.search(sample_external_id(ctx.n_samples // 2), [ctx.project.id]),
+        slayer.search(participant_external_id(ctx.n_samples // 3), [ctx.project.id]),
+    )
+
+
+@benchmark('upsert_participants')
+async def bench_upsert_participants(ctx: BenchmarkContext):
+    """Upsert a batch of new participants, with a sample, SG and assay each"""
+    sequencing_meta = {
+        'sequencing_type': 'genome',
+        'sequencing_technology': 'short-read',
+        'sequencing_platform': 'illumina',
+    }
+    batch = next(ctx.counter)
+    participants = [
+        ParticipantUpsertInternal(
+            external_ids={PRIMARY_EXTERNAL_ORG: f'UPT{batch:04d}_{i:04d}'},
+            reported_sex=1,
+            samples=[
+                SampleUpsertInternal(
+                    external_ids={PRIMARY_EXTERNAL_ORG: f'USM{batch:04d}_{i:04d}'},
+                    type='blood',
+                    sequencing_groups=[
+                        SequencingGroupUpsertInternal(
+                            type='genome',
+                            technology='short-read',
+                            platform='illumina',
+                            assays=[
+                                AssayUpsertInternal(
+                                    type='sequencing', meta=sequencing_meta
+                                )
+                            ],
+                        )
+                    ],
+                )
+            ],
+        )
+        for i in range(UPSERT_BATCH_SIZE)
+    ]
+    return await ParticipantLayer(ctx.connection).upsert_participants(participants)
+
+
+@benchmark('project_insights')
+async def bench_project_insights(ctx: BenchmarkContext):
+    """Project insights summary and details, without the in-process cache"""
+    _PROJECT_INSIGHTS_CACHE.clear()
+    layer = ProjectInsightsLayer(ctx.connection)
+    summary = await layer.get_project_insights_summary(
+        project_names=[ctx.project.name], sequencing_types=['genome', 'exome']
+    )
+    details = await layer.get_project_insights_details(
+        project_names=[ctx.project.name], sequencing_types=['genome', 'exome']
+    )
+    return summary, details
+
+
+@benchmark('proportionate_map')
+async def bench_proportionate_map(ctx: BenchmarkContext):
+    """The cram size proportionate map over the last year, by both methods"""
+    return await AnalysisLayer(ctx.connection).get_cram_size_proportionate_map(
+        projects=[ctx.project.id],
+        sequencing_types=None,
+        temporal_methods=[
+            ProportionalDateTemporalMethod.SAMPLE_CREATE_DATE,
+            ProportionalDateTemporalMethod.SG_ES_INDEX_DATE,
+        ],
+        start_date=datetime.date.today() - datetime.timedelta(days=365),
+    )
+
+
+async def time_benchmark(
+    f: Benchmark, ctx: BenchmarkContext, repeats: int
+) -> dict[str, float | list[float]]:
+    """Time the benchmark (after a warm-up run)"""
+    await f(ctx)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await f(ctx)
+        times.append(time.perf_counter() - start)
+    return {
+        'times': times,
+        'min': min(times),
+        'median': statistics.median(times),
+    }
+
+
+def create_database(n_samples: int) -> DbTest:
+    """
+    Create a fresh database (with the schema and a project) in the test container,
+    reusing the test setup
+    """
+    cls = type(f'Benchmark{n_samples}', (DbTest,), {})
+    cls.setUpClass()
+    db = cls()
+    db.setUp()
+    return db
+
+
+def snapshot_name(n_samples: int) -> str:
+    """Database the generated project with n_samples is saved to"""
+    digest = changelog_digest('db')
+    return f'sm_benchmark_{digest}_v{SNAPSHOT_VERSION}_{n_samples}'
+
+
+async def restore_snapshot(db: DbTest, n_samples: int) -> bool:
+    """
+    Copy the rows of the snapshot into the benchmark database, returns False if
+    there is no snapshot. The snapshot was generated into a database created the
+    same way, so the project has the same ID.
+    """
+    container = TestDatabaseContainer()
+    server, port = container.get_container(), container.get_port()
+    snapshot = snapshot_name(n_samples)
+    root_connection = make_root_connection(server, port, server.dbname)
+    await root_connection.connect()
+    try:
+        if not await database_exists(root_connection, snapshot):
+            return False
+    finally:
+        await root_connection.disconnect()
+
+    await copy_rows(server, port, source=snapshot, target=db.db_name)
+    return True
+
+
+async def save_snapshot(db: DbTest, n_samples: int):
+    """Save the benchmark database as the snapshot for n_samples"""
+    container = TestDatabaseContainer()
+    server, port = container.get_container(), container.get_port()
+    snapshot = snapshot_name(n_samples)
+    root_connection = make_root_connection(server, port, server.dbname)
+    await root_connection.connect()
+    try:
+        await root_connection.execute(f'DROP DATABASE IF EXISTS `{snapshot}`')
+        await create_empty_database(root_connection, server, snapshot)
+    finally:
+        await root_connection.disconnect()
+
+    await clone_database(server, port, source=db.db_name, target=snapshot)
+
+
+@run_as_sync
+async def _run_benchmarks(
+    db: DbTest,
+    n_samples: int,
+    benchmarks: list[str],
+    repeats: int,
+    use_snapshots: bool,
+) -> dict:
+    """Generate (or restore) a project with n_samples, and time the benchmarks"""
+    project = db.project_id_map[db.project_id]
+    start = time.perf_counter()
+    rows = None
+    restored = use_snapshots and await restore_snapshot(db, n_samples)
+    if not restored:
+        rows = await generate_project(db.connection, project.id, n_samples)
+        if use_snapshots:
+            await save_snapshot(db, n_samples)
+    generate_seconds = time.perf_counter() - start
+    print(
+        f'[{n_samples:,}] {"restored" if restored else "generated"} '
+        f'in {generate_seconds:.1f}s'
+    )
+
+    ctx = BenchmarkContext(
+        db=db, connection=db.connection, project=project, n_samples=n_samples
+    )
+
+    # the first refresh precomputes the storage proportions from scratch
+    start = time.perf_counter()
+    await AnalysisLayer(db.connection).refresh_storage_proportions()
+    refresh_seconds = time.perf_counter() - start
+    results: dict[str, dict] = {
+        'refresh_storage_proportions': {
+            'times': [refresh_seconds],
+            'min': refresh_seconds,
+            'median': refresh_seconds,
+        }
+    }
+    for name in benchmarks:
+        results[name] = await time_benchmark(BENCHMARKS[name], ctx, repeats)
+        print(f'[{n_samples:,}] {name}: {results[name]["median"]:.3f}s')
+
+    return {
+        'generate': {
+            'seconds': generate_seconds,
+            'restored': restored,
+            'rows': rows,
+        },
+        'benchmarks': results,
+    }
+
+
+def run_size(
+    n_samples: int,
+    benchmarks: list[str],
+    repeats: int,
+    keep: bool,
+    use_snapshots: bool = True,
+) -> dict:
+    """
+    Generate a project with n_samples, and run the benchmarks against it. The
+    database is set up (and torn down) by the test setup, which runs on the test
+    event loop itself, so only the benchmarks are run on the loop here.
+    """
+    db = create_database(n_samples)
+    try:
+        return _run_benchmarks(db, n_samples, benchmarks, repeats, use_snapshots)
+    finally:
+        if not keep:
+            db.tearDownClass()
+
+
+def git_commit() -> str | None:
+    """Commit the benchmarks ran on"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_to_baseline(results: dict, baseline: dict, threshold: float):
+    """Print the change of each benchmark vs the baseline, flagging regressions"""
+    for size, size_results in results['sizes'].items():
+        baseline_size = baseline.get('sizes', {}).get(size)
+        if not baseline_size:
+            continue
+        for name, result in size_results['benchmarks'].items():
+            previous = baseline_size['benchmarks'].get(name)
+            if not previous:
+                continue
+            ratio = result['min'] / previous['min'] if previous['min'] else 0
+            flag = ' REGRESSION' if ratio > threshold else ''
+            print(
+                f'[{int(size):,}] {name}: {previous["min"]:.3f}s -> '
+                f'{result["min"]:.3f}s ({ratio:.2f}x){flag}'
+            )
+
+
+@click.command()
+@click.option(
+    '--samples',
+    'sizes',
+    multiple=True,
+    type=int,
+    default=[10_000, 100_000, 1_000_000],
+    help='Number of samples in each generated project',
+)
+@click.option(
+    '--benchmark',
+    'benchmarks',
+    multiple=True,
+    type=click.Choice(list(BENCHMARKS)),
+    help='Only run these benchmarks (default: all)',
+)
+@click.option('--repeats', default=3, help='Timed runs of each benchmark')
+@click.option('--output', default='benchmark-results.json')
+@click.option('--baseline', help='Results (JSON) to compare against')
+@click.option(
+    '--threshold',
+    default=1.2,
+    help='Slowdown vs the baseline that is flagged as a regression',
+)
+@click.option('--keep', is_flag=True, help="Don't drop the generated databases")
+@click.option(
+    '--snapshot/--no-snapshot',
+    'use_snapshots',
+    default=True,
+    help='Restore generated projects from (and save them to) snapshot databases',
+)
+def main(
+    sizes: list[int],
+    benchmarks: list[str],
+    repeats: int,
+    output: str,
+    baseline: str | None,
+    threshold: float,
+    keep: bool,
+    use_snapshots: bool,
+):
+    """Generate synthetic projects, and time the hot paths against them"""
+
+    container = TestDatabaseContainer()
+    container.start()
+    try:
+        sizes_results = {
+            str(n_samples): run_size(
+                n_samples,
+                list(benchmarks or BENCHMARKS),
+                repeats,
+                keep,
+                use_snapshots=use_snapshots,
+            )
+            for n_samples in sizes
+        }
+    finally:
+        container.teardown()
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'repeats': repeats,
+        'sizes': sizes_results,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'Wrote results to {output}')
+
+    if baseline:
+        with open(baseline, encoding='utf-8') as f:
+            compare_to_baseline(results, json.load(f), threshold)
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
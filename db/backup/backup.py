@@ -1,126 +1,441 @@
 #!/usr/bin/python3
 # pylint: disable=broad-exception-caught,broad-exception-raised
 """Daily back up function for databases within a local
-MariaDB instance"""
+MariaDB instance.
 
+The backup is streamed (mariabackup --stream=xbstream) through multi-threaded
+zstd compression, and uploaded in chunks as it's produced, so no full local copy
+of the database is needed. Each backup is a folder of chunks, and a manifest
+(written last, so an interrupted backup is ignored) with the checksum of every
+chunk. A full backup is taken weekly, and incremental backups (from the LSN the
+previous backup finished at) in between.
+"""
+
+import abc
+import base64
+import concurrent.futures
+import dataclasses
+import hashlib
 import json
 import os
 import subprocess
-from datetime import datetime
-from typing import Literal
+import tempfile
+from collections import deque
+from datetime import datetime, timedelta
+from typing import BinaryIO, Iterator, Literal
 
 from google.cloud import logging, secretmanager, storage
 
-STORAGE_CLIENT = storage.Client()
-LOGGING_CLIENT = logging.Client()
-SECRET_CLIENT = secretmanager.SecretManagerServiceClient()
-
 SECRET_PROJECT = 'sample-metadata'
 SECRET_NAME = 'mariadb-backup-user-credentials'
 
+BACKUP_BUCKET = 'cpg-sm-backups'
+MANIFEST_NAME = 'manifest.json'
+# size of each (compressed) chunk that's uploaded
+CHUNK_SIZE = 64 * 1024 * 1024
+# chunks uploaded / downloaded at once, this also bounds the memory used
+TRANSFER_CONCURRENCY = 4
+# take a full backup if the latest full backup is older than this
+FULL_BACKUP_INTERVAL = timedelta(days=7)
+ZSTD_LEVEL = 3
+
+BackupKind = Literal['full', 'incremental']
+
+
+class ChecksumMismatchError(Exception):
+    """A chunk of a backup doesn't match its checksum"""
+
 
 def read_db_credentials() -> dict[Literal['username', 'password'], str]:
     """Get database credentials from Secret Manager."""
     try:
+        secret_client = secretmanager.SecretManagerServiceClient()
         # noinspection PyTypeChecker
-        secret_path = SECRET_CLIENT.secret_version_path(
+        secret_path = secret_client.secret_version_path(
             SECRET_PROJECT, SECRET_NAME, 'latest'
         )
-        response = SECRET_CLIENT.access_secret_version(request={'name': secret_path})
+        response = secret_client.access_secret_version(request={'name': secret_path})
         return json.loads(response.payload.data.decode('UTF-8'))
     except Exception as e:
         # Fail gracefully if there's no secret version yet.
         raise Exception(f'Could not access database credentials: {e}') from e
 
 
-def perform_backup():
+class BackupStore(abc.ABC):
+    """Object store that backups are written to"""
+
+    @abc.abstractmethod
+    def put(self, key: str, data: bytes):
+        """
+        Write the object, raising a ChecksumMismatchError if what was stored
+        doesn't match the data
+        """
+
+    @abc.abstractmethod
+    def get(self, key: str) -> bytes:
+        """Read the object"""
+
+    @abc.abstractmethod
+    def list(self, prefix: str = '') -> list[str]:
+        """Keys of the objects starting with prefix"""
+
+
+class LocalBackupStore(BackupStore):
+    """Backups in a local directory (eg: for testing)"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file, so a partially written object is never seen
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+        with open(path, 'rb') as f:
+            if f.read() != data:
+                raise ChecksumMismatchError(f'Stored {key} does not match')
+
+    def get(self, key: str) -> bytes:
+        with open(self._path(key), 'rb') as f:
+            return f.read()
+
+    def list(self, prefix: str = '') -> list[str]:
+        keys = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith('.tmp'):
+                    continue
+                key = os.path.relpath(os.path.join(dirpath, filename), self.root)
+                key = key.replace(os.sep, '/')
+                if key.startswith(prefix):
+                    keys.append(key)
+        return sorted(keys)
+
+
+class GCSBackupStore(BackupStore):
+    """Backups in a GCS bucket"""
+
+    def __init__(self, bucket: str, client: storage.Client | None = None):
+        self.client = client or storage.Client()
+        self.bucket = self.client.bucket(bucket)
+
+    def put(self, key: str, data: bytes):
+        blob = self.bucket.blob(key)
+        blob.upload_from_string(data, content_type='application/octet-stream')
+        # GCS returns the MD5 of the object it stored
+        md5 = base64.b64encode(hashlib.md5(data).digest()).decode()
+        if blob.md5_hash != md5:
+            raise ChecksumMismatchError(
+                f'Uploaded gs://{self.bucket.name}/{key} does not match '
+                f'(md5 {blob.md5_hash} != {md5})'
+            )
+
+    def get(self, key: str) -> bytes:
+        return self.bucket.blob(key).download_as_bytes()
+
+    def list(self, prefix: str = '') -> list[str]:
+        return sorted(
+            b.name for b in self.client.list_blobs(self.bucket, prefix=prefix)
+        )
+
+
+@dataclasses.dataclass
+class BackupChunk:
+    """A chunk of the compressed backup stream"""
+
+    key: str
+    size: int
+    sha256: str
+
+
+@dataclasses.dataclass
+class BackupManifest:
+    """
+    The chunks of a backup, and where it fits in the chain of backups: an
+    incremental backup has to be applied on top of its base (and so on, back
+    to a full backup)
+    """
+
+    name: str
+    kind: BackupKind
+    timestamp: str
+    chunks: list[BackupChunk]
+    # LSN the backup finished at, the next incremental backup starts from this
+    to_lsn: int | None = None
+    # backup this incremental backup is applied on top of
+    base: str | None = None
+    compression: str = 'zstd'
+
+    def to_json(self) -> str:
+        """Serialise to JSON"""
+        return json.dumps(dataclasses.asdict(self), indent=2)
+
+    @staticmethod
+    def from_json(data: str | bytes) -> 'BackupManifest':
+        """Parse from JSON"""
+        d = json.loads(data)
+        d['chunks'] = [BackupChunk(**c) for c in d['chunks']]
+        return BackupManifest(**d)
+
+
+def _read_chunk(stream: BinaryIO, size: int) -> bytes:
+    """Read size bytes (fewer only at the end of the stream)"""
+    parts = []
+    remaining = size
+    while remaining > 0:
+        data = stream.read(remaining)
+        if not data:
+            break
+        parts.append(data)
+        remaining -= len(data)
+    return b''.join(parts)
+
+
+def upload_stream(
+    stream: BinaryIO,
+    store: BackupStore,
+    prefix: str,
+    chunk_size: int = CHUNK_SIZE,
+    concurrency: int = TRANSFER_CONCURRENCY,
+) -> list[BackupChunk]:
+    """
+    Upload the stream in chunks, while it's being read. At most concurrency
+    chunks are held in memory (uploading) at once.
+    """
+
+    def _upload(chunk: BackupChunk, data: bytes) -> BackupChunk:
+        store.put(chunk.key, data)
+        return chunk
+
+    chunks: list[BackupChunk] = []
+    pending: deque[concurrent.futures.Future] = deque()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while data := _read_chunk(stream, chunk_size):
+            chunk = BackupChunk(
+                key=f'{prefix}/chunk-{len(chunks):06d}',
+                size=len(data),
+                sha256=hashlib.sha256(data).hexdigest(),
+            )
+            chunks.append(chunk)
+            if len(pending) >= concurrency:
+                pending.popleft().result()
+            pending.append(executor.submit(_upload, chunk, data))
+
+        for future in pending:
+            future.result()
+
+    return chunks
+
+
+def download_chunks(
+    store: BackupStore,
+    manifest: BackupManifest,
+    concurrency: int = TRANSFER_CONCURRENCY,
+) -> Iterator[bytes]:
+    """
+    Download the chunks of the backup in order (prefetching up to concurrency
+    chunks), checking each against its checksum in the manifest
+    """
+
+    def _download(chunk: BackupChunk) -> bytes:
+        data = store.get(chunk.key)
+        if hashlib.sha256(data).hexdigest() != chunk.sha256:
+            raise ChecksumMismatchError(
+                f'Chunk {chunk.key} of backup {manifest.name} does not match '
+                'its checksum'
+            )
+        return data
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending: deque[concurrent.futures.Future] = deque()
+        for chunk in manifest.chunks:
+            if len(pending) >= concurrency:
+                yield pending.popleft().result()
+            pending.append(executor.submit(_download, chunk))
+        while pending:
+            yield pending.popleft().result()
+
+
+def list_backups(store: BackupStore) -> list[BackupManifest]:
+    """Completed backups (those with a manifest), oldest first"""
+    manifests = [
+        BackupManifest.from_json(store.get(key))
+        for key in store.list()
+        if key.endswith('/' + MANIFEST_NAME)
+    ]
+    return sorted(manifests, key=lambda m: m.timestamp)
+
+
+def get_backup_chain(
+    store: BackupStore, name: str | None = None
+) -> list[BackupManifest]:
+    """
+    The backups to restore (in order) to get to the named backup (default: the
+    latest), ie: the full backup, then each incremental backup on top of it
+    """
+    backups = {m.name: m for m in list_backups(store)}
+    if not backups:
+        raise Exception('There are no completed backups')
+    if name is None:
+        name = max(backups.values(), key=lambda m: m.timestamp).name
+
+    chain = []
+    manifest: BackupManifest | None = backups.get(name)
+    while manifest:
+        chain.append(manifest)
+        if manifest.kind == 'full':
+            return chain[::-1]
+        manifest = backups.get(manifest.base)  # type: ignore[arg-type]
+    raise Exception(f'Could not find the full backup that {name} is based on')
+
+
+def next_backup_kind(
+    backups: list[BackupManifest], now: datetime
+) -> tuple[BackupKind, BackupManifest | None]:
+    """
+    Whether to take a full or incremental backup, and the backup an incremental
+    backup is on top of (the latest)
+    """
+    fulls = [m for m in backups if m.kind == 'full']
+    if not fulls or not backups[-1].to_lsn:
+        return 'full', None
+    latest_full = datetime.fromisoformat(fulls[-1].timestamp)
+    if now - latest_full >= FULL_BACKUP_INTERVAL:
+        return 'full', None
+    return 'incremental', backups[-1]
+
+
+def read_to_lsn(lsn_dir: str) -> int | None:
+    """The LSN the backup finished at, from mariabackup's checkpoints file"""
+    path = os.path.join(lsn_dir, 'xtrabackup_checkpoints')
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            key, _, value = line.partition('=')
+            if key.strip() == 'to_lsn':
+                return int(value.strip())
+    return None
+
+
+def stream_backup(
+    store: BackupStore,
+    name: str,
+    kind: BackupKind,
+    base: BackupManifest | None,
+    db_username: str,
+    db_password: str,
+) -> BackupManifest:
+    """
+    Stream a backup from mariabackup, through zstd, into the store, and write its
+    manifest once every chunk is uploaded
+    """
+    timestamp = datetime.utcnow().isoformat(timespec='seconds')
+    with tempfile.TemporaryDirectory() as lsn_dir, tempfile.TemporaryFile() as stderr:
+        command = [
+            'mariabackup',
+            '--backup',
+            '--stream=xbstream',
+            f'--user={db_username}',
+            # mariabackup needs a directory for temporary files when streaming,
+            # and writes the checkpoints (with the LSN) to the extra-lsndir
+            f'--target-dir={lsn_dir}',
+            f'--extra-lsndir={lsn_dir}',
+        ]
+        if kind == 'incremental' and base:
+            command.append(f'--incremental-lsn={base.to_lsn}')
+
+        backup_process = subprocess.Popen(  # pylint: disable=consider-using-with
+            command,
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+            # pass the password with env to avoid it being visible in the process list
+            env={'MYSQL_PWD': db_password, **os.environ},
+        )
+        compress_process = subprocess.Popen(  # pylint: disable=consider-using-with
+            ['zstd', '-T0', f'-{ZSTD_LEVEL}', '-c'],
+            stdin=backup_process.stdout,
+            stdout=subprocess.PIPE,
+        )
+        # so mariabackup gets a SIGPIPE if zstd exits
+        backup_process.stdout.close()  # type: ignore[union-attr]
+        try:
+            chunks = upload_stream(compress_process.stdout, store, name)  # type: ignore[arg-type]
+        finally:
+            compress_process.stdout.close()  # type: ignore[union-attr]
+            compress_process.wait()
+            backup_process.wait()
+
+        if backup_process.returncode:
+            stderr.seek(0)
+            raise subprocess.CalledProcessError(
+                backup_process.returncode, command, stderr=stderr.read()[-4000:]
+            )
+        if compress_process.returncode:
+            raise subprocess.CalledProcessError(compress_process.returncode, 'zstd')
+
+        manifest = BackupManifest(
+            name=name,
+            kind=kind,
+            timestamp=timestamp,
+            chunks=chunks,
+            to_lsn=read_to_lsn(lsn_dir),
+            base=base.name if kind == 'incremental' and base else None,
+        )
+
+    store.put(f'{name}/{MANIFEST_NAME}', manifest.to_json().encode())
+    return manifest
+
+
+def perform_backup(store: BackupStore | None = None):
     """Completes a backup of the databases within a local mariadb instance
-    and uploads this backup to GCS."""
+    and streams this backup to GCS."""
 
     # Logging: Any log with `severity >= ERROR` get's logged to #software-alerts
 
     log_name = 'backup_log'
-    logger = LOGGING_CLIENT.logger(log_name)
+    logger = logging.Client().logger(log_name)
+    store = store or GCSBackupStore(BACKUP_BUCKET)
 
     # Get timestamp
-    timestamp_str = (
-        datetime.utcnow().isoformat(timespec='seconds').replace(':', '-') + 'Z'
-    )
-
-    # Set up tmp dir
-    tmp_dir = f'backup_{timestamp_str}'
-    subprocess.run(['mkdir', tmp_dir], check=True)
-    # grant permissions, so that mariadb can read ib_logfile0
-    subprocess.run(['sudo', 'chmod', '-R', '770', tmp_dir], check=True)
+    now = datetime.utcnow()
+    timestamp_str = now.isoformat(timespec='seconds').replace(':', '-') + 'Z'
+    name = f'backup_{timestamp_str}'
 
     credentials = read_db_credentials()
-    db_username = credentials['username']
-    db_password = credentials['password']
 
-    # Export SQL Data
+    kind, base = next_backup_kind(list_backups(store), now)
     try:
-        text = f'Performed mariabackup to pull data {timestamp_str}.'
+        text = f'Performed mariabackup ({kind}) to pull data {timestamp_str}.'
         logger.log_text(text, severity='INFO')
-        subprocess.run(
-            [
-                'mariabackup',
-                '--backup',
-                f'--target-dir={tmp_dir}/',
-                f'--user={db_username}',
-            ],
-            check=True,
-            stderr=subprocess.DEVNULL,
-            # pass the password with stdin to avoid it being visible in the process list
-            env={'MYSQL_PWD': db_password, **os.environ},
+        manifest = stream_backup(
+            store,
+            name,
+            kind=kind,
+            base=base,
+            db_username=credentials['username'],
+            db_password=credentials['password'],
         )
-
     except subprocess.CalledProcessError as e:
         text = f'Failed to export backup {timestamp_str}: {e}\n {e.stderr}'
         logger.log_text(text, severity='ERROR')
-        return
+        raise
     except Exception as e:
         text = f'Failed to export backup {timestamp_str}: {e}'
         logger.log_text(text, severity='ERROR')
-        return
-
-    # mariabackup creates awkward permissions for the output files,
-    # so we'll grant appropriate permissions for tmp_dir to later remove it
-    subprocess.run(['sudo', 'chmod', '-R', '770', tmp_dir], check=True)
-
-    # tar the archive to make it easier to upload to GCS
-    tar_archive_path = f'{tmp_dir}.tar.gz'
-    subprocess.run(['tar', '-czf', tar_archive_path, tmp_dir], check=True)
-
-    # Upload tar file to GCS
-    # GCS Client Library does not support moving directories
-    try:
-        subprocess.run(
-            ['gsutil', '-m', 'mv', tar_archive_path, 'gs://cpg-sm-backups'], check=True
-        )
-    except subprocess.CalledProcessError as e:
-        text = (
-            f'Failed to upload backup {timestamp_str} to GCS. '
-            f'GSUtil failed to upload with error: {e.stderr}'
-        )
-        logger.log_text(text, severity='ERROR')
-
-    # Cleans up empty directories after the move
-    subprocess.run(['rm', '-rf', tmp_dir, tar_archive_path], check=True)
+        raise
 
-    # Validates file exists and was uploaded to GCS
-    bucket = STORAGE_CLIENT.get_bucket('cpg-sm-backups')
-    files_in_gcs = list(STORAGE_CLIENT.list_blobs(bucket, prefix=tar_archive_path))
-
-    if len(files_in_gcs) > 0:
-        text = f'Successfully backed up: {timestamp_str}'
-        logger.log_text(text, severity='INFO')
-    else:
-        text = (
-            f'Failed to upload backup to GCS: {timestamp_str}. '
-            f'Could not find the file gs://{bucket.name}/{tar_archive_path}'
-        )
-        logger.log_text(text, severity='ERROR')
-        raise Exception(text)
+    size = sum(c.size for c in manifest.chunks)
+    text = (
+        f'Successfully backed up: {timestamp_str} ({kind}, {len(manifest.chunks)} '
+        f'chunks, {size:,} bytes compressed)'
+    )
+    logger.log_text(text, severity='INFO')
 
 
 if __name__ == '__main__':
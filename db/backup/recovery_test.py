@@ -14,28 +14,15 @@ from typing import Optional, Tuple
 
 import google.cloud.secretmanager
 import mysql.connector
-from parameterized import parameterized
+from backup import BACKUP_BUCKET, GCSBackupStore, get_backup_chain
 from restore import pull_latest_backup, restore
+from verify import MySQLSource, get_tables, verify_databases
 
-BACKUP_BUCKET = 'cpg-sm-backups'
-LOCAL_BACKUP_FOLDER = 'latest_backup'
+# machine readable report of the verification
+REPORT_PATH = os.environ.get('verification_report', 'verification_report.json')
 
 ConnectionDetails = namedtuple('ConnectionDetails', 'address user password')
 
-FIELDS = [
-    ('analysis', ('id',)),
-    ('family', ('id',)),
-    ('participant', ('id',)),
-    ('project ', ('id',)),
-    ('sample', ('id',)),
-    ('sample_sequencing', ('id',)),
-    ('analysis_sample', ('analysis_id', 'sample_id')),
-    ('participant_phenotypes', ('participant_id', 'hpo_term', 'description')),
-    ('family_participant', ('participant_id',)),
-]
-
-TABLES = [field[0] for field in FIELDS]
-
 secret_manager = google.cloud.secretmanager.SecretManagerServiceClient()
 
 SECRET_NAME = 'projects/sample-metadata/secrets/db-validate-backup/versions/latest'
@@ -55,6 +42,26 @@ LOCAL_HOST = os.environ.get('local_host', 'localhost')
 LOCAL_PASSWORD = os.environ.get('local_password', '')
 
 
+def connect_local():
+    """Connection to the restored (local) database"""
+    return mysql.connector.connect(
+        user=LOCAL_USER,
+        host=LOCAL_HOST,
+        password=LOCAL_PASSWORD,
+        database=DATABASE,
+    )
+
+
+def connect_prod():
+    """Connection to the production database"""
+    return mysql.connector.connect(
+        host=PROD_HOST,
+        user=PROD_USER,
+        password=PROD_PASSWORD,
+        database=DATABASE,
+    )
+
+
 class TestDatabaseBackup(unittest.TestCase):
     """Testing validity of DB backup"""
 
@@ -62,25 +69,17 @@ class TestDatabaseBackup(unittest.TestCase):
     def setUpClass(cls):
         """Pull the backup file, and restore the database."""
 
-        backup_folder = pull_latest_backup(BACKUP_BUCKET)
-        restore(backup_folder)
+        backup_name = pull_latest_backup(BACKUP_BUCKET)
+        cls.timestamp = get_timestamp(backup_name)
+        restore(backup_name)
 
     def setUp(self):
-        backup_folder = pull_latest_backup(BACKUP_BUCKET)
-        self.timestamp = get_timestamp(backup_folder)
-
-        self.local_conn = mysql.connector.connect(
-            user=LOCAL_USER,
-            host=LOCAL_HOST,
-            password=LOCAL_PASSWORD,
-            database=DATABASE,
-        )
-        self.prod_conn = mysql.connector.connect(
-            host=PROD_HOST,
-            user=PROD_USER,
-            password=PROD_PASSWORD,
-            database=DATABASE,
-        )
+        self.local_conn = connect_local()
+        self.prod_conn = connect_prod()
+
+    def tearDown(self):
+        self.local_conn.close()
+        self.prod_conn.close()
 
     def test_database_exists(self):
         """Validates that the db in the production
@@ -89,74 +88,38 @@ class TestDatabaseBackup(unittest.TestCase):
         prod_databases = get_results(self.prod_conn, 'show databases;')
         self.assertEqual(backup_databases, prod_databases)
 
-    @parameterized.expand(TABLES)
-    def test_row_number(self, table):
-        """Tests that the count of rows for each table matches"""
-
-        restored_count = get_results(
-            self.local_conn,
-            f'SELECT COUNT(*) FROM {table};',
-        )
-        prod_count = get_results(
-            self.prod_conn,
-            f'SELECT COUNT(*) FROM {table} FOR SYSTEM_TIME AS OF TIMESTAMP{self.timestamp!r}',
-        )
-
-        self.assertEqual(restored_count, prod_count)
-
-    @parameterized.expand(TABLES)
-    def test_rows_top(self, table):
-        """Validates the top 10 rows in each table match"""
-        restored_results = get_results(
-            self.local_conn,
-            f'SELECT * FROM {table} LIMIT 10;',
+    def test_tables_match(self):
+        """Compares every row of every table (as of the time of the backup),
+        by checksums of primary key ranges, and writes a report"""
+        tables = get_tables(self.prod_conn, DATABASE)
+        restored = MySQLSource(connect_local)
+        production = MySQLSource(connect_prod, as_of=self.timestamp)
+        try:
+            report = verify_databases(restored, production, tables)
+        finally:
+            restored.close()
+            production.close()
+
+        with open(REPORT_PATH, 'w', encoding='utf-8') as f:
+            f.write(report.to_json())
+
+        # tables that aren't system versioned may have changed since the backup,
+        # so their differences are only in the report
+        mismatched = report.mismatched_tables
+        self.assertFalse(
+            mismatched, f'Tables do not match (see {REPORT_PATH}): {mismatched}'
         )
-        prod_results = get_results(
-            self.prod_conn,
-            f'SELECT * FROM {table} FOR SYSTEM_TIME AS OF TIMESTAMP{self.timestamp!r} LIMIT 10;',
-        )
-        self.assertEqual(restored_results, prod_results)
-
-    @parameterized.expand(FIELDS)
-    def test_random_rows_ids(self, table, id_fields: Tuple[str]):
-        """Pulls 10 random rows for testing.
-        Operates on tables with a unique id field"""
-
-        id_fields_str = ', '.join(id_fields) + f', {table}.*'
-
-        restored_random_results = get_results(
-            self.local_conn,
-            f'SELECT {id_fields_str} FROM {table} ORDER BY RAND() LIMIT 10',
-        )
-
-        for row in restored_random_results:
-            ids = row[: len(id_fields)]
-            wheres_str = ' AND '.join(f'{field} = %s' for field in id_fields)
-
-            _query = f"""\
-SELECT {id_fields_str}
-FROM {table}
-FOR SYSTEM_TIME AS OF TIMESTAMP{self.timestamp!r}
-WHERE {wheres_str};"""
-
-            prod_random_results = get_results(
-                self.prod_conn,
-                _query,
-                ids,
-            )
-            self.assertEqual(row, prod_random_results[0])
 
     @classmethod
     def tearDownClass(cls):
         """Delete test database following testing"""
-        subprocess.run(['rm', '-r', LOCAL_BACKUP_FOLDER], check=True)
         subprocess.run(['sudo', 'rm', '-r', '/var/lib/mysql'], check=True)
 
 
-def get_timestamp(folder: str):
-    """Returns timestamp in format YYYY-MM-DD HH:MM:SS"""
-    timestamp = f'{folder[13:17]}-{folder[10:12]}-{folder[7:9]} {folder[18:20]}:{folder[21:23]}:{folder[24:26]}'
-    return timestamp
+def get_timestamp(backup_name: str):
+    """Returns timestamp of the backup in format YYYY-MM-DD HH:MM:SS"""
+    chain = get_backup_chain(GCSBackupStore(BACKUP_BUCKET), backup_name)
+    return chain[-1].timestamp.replace('T', ' ')
 
 
 def get_results(conn, query: str, values: Optional[Tuple] = None):
@@ -4,40 +4,74 @@ backup"""
 import os
 import subprocess
 
-from google.cloud import storage
+from backup import (
+    BACKUP_BUCKET,
+    BackupManifest,
+    BackupStore,
+    GCSBackupStore,
+    download_chunks,
+    get_backup_chain,
+    list_backups,
+)
 
-BACKUP_BUCKET = 'cpg-sm-backups'
 LOCAL_BACKUP_FOLDER = 'latest_backup'
 
 
-def restore(backup_folder=None):
-    """Restore the database"""
+def extract_backup(store: BackupStore, manifest: BackupManifest, target_dir: str):
+    """
+    Stream the chunks of the backup through zstd and mbstream, into target_dir
+    (which is ready to be prepared by mariabackup)
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    decompress_process = subprocess.Popen(  # pylint: disable=consider-using-with
+        ['zstd', '-d', '-c'], stdin=subprocess.PIPE, stdout=subprocess.PIPE
+    )
+    extract_process = subprocess.Popen(  # pylint: disable=consider-using-with
+        ['mbstream', '-x', '-C', target_dir], stdin=decompress_process.stdout
+    )
+    decompress_process.stdout.close()  # type: ignore[union-attr]
+    try:
+        for data in download_chunks(store, manifest):
+            decompress_process.stdin.write(data)  # type: ignore[union-attr]
+    finally:
+        decompress_process.stdin.close()  # type: ignore[union-attr]
+        decompress_process.wait()
+        extract_process.wait()
+
+    if decompress_process.returncode or extract_process.returncode:
+        raise RuntimeError(f'Failed to extract backup {manifest.name}')
+
+
+def restore(backup_name=None, store: BackupStore | None = None):
+    """Restore the database (to the named backup, default: the latest)"""
     print('Starting Restoration')
-    if backup_folder is None:
-        backup_folder = pull_latest_backup(BACKUP_BUCKET)
+    store = store or GCSBackupStore(BACKUP_BUCKET)
+    # the full backup, then each incremental backup on top of it
+    chain = get_backup_chain(store, backup_name)
+
+    full_dir = os.path.join(LOCAL_BACKUP_FOLDER, chain[0].name)
+    for manifest in chain:
+        print(f'Pulling {manifest.kind} backup {manifest.name}')
+        extract_backup(
+            store, manifest, os.path.join(LOCAL_BACKUP_FOLDER, manifest.name)
+        )
 
-    subprocess.run(['mkdir', LOCAL_BACKUP_FOLDER], check=True)
-    subprocess.run(
-        [
-            'gsutil',
-            '-m',
-            'cp',
-            '-r',
-            f'gs://{BACKUP_BUCKET}/{backup_folder}',
-            LOCAL_BACKUP_FOLDER,
-        ],
-        check=True,
-    )
     # Prepare the backup for restoration
     print('Preparing Backup')
     subprocess.run(
-        [
-            'mariabackup',
-            '--prepare',
-            f'--target-dir={LOCAL_BACKUP_FOLDER}/{backup_folder}',
-        ],
+        ['mariabackup', '--prepare', f'--target-dir={full_dir}'],
         check=True,
     )
+    for manifest in chain[1:]:
+        subprocess.run(
+            [
+                'mariabackup',
+                '--prepare',
+                f'--target-dir={full_dir}',
+                f'--incremental-dir={os.path.join(LOCAL_BACKUP_FOLDER, manifest.name)}',
+            ],
+            check=True,
+        )
     # Stop the MariaDB server
     subprocess.run(['sudo', 'systemctl', 'stop', 'mariadb'], check=True)
 
@@ -52,7 +86,7 @@ def restore(backup_folder=None):
             'sudo',
             'mariabackup',
             '--copy-back',
-            f'--target-dir={LOCAL_BACKUP_FOLDER}/{backup_folder}',
+            f'--target-dir={full_dir}',
         ],
         check=True,
     )
@@ -69,14 +103,9 @@ def restore(backup_folder=None):
 
 
 def pull_latest_backup(backup_bucket):
-    """Assumes no changes to metadata since initial upload"""
-    print('Pulling Latest Backup from GCS')
-    storage_client = storage.Client()
-    blobs = [(blob, blob.updated) for blob in storage_client.list_blobs(backup_bucket)]
-    latest = sorted(blobs, key=lambda tup: tup[1])[-1][0]
-    full_path = os.path.dirname(latest.name)
-    backup_folder = os.path.dirname(full_path)
-    return backup_folder
+    """Name of the latest completed backup"""
+    print('Finding Latest Backup')
+    return list_backups(GCSBackupStore(backup_bucket))[-1].name
 
 
 if __name__ == '__main__':
@@ -0,0 +1,370 @@
+"""
+Verify a restored database against production (as of the time of the backup),
+comparing every row rather than a sample of them.
+
+Each table is split into ranges of its (integer) primary key, and the row count
+and a checksum (the sum of the CRC32 of each row) of each range is compared
+between the two databases. Ranges are compared concurrently, and a mismatching
+range is split in half repeatedly to find the rows that differ, which are then
+fetched and compared directly. The result is a machine readable report.
+
+Only system versioned tables can be read as of the time of the backup, other
+tables (eg: DATABASECHANGELOG, or the precomputed storage proportions) may have
+changed in production since. They're still compared, but only for information:
+their differences don't fail the verification.
+"""
+
+import concurrent.futures
+import dataclasses
+import json
+import threading
+import time
+from typing import Any, Callable
+
+# rows of primary key in each range that is checksummed
+RANGE_SIZE = 10_000
+# mismatching ranges are split until they're this small, then rows are compared
+MIN_RANGE_SIZE = 64
+# tables / ranges compared at once (each thread has a connection to each database)
+VERIFY_CONCURRENCY = 8
+# differing rows listed per table in the report
+MAX_REPORTED_ROWS = 100
+
+INTEGER_TYPES = {'tinyint', 'smallint', 'mediumint', 'int', 'bigint'}
+
+
+@dataclasses.dataclass
+class TableInfo:
+    """Columns and primary key of a table to verify"""
+
+    name: str
+    columns: list[str]
+    primary_key: list[str]
+    # whether the first column of the primary key is an integer, so the table
+    # can be split into ranges of it (otherwise it's compared as a whole)
+    rangeable: bool = False
+    system_versioned: bool = False
+
+    @property
+    def key_columns(self) -> list[str]:
+        """Columns that identify a row"""
+        return self.primary_key or self.columns
+
+
+def get_tables(connection, database: str) -> list[TableInfo]:
+    """Tables in the database, with their columns and primary keys"""
+    cursor = connection.cursor()
+    cursor.execute(
+        """
+        SELECT TABLE_NAME, TABLE_TYPE FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = %s AND TABLE_TYPE IN ('BASE TABLE', 'SYSTEM VERSIONED')
+        ORDER BY TABLE_NAME
+        """,
+        (database,),
+    )
+    tables = {
+        name: TableInfo(
+            name=name,
+            columns=[],
+            primary_key=[],
+            system_versioned=table_type == 'SYSTEM VERSIONED',
+        )
+        for name, table_type in cursor.fetchall()
+    }
+
+    # the (invisible) system versioning columns aren't compared
+    cursor.execute(
+        """
+        SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, COLUMN_KEY
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = %s AND EXTRA NOT LIKE '%%INVISIBLE%%'
+        ORDER BY TABLE_NAME, ORDINAL_POSITION
+        """,
+        (database,),
+    )
+    data_types: dict[tuple[str, str], str] = {}
+    for table, column, data_type, _ in cursor.fetchall():
+        if table in tables:
+            tables[table].columns.append(column)
+            data_types[(table, column)] = data_type
+
+    cursor.execute(
+        """
+        SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = %s AND CONSTRAINT_NAME = 'PRIMARY'
+        ORDER BY TABLE_NAME, ORDINAL_POSITION
+        """,
+        (database,),
+    )
+    for table, column in cursor.fetchall():
+        if table in tables:
+            tables[table].primary_key.append(column)
+
+    for table in tables.values():
+        table.rangeable = bool(table.primary_key) and (
+            data_types.get((table.name, table.primary_key[0])) in INTEGER_TYPES
+        )
+    return list(tables.values())
+
+
+class MySQLSource:
+    """
+    A database to verify, queried with a connection per thread. If as_of is set,
+    system versioned tables are read as of that time (eg: production, as of the
+    time of the backup).
+    """
+
+    def __init__(self, connect: Callable[[], Any], as_of: str | None = None):
+        self._connect = connect
+        self.as_of = as_of
+        self._local = threading.local()
+        self._connections: list = []
+        self._lock = threading.Lock()
+
+    def _query(self, query: str, values: tuple = ()) -> list[tuple]:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+            with self._lock:
+                self._connections.append(connection)
+        cursor = connection.cursor()
+        cursor.execute(query, values)
+        return cursor.fetchall()
+
+    def _from(self, table: TableInfo, lo: int | None, hi: int | None):
+        """FROM (and WHERE) clause for the range of the table, with its values"""
+        query = f'FROM `{table.name}`'
+        values: tuple = ()
+        if self.as_of and table.system_versioned:
+            query += ' FOR SYSTEM_TIME AS OF TIMESTAMP %s'
+            values += (self.as_of,)
+        if lo is not None and hi is not None:
+            query += f' WHERE `{table.primary_key[0]}` >= %s AND `{table.primary_key[0]}` < %s'
+            values += (lo, hi)
+        return query, values
+
+    def bounds(self, table: TableInfo) -> tuple[int, int] | None:
+        """Smallest and largest value of the first primary key column"""
+        pk = table.primary_key[0]
+        from_, values = self._from(table, None, None)
+        rows = self._query(f'SELECT MIN(`{pk}`), MAX(`{pk}`) {from_}', values)
+        if not rows or rows[0][0] is None:
+            return None
+        return int(rows[0][0]), int(rows[0][1])
+
+    def range_checksum(
+        self, table: TableInfo, lo: int | None, hi: int | None
+    ) -> tuple[int, int]:
+        """Number of rows, and the sum of the CRC32 of each row, in the range"""
+        # CONCAT_WS skips NULLs, so also include whether each column is NULL
+        row = ', '.join(f'ISNULL(`{c}`), `{c}`' for c in table.columns)
+        from_, values = self._from(table, lo, hi)
+        rows = self._query(
+            f"SELECT COUNT(*), COALESCE(SUM(CRC32(CONCAT_WS('#', {row}))), 0) {from_}",
+            values,
+        )
+        return int(rows[0][0]), int(rows[0][1])
+
+    def range_rows(
+        self, table: TableInfo, lo: int | None, hi: int | None
+    ) -> dict[tuple, tuple]:
+        """Rows in the range, keyed by their primary key"""
+        columns = ', '.join(f'`{c}`' for c in table.columns)
+        key_idx = [table.columns.index(c) for c in table.key_columns]
+        from_, values = self._from(table, lo, hi)
+        return {
+            tuple(row[i] for i in key_idx): tuple(row)
+            for row in self._query(f'SELECT {columns} {from_}', values)
+        }
+
+    def close(self):
+        """Close every thread's connection"""
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+
+
+@dataclasses.dataclass
+class TableReport:
+    """Result of verifying a table"""
+
+    table: str
+    # not system versioned, so differences may be from changes after the backup
+    informational: bool = False
+    rows_restored: int = 0
+    rows_production: int = 0
+    ranges_checked: int = 0
+    # [lo, hi) primary key ranges with differing rows (None if not rangeable)
+    mismatched_ranges: list[tuple[int | None, int | None]] = dataclasses.field(
+        default_factory=list
+    )
+    # keys of rows in production but not the restored database
+    missing_rows: list[tuple] = dataclasses.field(default_factory=list)
+    # keys of rows in the restored database but not production
+    extra_rows: list[tuple] = dataclasses.field(default_factory=list)
+    # keys of rows that are in both, with different values
+    changed_rows: list[tuple] = dataclasses.field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        """Does the restored table match production"""
+        return not self.mismatched_ranges
+
+    def merge(self, other: 'TableReport'):
+        """Add the result of verifying another range of this table"""
+        self.rows_restored += other.rows_restored
+        self.rows_production += other.rows_production
+        self.ranges_checked += other.ranges_checked
+        self.mismatched_ranges.extend(other.mismatched_ranges)
+        for field in ('missing_rows', 'extra_rows', 'changed_rows'):
+            rows = getattr(self, field)
+            rows.extend(getattr(other, field)[: MAX_REPORTED_ROWS - len(rows)])
+
+
+@dataclasses.dataclass
+class VerificationReport:
+    """Result of verifying every table"""
+
+    tables: list[TableReport]
+    seconds: float = 0.0
+
+    @property
+    def mismatched_tables(self) -> list[str]:
+        """(Non-informational) tables that don't match production"""
+        return [t.table for t in self.tables if not t.ok and not t.informational]
+
+    @property
+    def ok(self) -> bool:
+        """Does the restored database match production"""
+        return not self.mismatched_tables
+
+    def to_json(self) -> str:
+        """Serialise to JSON"""
+        return json.dumps(
+            {
+                'ok': self.ok,
+                'seconds': self.seconds,
+                'tables': [{'ok': t.ok, **dataclasses.asdict(t)} for t in self.tables],
+            },
+            indent=2,
+            default=str,
+        )
+
+
+def _table_ranges(
+    table: TableInfo, restored, production, range_size: int
+) -> list[tuple[int | None, int | None]]:
+    if not table.rangeable:
+        return [(None, None)]
+    bounds = [b for b in (restored.bounds(table), production.bounds(table)) if b]
+    if not bounds:
+        return []
+    lo = min(b[0] for b in bounds)
+    hi = max(b[1] for b in bounds) + 1
+    return [(start, min(start + range_size, hi)) for start in range(lo, hi, range_size)]
+
+
+def _compare_rows(table: TableInfo, restored, production, lo, hi, report: TableReport):
+    restored_rows = restored.range_rows(table, lo, hi)
+    production_rows = production.range_rows(table, lo, hi)
+    report.mismatched_ranges.append((lo, hi))
+    report.missing_rows.extend(k for k in production_rows if k not in restored_rows)
+    report.extra_rows.extend(k for k in restored_rows if k not in production_rows)
+    report.changed_rows.extend(
+        k
+        for k, row in restored_rows.items()
+        if k in production_rows and production_rows[k] != row
+    )
+    for field in ('missing_rows', 'extra_rows', 'changed_rows'):
+        del getattr(report, field)[MAX_REPORTED_ROWS:]
+
+
+def _bisect(
+    table: TableInfo,
+    restored,
+    production,
+    lo: int,
+    hi: int,
+    min_range_size: int,
+    report: TableReport,
+):
+    """Find the rows that differ in the (mismatching) range"""
+    if hi - lo <= min_range_size:
+        _compare_rows(table, restored, production, lo, hi, report)
+        return
+    mid = (lo + hi) // 2
+    for sub_lo, sub_hi in ((lo, mid), (mid, hi)):
+        if restored.range_checksum(table, sub_lo, sub_hi) != production.range_checksum(
+            table, sub_lo, sub_hi
+        ):
+            _bisect(table, restored, production, sub_lo, sub_hi, min_range_size, report)
+
+
+def verify_range(
+    table: TableInfo,
+    restored,
+    production,
+    lo: int | None,
+    hi: int | None,
+    min_range_size: int = MIN_RANGE_SIZE,
+) -> TableReport:
+    """Compare a range of the table, finding the rows that differ"""
+    report = TableReport(table=table.name, ranges_checked=1)
+    restored_checksum = restored.range_checksum(table, lo, hi)
+    production_checksum = production.range_checksum(table, lo, hi)
+    report.rows_restored = restored_checksum[0]
+    report.rows_production = production_checksum[0]
+    if restored_checksum == production_checksum:
+        return report
+
+    if lo is None or hi is None:
+        _compare_rows(table, restored, production, lo, hi, report)
+    else:
+        _bisect(table, restored, production, lo, hi, min_range_size, report)
+    return report
+
+
+def verify_databases(
+    restored,
+    production,
+    tables: list[TableInfo],
+    range_size: int = RANGE_SIZE,
+    min_range_size: int = MIN_RANGE_SIZE,
+    concurrency: int = VERIFY_CONCURRENCY,
+) -> VerificationReport:
+    """
+    Compare every row of the tables in the restored database and production,
+    checksumming ranges of each table concurrently. Tables that aren't system
+    versioned are reported, but don't affect whether the report is ok.
+    """
+    start = time.perf_counter()
+    reports = {
+        table.name: TableReport(
+            table=table.name, informational=not table.system_versioned
+        )
+        for table in tables
+    }
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        ranges = {
+            table.name: executor.submit(
+                _table_ranges, table, restored, production, range_size
+            )
+            for table in tables
+        }
+        range_reports = [
+            executor.submit(
+                verify_range, table, restored, production, lo, hi, min_range_size
+            )
+            for table in tables
+            for lo, hi in ranges[table.name].result()
+        ]
+        for future in concurrent.futures.as_completed(range_reports):
+            result = future.result()
+            reports[result.table].merge(result)
+
+    for report in reports.values():
+        report.mismatched_ranges.sort(key=lambda r: (r[0] is None, r[0] or 0))
+
+    return VerificationReport(
+        tables=list(reports.values()), seconds=time.perf_counter() - start
+    )
@@ -61,6 +61,10 @@ TABLES_ORDERED_BY_FK_DEPS = [
     'sequencing_group_comment',
     'participant_comment',
     'family_comment',
+    'project_storage_proportion_daily',
+    'project_storage_proportion_refresh',
+    'seqr_sync_digest',
+    'bulk_operation',
 ][::-1]
 
 
@@ -1,16 +1,23 @@
 import datetime
-from collections import defaultdict
-from typing import Any
+from collections import OrderedDict, defaultdict
+from itertools import groupby
+from typing import Any, AsyncIterator
 
 from api.utils import group_by
 from db.python.connect import Connection
 from db.python.filters import GenericFilter
+from db.python.enum_tables import SequencingTypeTable
 from db.python.layers.base import BaseLayer
 from db.python.layers.sequencing_group import SequencingGroupLayer
+from db.python.proportionate_map import cumulative_project_sizes_by_day
 from db.python.tables.analysis import AnalysisFilter, AnalysisTable
 from db.python.tables.cohort import CohortTable
 from db.python.tables.output_file import OutputFileTable
 from db.python.tables.sample import SampleTable
+from db.python.tables.storage_proportion import (
+    StorageProportionKey,
+    StorageProportionTable,
+)
 from db.python.tables.sequencing_group import SequencingGroupFilter
 from db.python.utils import get_logger
 from models.enums import AnalysisStatus
@@ -32,6 +39,19 @@ from models.models.sequencing_group import SequencingGroupInternalId
 
 ES_ANALYSIS_OBJ_INTRO_DATE = datetime.date(2022, 6, 21)
 
+PROP_MAP_TEMPORAL_METHODS = (
+    ProportionalDateTemporalMethod.SAMPLE_CREATE_DATE,
+    ProportionalDateTemporalMethod.SG_ES_INDEX_DATE,
+)
+# the earliest start_date of the proportionate map
+PROP_MAP_EPOCH = datetime.date(2020, 1, 1)
+
+# {(database, projects, sequencing_types, start_date): (closed_through, days)}
+ES_INDEX_PROP_MAP_CACHE_MAX_SIZE = 32
+_ES_INDEX_PROP_MAP_CACHE: OrderedDict[
+    tuple, tuple[datetime.date, list[ProportionalDateModel]]
+] = OrderedDict()
+
 logger = get_logger()
 
 
@@ -124,6 +144,19 @@ class AnalysisLayer(BaseLayer):
             participant_ids=participant_ids,
         )
 
+    def iterate_sample_cram_path_map_for_seqr(
+        self,
+        project: ProjectId,
+        sequencing_types: list[str],
+        participant_ids: list[int] = None,
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """Get (ext_participant_id, cram_path, internal_id) map, in pages"""
+        return self.at.iterate_sample_cram_path_map_for_seqr(
+            project=project,
+            sequencing_types=sequencing_types,
+            participant_ids=participant_ids,
+        )
+
     async def query(self, filter_: AnalysisFilter) -> list[AnalysisInternal]:
         """Query analyses"""
         analyses = await self.at.query(filter_)
@@ -162,14 +195,75 @@ class AnalysisLayer(BaseLayer):
                 f'end_date ({end_date}) must be after start_date ({start_date})'
             )
 
-        if start_date < datetime.date(2020, 1, 1):
-            raise ValueError(f'start_date ({start_date}) must be after 2020-01-01')
+        if start_date < PROP_MAP_EPOCH:
+            raise ValueError(
+                f'start_date ({start_date}) must be after {PROP_MAP_EPOCH}'
+            )
 
         project_objs = self.connection.get_and_check_access_to_projects_for_ids(
             project_ids=projects, allowed_roles=ReadAccessRoles
         )
         project_name_map = {p.id: p.name for p in project_objs}
 
+        for method in temporal_methods:
+            if method not in PROP_MAP_TEMPORAL_METHODS:
+                raise NotImplementedError(
+                    f'Have not implemented {method.value} temporal method yet'
+                )
+
+        # Use the precomputed sizes (see refresh_storage_proportions) where they've
+        # been refreshed, and only compute the days since then live
+        spt = StorageProportionTable(self.connection)
+        results: dict[ProportionalDateTemporalMethod, list[ProportionalDateModel]] = {}
+        live_methods_by_start: dict[
+            datetime.date, list[ProportionalDateTemporalMethod]
+        ] = defaultdict(list)
+        for method in temporal_methods:
+            state = await spt.get_refresh_state(method)
+            refreshed_through = state[0] if state else None
+            if refreshed_through is None or refreshed_through < start_date:
+                live_methods_by_start[start_date].append(method)
+                continue
+
+            results[method] = await self.get_precomputed_prop_map(
+                method=method,
+                project_name_map=project_name_map,
+                sequencing_types=sequencing_types,
+                start_date=start_date,
+                end_date=min(end_date, refreshed_through)
+                if end_date
+                else refreshed_through,
+            )
+            if not end_date or end_date > refreshed_through:
+                live_start = refreshed_through + datetime.timedelta(days=1)
+                live_methods_by_start[live_start].append(method)
+
+        for live_start, methods in live_methods_by_start.items():
+            live_results = await self.compute_cram_size_proportionate_map(
+                project_name_map=project_name_map,
+                sequencing_types=sequencing_types,
+                temporal_methods=methods,
+                start_date=live_start,
+                end_date=end_date,
+            )
+            for method, prop_map in live_results.items():
+                results[method] = results.get(method, []) + prop_map
+
+        return {method: results[method] for method in temporal_methods}
+
+    async def compute_cram_size_proportionate_map(
+        self,
+        project_name_map: dict[ProjectId, str],
+        sequencing_types: list[str] | None,
+        temporal_methods: list[ProportionalDateTemporalMethod],
+        start_date: datetime.date,
+        end_date: datetime.date | None,
+    ) -> dict[ProportionalDateTemporalMethod, list[ProportionalDateModel]]:
+        """
+        Compute the proportionate map from the sequencing groups and crams,
+        this doesn't check access to the projects
+        """
+        projects = list(project_name_map.keys())
         sglayer = SequencingGroupLayer(self.connection)
         sgfilter = SequencingGroupFilter(
             project=GenericFilter(in_=projects),
@@ -207,6 +301,11 @@ class AnalysisLayer(BaseLayer):
                     project_name_map=project_name_map,
                     start_date=start_date,
                     end_date=end_date,
+                    cache_key=(
+                        self.connection.connection.url.database,
+                        tuple(sorted(projects)),
+                        tuple(sorted(sequencing_types or [])),
+                    ),
                 )
             else:
                 raise NotImplementedError(
@@ -215,6 +314,156 @@ class AnalysisLayer(BaseLayer):
 
         return results
 
+    async def get_precomputed_prop_map(
+        self,
+        method: ProportionalDateTemporalMethod,
+        project_name_map: dict[ProjectId, str],
+        sequencing_types: list[str] | None,
+        start_date: datetime.date,
+        end_date: datetime.date,
+    ) -> list[ProportionalDateModel]:
+        """
+        Build the proportionate map from the precomputed sizes: the size of each
+        project on the start date, and then on each day a size changes
+        """
+        spt = StorageProportionTable(self.connection)
+        steps = await spt.get_sizes(
+            method=method,
+            projects=list(project_name_map.keys()),
+            sequencing_types=sequencing_types,
+            end_date=end_date,
+        )
+
+        current_sizes: dict[StorageProportionKey, int] = {}
+        sizes_by_day: list[tuple[datetime.date, dict[ProjectId, int]]] = []
+
+        def _add_day(day: datetime.date):
+            by_project: dict[ProjectId, int] = defaultdict(int)
+            for (project, _), size in current_sizes.items():
+                by_project[project] += size
+            sizes_by_day.append(
+                (day, {pid: size for pid, size in by_project.items() if size > 0})
+            )
+
+        for day, steps_for_day in groupby(steps, key=lambda step: step[0]):
+            if day > start_date and not sizes_by_day:
+                _add_day(start_date)
+            for _, key, size in steps_for_day:
+                current_sizes[key] = size
+            if day >= start_date:
+                _add_day(day)
+        if not sizes_by_day and current_sizes:
+            _add_day(start_date)
+
+        prop_map: list[ProportionalDateModel] = []
+        for day, by_project in sizes_by_day:
+            if not by_project:
+                continue
+            total_size = sum(by_project.values())
+            prop_map.append(
+                ProportionalDateModel(
+                    date=day,
+                    projects=[
+                        ProportionalDateProjectModel(
+                            project=project_name_map[pid],
+                            percentage=size / total_size,
+                            size=size,
+                        )
+                        for pid, size in by_project.items()
+                    ],
+                )
+            )
+
+        return prop_map
+
+    async def refresh_storage_proportions(
+        self,
+    ) -> dict[ProportionalDateTemporalMethod, int]:
+        """
+        Refresh the precomputed sizes for the proportionate map through yesterday,
+        only recomputing the projects with cram / es-index analyses written since
+        the last refresh, from the earliest day they could have changed.
+        Returns the number of projects refreshed for each method.
+        """
+        spt = StorageProportionTable(self.connection)
+        refreshed_through = datetime.date.today() - datetime.timedelta(days=1)
+        # read before computing, so anything written during the refresh is
+        # picked up by the next one
+        analysis_audit_log_id = await spt.get_max_analysis_audit_log_id()
+        all_project_names = await spt.get_project_names()
+        sequencing_types = await SequencingTypeTable(self.connection).get()
+
+        n_refreshed: dict[ProportionalDateTemporalMethod, int] = {}
+        for method in PROP_MAP_TEMPORAL_METHODS:
+            state = await spt.get_refresh_state(method)
+            if state is None or state[1] is None:
+                affected = {pid: PROP_MAP_EPOCH for pid in all_project_names}
+            else:
+                affected = await spt.get_projects_affected_since(
+                    analysis_audit_log_id=state[1], refreshed_through=state[0]
+                )
+
+            affected = {
+                pid: max(from_date, PROP_MAP_EPOCH)
+                for pid, from_date in affected.items()
+                if pid in all_project_names and from_date <= refreshed_through
+            }
+            if affected:
+                from_date = min(affected.values())
+                project_name_map = {pid: all_project_names[pid] for pid in affected}
+                project_id_map = {name: pid for pid, name in project_name_map.items()}
+
+                previous_sizes: dict[StorageProportionKey, int] = {}
+                for _, key, size in await spt.get_sizes(
+                    method=method,
+                    projects=list(affected),
+                    sequencing_types=None,
+                    end_date=from_date - datetime.timedelta(days=1),
+                ):
+                    previous_sizes[key] = size
+
+                steps: list[tuple[datetime.date, StorageProportionKey, int]] = []
+                for sequencing_type in sequencing_types:
+                    results = await self.compute_cram_size_proportionate_map(
+                        project_name_map=project_name_map,
+                        sequencing_types=[sequencing_type],
+                        temporal_methods=[method],
+                        start_date=from_date,
+                        # es-indices are included up to midnight on the end date
+                        end_date=refreshed_through + datetime.timedelta(days=1),
+                    )
+                    for day_model in results[method]:
+                        if day_model.date > refreshed_through:
+                            continue
+                        sizes = {
+                            (project_id_map[p.project], sequencing_type): p.size
+                            for p in day_model.projects
+                        }
+                        # projects missing from a day have no size left
+                        for key in previous_sizes:
+                            if key[1] == sequencing_type:
+                                sizes.setdefault(key, 0)
+                        for key, size in sizes.items():
+                            if previous_sizes.get(key, 0) != size:
+                                steps.append((day_model.date, key, size))
+                                previous_sizes[key] = size
+
+                await spt.replace_sizes_from(
+                    method=method,
+                    projects=list(affected),
+                    from_date=from_date,
+                    sizes=steps,
+                )
+
+            await spt.set_refresh_state(
+                method,
+                refreshed_through=refreshed_through,
+                analysis_audit_log_id=analysis_audit_log_id,
+            )
+            n_refreshed[method] = len(affected)
+
+        return n_refreshed
+
     async def get_prop_map_for_sample_create_date(
         self,
         sg_by_id: dict[SequencingGroupInternalId, SequencingGroupInternal],
@@ -287,8 +536,9 @@ class AnalysisLayer(BaseLayer):
         sg_by_id: dict[SequencingGroupInternalId, SequencingGroupInternal],
         crams: dict[SequencingGroupInternalId, list[AnalysisInternal]],
         project_name_map: dict[ProjectId, str],
-        start_date: datetime.date | None,
+        start_date: datetime.date,
         end_date: datetime.date | None,
+        cache_key: tuple | None = None,
     ) -> list[ProportionalDateModel]:
         """
         Calculate the prop map for es-indices.
@@ -308,60 +558,65 @@ class AnalysisLayer(BaseLayer):
                 We'll do some processing on these analysis objects so we just get the
                 SGs that are new on a specific day.
 
-            4. Iterate over the days, and add the most appropriate cram size for each
-                SG for that day.
-                    * We can't progressively sum, because the cram size might change
-                        between days, so get it on each day.
+            4. Turn each SG's crams into size deltas from the day it was first seen,
+                and cumulatively sum the deltas by project over the days
+                (see db.python.proportionate_map).
+
+        If a cache_key is provided, the days before today are cached, so repeat
+        calls only compute the days since.
         """
+        end_date = end_date or datetime.date.today()
+
+        # Closed days (before today) don't change, as new es-indices and crams are
+        # only ever completed today, so reuse them and only compute the new days
+        cached_days: list[ProportionalDateModel] = []
+        compute_from = start_date
+        if cache_key is not None:
+            cache_key = (*cache_key, start_date)
+            if cached := _ES_INDEX_PROP_MAP_CACHE.get(cache_key):
+                closed_through, cached_days = cached
+                _ES_INDEX_PROP_MAP_CACHE.move_to_end(cache_key)
+                cached_days = [d for d in cached_days if d.date <= end_date]
+                if end_date <= closed_through:
+                    return cached_days
+                compute_from = closed_through
+
         sizes_by_sg = await self.get_cram_sizes_between_range(
             crams=crams,
-            start_date=start_date,
+            start_date=compute_from,
             end_date=end_date,
         )
 
-        def get_cram_size_for(sg_id: SequencingGroupInternalId, date):
-            """
-            From the list of crams, return the most appropriate cram size for a
-            sequencing group on a specific day.
-            """
-            if sg_id not in sizes_by_sg:
-                return None
-            sg_sizes = sizes_by_sg[sg_id]
-            if len(sg_sizes) == 1:
-                # probably shouldn't just return it, but it's the only cram size
-                # and for some reason it's in the es-index, so we'll just use it
-                return sg_sizes[0][1]
-            for dt, size in sg_sizes[::-1]:
-                if dt <= date:
-                    return size
-            logger.warning(f'Could not find size for {sg_id} on {date}')
-            return None
-
         sg_to_project: dict[SequencingGroupInternalId, ProjectId] = {
             sg.id: sg.project for sg in sg_by_id.values()
         }
 
         sgs_added_by_day = await self.get_sgs_added_by_day_by_es_indices(
-            start=start_date,
+            start=compute_from,
             end=end_date,
             projects=list(project_name_map.keys()),
         )
-        sgs_seen: set[SequencingGroupInternalId] = set()
 
-        ordered_days = sorted(sgs_added_by_day.items(), key=lambda el: el[0])
-        prop_map: list[ProportionalDateModel] = []
-        for day, sgs_for_day in ordered_days:
-            by_project: dict[ProjectId, int] = defaultdict(int)
-            sgs_seen |= sgs_for_day
-            for sg in sgs_seen:
-                if sg not in sg_to_project:
-                    # it's a sg that was in an es-index, but not in the projects
-                    # we care about, so happily skip. It's _probably_ quicker to do
-                    # it this way, rather than only querying for the SGs we care about
-                    continue
-                if cram_size := get_cram_size_for(sg, day):
-                    by_project[sg_to_project[sg]] += cram_size
+        ordered_days = sorted(sgs_added_by_day.keys())
+        # SGs from es-indices outside the projects we care about are skipped, it's
+        # _probably_ quicker to do it this way, rather than only querying for them
+        sg_first_seen: dict[SequencingGroupInternalId, datetime.date] = {}
+        for day in ordered_days:
+            for sg in sgs_added_by_day[day]:
+                sg_first_seen.setdefault(sg, day)
+
+        sizes_by_day = cumulative_project_sizes_by_day(
+            days=ordered_days,
+            sg_first_seen=sg_first_seen,
+            sizes_by_sg=sizes_by_sg,
+            sg_to_project=sg_to_project,
+        )
 
+        prop_map: list[ProportionalDateModel] = []
+        for day, by_project in zip(ordered_days, sizes_by_day):
+            if compute_from != start_date and day <= compute_from:
+                # the cached days already cover this day
+                continue
             total_size = sum(by_project.values())
             prop_map.append(
                 ProportionalDateModel(
@@ -377,6 +632,21 @@ class AnalysisLayer(BaseLayer):
                 )
             )
 
+        prop_map = cached_days + prop_map
+        if cache_key is not None:
+            # es-indices completed on the end date aren't included, so that day
+            # isn't closed yet either
+            closed_through = min(end_date, datetime.date.today()) - datetime.timedelta(
+                days=1
+            )
+            if closed_through >= start_date:
+                _ES_INDEX_PROP_MAP_CACHE[cache_key] = (
+                    closed_through,
+                    [d for d in prop_map if d.date <= closed_through],
+                )
+                while len(_ES_INDEX_PROP_MAP_CACHE) > ES_INDEX_PROP_MAP_CACHE_MAX_SIZE:
+                    _ES_INDEX_PROP_MAP_CACHE.popitem(last=False)
+
         return prop_map
 
     async def calculate_delta_of_crams_by_project_for_day(
@@ -16,10 +16,19 @@ class AnalysisRunnerLayer(BaseLayer):
     # GETS
 
     async def query(
-        self, filter_: AnalysisRunnerFilter
+        self,
+        filter_: AnalysisRunnerFilter,
+        limit: int | None = None,
+        after: str | None = None,
+        include_heavy_fields: bool = True,
     ) -> list[AnalysisRunnerInternal]:
-        """Get analysis runner logs"""
-        logs = await self.at.query(filter_)
+        """Get analysis runner logs, most recently submitted first"""
+        logs = await self.at.query(
+            filter_,
+            limit=limit,
+            after=after,
+            include_heavy_fields=include_heavy_fields,
+        )
         if not logs:
             return []
 
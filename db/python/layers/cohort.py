@@ -125,6 +125,23 @@ class CohortLayer(BaseLayer):
         """
         return await self.ct.get_cohort_sequencing_group_ids(cohort_id)
 
+    async def get_cohort_sequencing_group_ids_by_cohort_ids(
+        self, cohort_ids: list[int]
+    ) -> dict[int, list[int]]:
+        """
+        Get the sequencing group IDs for each of the given cohorts.
+        """
+        return await self.ct.get_cohort_sequencing_group_ids_by_cohort_ids(cohort_ids)
+
+    async def get_templates_by_cohort_ids(
+        self, cohort_ids: list[int]
+    ) -> dict[int, CohortTemplateInternal]:
+        """
+        Get the cohort template for each of the given cohorts (cohorts without a
+        template are omitted).
+        """
+        return await self.ct.get_cohort_templates_by_cohort_ids(cohort_ids)
+
     async def create_cohort_template(
         self,
         cohort_template: CohortTemplateInternal,
@@ -12,6 +12,7 @@ from models.models.comment import (
     CommentEntityType,
     CommentInternal,
     CommentStatus,
+    CommentVersionInternal,
     DiscussionInternal,
 )
 from models.models.project import ProjectMemberRole
@@ -43,6 +44,16 @@ class CommentLayer(BaseLayer):
         """
         return await self.ct.get_discussion_for_entity_ids(entity, entity_ids)
 
+    async def get_versions_for_comment_ids(
+        self, comment_ids: list[int]
+    ) -> dict[int, list[CommentVersionInternal]]:
+        """
+        Query the previous versions of the provided comments
+        _Note_: as above, access is expected to have been checked on the entities
+        the comments are attached to.
+        """
+        return await self.ct.get_versions_for_comment_ids(comment_ids)
+
     async def check_project_access_for_entity(
         self,
         entity: CommentEntityType,
@@ -1,8 +1,10 @@
 # pylint: disable=invalid-name,too-many-lines,too-many-public-methods
 import re
-from collections import defaultdict
 from enum import Enum
-from typing import Any
+from typing import Any, Iterable
+
+import pyarrow as pa
+import pyarrow.compute as pc
 
 from db.python.connect import Connection
 from db.python.filters import GenericFilter
@@ -16,7 +18,13 @@ from db.python.tables.family_participant import (
 from db.python.tables.participant import ParticipantFilter, ParticipantTable
 from db.python.tables.participant_phenotype import ParticipantPhenotypeTable
 from db.python.tables.sample import SampleTable
-from db.python.utils import NoOpAenter, NotFoundError, split_generic_terms
+from db.python.utils import (
+    NoOpAenter,
+    NotFoundError,
+    chunk,
+    get_logger,
+    split_generic_terms,
+)
 from models.models import PRIMARY_EXTERNAL_ORG
 from models.models.family import PedRowInternal
 from models.models.participant import ParticipantInternal, ParticipantUpsertInternal
@@ -28,6 +36,11 @@ from models.models.project import (
 
 HPO_REGEX_MATCHER = re.compile(r'HP\:\d+$')
 
+# rows of individual metadata parsed (and written) at a time during an import
+INDIVIDUAL_METADATA_IMPORT_CHUNK_SIZE = 5000
+
+logger = get_logger()
+
 
 class ExtraParticipantImporterHandler(Enum):
     """How to handle extra participants during metadata import"""
@@ -407,164 +420,232 @@ class ParticipantLayer(BaseLayer):
     async def generic_individual_metadata_importer(
         self,
         headers: list[str],
-        rows: list[list[str]],
+        rows: Iterable[list[str]],
         extra_participants_method: ExtraParticipantImporterHandler = ExtraParticipantImporterHandler.FAIL,
-    ):
+        chunk_size: int = INDIVIDUAL_METADATA_IMPORT_CHUNK_SIZE,
+    ) -> dict[str, int]:
         """
         Import individual level metadata,
         currently only imports seqr metadata fields.
+
+        Rows are consumed chunk_size at a time, so an iterator of rows (eg: a
+        csv.reader over an upload) is never held in memory at once. Each chunk
+        is ID mapped and written in bulk, within a single transaction.
+        Returns the number of rows imported and participants created.
         """
-        # pylint: disable=too-many-locals
-        # currently only does the seqr metadata template
+        self._validate_individual_metadata_headers(headers)
+        assert self.connection.project_id
 
-        # filter to non-comment rows
+        summary = {'rows': 0, 'participants_created': 0}
+        # first row number of each participant, to find duplicates across chunks
+        first_row_by_eid: dict[str, int] = {}
         async with self.connection.connection.transaction():
-            ppttable = ParticipantPhenotypeTable(self.connection)
+            for rows_chunk in chunk(rows, chunk_size=chunk_size):
+                table = self.individual_metadata_rows_to_table(headers, rows_chunk)
+                summary[
+                    'participants_created'
+                ] += await self._import_individual_metadata_chunk(
+                    table,
+                    extra_participants_method=extra_participants_method,
+                    row_offset=summary['rows'],
+                    first_row_by_eid=first_row_by_eid,
+                )
+                summary['rows'] += table.num_rows
+                # the import is one transaction, so progress written to the
+                # database wouldn't be visible until it's finished anyway
+                logger.info(
+                    f'Imported {summary["rows"]} rows of individual metadata '
+                    f'for project {self.connection.project_id}'
+                )
 
-            self._validate_individual_metadata_headers(headers)
+        return summary
 
-            lheaders_to_idx_map = {h.lower(): idx for idx, h in enumerate(headers)}
+    async def _import_individual_metadata_chunk(
+        self,
+        table: pa.Table,
+        extra_participants_method: ExtraParticipantImporterHandler,
+        row_offset: int = 0,
+        first_row_by_eid: dict[str, int] | None = None,
+    ) -> int:
+        """
+        Import a chunk of individual metadata (starting at row_offset of the
+        whole import). Validation and ID mapping is done column-wise, with one
+        query to map the participant IDs, and new participants, families and
+        phenotype rows are written in bulk. Returns the number of participants
+        created.
+        """
+        # pylint: disable=too-many-locals
+        # currently only does the seqr metadata template
+        headers = table.column_names
+        lheaders_to_idx_map = {h.lower(): idx for idx, h in enumerate(headers)}
+        participant_id_field_idx = lheaders_to_idx_map[
+            SeqrMetadataKeys.INDIVIDUAL_ID.value.lower()
+        ]
+        family_id_field_idx = lheaders_to_idx_map.get(
+            SeqrMetadataKeys.FAMILY_ID.value.lower()
+        )
+        self._validate_individual_metadata_participant_ids_column(
+            table.column(participant_id_field_idx),
+            row_offset=row_offset,
+            first_row_by_eid=first_row_by_eid,
+        )
 
-            participant_id_field_idx = lheaders_to_idx_map[
-                SeqrMetadataKeys.INDIVIDUAL_ID.value.lower()
-            ]
-            family_id_field_indx = lheaders_to_idx_map.get(
-                SeqrMetadataKeys.FAMILY_ID.value.lower()
-            )
-            self._validate_individual_metadata_participant_ids(
-                rows=rows, participant_id_field_indx=participant_id_field_idx
-            )
+        ppttable = ParticipantPhenotypeTable(self.connection)
 
-            external_participant_ids = {row[participant_id_field_idx] for row in rows}
-            # TODO: determine better way to add persons if they're not here, if we add them here
-            #       we risk when the samples are added, we might not link them correctly.
-            # will throw if missing external ids
+        external_participant_ids: list[str] = pc.unique(
+            table.column(participant_id_field_idx)
+        ).to_pylist()
+        # TODO: determine better way to add persons if they're not here, if we add them here
+        #       we risk when the samples are added, we might not link them correctly.
+        # will throw if missing external ids
 
-            # we'll allow missing (from the db) participants if we're going to add them
-            allow_missing_participants = (
-                extra_participants_method != ExtraParticipantImporterHandler.FAIL
-            )
-            assert self.connection.project_id
-            external_pid_map = await self.get_id_map_by_external_ids(
-                list(external_participant_ids),
+        # we'll allow missing (from the db) participants if we're going to add them
+        allow_missing_participants = (
+            extra_participants_method != ExtraParticipantImporterHandler.FAIL
+        )
+        external_pid_map = await self.get_id_map_by_external_ids(
+            external_participant_ids,
+            project=self.connection.project_id,
+            allow_missing=allow_missing_participants,
+        )
+        participants_created = 0
+        if extra_participants_method == ExtraParticipantImporterHandler.ADD:
+            missing_participant_eids = [
+                eid for eid in external_participant_ids if eid not in external_pid_map
+            ]
+            new_pids = await self.pttable.create_participants(
+                external_ids=[
+                    {PRIMARY_EXTERNAL_ORG: eid} for eid in missing_participant_eids
+                ],
                 project=self.connection.project_id,
-                allow_missing=allow_missing_participants,
             )
-            if extra_participants_method == ExtraParticipantImporterHandler.ADD:
-                missing_participant_eids = external_participant_ids - set(
-                    external_pid_map.keys()
+            external_pid_map.update(zip(missing_participant_eids, new_pids))
+            participants_created = len(new_pids)
+        elif extra_participants_method == ExtraParticipantImporterHandler.IGNORE:
+            table = table.filter(
+                pc.is_in(
+                    table.column(participant_id_field_idx),
+                    value_set=pa.array(list(external_pid_map.keys()), pa.string()),
                 )
-                for ex_pid in missing_participant_eids:
-                    external_pid_map[ex_pid] = await self.pttable.create_participant(
-                        external_ids={PRIMARY_EXTERNAL_ORG: ex_pid},
-                        reported_sex=None,
-                        reported_gender=None,
-                        karyotype=None,
-                        meta=None,
-                        project=self.connection.project_id,
-                    )
-            elif extra_participants_method == ExtraParticipantImporterHandler.IGNORE:
-                rows = [
-                    row
-                    for row in rows
-                    if row[participant_id_field_idx] in external_pid_map
-                ]
+            )
 
-            internal_to_external_pid_map = {v: k for k, v in external_pid_map.items()}
-            pids = list(external_pid_map.values())
+        # internal participant ID for each row, in row order
+        pid_column = self._map_column_values(
+            table.column(participant_id_field_idx), external_pid_map
+        )
 
-            # we're going to verify the family identifier if specified (and known) is correct
-            # then we'll insert a row in the FamilyParticipant if unknown (by SM) and specified
+        if family_id_field_idx is not None:
+            await self._link_individual_metadata_families(
+                pid_column=pid_column,
+                family_id_column=table.column(family_id_field_idx),
+                internal_to_external_pid_map={
+                    v: k for k, v in external_pid_map.items()
+                },
+            )
 
-            ftable = FamilyTable(self.connection)
-            fpttable = FamilyParticipantTable(self.connection)
+        storeable_keys = [k.value for k in SeqrMetadataKeys.get_storeable_keys()]
+        insertable_rows = self._prepare_individual_metadata_insertable_rows(
+            storeable_keys=storeable_keys,
+            lheaders_to_idx_map=lheaders_to_idx_map,
+            pid_column=pid_column,
+            table=table,
+        )
 
-            provided_pid_to_external_family = {
-                external_pid_map[row[participant_id_field_idx]]: row[
-                    family_id_field_indx
-                ]
-                for row in rows
-                if family_id_field_indx and row[family_id_field_indx]
-            }
+        await ppttable.add_key_value_rows(insertable_rows)
+        return participants_created
 
-            external_family_ids = set(provided_pid_to_external_family.values())
-            # check that all the family ids actually line up
-            _, pid_to_internal_family = await fpttable.get_participant_family_map(pids)
-            fids = set(pid_to_internal_family.values())
-            fmap_by_internal = await ftable.get_id_map_by_internal_ids(list(fids))
-            fmap_from_external = await ftable.get_id_map_by_external_ids(
-                list(external_family_ids),
-                project=self.connection.project_id,
-                allow_missing=True,
+    async def _link_individual_metadata_families(
+        self,
+        pid_column: list[int],
+        family_id_column: pa.ChunkedArray,
+        internal_to_external_pid_map: dict[int, str],
+    ):
+        """
+        Verify the family identifier (if specified and known) is correct, then
+        create any unknown families, and insert a FamilyParticipant row for
+        participants that aren't already in a family
+        """
+        has_family_mask = pc.fill_null(pc.not_equal(family_id_column, ''), False)
+        provided_pid_to_external_family: dict[int, str] = dict(
+            zip(
+                pa.array(pid_column, pa.int64()).filter(has_family_mask).to_pylist(),
+                family_id_column.filter(has_family_mask).to_pylist(),
             )
-            fmap_by_external = {
-                **fmap_from_external,
-                **{v: k for k, v in fmap_by_internal.items()},
-            }
-            missing_family_ids = external_family_ids - set(fmap_by_external.keys())
-
-            family_persons_to_insert: list[tuple[str, int]] = []
-            incompatible_familes: list[str] = []
-            for pid, external_family_id in provided_pid_to_external_family.items():
-                if pid in pid_to_internal_family:
-                    # we know the family
-                    family_id = pid_to_internal_family[pid]
-                    known_external_fid = fmap_by_internal[family_id]
-                    if known_external_fid != external_family_id:
-                        external_pid = internal_to_external_pid_map.get(pid, pid)
-                        incompatible_familes.append(
-                            f'{external_pid} (expected: {known_external_fid}, received: {external_family_id})'
-                        )
-                    # else: we're all gravy
-                else:
-                    # we can insert the family
-                    # we'd have to INSERT the families, we'll use the
-                    family_persons_to_insert.append((external_family_id, pid))
-
-            if len(incompatible_familes) > 0:
-                raise ValueError(
-                    'Specified family IDs for participants did not match what SM '
-                    'already knows,please update these in the SM database before '
-                    f'proceeding: {", ".join(incompatible_familes)}'
-                )
+        )
+        if not provided_pid_to_external_family:
+            return
 
-            if len(missing_family_ids) > 0:
-                # they might not be missing
-                for external_family_id in missing_family_ids:
-                    new_pid = await ftable.create_family(
-                        external_ids={PRIMARY_EXTERNAL_ORG: external_family_id},
-                        description=None,
-                        coded_phenotype=None,
-                    )
-                    fmap_by_internal[new_pid] = external_family_id
-                    fmap_by_external[external_family_id] = new_pid
-
-            if len(family_persons_to_insert) > 0:
-                formed_rows = [
-                    PedRowInternal(
-                        family_id=fmap_by_external[external_family_id],
-                        individual_id=pid,
-                        affected=0,
-                        maternal_id=None,
-                        paternal_id=None,
-                        notes=None,
-                        sex=None,
+        ftable = FamilyTable(self.connection)
+        fpttable = FamilyParticipantTable(self.connection)
+
+        external_family_ids = set(provided_pid_to_external_family.values())
+        # check that all the family ids actually line up
+        _, pid_to_internal_family = await fpttable.get_participant_family_map(
+            list(provided_pid_to_external_family.keys())
+        )
+        fids = set(pid_to_internal_family.values())
+        fmap_by_internal = await ftable.get_id_map_by_internal_ids(list(fids))
+        fmap_from_external = await ftable.get_id_map_by_external_ids(
+            list(external_family_ids),
+            project=self.connection.project_id,
+            allow_missing=True,
+        )
+        fmap_by_external = {
+            **fmap_from_external,
+            **{v: k for k, v in fmap_by_internal.items()},
+        }
+        missing_family_ids = [
+            fid for fid in external_family_ids if fid not in fmap_by_external
+        ]
+
+        family_persons_to_insert: list[tuple[str, int]] = []
+        incompatible_familes: list[str] = []
+        for pid, external_family_id in provided_pid_to_external_family.items():
+            if pid in pid_to_internal_family:
+                # we know the family
+                family_id = pid_to_internal_family[pid]
+                known_external_fid = fmap_by_internal[family_id]
+                if known_external_fid != external_family_id:
+                    external_pid = internal_to_external_pid_map.get(pid, pid)
+                    incompatible_familes.append(
+                        f'{external_pid} (expected: {known_external_fid}, received: {external_family_id})'
                     )
-                    for external_family_id, pid in family_persons_to_insert
-                ]
-                await fpttable.create_rows(formed_rows)
-
-            storeable_keys = [k.value for k in SeqrMetadataKeys.get_storeable_keys()]
-            insertable_rows = self._prepare_individual_metadata_insertable_rows(
-                storeable_keys=storeable_keys,
-                lheaders_to_idx_map=lheaders_to_idx_map,
-                participant_id_field_idx=participant_id_field_idx,
-                pid_map=external_pid_map,
-                rows=rows,
+                # else: we're all gravy
+            else:
+                # we can insert the family
+                family_persons_to_insert.append((external_family_id, pid))
+
+        if len(incompatible_familes) > 0:
+            raise ValueError(
+                'Specified family IDs for participants did not match what SM '
+                'already knows,please update these in the SM database before '
+                f'proceeding: {", ".join(incompatible_familes)}'
             )
 
-            await ppttable.add_key_value_rows(insertable_rows)
-            return True
+        if len(missing_family_ids) > 0:
+            new_family_ids = await ftable.create_families(
+                external_ids=[
+                    {PRIMARY_EXTERNAL_ORG: external_family_id}
+                    for external_family_id in missing_family_ids
+                ],
+                project=self.connection.project_id,
+            )
+            fmap_by_external.update(zip(missing_family_ids, new_family_ids))
+
+        if len(family_persons_to_insert) > 0:
+            formed_rows = [
+                PedRowInternal(
+                    family_id=fmap_by_external[external_family_id],
+                    individual_id=pid,
+                    affected=0,
+                    maternal_id=None,
+                    paternal_id=None,
+                    notes=None,
+                    sex=None,
+                )
+                for external_family_id, pid in family_persons_to_insert
+            ]
+            await fpttable.create_rows(formed_rows)
 
     async def get_participants_by_families(
         self, family_ids: list[int]
@@ -898,41 +979,103 @@ class ParticipantLayer(BaseLayer):
             )
 
     @staticmethod
-    def _validate_individual_metadata_participant_ids(rows, participant_id_field_indx):
-        # validate persons
-        external_id_to_row_number = defaultdict(list)
-        for idx, row in enumerate(rows):
-            external_id_to_row_number[row[participant_id_field_indx]].append(idx + 1)
-
-        pids_with_duplicates = {
-            eid: rownumbers
-            for eid, rownumbers in external_id_to_row_number.items()
-            if len(rownumbers) > 1
-        }
+    def individual_metadata_rows_to_table(
+        headers: list[str], rows: Iterable[list[str]]
+    ) -> pa.Table:
+        """
+        Pivot row-wise individual metadata into a table of string columns,
+        short rows are padded with empty values
 
-        if len(pids_with_duplicates) > 0:
+        >>> ParticipantLayer.individual_metadata_rows_to_table(
+        ...     ['Individual ID', 'Birth Year'], [['P01', '1990'], ['P02']]
+        ... ).to_pydict()
+        {'Individual ID': ['P01', 'P02'], 'Birth Year': ['1990', '']}
+        """
+        columns: list[list[str]] = [[] for _ in headers]
+        for row in rows:
+            for idx, column in enumerate(columns):
+                column.append(row[idx] if idx < len(row) else '')
+
+        return pa.Table.from_arrays(
+            [pa.array(column, pa.string()) for column in columns], names=headers
+        )
+
+    @staticmethod
+    def _validate_individual_metadata_participant_ids_column(
+        participant_ids: pa.ChunkedArray,
+        row_offset: int = 0,
+        first_row_by_eid: dict[str, int] | None = None,
+    ):
+        """
+        Check there are no empty or duplicated participant IDs, reporting (1-based)
+        row numbers offset by row_offset. If first_row_by_eid is given, it's
+        checked for participants in earlier chunks, and updated with this one.
+        """
+        # validate persons
+        empty_mask = pc.fill_null(pc.equal(participant_ids, ''), True)
+        if pc.any(empty_mask).as_py():
+            rows_with_empty_pids = [
+                row_offset + idx + 1
+                for idx in pc.indices_nonzero(empty_mask).to_pylist()
+            ]
             raise ValueError(
-                f'There were duplicate participants for {{external_id: row_numbers}}: {pids_with_duplicates}'
+                f'Empty values found for participants in rows {rows_with_empty_pids}'
             )
 
-        if '' in pids_with_duplicates or None in pids_with_duplicates:
-            rows_with_empty_pids = sorted(
-                row_numbers
-                for k in ('', None)
-                for row_numbers in pids_with_duplicates[k]
-                if k in pids_with_duplicates
-            )
+        earlier_rows = first_row_by_eid or {}
+        counts = pc.value_counts(participant_ids).flatten()
+        duplicated_eids = [
+            eid
+            for eid, count in zip(counts[0].to_pylist(), counts[1].to_pylist())
+            if count > 1 or eid in earlier_rows
+        ]
+        if duplicated_eids:
+            # only compute row numbers for the (hopefully few) failing IDs
+            pids_with_duplicates = {
+                eid: ([earlier_rows[eid]] if eid in earlier_rows else [])
+                + [
+                    row_offset + idx + 1
+                    for idx in pc.indices_nonzero(
+                        pc.equal(participant_ids, eid)
+                    ).to_pylist()
+                ]
+                for eid in duplicated_eids
+            }
             raise ValueError(
-                f'Empty values found for participants in rows {rows_with_empty_pids}'
+                f'There were duplicate participants for {{external_id: row_numbers}}: {pids_with_duplicates}'
             )
 
+        if first_row_by_eid is not None:
+            for idx, eid in enumerate(participant_ids.to_pylist()):
+                first_row_by_eid[eid] = row_offset + idx + 1
+
+    @staticmethod
+    def _map_column_values(column: pa.ChunkedArray, mapping: dict) -> list:
+        """
+        Map every value in an arrow column through a dict, only computing
+        the position of each distinct value once
+        """
+        keys = list(mapping.keys())
+        positions = pc.index_in(column, value_set=pa.array(keys, column.type))
+        values = list(mapping.values())
+        return [None if p is None else values[p] for p in positions.to_pylist()]
+
+    @staticmethod
+    def _parse_column_values(column: pa.ChunkedArray, parser) -> list:
+        """
+        Parse a column of strings, calling the parser once per distinct value
+        """
+        unique_values = pc.unique(column)
+        parsed = [parser(v) if v else None for v in unique_values.to_pylist()]
+        positions = pc.index_in(column, value_set=unique_values)
+        return [parsed[p] for p in positions.to_pylist()]
+
     @staticmethod
     def _prepare_individual_metadata_insertable_rows(
         storeable_keys: list[str],
         lheaders_to_idx_map: dict[str, int],
-        participant_id_field_idx: int,
-        pid_map: dict[str, int],
-        rows: list[list[str]],
+        pid_column: list[int],
+        table: pa.Table,
     ):
         # do all the matching in lowercase space, but store in regular case space
         # pylint: disable=invalid-name
@@ -940,6 +1083,7 @@ class ParticipantLayer(BaseLayer):
             (k, lheaders_to_idx_map[k.lower()])
             for k in storeable_keys
             if k.lower() in lheaders_to_idx_map
+            and k != SeqrMetadataKeys.HPO_TERMS_PRESENT.value
         ]
 
         # list of (PersonId, Key, value) to insert into the participant_phenotype table
@@ -947,31 +1091,40 @@ class ParticipantLayer(BaseLayer):
         parsers = {k.value: v for k, v in SeqrMetadataKeys.get_key_parsers().items()}
 
         hpo_col_indices = [
-            lheaders_to_idx_map.get(h.lower())
+            lheaders_to_idx_map[h.lower()]
             for h in SeqrMetadataKeys.get_hpo_keys()
             if h.lower() in lheaders_to_idx_map
         ]
 
-        for row in rows:
-            external_participant_id = row[participant_id_field_idx]
-            participant_id = pid_map[external_participant_id]
-
-            for header_key, col_number in storeable_header_col_number_tuples:
-                if header_key == SeqrMetadataKeys.HPO_TERMS_PRESENT.value:
-                    continue
-                if col_number >= len(row):
-                    continue
-                value = row[col_number]
-                if header_key in parsers:
-                    # use custom parse declared in SeqrMetadataKeys.get_key_parsers
-                    value = parsers[header_key](value)
-
-                if value:
-                    insertable_rows.append((participant_id, header_key, value))
+        values_by_key: list[tuple[str, list]] = []
+        for header_key, col_number in storeable_header_col_number_tuples:
+            column = table.column(col_number)
+            if header_key in parsers:
+                # use custom parse declared in SeqrMetadataKeys.get_key_parsers
+                values = ParticipantLayer._parse_column_values(
+                    column, parsers[header_key]
+                )
+            else:
+                values = column.to_pylist()
+            values_by_key.append((header_key, values))
+
+        hpo_terms_by_column = [
+            ParticipantLayer._parse_column_values(
+                table.column(idx), SeqrMetadataKeys.parse_hpo_terms
+            )
+            for idx in hpo_col_indices
+        ]
+
+        for row_idx, participant_id in enumerate(pid_column):
+            for header_key, values in values_by_key:
+                if values[row_idx]:
+                    insertable_rows.append(
+                        (participant_id, header_key, values[row_idx])
+                    )
 
             hpo_terms = []
-            for idx in hpo_col_indices:
-                hpo_terms.extend(SeqrMetadataKeys.parse_hpo_terms(row[idx]))
+            for column_terms in hpo_terms_by_column:
+                hpo_terms.extend(column_terms[row_idx] or [])
 
             if hpo_terms:
                 insertable_rows.append(
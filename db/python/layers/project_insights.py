@@ -3,6 +3,8 @@
 import asyncio
 import itertools
 import json
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Any, NamedTuple
 
@@ -88,6 +90,182 @@ SV_INDEX_SEQ_TYPE_STAGE_MAP = {
     'exome': 'MtToEsCNV',
 }
 
+WEB_REPORT_STAGES = ('Stripy', 'MitoReport')
+
+# Facts are cached per project, keyed by (database, project), and each entry records
+# the project version it was loaded at, see `ProjectInsightsDb.get_project_versions`
+PROJECT_INSIGHTS_CACHE_MAX_SIZE = 64
+
+_PROJECT_INSIGHTS_CACHE: OrderedDict[
+    tuple[str, ProjectId], tuple[tuple, 'ProjectInsightsFacts']
+] = OrderedDict()
+
+
+class ProjectInsightsTotals(NamedTuple):
+    families: int
+    participants: int
+    samples: int
+    sequencing_groups: int
+
+
+def _is_later(candidate: AnalysisRow, current: AnalysisRow | None) -> bool:
+    """Is the candidate analysis completed after the current one (ties on id)"""
+    if current is None:
+        return True
+    return (candidate.timestamp_completed, candidate.id) > (
+        current.timestamp_completed,
+        current.id,
+    )
+
+
+@dataclass
+class ProjectInsightsFacts:
+    """
+    Everything the summary and details rows of a single project are derived from.
+
+    The sequencing groups are stored column-wise, with an entry for each sequencing
+    group (or for each family the sequencing group's participant is in). The
+    analyses are reduced to the latest of each kind when loaded.
+    """
+
+    project: ProjectId
+
+    sequencing_group_ids: list[SequencingGroupInternalId] = field(default_factory=list)
+    sequencing_types: list[SequencingType] = field(default_factory=list)
+    sequencing_technologies: list[SequencingTechnology] = field(default_factory=list)
+    sequencing_platforms: list[SequencingPlatform] = field(default_factory=list)
+    sample_ids: list[int] = field(default_factory=list)
+    sample_types: list[str] = field(default_factory=list)
+    participant_ids: list[int | None] = field(default_factory=list)
+    family_ids: list[int | None] = field(default_factory=list)
+
+    family_external_ids: dict[int, list[str]] = field(default_factory=dict)
+    participant_external_ids: dict[int, list[str]] = field(default_factory=dict)
+    sample_external_ids: dict[int, list[str]] = field(default_factory=dict)
+
+    # latest completed CRAM of each sequencing group
+    crams: dict[
+        ProjectSeqTypeTechnologyKey, dict[SequencingGroupInternalId, AnalysisRow]
+    ] = field(default_factory=dict)
+    latest_annotate_dataset: dict[ProjectSeqTypeKey, AnalysisRow] = field(
+        default_factory=dict
+    )
+    latest_es_indices: dict[ProjectSeqTypeStageKey, AnalysisRow] = field(
+        default_factory=dict
+    )
+    stripy_reports: dict[ProjectSeqGroupKey, StripyReportRow] = field(
+        default_factory=dict
+    )
+    mito_reports: dict[ProjectSeqGroupKey, AnalysisRow] = field(default_factory=dict)
+    # sequencing groups in each of the latest annotate dataset / es-index analyses
+    analysis_sequencing_groups: dict[AnalysisId, list[SequencingGroupInternalId]] = (
+        field(default_factory=dict)
+    )
+
+    def add_sequencing_group(self, row: Record):
+        """Append a row of the sequencing groups query to the columns"""
+        self.sequencing_group_ids.append(row['sequencing_group_id'])
+        self.sequencing_types.append(row['sequencing_type'])
+        self.sequencing_technologies.append(row['sequencing_technology'])
+        self.sequencing_platforms.append(row['sequencing_platform'])
+        self.sample_ids.append(row['sample_id'])
+        self.sample_types.append(row['sample_type'])
+        self.participant_ids.append(row['participant_id'])
+        self.family_ids.append(row['family_id'])
+
+    def get_totals(
+        self, sequencing_types: list[SequencingType]
+    ) -> dict[ProjectSeqTypeTechnologyKey, ProjectInsightsTotals]:
+        """
+        Count the distinct families, participants, samples and sequencing groups
+        by sequencing type and technology
+        """
+        families: dict[ProjectSeqTypeTechnologyKey, set[int]] = defaultdict(set)
+        participants: dict[ProjectSeqTypeTechnologyKey, set[int]] = defaultdict(set)
+        samples: dict[ProjectSeqTypeTechnologyKey, set[int]] = defaultdict(set)
+        sequencing_groups: dict[ProjectSeqTypeTechnologyKey, set[int]] = defaultdict(
+            set
+        )
+        requested_types = set(sequencing_types)
+        for idx, sequencing_type in enumerate(self.sequencing_types):
+            if sequencing_type not in requested_types:
+                continue
+            key = ProjectSeqTypeTechnologyKey(
+                self.project, sequencing_type, self.sequencing_technologies[idx]
+            )
+            sequencing_groups[key].add(self.sequencing_group_ids[idx])
+            samples[key].add(self.sample_ids[idx])
+            if (participant_id := self.participant_ids[idx]) is not None:
+                participants[key].add(participant_id)
+            if (family_id := self.family_ids[idx]) is not None:
+                families[key].add(family_id)
+
+        return {
+            key: ProjectInsightsTotals(
+                families=len(families[key]),
+                participants=len(participants[key]),
+                samples=len(samples[key]),
+                sequencing_groups=len(sgs),
+            )
+            for key, sgs in sequencing_groups.items()
+        }
+
+    def get_sequencing_group_details(
+        self, sequencing_types: list[SequencingType]
+    ) -> dict[ProjectSeqTypeTechnologyPlatformKey, list[SequencingGroupDetailRow]]:
+        """
+        Get the details rows of the sequencing groups whose participants are in a
+        family, with a row for each combination of external IDs
+        """
+        requested_types = set(sequencing_types)
+        indices = sorted(
+            (
+                idx
+                for idx, family_id in enumerate(self.family_ids)
+                if family_id is not None
+                and self.sequencing_types[idx] in requested_types
+            ),
+            key=lambda idx: (
+                self.sample_types[idx],
+                self.family_ids[idx],
+                self.participant_ids[idx],
+                self.sequencing_group_ids[idx],
+            ),
+        )
+
+        details: dict[
+            ProjectSeqTypeTechnologyPlatformKey, list[SequencingGroupDetailRow]
+        ] = defaultdict(list)
+        for idx in indices:
+            family_id = self.family_ids[idx]
+            participant_id = self.participant_ids[idx]
+            sample_id = self.sample_ids[idx]
+            key = ProjectSeqTypeTechnologyPlatformKey(
+                project=self.project,
+                sequencing_type=self.sequencing_types[idx],
+                sequencing_technology=self.sequencing_technologies[idx],
+                sequencing_platform=self.sequencing_platforms[idx],
+            )
+            for family_ext_id, participant_ext_id, sample_ext_id in itertools.product(
+                self.family_external_ids.get(family_id) or [None],
+                self.participant_external_ids.get(participant_id) or [None],
+                self.sample_external_ids.get(sample_id) or [None],
+            ):
+                details[key].append(
+                    SequencingGroupDetailRow(
+                        family_id=family_id,
+                        family_external_id=family_ext_id,
+                        participant_id=participant_id,
+                        participant_external_id=participant_ext_id,
+                        sample_id=sample_id,
+                        sample_external_ids=sample_ext_id,
+                        sample_type=self.sample_types[idx],
+                        sequencing_group_id=self.sequencing_group_ids[idx],
+                    )
+                )
+
+        return details
+
 
 class ProjectInsightsLayer(BaseLayer):
     """Project Insights layer - business logic for the project insights dashboards"""
@@ -151,31 +329,6 @@ class ProjectInsightsDb(DbBase):
             return [external_ids_value]
         return external_ids_value
 
-    def parse_project_seqtype_technology_keyed_rows(
-        self, rows: list[Record], value_field: str
-    ) -> dict[ProjectSeqTypeTechnologyKey, Any]:
-        """
-        Parse rows that are keyed by project, sequencing type, and sequencing technology
-        """
-        parsed_rows: dict[
-            ProjectSeqTypeTechnologyKey,
-            dict[str, Any] | list[SequencingGroupInternalId],
-        ] = {}
-        for row in rows:
-            key = ProjectSeqTypeTechnologyKey(
-                row['project'],
-                row['sequencing_type'],
-                row['sequencing_technology'],
-            )
-            if value_field == 'sequencing_group_ids':
-                parsed_rows[key] = [int(sgid) for sgid in row[value_field].split(',')]
-            else:
-                try:
-                    parsed_rows[key] = row[value_field]
-                except KeyError:
-                    parsed_rows[key] = None
-        return parsed_rows
-
     async def _get_sequencing_groups_by_analysis_ids(
         self, analysis_ids: list[AnalysisId]
     ) -> dict[AnalysisId, list[SequencingGroupInternalId]]:
@@ -206,20 +359,6 @@ GROUP BY analysis_id;
 
         return sequencing_groups_by_analysis_id
 
-    async def get_analysis_sequencing_groups(
-        self, grouped_analysis_rows: list[AnalysisRow]
-    ):
-        """
-        Get the analysis IDs from the group analysis rows, which is a list of analysis record dicts
-        """
-        analyses_to_query_sequencing_groups: list[AnalysisId] = []
-        for row in grouped_analysis_rows:
-            analyses_to_query_sequencing_groups.append(row.id)
-
-        return await self._get_sequencing_groups_by_analysis_ids(
-            analyses_to_query_sequencing_groups
-        )
-
     def get_report_url(
         self,
         project_name: str,
@@ -406,500 +545,286 @@ GROUP BY analysis_id;
             web_reports=web_reports,
         )
 
-    # Project Insights Summary queries
-    async def _total_families_by_project_id_and_seq_fields(
-        self, project_ids: list[ProjectId], sequencing_types: list[SequencingType]
-    ) -> dict[ProjectSeqTypeTechnologyKey, int]:
-        _query = """
-SELECT
-    f.project,
-    sg.type as sequencing_type,
-    sg.technology as sequencing_technology,
-    COUNT(DISTINCT f.id) as num_families
-FROM
-    family f
-    LEFT JOIN family_participant fp ON f.id = fp.family_id
-    LEFT JOIN sample s ON fp.participant_id = s.participant_id
-    LEFT JOIN sequencing_group sg on sg.sample_id = s.id
-WHERE
-    f.project IN :projects
-    AND sg.type IN :sequencing_types
-GROUP BY
-    f.project,
-    sg.type,
-    sg.technology;
+    # Queries, the facts of each project are loaded in a single pass
+    async def get_project_versions(
+        self, project_ids: list[ProjectId]
+    ) -> dict[ProjectId, tuple]:
+        """
+        Cheap token for each project that changes whenever data the insights are
+        derived from changes, as every write sets a new audit_log_id (and deletes
+        change the number of rows). Includes the database name, as the cache is
+        shared by every connection in the process.
         """
-
-        _query_results = await self.connection.fetch_all(
-            _query,
-            {
-                'projects': project_ids,
-                'sequencing_types': sequencing_types,
-            },
-        )
-        return self.parse_project_seqtype_technology_keyed_rows(
-            _query_results, 'num_families'
-        )
-
-    async def _total_participants_by_project_id_and_seq_fields(
-        self, project_ids: list[ProjectId], sequencing_types: list[SequencingType]
-    ) -> dict[ProjectSeqTypeTechnologyKey, int]:
         _query = """
 SELECT
-    p.project,
-    sg.type as sequencing_type,
-    sg.technology as sequencing_technology,
-    COUNT(DISTINCT p.id) as num_participants
-FROM
-    participant p
-    LEFT JOIN sample s ON p.id = s.participant_id
-    LEFT JOIN sequencing_group sg on sg.sample_id = s.id
-WHERE
-    p.project IN :projects
-    AND sg.type IN :sequencing_types
-GROUP BY
-    p.project,
-    sg.type,
-    sg.technology;
+    DATABASE() as db,
+    p.id as project,
+    MAX(v.audit_log_id) as audit_log_id,
+    SUM(v.n) as n
+FROM project p
+LEFT JOIN (
+    SELECT project, MAX(audit_log_id) as audit_log_id, COUNT(*) as n
+    FROM sample WHERE project IN :projects GROUP BY project
+    UNION ALL
+    SELECT project, MAX(audit_log_id), COUNT(*)
+    FROM participant WHERE project IN :projects GROUP BY project
+    UNION ALL
+    SELECT project, MAX(audit_log_id), COUNT(*)
+    FROM family WHERE project IN :projects GROUP BY project
+    UNION ALL
+    SELECT project, MAX(audit_log_id), COUNT(*)
+    FROM analysis WHERE project IN :projects GROUP BY project
+    UNION ALL
+    SELECT project, MAX(audit_log_id), COUNT(*)
+    FROM sample_external_id WHERE project IN :projects GROUP BY project
+    UNION ALL
+    SELECT project, MAX(audit_log_id), COUNT(*)
+    FROM participant_external_id WHERE project IN :projects GROUP BY project
+    UNION ALL
+    SELECT project, MAX(audit_log_id), COUNT(*)
+    FROM family_external_id WHERE project IN :projects GROUP BY project
+    UNION ALL
+    SELECT s.project, MAX(sg.audit_log_id), COUNT(*)
+    FROM sequencing_group sg
+    INNER JOIN sample s ON s.id = sg.sample_id
+    WHERE s.project IN :projects
+    GROUP BY s.project
+    UNION ALL
+    SELECT f.project, MAX(fp.audit_log_id), COUNT(*)
+    FROM family_participant fp
+    INNER JOIN family f ON f.id = fp.family_id
+    WHERE f.project IN :projects
+    GROUP BY f.project
+) v ON v.project = p.id
+WHERE p.id IN :projects
+GROUP BY p.id;
         """
         _query_results = await self.connection.fetch_all(
-            _query,
-            {
-                'projects': project_ids,
-                'sequencing_types': sequencing_types,
-            },
-        )
-        return self.parse_project_seqtype_technology_keyed_rows(
-            _query_results, 'num_participants'
+            _query, {'projects': project_ids}
         )
+        return {
+            row['project']: (row['db'], row['audit_log_id'], row['n'])
+            for row in _query_results
+        }
 
-    async def _total_samples_by_project_id_and_seq_fields(
-        self, project_ids: list[ProjectId], sequencing_types: list[SequencingType]
-    ) -> dict[ProjectSeqTypeTechnologyKey, int]:
+    async def _get_sequencing_group_rows(
+        self, project_ids: list[ProjectId]
+    ) -> list[Record]:
+        """One row per sequencing group, or per family its participant is in"""
         _query = """
 SELECT
     s.project,
+    sg.id as sequencing_group_id,
     sg.type as sequencing_type,
     sg.technology as sequencing_technology,
-    COUNT(DISTINCT s.id) as num_samples
+    sg.platform as sequencing_platform,
+    s.id as sample_id,
+    s.type as sample_type,
+    s.participant_id,
+    fp.family_id
 FROM
     sample s
-    LEFT JOIN sequencing_group sg on sg.sample_id = s.id
+    INNER JOIN sequencing_group sg ON sg.sample_id = s.id
+    LEFT JOIN family_participant fp ON fp.participant_id = s.participant_id
 WHERE
-    s.project IN :projects
-    AND sg.type IN :sequencing_types
-GROUP BY
-    s.project,
-    sg.type,
-    sg.technology;
+    s.project IN :projects;
         """
-        _query_results = await self.connection.fetch_all(
-            _query,
-            {
-                'projects': project_ids,
-                'sequencing_types': sequencing_types,
-            },
-        )
-        return self.parse_project_seqtype_technology_keyed_rows(
-            _query_results, 'num_samples'
-        )
+        return await self.connection.fetch_all(_query, {'projects': project_ids})
 
-    async def _total_sequencing_groups_by_project_id_and_seq_fields(
-        self, project_ids: list[ProjectId], sequencing_types: list[SequencingType]
-    ) -> dict[ProjectSeqTypeTechnologyKey, int]:
+    async def _get_external_id_rows(self, project_ids: list[ProjectId]) -> list[Record]:
+        """The external IDs of the families, participants and samples"""
         _query = """
-SELECT
-    s.project,
-    sg.type as sequencing_type,
-    sg.technology as sequencing_technology,
-    COUNT(DISTINCT sg.id) as num_sgs
-FROM
-    sequencing_group sg
-    LEFT JOIN sample s on s.id = sg.sample_id
-WHERE
-    s.project IN :projects
-    AND sg.type IN :sequencing_types
-GROUP BY
-    s.project,
-    sg.type,
-    sg.technology;
+SELECT project, 'family' as entity, family_id as id, external_id
+FROM family_external_id
+WHERE project IN :projects
+UNION ALL
+SELECT project, 'participant' as entity, participant_id as id, external_id
+FROM participant_external_id
+WHERE project IN :projects
+UNION ALL
+SELECT project, 'sample' as entity, sample_id as id, external_id
+FROM sample_external_id
+WHERE project IN :projects;
         """
-        _query_results = await self.connection.fetch_all(
-            _query,
-            {
-                'projects': project_ids,
-                'sequencing_types': sequencing_types,
-            },
-        )
-        return self.parse_project_seqtype_technology_keyed_rows(
-            _query_results, 'num_sgs'
-        )
+        return await self.connection.fetch_all(_query, {'projects': project_ids})
 
-    async def _crams_by_project_id_and_seq_fields(
-        self,
-        project_ids: list[ProjectId],
-        sequencing_types: list[SequencingType],
-    ) -> dict[ProjectSeqTypeTechnologyKey, list[SequencingGroupInternalId]]:
-        _query = """
-SELECT
-    a.project,
-    sg.type as sequencing_type,
-    sg.technology as sequencing_technology,
-    GROUP_CONCAT(DISTINCT asg.sequencing_group_id) as sequencing_group_ids
-FROM
-    analysis a
-    LEFT JOIN analysis_sequencing_group asg ON a.id = asg.analysis_id
-    LEFT JOIN sequencing_group sg ON sg.id = asg.sequencing_group_id
-WHERE
-    a.project IN :projects
-    AND sg.type IN :sequencing_types
-    AND a.type = 'CRAM'
-    AND a.status = 'COMPLETED'
-GROUP BY
-    a.project,
-    sg.type,
-    sg.technology;
+    async def _get_analysis_rows(self, project_ids: list[ProjectId]) -> list[Record]:
         """
-
-        _query_results = await self.connection.fetch_all(
-            _query,
-            {
-                'projects': project_ids,
-                'sequencing_types': sequencing_types,
-            },
-        )
-        return self.parse_project_seqtype_technology_keyed_rows(
-            _query_results, 'sequencing_group_ids'
-        )
-
-    async def _sg_crams_by_project_id_and_seq_fields(
-        self, project_ids: list[ProjectId], sequencing_types: list[str]
-    ) -> dict[
-        ProjectSeqTypeTechnologyKey, dict[SequencingGroupInternalId, AnalysisRow]
-    ]:
-        _query = """
-SELECT
-    a.project,
-    a.id as analysis_id,
-    sg.id as sequencing_group_id,
-    sg.type as sequencing_type,
-    sg.technology as sequencing_technology,
-    COALESCE(a.output, ao.output, of.path) as output,
-    a.timestamp_completed
-FROM
-    analysis a
-    LEFT JOIN analysis_sequencing_group asg ON a.id = asg.analysis_id
-    LEFT JOIN analysis_outputs ao ON a.id = ao.analysis_id
-    LEFT JOIN output_file of ON ao.file_id = of.id
-    LEFT JOIN sequencing_group sg ON sg.id = asg.sequencing_group_id
-    INNER JOIN (
-        SELECT
-            asg.sequencing_group_id,
-            MAX(a.timestamp_completed) as max_timestamp
-        FROM analysis a
-        INNER JOIN analysis_sequencing_group asg ON a.id = asg.analysis_id
-        WHERE a.type='CRAM'
-        AND a.status='COMPLETED'
-        AND a.project IN :projects
-        GROUP BY asg.sequencing_group_id
-    ) max_timestamps ON asg.sequencing_group_id = max_timestamps.sequencing_group_id
-    AND a.timestamp_completed = max_timestamps.max_timestamp
-WHERE
-    a.project IN :projects
-    AND sg.type IN :sequencing_types
-    AND a.type = 'CRAM'
-    AND a.status = 'COMPLETED';
+        Every completed CRAM, web report, AnnotateDataset and es-index analysis,
+        the latest of each is picked out in python rather than with a MAX subquery
+        for each kind of analysis
         """
-        _query_results = await self.connection.fetch_all(
-            _query,
-            {
-                'projects': project_ids,
-                'sequencing_types': sequencing_types,
-            },
-        )
-
-        cram_timestamps_by_project_id_and_seq_fields: dict[
-            ProjectSeqTypeTechnologyKey, dict[SequencingGroupInternalId, AnalysisRow]
-        ] = {}
-        for row in _query_results:
-            key = ProjectSeqTypeTechnologyKey(
-                row['project'],
-                row['sequencing_type'],
-                row['sequencing_technology'],
-            )
-            sg_id = row['sequencing_group_id']
-            cram_row = AnalysisRow(
-                id=row['analysis_id'],
-                output=row['output'],
-                timestamp_completed=row['timestamp_completed'],
-            )
-            if key not in cram_timestamps_by_project_id_and_seq_fields:
-                cram_timestamps_by_project_id_and_seq_fields[key] = {}
-            cram_timestamps_by_project_id_and_seq_fields[key][sg_id] = cram_row
-        return cram_timestamps_by_project_id_and_seq_fields
-
-    async def _latest_annotate_dataset_by_project_id_and_seq_type(
-        self, project_ids: list[ProjectId], sequencing_types: list[str]
-    ) -> dict[ProjectSeqTypeKey, AnalysisRow]:
         _query = """
 SELECT
     a.project,
-    JSON_UNQUOTE(JSON_EXTRACT(a.meta, '$.sequencing_type')) as sequencing_type,
     a.id,
-    a.output,
-    a.timestamp_completed
+    LOWER(a.type) as type,
+    JSON_VALUE(a.meta, '$.sequencing_type') as sequencing_type,
+    JSON_VALUE(a.meta, '$.stage') as stage,
+    COALESCE(a.output, ao.output, of.path) as output,
+    a.timestamp_completed,
+    asg.sequencing_group_id,
+    JSON_EXTRACT(a.meta, '$.outliers_detected') as outliers_detected,
+    JSON_QUERY(a.meta, '$.outlier_loci') as outlier_loci
 FROM analysis a
-INNER JOIN (
-    SELECT
-        project,
-        MAX(timestamp_completed) as max_timestamp,
-        JSON_UNQUOTE(JSON_EXTRACT(meta, '$.sequencing_type')) as sequencing_type
-    FROM analysis
-    WHERE
-        status = 'COMPLETED'
-        AND type = 'CUSTOM'
-        AND JSON_EXTRACT(meta, '$.stage') = 'AnnotateDataset'
-        AND JSON_UNQUOTE(JSON_EXTRACT(meta, '$.sequencing_type')) IN :sequencing_types
-    GROUP BY project, JSON_EXTRACT(meta, '$.sequencing_type')
-) max_timestamps ON a.project = max_timestamps.project
-AND a.timestamp_completed = max_timestamps.max_timestamp
-AND JSON_UNQUOTE(JSON_EXTRACT(a.meta, '$.sequencing_type')) = max_timestamps.sequencing_type
+LEFT JOIN analysis_outputs ao ON a.id = ao.analysis_id
+LEFT JOIN output_file of ON of.id = ao.file_id
+-- AnnotateDataset and es-index analyses contain every sequencing group in the
+-- dataset, so the sequencing groups are only fetched for the latest of those
+LEFT JOIN analysis_sequencing_group asg
+    ON asg.analysis_id = a.id AND a.type IN ('cram', 'web')
 WHERE
-    a.type = 'CUSTOM'
+    a.project IN :projects
     AND a.status = 'COMPLETED'
-    AND a.project IN :projects
-    AND JSON_UNQUOTE(JSON_EXTRACT(a.meta, '$.sequencing_type')) IN :sequencing_types
-    AND JSON_EXTRACT(a.meta, '$.stage') = 'AnnotateDataset';
-    -- JSON_UNQUOTE is necessary to compare JSON values with IN operator
+    AND (
+        a.type IN ('cram', 'es-index')
+        OR (a.type = 'web' AND JSON_VALUE(a.meta, '$.stage') IN :web_report_stages)
+        OR (a.type = 'custom' AND JSON_VALUE(a.meta, '$.stage') = 'AnnotateDataset')
+    );
         """
-        _query_results = await self.connection.fetch_all(
+        return await self.connection.fetch_all(
             _query,
-            {
-                'projects': project_ids,
-                'sequencing_types': sequencing_types,
-            },
+            {'projects': project_ids, 'web_report_stages': list(WEB_REPORT_STAGES)},
         )
-        latest_annotate_dataset_by_project_id_and_seq_type: dict[
-            ProjectSeqTypeKey, AnalysisRow
-        ] = {}
-        for row in _query_results:
-            key = ProjectSeqTypeKey(row['project'], row['sequencing_type'])
-            latest_annotate_dataset_by_project_id_and_seq_type[key] = (
-                self.get_analysis_row(row)
-            )
-        return latest_annotate_dataset_by_project_id_and_seq_type
 
-    async def _latest_es_indices_by_project_id_and_seq_type_and_stage(
-        self, project_ids: list[ProjectId], sequencing_types: list[str]
-    ) -> dict[ProjectSeqTypeStageKey, AnalysisRow]:
-        _query = """
-SELECT
-    a.project,
-    JSON_UNQUOTE(JSON_EXTRACT(a.meta, '$.sequencing_type')) as sequencing_type,
-    a.id,
-    JSON_UNQUOTE(JSON_EXTRACT(a.meta, '$.stage')) as stage,
-    a.output,
-    a.timestamp_completed
-FROM analysis a
-INNER JOIN (
-    SELECT
-        project,
-        MAX(timestamp_completed) as max_timestamp,
-        JSON_UNQUOTE(JSON_EXTRACT(meta, '$.sequencing_type')) as sequencing_type,
-        JSON_UNQUOTE(JSON_EXTRACT(meta, '$.stage')) as stage
-    FROM analysis
-    WHERE type='es-index'
-    AND status='COMPLETED'
-    GROUP BY project, JSON_EXTRACT(meta, '$.sequencing_type'), JSON_EXTRACT(meta, '$.stage')
-) max_timestamps ON a.project = max_timestamps.project
-AND a.timestamp_completed = max_timestamps.max_timestamp
-AND JSON_UNQUOTE(JSON_EXTRACT(a.meta, '$.sequencing_type')) = max_timestamps.sequencing_type
-AND JSON_EXTRACT(a.meta, '$.stage') = max_timestamps.stage
-WHERE
-    a.project IN :projects
-    AND JSON_UNQUOTE(JSON_EXTRACT(a.meta, '$.sequencing_type')) in :sequencing_types;
-        """
-        _query_results = await self.connection.fetch_all(
-            _query,
-            {
-                'projects': project_ids,
-                'sequencing_types': sequencing_types,
-            },
+    async def _load_project_facts(
+        self, project_ids: list[ProjectId]
+    ) -> dict[ProjectId, ProjectInsightsFacts]:
+        """Load the facts for each of the projects from the database"""
+        facts = {
+            project_id: ProjectInsightsFacts(project=project_id)
+            for project_id in project_ids
+        }
+        sequencing_group_rows, external_id_rows, analysis_rows = await asyncio.gather(
+            self._get_sequencing_group_rows(project_ids),
+            self._get_external_id_rows(project_ids),
+            self._get_analysis_rows(project_ids),
         )
-        latest_es_indices_by_project_id_and_seq_type_and_stage: dict[
-            ProjectSeqTypeStageKey, AnalysisRow
-        ] = {}
-        for row in _query_results:
-            key = ProjectSeqTypeStageKey(
-                row['project'], row['sequencing_type'], row['stage']
-            )
-            latest_es_indices_by_project_id_and_seq_type_and_stage[key] = (
-                self.get_analysis_row(row)
-            )
-        return latest_es_indices_by_project_id_and_seq_type_and_stage
 
-    # Project Insights details queries
-    async def _sequencing_group_details_by_project_and_seq_fields(
-        self, project_ids: list[ProjectId], sequencing_types: list[str]
-    ) -> dict[ProjectSeqTypeTechnologyPlatformKey, list[SequencingGroupDetailRow]]:
-        _query = """
-SELECT
-    f.project,
-    sg.type as sequencing_type,
-    sg.platform as sequencing_platform,
-    sg.technology as sequencing_technology,
-    s.type as sample_type,
-    f.id as family_id,
-    fext.external_id as family_external_id,
-    fp.participant_id as participant_id,
-    pext.external_id as participant_external_id,
-    s.id as sample_id,
-    sext.external_id as sample_external_ids,
-    sg.id as sequencing_group_id
-FROM
-    family f
-    LEFT JOIN family_participant fp ON f.id = fp.family_id
-    LEFT JOIN family_external_id fext ON f.id = fext.family_id
-    LEFT JOIN participant_external_id pext ON fp.participant_id = pext.participant_id
-    LEFT JOIN sample s ON fp.participant_id = s.participant_id
-    LEFT JOIN sample_external_id sext ON s.id = sext.sample_id
-    LEFT JOIN sequencing_group sg on sg.sample_id = s.id
-WHERE
-    f.project IN :projects
-    AND sg.type IN :sequencing_types
-ORDER BY
-    f.project,
-    sg.type,
-    sg.platform,
-    sg.technology,
-    s.type,
-    f.id,
-    fp.participant_id,
-    sg.id;
-        """
-        _query_results = await self.connection.fetch_all(
-            _query,
-            {
-                'projects': project_ids,
-                'sequencing_types': sequencing_types,
-            },
-        )
-        sequencing_group_details_by_project_id_and_seq_fields: dict[
-            ProjectSeqTypeTechnologyPlatformKey, list[SequencingGroupDetailRow]
+        sequencing_group_fields: dict[
+            SequencingGroupInternalId, tuple[SequencingType, SequencingTechnology]
         ] = {}
-        for row in _query_results:
-            key = ProjectSeqTypeTechnologyPlatformKey(
-                row['project'],
+        for row in sequencing_group_rows:
+            facts[row['project']].add_sequencing_group(row)
+            sequencing_group_fields[row['sequencing_group_id']] = (
                 row['sequencing_type'],
-                row['sequencing_platform'],
                 row['sequencing_technology'],
             )
-            if key not in sequencing_group_details_by_project_id_and_seq_fields:
-                sequencing_group_details_by_project_id_and_seq_fields[key] = []
-            sequencing_group_details_by_project_id_and_seq_fields[key].append(
-                SequencingGroupDetailRow(
-                    family_id=row['family_id'],
-                    family_external_id=row['family_external_id'],
-                    participant_id=row['participant_id'],
-                    participant_external_id=row['participant_external_id'],
-                    sample_id=row['sample_id'],
-                    sample_external_ids=row['sample_external_ids'],
-                    sample_type=row['sample_type'],
-                    sequencing_group_id=row['sequencing_group_id'],
+
+        for row in external_id_rows:
+            project_facts = facts[row['project']]
+            external_ids = {
+                'family': project_facts.family_external_ids,
+                'participant': project_facts.participant_external_ids,
+                'sample': project_facts.sample_external_ids,
+            }[row['entity']]
+            external_ids.setdefault(row['id'], []).append(row['external_id'])
+
+        for row in analysis_rows:
+            project_facts = facts[row['project']]
+            sg_id = row['sequencing_group_id']
+            analysis_row = self.get_analysis_row(row)
+            if row['type'] == 'web':
+                report_key = ProjectSeqGroupKey(row['project'], sg_id)
+                if row['stage'] == 'Stripy':
+                    current = project_facts.stripy_reports.get(report_key)
+                    if current is None or row['id'] > current.id:
+                        project_facts.stripy_reports[report_key] = StripyReportRow(
+                            id=row['id'],
+                            output=row['output'],
+                            outliers_detected=row['outliers_detected'],
+                            outlier_loci=row['outlier_loci'],
+                            timestamp_completed=row['timestamp_completed'],
+                        )
+                else:
+                    current = project_facts.mito_reports.get(report_key)
+                    if current is None or row['id'] > current.id:
+                        project_facts.mito_reports[report_key] = analysis_row
+                continue
+
+            if not row['timestamp_completed']:
+                # the latest analyses are picked by their completion time
+                continue
+
+            if row['type'] == 'cram':
+                if sg_id not in sequencing_group_fields:
+                    continue
+                cram_key = ProjectSeqTypeTechnologyKey(
+                    row['project'], *sequencing_group_fields[sg_id]
                 )
+                crams = project_facts.crams.setdefault(cram_key, {})
+                if _is_later(analysis_row, crams.get(sg_id)):
+                    crams[sg_id] = analysis_row
+            elif row['type'] == 'custom':
+                annotate_key = ProjectSeqTypeKey(row['project'], row['sequencing_type'])
+                latest = project_facts.latest_annotate_dataset
+                if _is_later(analysis_row, latest.get(annotate_key)):
+                    latest[annotate_key] = analysis_row
+            else:
+                es_index_key = ProjectSeqTypeStageKey(
+                    row['project'], row['sequencing_type'], row['stage']
+                )
+                latest = project_facts.latest_es_indices
+                if _is_later(analysis_row, latest.get(es_index_key)):
+                    latest[es_index_key] = analysis_row
+
+        grouped_analysis_ids = [
+            analysis.id
+            for project_facts in facts.values()
+            for analysis in itertools.chain(
+                project_facts.latest_annotate_dataset.values(),
+                project_facts.latest_es_indices.values(),
             )
+        ]
+        analysis_sequencing_groups = await self._get_sequencing_groups_by_analysis_ids(
+            grouped_analysis_ids
+        )
+        for project_facts in facts.values():
+            for analysis in itertools.chain(
+                project_facts.latest_annotate_dataset.values(),
+                project_facts.latest_es_indices.values(),
+            ):
+                project_facts.analysis_sequencing_groups[analysis.id] = (
+                    analysis_sequencing_groups.get(analysis.id, [])
+                )
 
-        return sequencing_group_details_by_project_id_and_seq_fields
+        return facts
 
-    async def _details_stripy_reports(
+    async def get_project_facts(
         self, project_ids: list[ProjectId]
-    ) -> dict[ProjectSeqGroupKey, StripyReportRow]:
-        """Get stripy web report links"""
-        _query = """
-SELECT
-    a.project,
-    a.id,
-    coalesce(a.output, ao.output, of.path) as output,
-    a.timestamp_completed,
-    asg.sequencing_group_id,
-    JSON_EXTRACT(a.meta, '$.outliers_detected') as outliers_detected,
-    JSON_QUERY(a.meta, '$.outlier_loci') as outlier_loci
-FROM analysis a
-LEFT JOIN analysis_outputs ao on a.id=ao.analysis_id
-LEFT JOIN output_file of on of.id = ao.file_id
-LEFT JOIN analysis_sequencing_group asg on asg.analysis_id=a.id
-INNER JOIN (
-    SELECT
-        asg.sequencing_group_id,
-        MAX(a.id) as max_analysis_id
-    FROM analysis a
-    LEFT JOIN analysis_sequencing_group asg on asg.analysis_id=a.id
-    WHERE type='web'
-    AND status='COMPLETED'
-    AND project IN :projects
-    AND JSON_EXTRACT(meta, '$.stage') = 'Stripy'
-    GROUP BY asg.sequencing_group_id
-) latest_analysis ON a.id = latest_analysis.max_analysis_id;
+    ) -> dict[ProjectId, ProjectInsightsFacts]:
         """
-        _query_results = await self.connection.fetch_all(
-            _query,
-            {
-                'projects': project_ids,
-            },
-        )
-        stripy_reports: dict[ProjectSeqGroupKey, StripyReportRow] = {}
-        for row in _query_results:
-            key = ProjectSeqGroupKey(row['project'], row['sequencing_group_id'])
-            stripy_reports[key] = StripyReportRow(
-                id=row['id'],
-                output=row['output'],
-                outliers_detected=row['outliers_detected'],
-                outlier_loci=row['outlier_loci'],
-                timestamp_completed=row['timestamp_completed'],
-            )
+        Get the facts for each project, from the cache if the project
+        hasn't changed since they were loaded
+        """
+        versions = await self.get_project_versions(project_ids)
 
-        return stripy_reports
+        facts: dict[ProjectId, ProjectInsightsFacts] = {}
+        for project_id in project_ids:
+            version = versions.get(project_id)
+            if version is None:
+                continue
+            cache_key = (version[0], project_id)
+            cached = _PROJECT_INSIGHTS_CACHE.get(cache_key)
+            if cached and cached[0] == version:
+                facts[project_id] = cached[1]
+                _PROJECT_INSIGHTS_CACHE.move_to_end(cache_key)
+
+        missing_ids = [pid for pid in project_ids if pid not in facts]
+        if missing_ids:
+            loaded = await self._load_project_facts(missing_ids)
+            for project_id, project_facts in loaded.items():
+                facts[project_id] = project_facts
+                if version := versions.get(project_id):
+                    _PROJECT_INSIGHTS_CACHE[(version[0], project_id)] = (
+                        version,
+                        project_facts,
+                    )
 
-    async def _details_mito_reports(
-        self, project_ids: list[ProjectId]
-    ) -> dict[ProjectSeqGroupKey, AnalysisRow]:
-        """Get mito web report links"""
-        _query = """
-SELECT
-    a.project,
-    a.id,
-    coalesce(a.output, ao.output, of.path) as output,
-    a.timestamp_completed,
-    asg.sequencing_group_id
-FROM analysis a
-LEFT JOIN analysis_outputs ao on a.id=ao.analysis_id
-LEFT JOIN output_file of on of.id = ao.file_id
-LEFT JOIN analysis_sequencing_group asg on asg.analysis_id=a.id
-INNER JOIN (
-    SELECT
-        asg.sequencing_group_id,
-        MAX(a.id) as max_analysis_id
-    FROM analysis a
-    LEFT JOIN analysis_sequencing_group asg on asg.analysis_id=a.id
-    WHERE type='web'
-    AND status='COMPLETED'
-    AND project IN :projects
-    AND JSON_EXTRACT(meta, '$.stage') = 'MitoReport'
-    GROUP BY asg.sequencing_group_id
-) latest_analysis ON a.id = latest_analysis.max_analysis_id;
-        """
-        _query_results = await self.connection.fetch_all(
-            _query,
-            {
-                'projects': project_ids,
-            },
-        )
-        mito_reports: dict[ProjectSeqGroupKey, AnalysisRow] = {}
-        for row in _query_results:
-            key = ProjectSeqGroupKey(row['project'], row['sequencing_group_id'])
-            mito_reports[key] = self.get_analysis_row(row)
+            while len(_PROJECT_INSIGHTS_CACHE) > PROJECT_INSIGHTS_CACHE_MAX_SIZE:
+                _PROJECT_INSIGHTS_CACHE.popitem(last=False)
 
-        return mito_reports
+        return facts
 
     def get_latest_grouped_analyses(
         self,
@@ -948,216 +873,134 @@ INNER JOIN (
     async def get_project_insights_summary(
         self, project_names: list[str], sequencing_types: list[str]
     ):
-        """Combines the results of the above queries into a response"""
+        """Derives a summary row for each project, sequencing type and technology"""
         projects = self._connection.get_and_check_access_to_projects_for_names(
             project_names=project_names, allowed_roles=ReadAccessRoles
         )
-        project_ids: list[ProjectId] = [project.id for project in projects]
-
-        (
-            total_families_by_project_id_and_seq_fields,
-            total_participants_by_project_id_and_seq_fields,
-            total_samples_by_project_id_and_seq_fields,
-            total_sequencing_groups_by_project_id_and_seq_fields,
-            crams_by_project_id_and_seq_fields,
-            latest_annotate_dataset_by_project_id_and_seq_type,
-            latest_es_indices_by_project_id_and_seq_type_and_stage,  # keyed by (project_id, sequencing_type, stage)
-        ) = await asyncio.gather(
-            self._total_families_by_project_id_and_seq_fields(
-                project_ids, sequencing_types
-            ),
-            self._total_participants_by_project_id_and_seq_fields(
-                project_ids, sequencing_types
-            ),
-            self._total_samples_by_project_id_and_seq_fields(
-                project_ids, sequencing_types
-            ),
-            self._total_sequencing_groups_by_project_id_and_seq_fields(
-                project_ids, sequencing_types
-            ),
-            self._crams_by_project_id_and_seq_fields(project_ids, sequencing_types),
-            self._latest_annotate_dataset_by_project_id_and_seq_type(
-                project_ids, sequencing_types
-            ),
-            self._latest_es_indices_by_project_id_and_seq_type_and_stage(
-                project_ids,
-                sequencing_types,
-            ),
-        )
-
-        # Get the sequencing groups for each of the analyses in the grouped analyses rows
-        analysis_sequencing_groups = await self.get_analysis_sequencing_groups(
-            (
-                list(latest_annotate_dataset_by_project_id_and_seq_type.values())
-                + list(latest_es_indices_by_project_id_and_seq_type_and_stage.values())
-            )
-        )
-
+        if not projects:
+            return []
+        facts_by_project = await self.get_project_facts([p.id for p in projects])
         sequencing_technologies = await SeqTechTable(self._connection).get()
-        # Get all possible combinations of the projects, sequencing types, and sequencing technologies
-        combinations = itertools.product(
-            projects, sequencing_types, sequencing_technologies
-        )
 
         response = []
-        for project, seq_type, seq_tech in combinations:
-            rowkey = ProjectSeqTypeTechnologyKey(project.id, seq_type, seq_tech)
-
-            total_sequencing_groups = (
-                total_sequencing_groups_by_project_id_and_seq_fields.get(rowkey, 0)
-            )
-            if total_sequencing_groups == 0:
-                continue
+        for project in projects:
+            facts = facts_by_project[project.id]
+            totals_by_key = facts.get_totals(sequencing_types)
+            for seq_type, seq_tech in itertools.product(
+                sequencing_types, sequencing_technologies
+            ):
+                rowkey = ProjectSeqTypeTechnologyKey(project.id, seq_type, seq_tech)
+                if not (totals := totals_by_key.get(rowkey)):
+                    continue
 
-            crams_in_project_with_sequencing_fields = (
-                crams_by_project_id_and_seq_fields.get(rowkey, [])
-            )
-            (
-                latest_annotate_dataset_row,
-                latest_snv_es_index_row,
-                latest_sv_es_index_row,
-            ) = self.get_latest_grouped_analyses(
-                project,
-                seq_type,
-                seq_tech,
-                latest_annotate_dataset_by_project_id_and_seq_type,
-                latest_es_indices_by_project_id_and_seq_type_and_stage,
-            )
+                (
+                    latest_annotate_dataset_row,
+                    latest_snv_es_index_row,
+                    latest_sv_es_index_row,
+                ) = self.get_latest_grouped_analyses(
+                    project,
+                    seq_type,
+                    seq_tech,
+                    facts.latest_annotate_dataset,
+                    facts.latest_es_indices,
+                )
 
-            total_families_by_project_id_and_seq_fields.setdefault(rowkey, 0)
-            total_participants_by_project_id_and_seq_fields.setdefault(rowkey, 0)
-            total_samples_by_project_id_and_seq_fields.setdefault(rowkey, 0)
-
-            response.append(
-                self.get_insights_summary_internal_row(
-                    summary_row_key=rowkey,
-                    project=project,
-                    total_families=total_families_by_project_id_and_seq_fields[rowkey],
-                    total_participants=total_participants_by_project_id_and_seq_fields[
-                        rowkey
-                    ],
-                    total_samples=total_samples_by_project_id_and_seq_fields[rowkey],
-                    total_sequencing_groups=total_sequencing_groups,
-                    crams=crams_in_project_with_sequencing_fields,
-                    analysis_sequencing_groups=analysis_sequencing_groups,
-                    latest_annotate_dataset_analysis=latest_annotate_dataset_row,
-                    latest_snv_es_index_analysis=latest_snv_es_index_row,
-                    latest_sv_es_index_analysis=latest_sv_es_index_row,
+                response.append(
+                    self.get_insights_summary_internal_row(
+                        summary_row_key=rowkey,
+                        project=project,
+                        total_families=totals.families,
+                        total_participants=totals.participants,
+                        total_samples=totals.samples,
+                        total_sequencing_groups=totals.sequencing_groups,
+                        crams=list(facts.crams.get(rowkey, {})),
+                        analysis_sequencing_groups=facts.analysis_sequencing_groups,
+                        latest_annotate_dataset_analysis=latest_annotate_dataset_row,
+                        latest_snv_es_index_analysis=latest_snv_es_index_row,
+                        latest_sv_es_index_analysis=latest_sv_es_index_row,
+                    )
                 )
-            )
 
         return response
 
     async def get_project_insights_details(
         self, project_names: list[str], sequencing_types: list[str]
     ):
-        """Combines the results of the queries above into a response"""
+        """Derives a details row for each sequencing group in a family"""
         projects = self._connection.get_and_check_access_to_projects_for_names(
             project_names=project_names, allowed_roles=ReadAccessRoles
         )
-        project_ids: list[ProjectId] = [project.id for project in projects]
-
-        (
-            sequencing_group_details_by_project_id_and_seq_fields,
-            crams_by_project_id_and_seq_fields,
-            latest_annotate_dataset_by_project_id_and_seq_type,
-            latest_es_indices_by_project_id_and_seq_type_and_stage,
-            sequencing_group_stripy_reports,
-            sequencing_group_mito_reports,
-        ) = await asyncio.gather(
-            self._sequencing_group_details_by_project_and_seq_fields(
-                project_ids, sequencing_types
-            ),
-            self._sg_crams_by_project_id_and_seq_fields(project_ids, sequencing_types),
-            self._latest_annotate_dataset_by_project_id_and_seq_type(
-                project_ids, sequencing_types
-            ),
-            self._latest_es_indices_by_project_id_and_seq_type_and_stage(
-                project_ids, sequencing_types
-            ),
-            self._details_stripy_reports(project_ids),
-            self._details_mito_reports(project_ids),
-        )
-        # Get the sequencing groups for each of the analyses in the grouped analyses rows
-        analysis_sequencing_groups = await self.get_analysis_sequencing_groups(
-            (
-                list(latest_annotate_dataset_by_project_id_and_seq_type.values())
-                + list(latest_es_indices_by_project_id_and_seq_type_and_stage.values())
-            )
-        )
-
+        if not projects:
+            return []
+        facts_by_project = await self.get_project_facts([p.id for p in projects])
         sequencing_platforms = await SeqPlatformTable(self._connection).get()
         sequencing_technologies = await SeqTechTable(self._connection).get()
 
-        # Get all possible combinations of the projects, sequencing types, platforms, and technologies
-        combinations = itertools.product(
-            projects, sequencing_types, sequencing_platforms, sequencing_technologies
-        )
-
         response = []
-        for (
-            project,
-            seq_type,
-            seq_platform,
-            seq_tech,
-        ) in combinations:
-            details_rows: list[SequencingGroupDetailRow]
-            if not (
-                details_rows
-                := sequencing_group_details_by_project_id_and_seq_fields.get(
-                    (project.id, seq_type, seq_platform, seq_tech)
-                )
+        for project in projects:
+            facts = facts_by_project[project.id]
+            details_by_key = facts.get_sequencing_group_details(sequencing_types)
+
+            for seq_type, seq_platform, seq_tech in itertools.product(
+                sequencing_types, sequencing_platforms, sequencing_technologies
             ):
-                continue
+                details_rows: list[SequencingGroupDetailRow]
+                if not (
+                    details_rows := details_by_key.get(
+                        ProjectSeqTypeTechnologyPlatformKey(
+                            project=project.id,
+                            sequencing_type=seq_type,
+                            sequencing_technology=seq_tech,
+                            sequencing_platform=seq_platform,
+                        )
+                    )
+                ):
+                    continue
 
-            sequencing_groups_crams: dict[SequencingGroupInternalId, AnalysisRow] = (
-                crams_by_project_id_and_seq_fields.get(
-                    (project.id, seq_type, seq_tech), {}
+                sequencing_groups_crams = facts.crams.get(
+                    ProjectSeqTypeTechnologyKey(project.id, seq_type, seq_tech), {}
+                )
+                (
+                    latest_annotate_dataset_row,
+                    latest_snv_es_index_row,
+                    latest_sv_es_index_row,
+                ) = self.get_latest_grouped_analyses(
+                    project,
+                    seq_type,
+                    seq_tech,
+                    facts.latest_annotate_dataset,
+                    facts.latest_es_indices,
                 )
-            )
-            (
-                latest_annotate_dataset_row,
-                latest_snv_es_index_row,
-                latest_sv_es_index_row,
-            ) = self.get_latest_grouped_analyses(
-                project,
-                seq_type,
-                seq_tech,
-                latest_annotate_dataset_by_project_id_and_seq_type,
-                latest_es_indices_by_project_id_and_seq_type_and_stage,
-            )
 
-            for details_row in details_rows:
-                if not details_row:
-                    continue
-                sg_id = details_row.sequencing_group_id
-                response.append(
-                    self.get_insights_details_internal_row(
-                        project=project,
-                        sequencing_type=seq_type,
-                        sequencing_platform=seq_platform,
-                        sequencing_technology=seq_tech,
-                        sequencing_group_details=details_row,
-                        sequencing_group_cram=sequencing_groups_crams.get(sg_id),
-                        analysis_sequencing_groups=analysis_sequencing_groups,
-                        latest_annotate_dataset_id=(
-                            latest_annotate_dataset_row.id
-                            if latest_annotate_dataset_row
-                            else None
-                        ),
-                        latest_snv_es_index_id=(
-                            latest_snv_es_index_row.id
-                            if latest_snv_es_index_row
-                            else None
-                        ),
-                        latest_sv_es_index_id=(
-                            latest_sv_es_index_row.id
-                            if latest_sv_es_index_row
-                            else None
-                        ),
-                        stripy_reports=sequencing_group_stripy_reports,
-                        mito_reports=sequencing_group_mito_reports,
+                for details_row in details_rows:
+                    sg_id = details_row.sequencing_group_id
+                    response.append(
+                        self.get_insights_details_internal_row(
+                            project=project,
+                            sequencing_type=seq_type,
+                            sequencing_platform=seq_platform,
+                            sequencing_technology=seq_tech,
+                            sequencing_group_details=details_row,
+                            sequencing_group_cram=sequencing_groups_crams.get(sg_id),
+                            analysis_sequencing_groups=facts.analysis_sequencing_groups,
+                            latest_annotate_dataset_id=(
+                                latest_annotate_dataset_row.id
+                                if latest_annotate_dataset_row
+                                else None
+                            ),
+                            latest_snv_es_index_id=(
+                                latest_snv_es_index_row.id
+                                if latest_snv_es_index_row
+                                else None
+                            ),
+                            latest_sv_es_index_id=(
+                                latest_sv_es_index_row.id
+                                if latest_sv_es_index_row
+                                else None
+                            ),
+                            stripy_reports=facts.stripy_reports,
+                            mito_reports=facts.mito_reports,
+                        )
                     )
-                )
 
         return response
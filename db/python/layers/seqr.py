@@ -1,12 +1,16 @@
 # pylint: disable=unnecessary-lambda-assignment,too-many-locals,broad-exception-caught
 
 import asyncio
+import hashlib
+import json
 import os
 import re
+import time
 import traceback
 from collections import defaultdict
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Iterable, Iterator, TypeVar
+from typing import Any, AsyncIterator
 
 import aiohttp
 import slack_sdk
@@ -32,10 +36,12 @@ from db.python.layers.family import FamilyLayer
 from db.python.layers.participant import ParticipantLayer
 from db.python.layers.sequencing_group import SequencingGroupLayer
 from db.python.tables.analysis import AnalysisFilter
-from db.python.tables.project import Project
+from db.python.tables.project import Project, ProjectPermissionsTable
+from db.python.tables.seqr_sync import SeqrPushDigest, SeqrSyncDigestTable
 from models.enums import AnalysisStatus
 from models.enums.web import SeqrDatasetType
 from models.models import PRIMARY_EXTERNAL_ORG
+from models.models.project import FullWriteAccessRoles
 
 # literally the most temporary thing ever, but for complete
 # automation need to have sample inclusion / exclusion
@@ -63,22 +69,186 @@ _url_igv_diff = '/api/project/sa/{projectGuid}/igv/diff'
 _url_igv_individual_update = '/api/individual/sa/{individualGuid}/igv/update'
 _url_families_guid_map = '/api/project/sa/{projectGuid}/families/mapping'
 
-T = TypeVar('T')
+# Requests to seqr are spread over many projects at once, so bound the total number
+# in flight, and size the IGV update batches by how quickly seqr is responding
+SEQR_MAX_CONCURRENT_REQUESTS = 8
+SEQR_MAX_CONCURRENT_PROJECTS = 4
+SEQR_TARGET_LATENCY_SECONDS = 2.0
 
 
-def chunk(iterable: Iterable[T], chunk_size=50) -> Iterator[list[T]]:
+def payload_digest(payload: Any) -> str:
     """
-    Chunk a sequence by yielding lists of `chunk_size`
+    Stable digest of a JSON payload, regardless of key order
+
+    >>> payload_digest({'a': 1, 'b': [1, 2]}) == payload_digest({'b': [1, 2], 'a': 1})
+    True
+    >>> payload_digest({'a': 1}) == payload_digest({'a': 2})
+    False
+    """
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+class SeqrPushState:
+    """
+    Digests of the payloads last pushed to a seqr project (by section), and of
+    the sections pushed during this sync, to be saved once the sync finishes
     """
-    chnk: list[T] = []
-    for element in iterable:
-        chnk.append(element)
-        if len(chnk) >= chunk_size:
-            yield chnk
-            chnk = []
 
-    if chnk:
-        yield chnk
+    def __init__(
+        self,
+        digests: dict[str, SeqrPushDigest] | None = None,
+        skip_unchanged: bool = True,
+    ):
+        self.digests = digests or {}
+        self.skip_unchanged = skip_unchanged
+        self.pushed: dict[str, SeqrPushDigest] = {}
+
+    def is_unchanged(self, section: str, digest: str) -> bool:
+        """Is the section's payload the same as the last one pushed"""
+        if not self.skip_unchanged or section not in self.digests:
+            return False
+        return self.digests[section].digest == digest
+
+    def changed_rows(
+        self, section: str, rows: dict[str, Any]
+    ) -> tuple[dict[str, Any], dict[str, str]]:
+        """
+        Get the (keyed) rows that have changed since the section was last pushed,
+        and the digest of every row
+
+        >>> state = SeqrPushState()
+        >>> changed, row_digests = state.changed_rows('s', {'a': 1, 'b': 2})
+        >>> sorted(changed)
+        ['a', 'b']
+        >>> state.record('s', row_digests=row_digests)
+        >>> changed, _ = state.changed_rows('s', {'a': 1, 'b': 3, 'c': 4})
+        >>> sorted(changed)
+        ['b', 'c']
+        """
+        row_digests = {key: payload_digest(row) for key, row in rows.items()}
+        last = self.digests.get(section)
+        if not self.skip_unchanged or last is None:
+            return rows, row_digests
+        changed = {
+            key: row
+            for key, row in rows.items()
+            if last.row_digests.get(key) != row_digests[key]
+        }
+        return changed, row_digests
+
+    def record(
+        self,
+        section: str,
+        digest: str | None = None,
+        row_digests: dict[str, str] | None = None,
+    ):
+        """Record the section was pushed"""
+        row_digests = row_digests or {}
+        pushed = SeqrPushDigest(
+            digest=digest or payload_digest(row_digests), row_digests=row_digests
+        )
+        self.digests[section] = pushed
+        self.pushed[section] = pushed
+
+
+class AdaptiveChunkSize:
+    """
+    Additive-increase / multiplicative-decrease chunk size, which grows while seqr
+    responds faster than the target latency, and halves when it's slower
+
+    >>> chunk_size = AdaptiveChunkSize(initial=10, target_latency=1.0)
+    >>> chunk_size.observe(0.5), chunk_size.observe(0.5), chunk_size.observe(3.0)
+    (12, 14, 7)
+    """
+
+    def __init__(
+        self,
+        initial: int = 10,
+        minimum: int = 1,
+        maximum: int = 50,
+        increment: int = 2,
+        target_latency: float = SEQR_TARGET_LATENCY_SECONDS,
+    ):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increment = increment
+        self.target_latency = target_latency
+
+    def observe(self, latency: float | None) -> int:
+        """Adjust the chunk size from the latest observed latency"""
+        if latency is None:
+            return self.size
+        if latency > self.target_latency:
+            self.size = max(self.minimum, self.size // 2)
+        else:
+            self.size = min(self.maximum, self.size + self.increment)
+        return self.size
+
+
+class SeqrSession:
+    """
+    Wraps the aiohttp session (and its connection pool) shared by every dataset
+    being synced, limiting the number of requests in flight to seqr, and keeping
+    a moving average of how long seqr takes to respond
+    """
+
+    # weight of the latest request in the moving average
+    LATENCY_SMOOTHING = 0.3
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        max_concurrent_requests: int = SEQR_MAX_CONCURRENT_REQUESTS,
+    ):
+        self.session = session
+        self._semaphore = asyncio.Semaphore(max_concurrent_requests)
+        self.latency: float | None = None
+        self.igv_chunk_size = AdaptiveChunkSize()
+
+    @classmethod
+    @asynccontextmanager
+    async def create(
+        cls, max_concurrent_requests: int = SEQR_MAX_CONCURRENT_REQUESTS
+    ) -> AsyncIterator['SeqrSession']:
+        """Create a session, with a connection pool sized to the request limit"""
+        connector = aiohttp.TCPConnector(limit=max_concurrent_requests)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            yield cls(session, max_concurrent_requests=max_concurrent_requests)
+
+    def _observe_latency(self, latency: float):
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency = (
+                self.LATENCY_SMOOTHING * latency
+                + (1 - self.LATENCY_SMOOTHING) * self.latency
+            )
+
+    async def request(self, method: str, url: str, **kwargs) -> aiohttp.ClientResponse:
+        """
+        Make a request to seqr, the body is read before the request slot is
+        released, so .text() / .json() can still be called on the response
+        """
+        async with self._semaphore:
+            start = time.monotonic()
+            resp = await self.session.request(method, url, **kwargs)
+            try:
+                await resp.read()
+            finally:
+                resp.release()
+            self._observe_latency(time.monotonic() - start)
+        return resp
+
+    async def post(self, url: str, **kwargs) -> aiohttp.ClientResponse:
+        """POST to seqr"""
+        return await self.request('POST', url, **kwargs)
+
+    async def get(self, url: str, **kwargs) -> aiohttp.ClientResponse:
+        """GET from seqr"""
+        return await self.request('GET', url, **kwargs)
 
 
 class SeqrLayer(BaseLayer):
@@ -130,8 +300,16 @@ class SeqrLayer(BaseLayer):
         sync_saved_variants: bool = True,
         sync_cram_map: bool = True,
         post_slack_notification: bool = True,
+        skip_unchanged: bool = True,
+        seqr_session: SeqrSession | None = None,
     ) -> dict[str, list[str]]:
-        """Sync a specific dataset for seqr"""
+        """
+        Sync a specific dataset for seqr. Each section (pedigree, families,
+        individual metadata, ES indices, CRAM map) is only pushed if it's changed
+        since it was last pushed to the seqr project, and where seqr allows, only
+        the changed rows are sent (unless skip_unchanged is False).
+        Pass a seqr_session to share the session (and request limit) between datasets.
+        """
         if not await self.is_seqr_sync_setup():
             raise ValueError('Seqr synchronisation is not configured in metamist')
 
@@ -171,8 +349,14 @@ class SeqrLayer(BaseLayer):
         if not family_ids and not participant_ids:
             raise ValueError('No families / participants to synchronize')
 
+        digest_table = SeqrSyncDigestTable(self.connection)
+        push_state = SeqrPushState(
+            await digest_table.get_digests(project.id, sequencing_type, seqr_guid),
+            skip_unchanged=skip_unchanged,
+        )
+
         messages = []
-        async with aiohttp.ClientSession() as session:
+        async with self._use_seqr_session(seqr_session) as session:
             params = {
                 'headers': {'Authorization': f'Bearer {token}'},
                 'project_guid': seqr_guid,
@@ -185,7 +369,9 @@ class SeqrLayer(BaseLayer):
             if sync_individuals:
                 try:
                     messages.extend(
-                        await self.sync_pedigree(family_ids=family_ids, **params)
+                        await self.sync_pedigree(
+                            family_ids=family_ids, push_state=push_state, **params
+                        )
                     )
                 except Exception as e:
                     _errors = [
@@ -205,12 +391,18 @@ class SeqrLayer(BaseLayer):
                     return {'errors': _errors, 'messages': messages}
 
             if sync_families:
-                promises.append(self.sync_families(family_ids=family_ids, **params))
+                promises.append(
+                    self.sync_families(
+                        family_ids=family_ids, push_state=push_state, **params
+                    )
+                )
 
             if sync_individual_metadata:
                 promises.append(
                     self.sync_individual_metadata(
-                        participant_ids=participant_ids, **params
+                        participant_ids=participant_ids,
+                        push_state=push_state,
+                        **params,
                     )
                 )
             if sync_es_index:
@@ -219,6 +411,7 @@ class SeqrLayer(BaseLayer):
                         sequencing_type=sequencing_type,
                         sequencing_group_ids=sequencing_group_ids,
                         es_index_types=es_index_types,
+                        push_state=push_state,
                         **params,
                     )
                 )
@@ -229,6 +422,7 @@ class SeqrLayer(BaseLayer):
                     self.sync_cram_map(
                         sequencing_type=sequencing_type,
                         participant_ids=participant_ids,
+                        push_state=push_state,
                         **params,
                     )
                 )
@@ -244,6 +438,11 @@ class SeqrLayer(BaseLayer):
                 else:
                     messages.extend(m)
 
+        # only the sections that were pushed successfully are recorded
+        await digest_table.set_digests(
+            project.id, sequencing_type, seqr_guid, push_state.pushed
+        )
+
         _errors = [
             ''.join(traceback.format_exception(type(e), e, e.__traceback__))
             for e in errors
@@ -264,19 +463,113 @@ class SeqrLayer(BaseLayer):
             return {'errors': _errors, 'messages': messages}
         return {'messages': messages}
 
+    async def sync_datasets(
+        self,
+        sequencing_types: list[str],
+        project_names: list[str] | None = None,
+        max_concurrent_projects: int = SEQR_MAX_CONCURRENT_PROJECTS,
+        max_concurrent_requests: int = SEQR_MAX_CONCURRENT_REQUESTS,
+        **sync_kwargs,
+    ) -> list[dict[str, Any]]:
+        """
+        Sync many seqr projects at once (all seqr projects if no project_names are
+        provided), for each sequencing type the project has a seqr project for.
+        The datasets share one seqr session, so the request limit is global.
+        The sync_kwargs are passed through to sync_dataset.
+        """
+        if not await self.is_seqr_sync_setup():
+            raise ValueError('Seqr synchronisation is not configured in metamist')
+
+        if project_names is None:
+            seqr_project_ids = await ProjectPermissionsTable(
+                self.connection
+            ).get_seqr_project_ids()
+            projects = self.connection.get_and_check_access_to_projects_for_ids(
+                seqr_project_ids, allowed_roles=FullWriteAccessRoles
+            )
+        else:
+            projects = self.connection.get_and_check_access_to_projects_for_names(
+                project_names, allowed_roles=FullWriteAccessRoles
+            )
+
+        datasets = [
+            (project, sequencing_type)
+            for project in projects
+            for sequencing_type in sequencing_types
+            if self.get_meta_key_from_sequencing_type(sequencing_type)
+            in (project.meta or {})
+        ]
+        project_semaphore = asyncio.Semaphore(max_concurrent_projects)
+
+        async def _sync(project: Project, sequencing_type: str, session: SeqrSession):
+            async with project_semaphore:
+                project_connection = Connection(
+                    connection=self.connection.connection,
+                    project=project,
+                    project_id_map=self.connection.project_id_map,
+                    project_name_map=self.connection.project_name_map,
+                    author=self.connection.author,
+                    on_behalf_of=self.connection.on_behalf_of,
+                    ar_guid=self.connection.ar_guid,
+                    meta=self.connection.meta,
+                )
+                try:
+                    result = await SeqrLayer(project_connection).sync_dataset(
+                        sequencing_type, seqr_session=session, **sync_kwargs
+                    )
+                except Exception as e:
+                    result = {
+                        'errors': [
+                            ''.join(
+                                traceback.format_exception(type(e), e, e.__traceback__)
+                            )
+                        ],
+                        'messages': [],
+                    }
+            return {
+                'project': project.name,
+                'sequencing_type': sequencing_type,
+                'success': 'errors' not in result,
+                **result,
+            }
+
+        async with SeqrSession.create(
+            max_concurrent_requests=max_concurrent_requests
+        ) as session:
+            return await asyncio.gather(
+                *[
+                    _sync(project, sequencing_type, session)
+                    for project, sequencing_type in datasets
+                ]
+            )
+
+    @staticmethod
+    @asynccontextmanager
+    async def _use_seqr_session(
+        seqr_session: SeqrSession | None,
+    ) -> AsyncIterator[SeqrSession]:
+        """Use the provided seqr session, or create one for this sync"""
+        if seqr_session:
+            yield seqr_session
+            return
+        async with SeqrSession.create() as session:
+            yield session
+
     def generate_seqr_auth_token(self):
         """Generate an OAUTH2 token for talking to seqr"""
         return get_google_identity_token(target_audience=SEQR_AUDIENCE)
 
     async def sync_families(
         self,
-        session: aiohttp.ClientSession,
+        session: SeqrSession,
         project_guid: str,
         headers: dict[str, str],
         family_ids: set[int],
+        push_state: SeqrPushState,
     ) -> list[str]:
         """
-        Synchronise families template from SM -> seqr
+        Synchronise families template from SM -> seqr,
+        only the families that have changed since the last push are sent
         """
 
         fam_rows = await self.flayer.get_families_by_ids(family_ids=list(family_ids))
@@ -294,20 +587,30 @@ class SeqrLayer(BaseLayer):
 
         # 1. Get family data from SM
 
+        changed_families, row_digests = push_state.changed_rows(
+            'families', {f['familyId']: f for f in family_data}
+        )
+        if not changed_families:
+            return [f'Families unchanged since last sync ({len(fam_rows)} families)']
+
         # use a filename ending with .csv to signal to seqr it's comma-delimited
         req_url = SEQR_URL + _url_family_sync.format(projectGuid=project_guid)
         resp_2 = await session.post(
-            req_url, json={'families': family_data}, headers=headers
+            req_url,
+            json={'families': list(changed_families.values())},
+            headers=headers,
         )
         resp_2.raise_for_status()
-        return [f'Synchronised {len(fam_rows)} families']
+        push_state.record('families', row_digests=row_digests)
+        return [f'Synchronised {len(changed_families)} (/{len(fam_rows)}) families']
 
     async def sync_pedigree(
         self,
-        session: aiohttp.ClientSession,
+        session: SeqrSession,
         project_guid,
         headers,
         family_ids: set[int],
+        push_state: SeqrPushState,
     ) -> list[str]:
         """
         Synchronise pedigree from SM -> seqr in 3 steps:
@@ -315,6 +618,9 @@ class SeqrLayer(BaseLayer):
         1. Get pedigree from SM
         2. Upload pedigree to seqr
         3. Confirm the upload
+
+        The pedigree is sent in full (as relationships span rows), but only if
+        it's changed since the last push
         """
 
         # 1. Get pedigree from SM
@@ -322,25 +628,32 @@ class SeqrLayer(BaseLayer):
         if not pedigree_data:
             return ['No pedigree to synchronise']
 
+        digest = payload_digest(pedigree_data)
+        if push_state.is_unchanged('pedigree', digest):
+            return [f'Pedigree unchanged since last sync ({len(pedigree_data)} rows)']
+
         # 2. Upload pedigree to seqr
         req_url = SEQR_URL + _url_individuals_sync.format(projectGuid=project_guid)
         resp = await session.post(
             req_url, json={'individuals': pedigree_data}, headers=headers
         )
         resp.raise_for_status()
+        push_state.record('pedigree', digest)
 
         return [f'Uploaded {len(pedigree_data)} rows of pedigree data']
 
     async def sync_individual_metadata(
         self,
-        session: aiohttp.ClientSession,
+        session: SeqrSession,
         project_guid,
         headers,
         participant_ids: list[int],
+        push_state: SeqrPushState,
     ):
         """
         Sync individual participant metadata (eg: phenotypes)
-        for a dataset into a seqr project
+        for a dataset into a seqr project, only the individuals whose metadata
+        has changed since the last push are sent
         """
 
         processed_records = await self.get_individual_meta_objs_for_seqr(
@@ -350,23 +663,41 @@ class SeqrLayer(BaseLayer):
         if not processed_records:
             return ['No individual metadata to synchronise']
 
+        changed_records, row_digests = push_state.changed_rows(
+            'individual_metadata',
+            {
+                f'{r.get("family_id")}/{r.get("individual_id")}': r
+                for r in processed_records
+            },
+        )
+        if not changed_records:
+            return [
+                'Individual metadata unchanged since last sync '
+                f'({len(processed_records)} individuals)'
+            ]
+
         req_url = SEQR_URL + _url_individual_meta_sync.format(projectGuid=project_guid)
         resp = await session.post(
-            req_url, json={'individuals': processed_records}, headers=headers
+            req_url,
+            json={'individuals': list(changed_records.values())},
+            headers=headers,
         )
         text_response = await resp.text()
         if (
             resp.status == 400
             and 'Unable to find individuals to update' in text_response
         ):
+            push_state.record('individual_metadata', row_digests=row_digests)
             return [
-                f'No individual metadata needed updating (from {len(processed_records)} rows)'
+                f'No individual metadata needed updating (from {len(changed_records)} rows)'
             ]
 
         resp.raise_for_status()
+        push_state.record('individual_metadata', row_digests=row_digests)
 
         return [
-            f'Uploaded individual metadata for {len(processed_records)} individuals'
+            f'Uploaded individual metadata for {len(changed_records)} '
+            f'(/{len(processed_records)}) individuals'
         ]
 
     def check_updated_sequencing_group_ids(
@@ -407,7 +738,7 @@ class SeqrLayer(BaseLayer):
 
     async def post_es_index_update(
         self,
-        session: aiohttp.ClientSession,
+        session: SeqrSession,
         url: str,
         post_json: dict,
         headers: dict[str, str],
@@ -423,14 +754,18 @@ class SeqrLayer(BaseLayer):
 
     async def update_es_index(
         self,
-        session: aiohttp.ClientSession,
+        session: SeqrSession,
         es_index_types: list[SeqrDatasetType],
         sequencing_type: str,
         project_guid,
         headers,
         sequencing_group_ids: set[int],
+        push_state: SeqrPushState,
     ) -> list[str]:
-        """Update seqr samples for latest elastic-search index"""
+        """
+        Update seqr samples for latest elastic-search index, skipping the dataset
+        types whose index and samples haven't changed since the last push
+        """
         assert self.connection.project_id
         eid_to_sgid_rows = await self.player.get_external_participant_id_to_internal_sequencing_group_id_map(
             self.connection.project_id, sequencing_type=sequencing_type
@@ -452,17 +787,6 @@ class SeqrLayer(BaseLayer):
             if not any(sid in s for sid in SEQUENCING_GROUPS_TO_IGNORE)
         ]
 
-        filename = f'{project_guid}_pid_sgid_map_{datetime.now().isoformat()}.tsv'
-        # remove any non-filename compliant filenames
-        filename = re.sub(r'[/\\?%*:|\'<>\x7F\x00-\x1F]', '-', filename)
-
-        fn_path = os.path.join(SEQR_MAP_LOCATION, filename)
-        # pylint: disable=no-member
-
-        # Only need to write this once, as the POST request will ignore extra samples not in each index synced
-        with AnyPath(fn_path).open('w+') as f:  # type: ignore
-            f.write('\n'.join(rows_to_write))
-
         alayer = AnalysisLayer(connection=self.connection)
         es_index_analyses = await alayer.query(
             AnalysisFilter(
@@ -478,7 +802,8 @@ class SeqrLayer(BaseLayer):
             return ['No ES index to synchronise']
 
         messages = []
-        requests = []  # for POST requests to gather
+        # (section, digest, post_json) of the indices to update
+        updates: list[tuple[str, str, dict]] = []
         for es_index_type in es_index_types:
             es_indexes_filtered_by_type: list[AnalysisInternal] = [
                 a
@@ -502,24 +827,65 @@ class SeqrLayer(BaseLayer):
                 )
             )
 
-            req1_url = SEQR_URL + _url_update_es_index.format(projectGuid=project_guid)
-            post_json = {
-                'elasticsearchIndex': es_index,
-                'datasetType': es_index_type.value,
-                'mappingFilePath': fn_path,
-                'ignoreExtraSamplesInCallset': True,
-            }
-            requests.append(
-                self.post_es_index_update(session, req1_url, post_json, headers)
+            section = f'es_index:{es_index_type.value}'
+            digest = payload_digest(
+                {
+                    'elasticsearchIndex': es_index,
+                    'datasetType': es_index_type.value,
+                    'sequencingGroups': sorted(sequencing_group_ids),
+                    'mapping': rows_to_write,
+                }
+            )
+            if push_state.is_unchanged(section, digest):
+                messages.append(
+                    f'ES index {es_index} ({es_index_type.value}) unchanged since last sync'
+                )
+                continue
+
+            updates.append(
+                (
+                    section,
+                    digest,
+                    {
+                        'elasticsearchIndex': es_index,
+                        'datasetType': es_index_type.value,
+                        'ignoreExtraSamplesInCallset': True,
+                    },
+                )
+            )
+
+        if not updates:
+            return messages
+
+        filename = f'{project_guid}_pid_sgid_map_{datetime.now().isoformat()}.tsv'
+        # remove any non-filename compliant filenames
+        filename = re.sub(r'[/\\?%*:|\'<>\x7F\x00-\x1F]', '-', filename)
+
+        fn_path = os.path.join(SEQR_MAP_LOCATION, filename)
+        # pylint: disable=no-member
+
+        # Only need to write this once, as the POST request will ignore extra samples not in each index synced
+        with AnyPath(fn_path).open('w+') as f:  # type: ignore
+            f.write('\n'.join(rows_to_write))
+
+        req1_url = SEQR_URL + _url_update_es_index.format(projectGuid=project_guid)
+
+        async def _post_and_record(section: str, digest: str, post_json: dict):
+            message = await self.post_es_index_update(
+                session, req1_url, {**post_json, 'mappingFilePath': fn_path}, headers
             )
+            push_state.record(section, digest)
+            return message
 
-        messages.extend(await asyncio.gather(*requests))
+        messages.extend(
+            await asyncio.gather(*[_post_and_record(*update) for update in updates])
+        )
         return messages
 
     @on_exception(expo, aiohttp.ClientResponseError, max_tries=3)
     async def update_saved_variants(
         self,
-        session: aiohttp.ClientSession,
+        session: SeqrSession,
         project_guid,
         headers,
     ) -> list[str]:
@@ -534,13 +900,17 @@ class SeqrLayer(BaseLayer):
 
     async def sync_cram_map(
         self,
-        session: aiohttp.ClientSession,
+        session: SeqrSession,
         participant_ids: list[int],
         sequencing_type: str,
         project_guid: str,
         headers,
+        push_state: SeqrPushState,
     ):
-        """Get map of participant EID to cram path"""
+        """
+        Sync the participant's cram paths to seqr, only the participants whose
+        crams have changed since the last push are diffed against seqr
+        """
 
         alayer = AnalysisLayer(self.connection)
 
@@ -574,14 +944,21 @@ class SeqrLayer(BaseLayer):
         if not reads_map:
             return ['No CRAMs to synchronise']
 
+        changed_records, row_digests = push_state.changed_rows(
+            'cram_map', {str(pid): records for pid, records in parsed_records.items()}
+        )
+        if not changed_records:
+            return [f'All CRAMs ({len(reads_map)}) unchanged since last sync']
+
         req_url = SEQR_URL + _url_igv_diff.format(projectGuid=project_guid)
         resp = await session.post(
-            req_url, json={'mapping': parsed_records}, headers=headers
+            req_url, json={'mapping': changed_records}, headers=headers
         )
         resp.raise_for_status()
 
         response = await resp.json()
         if 'updates' not in response:
+            push_state.record('cram_map', row_digests=row_digests)
             return [f'All CRAMs ({len(reads_map)}) are up to date']
 
         async def _make_update_igv_call(update):
@@ -596,13 +973,14 @@ class SeqrLayer(BaseLayer):
             igv_resp.raise_for_status()
             return await igv_resp.text()
 
-        chunk_size = 10
         all_updates = response['updates']
         exceptions: list[tuple[str, Exception]] = []
-        for idx, updates in enumerate(chunk(all_updates, chunk_size=10)):
-            start = idx * chunk_size + 1
+        start = 0
+        while start < len(all_updates):
+            # chunks grow while seqr keeps up, and shrink when it slows down
+            updates = all_updates[start : start + session.igv_chunk_size.size]
             finish = start + len(updates)
-            print(f'Updating CRAMs {start} -> {finish} (/{len(all_updates)})')
+            print(f'Updating CRAMs {start + 1} -> {finish} (/{len(all_updates)})')
 
             responses = await asyncio.gather(
                 *[_make_update_igv_call(update) for update in updates],
@@ -613,11 +991,14 @@ class SeqrLayer(BaseLayer):
                 for update, e in zip(updates, responses)
                 if isinstance(e, Exception)
             )
+            session.igv_chunk_size.observe(session.latency)
+            start = finish
 
         if exceptions:
             ps = '; '.join(f'{sid}: {ex}' for sid, ex in exceptions)
             return [f'Could not update {len(exceptions)} IGV paths: {ps}']
 
+        push_state.record('cram_map', row_digests=row_digests)
         return [f'{len(all_updates)} (/{len(reads_map)}) CRAMs were updated']
 
     async def _get_pedigree_from_sm(self, family_ids: set[int]) -> list[dict] | None:
@@ -343,20 +343,27 @@ class SequencingGroupLayer(BaseLayer):
                 else:
                     to_replace.append(sg)
 
+        if to_insert:
+            new_ids = await self.seqgt.create_sequencing_groups(
+                [
+                    {
+                        'sample_id': sg.sample_id,
+                        'type_': sg.type,
+                        'technology': sg.technology,
+                        'platform': sg.platform,
+                        'meta': sg.meta,
+                        'assay_ids': [a.id for a in sg.assays] if sg.assays else [],
+                    }
+                    for sg in to_insert
+                ],
+                open_transaction=False,
+            )
+            for sg, new_id in zip(to_insert, new_ids):
+                sg.id = new_id
+
         # You can't write to the same connections multiple times in parallel,
         # but we're inside a transaction, so it's not actually committing anything
         # so should be quick to "write" in serial
-        for sg in to_insert:
-            assay_ids = [a.id for a in sg.assays] if sg.assays else []
-            sg.id = await self.seqgt.create_sequencing_group(
-                sample_id=sg.sample_id,
-                type_=sg.type,
-                technology=sg.technology,
-                platform=sg.platform,
-                meta=sg.meta,
-                assay_ids=assay_ids,
-                open_transaction=False,
-            )
 
         for sg in to_update:
             await self.seqgt.update_sequencing_group(
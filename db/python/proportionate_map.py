@@ -0,0 +1,128 @@
+"""
+Vectorised helpers for building the cram size proportionate map.
+
+Rather than re-walking every sequencing group for every day, each sequencing
+group's cram sizes are turned into a step function (a list of size deltas by
+day), the deltas are bucketed onto the output days with an array lookup, summed
+by (project, day) and then cumulatively summed per project.
+"""
+
+import datetime
+from itertools import accumulate
+from typing import Hashable, TypeVar
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+SG = TypeVar('SG', bound=Hashable)
+P = TypeVar('P', bound=Hashable)
+
+
+def cram_size_deltas_for_sg(
+    first_seen: datetime.date, sizes: list[tuple[datetime.date, int]]
+) -> list[tuple[datetime.date, int]]:
+    """
+    Convert the (date, size) crams of a sequencing group (sorted by date) into
+    (date, delta) steps, starting from the date the sequencing group was first seen.
+    A single cram applies from the first day, regardless of its date.
+
+    >>> d = datetime.date
+    >>> cram_size_deltas_for_sg(d(2024, 1, 5), [(d(2024, 1, 1), 10)])
+    [(datetime.date(2024, 1, 5), 10)]
+    >>> cram_size_deltas_for_sg(d(2024, 1, 5), [(d(2024, 1, 1), 10), (d(2024, 1, 9), 15)])
+    [(datetime.date(2024, 1, 5), 10), (datetime.date(2024, 1, 9), 5)]
+    """
+    if len(sizes) == 1:
+        return [(first_seen, sizes[0][1])]
+
+    deltas = []
+    previous_size = 0
+    for date, size in sizes:
+        deltas.append((max(date, first_seen), size - previous_size))
+        previous_size = size
+    return deltas
+
+
+def cumulative_project_sizes_by_day(
+    days: list[datetime.date],
+    sg_first_seen: dict[SG, datetime.date],
+    sizes_by_sg: dict[SG, list[tuple[datetime.date, int]]],
+    sg_to_project: dict[SG, P],
+) -> list[dict[P, int]]:
+    """
+    For each of the (sorted) output days, sum the most appropriate cram size of
+    every sequencing group seen on or before that day, by project.
+
+    Sequencing groups that aren't in sg_to_project, or have no crams are skipped.
+    Projects with no size on a day are omitted from that day.
+    """
+    if not days:
+        return []
+
+    first_ordinal = days[0].toordinal()
+    n_ordinals = days[-1].toordinal() - first_ordinal + 1
+
+    # dense lookup of "index of the first output day on or after this date", which
+    # is the same as a searchsorted, but done as a single array take
+    day_index_for_ordinal = []
+    day_idx = 0
+    for offset in range(n_ordinals):
+        if days[day_idx].toordinal() - first_ordinal < offset:
+            day_idx += 1
+        day_index_for_ordinal.append(day_idx)
+
+    projects: dict[P, int] = {}
+    event_offsets: list[int] = []
+    event_projects: list[int] = []
+    event_deltas: list[int] = []
+    for sg, first_seen in sg_first_seen.items():
+        project = sg_to_project.get(sg)
+        sizes = sizes_by_sg.get(sg)
+        if project is None or not sizes:
+            continue
+        project_idx = projects.setdefault(project, len(projects))
+        for date, delta in cram_size_deltas_for_sg(first_seen, sizes):
+            offset = date.toordinal() - first_ordinal
+            if offset >= n_ordinals or not delta:
+                # after the last day we care about
+                continue
+            event_offsets.append(max(offset, 0))
+            event_projects.append(project_idx)
+            event_deltas.append(delta)
+
+    if not event_deltas:
+        return [{} for _ in days]
+
+    events = pa.table(
+        {
+            'day': pc.take(
+                pa.array(day_index_for_ordinal, type=pa.int32()),
+                pa.array(event_offsets, type=pa.int32()),
+            ),
+            'project': pa.array(event_projects, type=pa.int32()),
+            'delta': pa.array(event_deltas, type=pa.int64()),
+        }
+    )
+    summed = events.group_by(['project', 'day']).aggregate([('delta', 'sum')])
+
+    deltas_by_project = [[0] * len(days) for _ in projects]
+    for project_idx, day, delta in zip(
+        summed['project'].to_pylist(),
+        summed['day'].to_pylist(),
+        summed['delta_sum'].to_pylist(),
+    ):
+        deltas_by_project[project_idx][day] += delta
+
+    sizes_by_project = {
+        project: list(accumulate(deltas_by_project[project_idx]))
+        for project, project_idx in sorted(projects.items(), key=lambda p: p[1])
+    }
+
+    return [
+        {
+            project: sizes[day]
+            for project, sizes in sizes_by_project.items()
+            if sizes[day] > 0
+        }
+        for day in range(len(days))
+    ]
@@ -2,7 +2,7 @@
 import dataclasses
 import datetime
 from collections import defaultdict
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
 
 from db.python.filters import (
     GenericFilter,
@@ -18,6 +18,11 @@ from models.models.audit_log import AuditLogInternal
 from models.models.output_file import OutputFileInternal, RecursiveDict
 from models.models.project import ProjectId
 
+# rows of the seqr cram path map fetched at a time
+CRAM_PATH_MAP_PAGE_SIZE = 10_000
+# meta keys that are extracted into indexed (virtual) columns of analysis
+INDEXED_META_COLUMNS = {'sequencing_type': 'meta_sequencing_type'}
+
 
 @dataclasses.dataclass
 class AnalysisFilter(GenericFilterModel):
@@ -364,6 +369,10 @@ VALUES ({cs_id_keys}) RETURNING id;"""
         if meta:
             for k, v in meta.items():
                 k_replacer = f'meta_{k}'
+                if k in INDEXED_META_COLUMNS and isinstance(v, str):
+                    meta_str += f' AND {INDEXED_META_COLUMNS[k]} = :{k_replacer}'
+                    values[k_replacer] = v
+                    continue
                 meta_str += f" AND json_extract(meta, '$.{k}') = :{k_replacer}"
                 if v is None:
                     # mariadb does a bad cast for NULL
@@ -412,16 +421,18 @@ WHERE a.id = (
         self, analysis_type: str, project: ProjectId
     ) -> list[int]:
         """
-        Find all the samples in the sample_id list that a
+        Find all the sequencing groups in the project that don't have an active
+        analysis of analysis_type
         """
         _query = """
 SELECT sg.id FROM sequencing_group sg
-WHERE s.project = :project AND
-      id NOT IN (
-          SELECT a_sg.sequencing_group_id FROM analysis_sequencing_group a_sg
-          LEFT JOIN analysis a ON a_sg.analysis_id = a.id
-          WHERE a.type = :analysis_type AND a.active
-      )
+INNER JOIN sample s ON sg.sample_id = s.id
+WHERE s.project = :project AND NOT EXISTS (
+    SELECT 1 FROM analysis_sequencing_group a_sg
+    INNER JOIN analysis a ON a_sg.analysis_id = a.id
+    WHERE a_sg.sequencing_group_id = sg.id
+        AND a.type = :analysis_type AND a.active
+)
 ;"""
 
         rows = await self.connection.fetch_all(
@@ -533,10 +544,33 @@ WHERE a.id = :analysis_id
         participant_ids: list[int] = None,
     ) -> List[dict[str, str]]:
         """Get (ext_sample_id, cram_path, internal_id) map"""
+        results: list[dict] = []
+        async for page in self.iterate_sample_cram_path_map_for_seqr(
+            project=project,
+            sequencing_types=sequencing_types,
+            participant_ids=participant_ids,
+        ):
+            results.extend(page)
+        return results
+
+    async def iterate_sample_cram_path_map_for_seqr(
+        self,
+        project: ProjectId,
+        sequencing_types: list[str],
+        participant_ids: list[int] = None,
+        page_size: int = CRAM_PATH_MAP_PAGE_SIZE,
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """
+        Get (ext_sample_id, cram_path, internal_id) map, most recently completed
+        first, in pages of page_size rows. Each page is fetched by continuing
+        from the (timestamp_completed, analysis_id, sequencing_group_id) of the
+        last row of the previous page, so only one page is held in memory.
+        """
 
         values: dict[str, Any] = {
             'project': project,
             'PRIMARY_EXTERNAL_ORG': PRIMARY_EXTERNAL_ORG,
+            'limit': page_size,
         }
         filters = [
             'a.active',
@@ -559,40 +593,72 @@ WHERE a.id = :analysis_id
             filters.append('peid.participant_id IN :pids')
             values['pids'] = list(participant_ids)
 
-        _query = f"""
-SELECT a.id, peid.external_id as participant_id, a.output as output, sg.id as sequencing_group_id
+        # timestamp_completed is sorted descending, with NULLs last
+        after_row = """(
+        a.id < :last_id OR (a.id = :last_id AND sg.id < :last_sg_id)
+    )"""
+        after_timestamp = f"""(
+        a.timestamp_completed < :last_timestamp
+        OR a.timestamp_completed IS NULL
+        OR (a.timestamp_completed = :last_timestamp AND {after_row})
+    )"""
+        after_null_timestamp = f'(a.timestamp_completed IS NULL AND {after_row})'
+
+        last_row: dict[str, Any] | None = None
+        while True:
+            page_filters = list(filters)
+            if last_row:
+                values['last_id'] = last_row['id']
+                values['last_sg_id'] = last_row['sequencing_group_id']
+                if last_row['timestamp_completed'] is None:
+                    page_filters.append(after_null_timestamp)
+                    values.pop('last_timestamp', None)
+                else:
+                    page_filters.append(after_timestamp)
+                    values['last_timestamp'] = last_row['timestamp_completed']
+
+            _query = f"""
+SELECT
+    a.id, a.timestamp_completed, peid.external_id as participant_id,
+    a.output as output, sg.id as sequencing_group_id
 FROM analysis a
 INNER JOIN analysis_sequencing_group a_sg ON a_sg.analysis_id = a.id
 INNER JOIN sequencing_group sg ON a_sg.sequencing_group_id = sg.id
 INNER JOIN sample s ON sg.sample_id = s.id
 INNER JOIN participant_external_id peid ON s.participant_id = peid.participant_id
 WHERE
-    {' AND '.join(filters)}
-ORDER BY a.timestamp_completed DESC;
+    {' AND '.join(page_filters)}
+ORDER BY a.timestamp_completed DESC, a.id DESC, sg.id DESC
+LIMIT :limit
 """
 
-        rows = await self.connection.fetch_all(_query, values)
-        results: list[dict] = []
-        if not rows:
-            return results
+            rows = await self.connection.fetch_all(_query, values)
+            if not rows:
+                return
+            last_row = dict(rows[-1])
 
-        analysis_outputs_by_aid = await self.get_file_outputs_by_analysis_ids(
-            [r['id'] for r in rows]
-        )
-        for row in rows:
-            analysis_data = dict(row)
-            analysis_output_for_id = analysis_outputs_by_aid.get(
-                analysis_data['id'], None
+            analysis_outputs_by_aid = await self.get_file_outputs_by_analysis_ids(
+                list({r['id'] for r in rows})
             )
+            results: list[dict] = []
+            for row in rows:
+                analysis_data = dict(row)
+                analysis_output_for_id = analysis_outputs_by_aid.get(
+                    analysis_data['id'], None
+                )
 
-            if analysis_output_for_id:
-                analysis_data['output'] = analysis_output_for_id.get('output', None)
-                analysis_data['outputs'] = analysis_output_for_id.get('outputs', {})
+                if analysis_output_for_id:
+                    analysis_data['output'] = analysis_output_for_id.get('output', None)
+                    analysis_data['outputs'] = analysis_output_for_id.get('outputs', {})
 
-            analysis_data.pop('id')
-            results.append(analysis_data)
-        # many per analysis
-        return results
+                analysis_data.pop('id')
+                analysis_data.pop('timestamp_completed')
+                results.append(analysis_data)
+            # many per analysis
+            yield results
+
+            if len(rows) < page_size:
+                return
 
     # region STATS
 
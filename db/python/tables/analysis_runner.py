@@ -18,6 +18,7 @@ class AnalysisRunnerFilter(GenericFilterModel):
     repository: GenericFilter[str] | None = None
     access_level: GenericFilter[str] | None = None
     environment: GenericFilter[str] | None = None
+    timestamp: GenericFilter[datetime.datetime] | None = None
 
 
 class AnalysisRunnerTable(DbBase):
@@ -27,22 +28,61 @@ class AnalysisRunnerTable(DbBase):
 
     table_name = 'analysis_runner'
 
+    # environment, config_path and meta can be large, so are only fetched if asked for
+    LIGHT_COLUMNS = """
+    project, ar_guid, timestamp, access_level, repository, commit, script,
+    description, driver_image, NULL AS config_path, cwd, NULL AS environment,
+    hail_version, batch_url, submitting_user, NULL AS meta, output_path, audit_log_id
+"""
+    ALL_COLUMNS = """
+    project, ar_guid, timestamp, access_level, repository, commit, script,
+    description, driver_image, config_path, cwd, environment,
+    hail_version, batch_url, submitting_user, meta, output_path, audit_log_id
+"""
+
     async def query(
-        self, filter_: AnalysisRunnerFilter
+        self,
+        filter_: AnalysisRunnerFilter,
+        limit: int | None = None,
+        after: str | None = None,
+        include_heavy_fields: bool = True,
     ) -> list[AnalysisRunnerInternal]:
         """
-        Get analysis runner logs
+        Get analysis runner logs, most recently submitted first. Pages of logs
+        are requested with a limit, and the cursor of the last log of the
+        previous page as "after".
         """
 
         where_str, values = filter_.to_sql()
 
+        if after:
+            after_timestamp, after_ar_guid = AnalysisRunnerInternal.parse_cursor(after)
+            values['after_ar_guid'] = after_ar_guid
+            if after_timestamp is None:
+                # logs without a timestamp are sorted last
+                where_str += ' AND timestamp IS NULL AND ar_guid < :after_ar_guid'
+            else:
+                values['after_timestamp'] = after_timestamp
+                where_str += """ AND (
+        timestamp < :after_timestamp
+        OR timestamp IS NULL
+        OR (timestamp = :after_timestamp AND ar_guid < :after_ar_guid)
+    )"""
+
+        limit_str = ''
+        if limit is not None:
+            if limit < 1:
+                raise ValueError(f'Limit must be positive, got {limit}')
+            limit_str = 'LIMIT :limit'
+            values['limit'] = limit
+
+        columns = self.ALL_COLUMNS if include_heavy_fields else self.LIGHT_COLUMNS
         _query = f"""
-SELECT
-    project, ar_guid, timestamp, access_level, repository, commit, script,
-    description, driver_image, config_path, cwd, environment,
-    hail_version, batch_url, submitting_user, meta, output_path, audit_log_id
+SELECT {columns}
 FROM analysis_runner
 WHERE {where_str}
+ORDER BY timestamp DESC, ar_guid DESC
+{limit_str}
     """
         rows = await self.connection.fetch_all(_query, values)
         return [AnalysisRunnerInternal.from_db(**dict(row)) for row in rows]
@@ -1,11 +1,55 @@
 from collections import defaultdict
+from typing import Any, Iterable, Sequence
 
 import databases
+from databases.interfaces import Record
 
 from db.python.connect import Connection
-from db.python.utils import InternalError
+from db.python.utils import InternalError, chunk
 from models.models.audit_log import AuditLogInternal
 
+# number of rows to write per multi-row INSERT statement
+CREATE_MANY_CHUNK_SIZE = 1000
+
+
+async def insert_many(
+    connection: databases.Database,
+    table: str,
+    columns: list[str],
+    rows: Iterable[Sequence[Any]],
+    suffix: str = '',
+    returning: str | None = None,
+    chunk_size: int = CREATE_MANY_CHUNK_SIZE,
+) -> list[Record]:
+    """
+    Insert rows (of values in the order of columns) with multi-row INSERTs of
+    chunk_size rows each. The suffix (eg: an ON DUPLICATE KEY UPDATE clause) is
+    added to each statement. If returning is set (eg: 'id'), the RETURNING rows
+    are returned, which MariaDB returns in the order of the inserted rows.
+    """
+    columns_str = ', '.join(f'`{c}`' for c in columns)
+    returning_str = f'RETURNING {returning}' if returning else ''
+    returned: list[Record] = []
+    for rows_chunk in chunk(rows, chunk_size=chunk_size):
+        values: dict[str, Any] = {}
+        placeholders = []
+        for idx, row in enumerate(rows_chunk):
+            keys = [f'v{idx}_{cidx}' for cidx in range(len(columns))]
+            placeholders.append('(' + ', '.join(f':{k}' for k in keys) + ')')
+            values.update(zip(keys, row))
+
+        _query = f"""
+        INSERT INTO `{table}` ({columns_str})
+        VALUES {', '.join(placeholders)}
+        {suffix} {returning_str}
+        """
+        if returning:
+            returned.extend(await connection.fetch_all(_query, values))
+        else:
+            await connection.execute(_query, values)
+
+    return returned
+
 
 class DbBase:
     """Base class for table subclasses"""
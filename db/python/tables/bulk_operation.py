@@ -0,0 +1,258 @@
+import asyncio
+import dataclasses
+import datetime
+import logging
+from enum import Enum
+from typing import Any, Coroutine, NamedTuple
+
+from db.python.connect import TABLES_ORDERED_BY_FK_DEPS
+from db.python.tables.base import DbBase
+from db.python.utils import NotFoundError, from_db_json, to_db_json
+from models.models.project import ProjectId
+
+# rows written per batch, each batch is its own (short) transaction
+BULK_OPERATION_BATCH_SIZE = 1000
+
+# operations running in this process, by ID, so they're only run once at a time
+_RUNNING_OPERATIONS: dict[int, asyncio.Task] = {}
+
+
+class BulkOperationStatus(str, Enum):
+    """Status of a bulk operation"""
+
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+
+@dataclasses.dataclass
+class BulkOperation:
+    """Progress of a long running, batched operation"""
+
+    id: int
+    kind: str
+    project: ProjectId
+    status: BulkOperationStatus
+    author: str
+    target: dict[str, Any] = dataclasses.field(default_factory=dict)
+    step: str | None = None
+    # rows written by each step
+    progress: dict[str, int] = dataclasses.field(default_factory=dict)
+    error: str | None = None
+    created_at: datetime.datetime | None = None
+    updated_at: datetime.datetime | None = None
+
+    @staticmethod
+    def from_db(d: dict):
+        """Create from a database row"""
+        return BulkOperation(
+            id=d['id'],
+            kind=d['kind'],
+            project=d['project'],
+            status=BulkOperationStatus(d['status']),
+            author=d['author'],
+            target=from_db_json(d['target']) or {},
+            step=d['step'],
+            progress=from_db_json(d['progress']) or {},
+            error=d['error'],
+            created_at=d['created_at'],
+            updated_at=d['updated_at'],
+        )
+
+
+class BatchedStatement(NamedTuple):
+    """
+    A DELETE / UPDATE of a single table that ends in LIMIT :batch_size, it's run
+    repeatedly until it stops matching rows. cascades_to are the tables whose rows
+    are deleted by a cascading foreign key, so must still exist when this runs.
+    """
+
+    table: str
+    query: str
+    cascades_to: tuple[str, ...] = ()
+    # identifies the step when the same table is written by multiple statements
+    name: str | None = None
+
+    @property
+    def step(self) -> str:
+        """Name of the step in the operation's progress"""
+        return self.name or self.table
+
+
+def order_by_fk_deps(statements: list[BatchedStatement]) -> list[BatchedStatement]:
+    """
+    Order the statements so rows are deleted before the rows they reference,
+    using TABLES_ORDERED_BY_FK_DEPS. Statements that cascade run before the tables
+    they cascade to, and ties keep their given order.
+
+    >>> q = 'DELETE ... LIMIT :batch_size'
+    >>> [s.step for s in order_by_fk_deps([
+    ...     BatchedStatement('sample', q),
+    ...     BatchedStatement('assay', q),
+    ...     BatchedStatement('output_file', q, cascades_to=('analysis_outputs',)),
+    ...     BatchedStatement('analysis_outputs', q),
+    ... ])]
+    ['output_file', 'analysis_outputs', 'assay', 'sample']
+    """
+    position = {table: idx for idx, table in enumerate(TABLES_ORDERED_BY_FK_DEPS)}
+    return sorted(
+        statements,
+        key=lambda s: min(position[t] for t in (s.table, *s.cascades_to)),
+    )
+
+
+def run_in_background(
+    operation: BulkOperation, coroutine: Coroutine[Any, Any, Any]
+) -> asyncio.Task:
+    """
+    Run the operation in a task that isn't cancelled if the request that started
+    it goes away. If the operation is already running, the coroutine is discarded
+    and the running task is returned.
+    """
+    if task := _RUNNING_OPERATIONS.get(operation.id):
+        coroutine.close()
+        return task
+
+    async def _run():
+        try:
+            return await coroutine
+        except Exception:
+            logging.exception(
+                f'Bulk operation {operation.id} ({operation.kind}) failed'
+            )
+            raise
+        finally:
+            _RUNNING_OPERATIONS.pop(operation.id, None)
+
+    task = asyncio.create_task(_run())
+    # the exception is logged above, don't warn if no request awaits it
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    _RUNNING_OPERATIONS[operation.id] = task
+    return task
+
+
+class BulkOperationTable(DbBase):
+    """
+    Progress of long running operations, which are written in bounded batches
+    (each in a short transaction) so they don't hold locks for long, and can be
+    resumed if they're interrupted.
+    """
+
+    table_name = 'bulk_operation'
+
+    async def get_operation(self, operation_id: int) -> BulkOperation:
+        """Get an operation by ID"""
+        row = await self.connection.fetch_one(
+            'SELECT * FROM bulk_operation WHERE id = :id', {'id': operation_id}
+        )
+        if not row:
+            raise NotFoundError(f'Bulk operation {operation_id} does not exist')
+        return BulkOperation.from_db(dict(row))
+
+    async def get_or_create_operation(
+        self, kind: str, project: ProjectId, target: dict[str, Any] | None = None
+    ) -> BulkOperation:
+        """
+        Get the unfinished operation for the (kind, project, target) to resume it,
+        or create a new one
+        """
+        target = target or {}
+        rows = await self.connection.fetch_all(
+            """
+            SELECT * FROM bulk_operation
+            WHERE project = :project AND kind = :kind AND status != :completed
+            ORDER BY id DESC
+            """,
+            {
+                'project': project,
+                'kind': kind,
+                'completed': BulkOperationStatus.COMPLETED.value,
+            },
+        )
+        for row in rows:
+            operation = BulkOperation.from_db(dict(row))
+            if operation.target == target:
+                if operation.status == BulkOperationStatus.FAILED:
+                    await self.set_status(operation, BulkOperationStatus.RUNNING)
+                return operation
+
+        operation_id = await self.connection.fetch_val(
+            """
+            INSERT INTO bulk_operation (kind, project, target, status, progress, author)
+            VALUES (:kind, :project, :target, :status, :progress, :author)
+            RETURNING id
+            """,
+            {
+                'kind': kind,
+                'project': project,
+                'target': to_db_json(target),
+                'status': BulkOperationStatus.RUNNING.value,
+                'progress': to_db_json({}),
+                'author': self.author,
+            },
+        )
+        return await self.get_operation(operation_id)
+
+    async def set_progress(self, operation: BulkOperation):
+        """Save the operation's current step and progress"""
+        await self.connection.execute(
+            """
+            UPDATE bulk_operation
+            SET step = :step, progress = :progress, updated_at = CURRENT_TIMESTAMP
+            WHERE id = :id
+            """,
+            {
+                'id': operation.id,
+                'step': operation.step,
+                'progress': to_db_json(operation.progress),
+            },
+        )
+
+    async def set_status(
+        self,
+        operation: BulkOperation,
+        status: BulkOperationStatus,
+        error: str | None = None,
+    ):
+        """Mark the operation as running / completed / failed"""
+        operation.status = status
+        operation.error = error
+        await self.connection.execute(
+            """
+            UPDATE bulk_operation
+            SET status = :status, error = :error, updated_at = CURRENT_TIMESTAMP
+            WHERE id = :id
+            """,
+            {'id': operation.id, 'status': status.value, 'error': error},
+        )
+
+    async def run_batched(
+        self,
+        operation: BulkOperation,
+        statements: list[BatchedStatement],
+        values: dict[str, Any],
+        batch_size: int = BULK_OPERATION_BATCH_SIZE,
+    ) -> BulkOperation:
+        """
+        Run each statement in batches of batch_size rows until it stops matching
+        rows, saving the progress after each batch. Statements only match the
+        rows left to write, so an interrupted operation resumes by running again.
+        """
+        for statement in statements:
+            operation.step = statement.step
+            while True:
+                async with self.connection.transaction():
+                    await self.connection.execute(
+                        statement.query, {**values, 'batch_size': batch_size}
+                    )
+                    n_rows = await self.connection.fetch_val('SELECT ROW_COUNT()')
+                    if n_rows:
+                        operation.progress[statement.step] = (
+                            operation.progress.get(statement.step, 0) + n_rows
+                        )
+                    await self.set_progress(operation)
+
+                if n_rows < batch_size:
+                    break
+
+        return operation
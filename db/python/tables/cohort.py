@@ -1,6 +1,7 @@
 # pylint: disable=too-many-instance-attributes
 import dataclasses
 import datetime
+from collections import defaultdict
 from typing import Any
 
 from db.python.filters import GenericFilter, GenericFilterModel
@@ -125,12 +126,29 @@ class CohortTable(DbBase):
         """
         Return all sequencing group IDs for the given cohort.
         """
+        sg_ids = await self.get_cohort_sequencing_group_ids_by_cohort_ids([cohort_id])
+        return sg_ids.get(cohort_id, [])
+
+    async def get_cohort_sequencing_group_ids_by_cohort_ids(
+        self, cohort_ids: list[int]
+    ) -> dict[int, list[int]]:
+        """
+        Return the sequencing group IDs of each of the cohorts (in one query)
+        """
+        if not cohort_ids:
+            return {}
 
         _query = """
-        SELECT sequencing_group_id FROM cohort_sequencing_group WHERE cohort_id = :cohort_id
+        SELECT cohort_id, sequencing_group_id
+        FROM cohort_sequencing_group
+        WHERE cohort_id IN :cohort_ids
+        ORDER BY cohort_id, sequencing_group_id
         """
-        rows = await self.connection.fetch_all(_query, {'cohort_id': cohort_id})
-        return [row['sequencing_group_id'] for row in rows]
+        rows = await self.connection.fetch_all(_query, {'cohort_ids': cohort_ids})
+        sg_ids_by_cohort: dict[int, list[int]] = defaultdict(list)
+        for row in rows:
+            sg_ids_by_cohort[row['cohort_id']].append(row['sequencing_group_id'])
+        return dict(sg_ids_by_cohort)
 
     async def query_cohort_templates(
         self, filter_: CohortTemplateFilter
@@ -168,6 +186,31 @@ class CohortTable(DbBase):
 
         return cohort_template
 
+    async def get_cohort_templates_by_cohort_ids(
+        self, cohort_ids: list[int]
+    ) -> dict[int, CohortTemplateInternal]:
+        """
+        Get the template of each of the cohorts (in one query), cohorts without a
+        template are omitted
+        """
+        if not cohort_ids:
+            return {}
+
+        template_keys_str = ','.join(f'ct.{k}' for k in self.template_keys)
+        _query = f"""
+        SELECT c.id as cohort_id, {template_keys_str}
+        FROM cohort c
+        INNER JOIN cohort_template ct ON ct.id = c.template_id
+        WHERE c.id IN :cohort_ids
+        """
+        rows = await self.connection.fetch_all(_query, {'cohort_ids': cohort_ids})
+        templates: dict[int, CohortTemplateInternal] = {}
+        for row in rows:
+            row_dict = dict(row)
+            cohort_id = row_dict.pop('cohort_id')
+            templates[cohort_id] = CohortTemplateInternal.from_db(row_dict)
+        return templates
+
     async def create_cohort_template(
         self,
         name: str,
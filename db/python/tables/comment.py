@@ -1,14 +1,19 @@
+import time
+from collections import OrderedDict
 from itertools import groupby
 
+from api.utils import group_by
 from db.python.tables.base import DbBase
 from db.python.utils import InternalError, NotFoundError
 from models.models.comment import (
     CommentEntityType,
     CommentInternal,
     CommentStatus,
+    CommentVersionInternal,
     DiscussionInternal,
 )
 
+
 # These comment queries look a bit scary but aren't actually too bad
 #
 # As a bit of background – because metamist has a very relational structure with
@@ -271,22 +276,52 @@ comment_queries: dict[CommentEntityType, dict[CommentEntityType, str]] = {
 }
 
 
+# Assembled discussions, keyed by (entity_type, entity_id). Each entry records the
+# comment version it was assembled at, see `CommentTable.get_comments_version`
+DISCUSSION_CACHE_MAX_SIZE = 10_000
+# Related comments depend on the relationships between entities (eg: which
+# participant a sample belongs to), which aren't part of the comment version, so
+# limit how long a discussion can be cached for
+DISCUSSION_CACHE_TTL_SECONDS = 300
+
+_DISCUSSION_CACHE: OrderedDict[
+    tuple[CommentEntityType, int], tuple[tuple, float, DiscussionInternal | None]
+] = OrderedDict()
+
+
+def invalidate_discussion_cache():
+    """Drop all cached discussions, called whenever a comment is written"""
+    _DISCUSSION_CACHE.clear()
+
+
 class CommentTable(DbBase):
     """
     Comment table operations and queries
     """
 
-    async def get_comments_for_entity_ids(
+    async def get_comments_version(self) -> tuple:
+        """
+        Cheap token that changes whenever a comment is added or updated, as every
+        write to the comment table sets a new audit_log_id. Includes the database
+        name, as the cache is shared by every connection in the process.
+        """
+        row = await self.connection.fetch_one(
+            'SELECT DATABASE() AS db, MAX(audit_log_id) AS audit_log_id FROM comment'
+        )
+        assert row
+        return tuple(row.values())
+
+    async def _get_comment_links(
         self,
         entity: CommentEntityType,
         entity_ids: list[int],
-        include_related_comments: bool = True,
-        comment_id: int | None = None,
-    ):
+        include_related_comments: bool,
+    ) -> list[dict]:
         """
-        Get all the comments for a list of entities, will return flat list of comments
+        Get the top level comments attached to (or related to) the requested
+        entities, as (requested_entity_id, comment_id, comment_entity_type,
+        comment_entity_id) rows
         """
-
         queries_for_entity = comment_queries.get(entity, None)
         if queries_for_entity is None:
             raise InternalError(f'Unknown comment entity {entity}')
@@ -319,75 +354,189 @@ class CommentTable(DbBase):
             ),
             top_level_comment_list AS (
                 {combined_comment_query}
-            ) SELECT
-                c.id as comment_id,
-                c.parent_id,
-                c.content,
-                c.status,
-                tc.requested_entity_id,
-                tc.comment_entity_type,
-                tc.comment_entity_id,
-                al.timestamp,
-                al.author
-			FROM comment FOR SYSTEM_TIME ALL AS c
-            JOIN top_level_comment_list tc
-            ON c.id = tc.comment_id OR c.parent_id = tc.comment_id
+            )
+            SELECT * FROM top_level_comment_list
+            ORDER BY requested_entity_id, comment_id
+        """
+        rows = await self.connection.fetch_all(query, {'entity_ids': entity_ids})
+        return [dict(r) for r in rows]
+
+    async def _get_current_comments(self, comment_ids: list[int]) -> list[dict]:
+        """
+        Get the current version of the top level comments and their threads. The
+        history is only consulted (by primary key) for when each comment was created
+        """
+        if not comment_ids:
+            return []
+
+        # two separate lookups, rather than `id = x OR parent_id = x`, so that both
+        # the primary key and the parent_id index can be used
+        query = """
+            WITH current_comment AS (
+                SELECT id, parent_id, content, status, audit_log_id
+                FROM comment
+                WHERE id IN :comment_ids
+                UNION ALL
+                SELECT id, parent_id, content, status, audit_log_id
+                FROM comment
+                WHERE parent_id IN :comment_ids
+            ),
+            first_version AS (
+                SELECT id, MIN(audit_log_id) AS audit_log_id
+                FROM comment FOR SYSTEM_TIME ALL
+                WHERE id IN (SELECT id FROM current_comment)
+                GROUP BY id
+            )
+            SELECT
+                cc.id,
+                cc.parent_id,
+                cc.content,
+                cc.status,
+                created.author,
+                created.timestamp AS created_at,
+                updated.timestamp AS updated_at
+            FROM current_comment cc
+            LEFT JOIN first_version fv ON fv.id = cc.id
+            LEFT JOIN audit_log created ON created.id = fv.audit_log_id
+            LEFT JOIN audit_log updated ON updated.id = cc.audit_log_id
+            ORDER BY cc.id
+        """
+        rows = await self.connection.fetch_all(query, {'comment_ids': comment_ids})
+        return [dict(r) for r in rows]
+
+    async def get_versions_for_comment_ids(
+        self, comment_ids: list[int]
+    ) -> dict[int, list[CommentVersionInternal]]:
+        """
+        Get the previous versions of each comment (excluding the current version)
+        """
+        if not comment_ids:
+            return {}
+
+        query = """
+            SELECT c.id, c.content, c.status, al.timestamp, al.author
+            FROM comment FOR SYSTEM_TIME ALL AS c
             LEFT JOIN audit_log al
             ON al.id = c.audit_log_id
-            {'WHERE c.id = :comment_id or c.parent_id = :comment_id'  if comment_id else ''}
+            WHERE c.id IN :comment_ids
             ORDER BY c.id, al.timestamp
         """
-        values: dict['str', int | list[int]] = {'entity_ids': entity_ids}
+        rows = await self.connection.fetch_all(query, {'comment_ids': comment_ids})
 
-        if comment_id:
-            values['comment_id'] = comment_id
+        return {
+            cid: CommentInternal.history_from_db_versions([dict(v) for v in g])
+            for cid, g in groupby(rows, key=lambda k: k['id'])
+        }
 
-        comment_versions = await self.connection.fetch_all(query, values)
+    async def get_comments_for_entity_ids(
+        self,
+        entity: CommentEntityType,
+        entity_ids: list[int],
+        include_related_comments: bool = True,
+        include_history: bool = False,
+    ) -> list[CommentInternal]:
+        """
+        Get all the top level comments for a list of entities, with their threads.
+        A comment related to multiple requested entities is returned once for each.
+        The version history of each comment is only loaded if include_history is set.
+        """
+        links = await self._get_comment_links(
+            entity=entity,
+            entity_ids=entity_ids,
+            include_related_comments=include_related_comments,
+        )
+        # the UNION can match the same comment on the same entity through
+        # different relationships, so deduplicate
+        links = list(
+            {(r['requested_entity_id'], r['comment_id']): r for r in links}.values()
+        )
 
-        # Group comments by their ids so that versions get included within a comment
-        comment_map: dict[int, CommentInternal] = {
-            id: CommentInternal.from_db_versions(list(dict(v) for v in g))
-            for id, g in groupby(comment_versions, key=lambda k: k['comment_id'])
-        }
+        current_rows = await self._get_current_comments(
+            sorted({r['comment_id'] for r in links})
+        )
+        rows_by_id = {r['id']: r for r in current_rows}
+        thread_rows = group_by(
+            (r for r in current_rows if r['parent_id'] is not None),
+            lambda r: r['parent_id'],
+        )
 
-        # Organize threaded comments under their parents
-        for _, comment in comment_map.items():
-            if comment.parent_id is not None:
-                parent = comment_map.get(comment.parent_id, None)
-                if parent is not None:
-                    parent.add_comment_to_thread(comment)
+        versions: dict[int, list[CommentVersionInternal]] | None = None
+        if include_history:
+            versions = await self.get_versions_for_comment_ids(list(rows_by_id))
 
-        return comment_map
+        def _comment(row: dict, link: dict) -> CommentInternal:
+            comment = CommentInternal.from_db(
+                row,
+                requested_entity_id=link['requested_entity_id'],
+                comment_entity_type=link['comment_entity_type'],
+                comment_entity_id=link['comment_entity_id'],
+            )
+            if versions is not None:
+                comment.versions = versions.get(row['id'], [])
+            return comment
+
+        comments: list[CommentInternal] = []
+        for link in links:
+            row = rows_by_id.get(link['comment_id'])
+            if row is None:
+                continue
+            comment = _comment(row, link)
+            for thread_row in thread_rows.get(comment.id, []):
+                comment.add_comment_to_thread(_comment(thread_row, link))
+            comments.append(comment)
+
+        return comments
 
     async def get_discussion_for_entity_ids(
         self, entity: CommentEntityType, entity_ids: list[int]
     ) -> list[DiscussionInternal | None]:
         """
         Get comments organized into a discussion, separated into direct and related
-        comments for the specified entity
+        comments for the specified entity. Discussions are cached until any comment
+        is written (or the TTL expires), and don't include the comment history.
         """
-        comments: list[CommentInternal] = []
-
-        comment_map = await self.get_comments_for_entity_ids(
-            entity=entity, entity_ids=entity_ids, include_related_comments=True
-        )
-
-        # Only add parent comments to list
-        for _, comment in comment_map.items():
-            if comment.parent_id is None:
-                comments.append(comment)
-
-        # Group comments by the entity id so that they can be returned in the same order
-        # They were requested in. And wrap them in the Discussion model to separate
-        # direct from related comments
-        comments_by_entity_id_map = {
-            id: DiscussionInternal.from_flat_comments(
-                list(g), requested_entity_id=id, requested_entity_type=entity
+        version = await self.get_comments_version()
+        now = time.monotonic()
+
+        discussions: dict[int, DiscussionInternal | None] = {}
+        for eid in entity_ids:
+            cached = _DISCUSSION_CACHE.get((entity, eid))
+            if cached is None:
+                continue
+            cached_version, cached_at, discussion = cached
+            if (
+                cached_version == version
+                and now - cached_at < DISCUSSION_CACHE_TTL_SECONDS
+            ):
+                discussions[eid] = discussion
+                _DISCUSSION_CACHE.move_to_end((entity, eid))
+
+        missing_ids = [eid for eid in entity_ids if eid not in discussions]
+        if missing_ids:
+            comments = await self.get_comments_for_entity_ids(
+                entity=entity, entity_ids=missing_ids, include_related_comments=True
             )
-            for id, g in groupby(comments, key=lambda k: k.requested_entity_id)
-        }
-
-        return [comments_by_entity_id_map.get(eid, None) for eid in entity_ids]
+            # Group comments by the entity id so that they can be returned in the
+            # same order they were requested in. And wrap them in the Discussion
+            # model to separate direct from related comments
+            comments_by_entity_id = group_by(comments, lambda c: c.requested_entity_id)
+            for eid in missing_ids:
+                entity_comments = comments_by_entity_id.get(eid)
+                discussions[eid] = (
+                    DiscussionInternal.from_flat_comments(
+                        entity_comments,
+                        requested_entity_id=eid,
+                        requested_entity_type=entity,
+                    )
+                    if entity_comments
+                    else None
+                )
+                _DISCUSSION_CACHE[(entity, eid)] = (version, now, discussions[eid])
+
+            while len(_DISCUSSION_CACHE) > DISCUSSION_CACHE_MAX_SIZE:
+                _DISCUSSION_CACHE.popitem(last=False)
+
+        return [discussions[eid] for eid in entity_ids]
 
     async def get_comment_by_id(self, comment_id: int):
         """
@@ -403,7 +552,8 @@ class CommentTable(DbBase):
                 f"""(
                 SELECT
                     {entity_type}_id as entity_id,
-                    '{entity_type}' as entity_type
+                    '{entity_type}' as entity_type,
+                    rc.comment_id as root_comment_id
                 FROM {entity_type}_comment ec
                 JOIN root_comment rc
                 ON rc.comment_id = ec.comment_id
@@ -431,13 +581,18 @@ class CommentTable(DbBase):
             entity_ids=[rows[0]['entity_id']],
             entity=rows[0]['entity_type'],
             include_related_comments=False,
-            comment_id=comment_id,
+            include_history=True,
         )
 
-        if comment_id not in comments:
-            raise NotFoundError(f'Comment with id {comment_id} was not found')
+        root = next((c for c in comments if c.id == rows[0]['root_comment_id']), None)
+        if root is not None and root.id == comment_id:
+            return root
+        if root is not None:
+            for child in root.thread:
+                if child.id == comment_id:
+                    return child
 
-        return comments[comment_id]
+        raise NotFoundError(f'Comment with id {comment_id} was not found')
 
     async def add_comment_to_entity(
         self, entity: CommentEntityType, entity_id: int, content: str
@@ -476,6 +631,7 @@ class CommentTable(DbBase):
                 },
             )
 
+            invalidate_discussion_cache()
             return await self.get_comment_by_id(comment_id)
 
     async def add_comment_to_thread(self, content: str, parent_id: int):
@@ -496,6 +652,7 @@ class CommentTable(DbBase):
             },
         )
 
+        invalidate_discussion_cache()
         return await self.get_comment_by_id(comment_id)
 
     async def update_comment(
@@ -548,4 +705,5 @@ class CommentTable(DbBase):
             | update_v,
         )
 
+        invalidate_discussion_cache()
         return await self.get_comment_by_id(comment_id)
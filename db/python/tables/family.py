@@ -3,7 +3,7 @@ from collections import defaultdict
 from typing import Any, Dict, List, Optional, Set
 
 from db.python.filters import GenericFilter, GenericFilterModel, GenericMetaFilter
-from db.python.tables.base import DbBase
+from db.python.tables.base import DbBase, insert_many
 from db.python.utils import NotFoundError, escape_like_term, to_db_json
 from models.models import PRIMARY_EXTERNAL_ORG, FamilyInternal, ProjectId
 
@@ -306,6 +306,45 @@ class FamilyTable(DbBase):
 
         return new_id
 
+    async def create_families(
+        self,
+        external_ids: List[dict[str, str]],
+        project: ProjectId | None = None,
+    ) -> List[int]:
+        """
+        Create many (otherwise empty) families with multi-row inserts,
+        returns the new internal IDs in the same order as external_ids
+        """
+        if not external_ids:
+            return []
+
+        _project = project or self.project_id
+        audit_log_id = await self.audit_log_id()
+        meta = to_db_json({})
+
+        async with self.connection.transaction():
+            rows = await insert_many(
+                self.connection,
+                'family',
+                ['project', 'meta', 'audit_log_id'],
+                [(_project, meta, audit_log_id)] * len(external_ids),
+                returning='id',
+            )
+            new_ids = [r['id'] for r in rows]
+
+            await insert_many(
+                self.connection,
+                'family_external_id',
+                ['project', 'family_id', 'name', 'external_id', 'audit_log_id'],
+                (
+                    (_project, family_id, name, eid, audit_log_id)
+                    for family_id, eids in zip(new_ids, external_ids)
+                    for name, eid in eids.items()
+                ),
+            )
+
+        return new_ids
+
     async def insert_or_update_multiple_families(
         self,
         external_ids: List[str],
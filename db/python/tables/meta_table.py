@@ -1,5 +1,8 @@
-from io import BytesIO, StringIO
-from typing import Any, Callable
+import dataclasses
+import hashlib
+import io
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable
 
 # Unfortunately some of these libs have partially or completely missing
 # type annotations so mypy will have a few red underlines in this file :/
@@ -15,6 +18,96 @@ from models.models import PRIMARY_EXTERNAL_ORG
 # from the query. DuckDB doesn't support column names which are an empty string.
 EXTERNAL_ORG_SENTINEL = '__PRIMARY__EXTERNAL__ORG__'
 
+# Number of rows fetched from the database per page, each page is written
+# out as a single parquet row group
+EXPORT_ROW_GROUP_SIZE = 10_000
+
+# bump this when the layout of the exported tables changes, so that
+# any cached snapshots of the old layout are invalidated
+EXPORT_FORMAT_VERSION = 1
+
+# duckdb type used for json fields whose type differs between pages
+JSON_COLUMN_TYPE = 'JSON'
+NUMERIC_COLUMN_TYPES = {'BIGINT', 'DOUBLE'}
+
+# {(table_name, project): (table_version, (meta_columns, external_id_columns))}
+_EXPORT_SCHEMA_CACHE: dict[
+    tuple[str, int], tuple[tuple, tuple[dict[str, str], dict[str, str]]]
+] = {}
+
+
+def merge_json_column_types(
+    columns: dict[str, str], new_columns: dict[str, str]
+) -> dict[str, str]:
+    """
+    Merge duckdb column types inferred from different pages of json, if a
+    column was inferred with different types, fall back to a json string
+
+    >>> merge_json_column_types({'a': 'BIGINT', 'b': 'VARCHAR'}, {'a': 'DOUBLE'})
+    {'a': 'DOUBLE', 'b': 'VARCHAR'}
+    >>> merge_json_column_types({'a': 'BIGINT'}, {'a': 'STRUCT(x BIGINT)', 'c': 'BOOLEAN'})
+    {'a': 'JSON', 'c': 'BOOLEAN'}
+    """
+    merged = dict(columns)
+    for name, column_type in new_columns.items():
+        existing_type = merged.get(name)
+        if existing_type is None or existing_type == column_type:
+            merged[name] = column_type
+        elif {existing_type, column_type} == NUMERIC_COLUMN_TYPES:
+            merged[name] = 'DOUBLE'
+        else:
+            merged[name] = JSON_COLUMN_TYPE
+    return merged
+
+
+@dataclasses.dataclass(frozen=True)
+class EntityExport:
+    """
+    A parquet export of an entity table. The version is cheap to compute and
+    identifies the current state of the table, the parquet bytes are only
+    generated when `generate` is awaited (returns None if the table is empty).
+    """
+
+    table_name: str
+    project: int
+    version: tuple
+    generate: Callable[[], Awaitable[AsyncIterator[bytes] | None]]
+
+    @property
+    def etag(self) -> str:
+        """Strong HTTP entity tag, which changes whenever the table changes"""
+        key = (EXPORT_FORMAT_VERSION, self.table_name, self.project, self.version)
+        return f'"{hashlib.sha256(repr(key).encode()).hexdigest()[:32]}"'
+
+
+class _ParquetChunkSink(io.RawIOBase):
+    """
+    Write-only file object for the ParquetWriter, which holds on to the bytes
+    written since the last call to drain (ie: at most one row group)
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        self._position += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        """Return (and forget) everything written since the last drain"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
 
 class MetaTable(DbBase):
     """
@@ -38,107 +131,252 @@ class MetaTable(DbBase):
             ) AS external_ids
         """
 
-    async def entity_meta_table(
+    async def get_table_version(self, table_name: str, project: int) -> tuple:
+        """
+        Cheap token that changes whenever rows of an entity table (or its
+        external_id table) are inserted, updated or deleted within a project
+        """
+        _query = f"""
+            SELECT
+                (SELECT MAX(audit_log_id) FROM {table_name} WHERE project = :project)
+                    AS max_audit_log_id,
+                (SELECT COUNT(*) FROM {table_name} WHERE project = :project)
+                    AS n_rows,
+                (SELECT MAX(audit_log_id) FROM {table_name}_external_id
+                    WHERE project = :project) AS max_eid_audit_log_id,
+                (SELECT COUNT(*) FROM {table_name}_external_id
+                    WHERE project = :project) AS n_eid_rows
+        """
+        row = await self.connection.fetch_one(_query, {'project': project})
+        assert row
+        return tuple(row.values())
+
+    async def _iterate_pages(
+        self, project: int, query: str
+    ) -> AsyncIterator[list[Record]]:
+        """
+        Page through the query by primary key, the query must select an `id`
+        column and be filtered by `id > :last_id`, ordered by `id` and limited
+        by `:limit`
+        """
+        last_id = 0
+        while True:
+            rows = await self.connection.fetch_all(
+                query,
+                {
+                    'project': project,
+                    'last_id': last_id,
+                    'limit': EXPORT_ROW_GROUP_SIZE,
+                    'primary_external_org': PRIMARY_EXTERNAL_ORG,
+                    'primary_external_org_sentinel': EXTERNAL_ORG_SENTINEL,
+                },
+            )
+            if not rows:
+                return
+            yield rows
+            if len(rows) < EXPORT_ROW_GROUP_SIZE:
+                return
+            last_id = rows[-1]['id']
+
+    @staticmethod
+    def _json_lines(rows: list[Record], key: str, empty_value: str) -> io.BytesIO:
+        return io.BytesIO(
+            '\n'.join((row[key] or empty_value) for row in rows).encode() + b'\n'
+        )
+
+    @staticmethod
+    def _infer_json_columns(duck, lines: io.BytesIO) -> dict[str, str]:
+        """Infer {column: duckdb_type} for a page of newline delimited json"""
+        relation = duck.read_json(
+            lines, map_inference_threshold=-1, format='newline_delimited'
+        )
+        columns = {c: str(t) for c, t in zip(relation.columns, relation.types)}
+        # pages where every object is empty are read as a single json column
+        if columns == {'json': JSON_COLUMN_TYPE}:
+            return {}
+        return columns
+
+    async def _get_export_columns(
         self,
+        table_name: str,
         project: int,
         query: str,
-        row_getter: Callable[[Record], dict[str, Any]],
         has_external_ids: bool,
         has_meta: bool,
-    ):
+        version: tuple,
+    ) -> tuple[dict[str, str], dict[str, str]] | None:
         """
-        Return a flat tabular parquet file for the provied query. Optionally include
-        metadata and external_ids columns. This returns a BytesIO object with the
-        parquet file.
+        Get the (meta, external_id) json columns for the export, this requires a
+        full (paged) pass over the table, so is cached per project until the
+        table changes. Returns None if the table is empty.
         """
+        cache_key = (table_name, project)
+        if cached := _EXPORT_SCHEMA_CACHE.get(cache_key):
+            cached_version, columns = cached
+            if cached_version == version:
+                return columns
 
-        rows = await self.connection.fetch_all(
-            query,
-            {
-                'project': project,
-                'primary_external_org': PRIMARY_EXTERNAL_ORG,
-                'primary_external_org_sentinel': EXTERNAL_ORG_SENTINEL,
-            },
+        duck = duckdb.connect()
+        meta_columns: dict[str, str] = {}
+        # keep the primary external_id as the first external_id column
+        external_id_columns: dict[str, str] = (
+            {EXTERNAL_ORG_SENTINEL: 'VARCHAR'} if has_external_ids else {}
         )
+        has_rows = False
+        try:
+            async for rows in self._iterate_pages(project, query):
+                has_rows = True
+                if has_meta:
+                    meta_columns = merge_json_column_types(
+                        meta_columns,
+                        self._infer_json_columns(
+                            duck, self._json_lines(rows, 'meta', 'null')
+                        ),
+                    )
+                if has_external_ids:
+                    # external ids are always strings
+                    for row in rows:
+                        for name in json.loads(row['external_ids'] or '{}'):
+                            external_id_columns[name] = 'VARCHAR'
 
-        if len(rows) == 0:
+        finally:
+            duck.close()
+
+        if not has_rows:
+            _EXPORT_SCHEMA_CACHE.pop(cache_key, None)
             return None
 
-        duck = duckdb.connect()
-        meta_rows_str = StringIO()
-        external_id_rows_str = StringIO()
-        main_rows: list[dict[str, Any]] = []
-
-        for row in rows:
-            if has_meta:
-                meta_rows_str.write((row['meta'] or 'null') + '\n')
-
-            if has_external_ids:
-                external_id_rows_str.write(
-                    (row['external_ids'] or f'{{"{EXTERNAL_ORG_SENTINEL}": null}}')
-                    + '\n'
-                )
+        columns = (meta_columns, external_id_columns)
+        _EXPORT_SCHEMA_CACHE[cache_key] = (version, columns)
+        return columns
 
-            main_rows.append(row_getter(row))
-
-        duck.register('main_table', pa.Table.from_pylist(main_rows))
-
-        # Seek str buffers back to beginning
-        meta_rows_str.seek(0)
-        external_id_rows_str.seek(0)
-
-        # parse the json for the meta table
-        meta_columns = ''
-        meta_join = ''
-        if has_meta:
-            duck.register(
-                'meta_table',
-                duck.read_json(
-                    meta_rows_str,
-                    map_inference_threshold=-1,
-                    format='newline_delimited',
-                ).arrow(),
+    async def entity_meta_table(
+        self,
+        table_name: str,
+        project: int,
+        query: str,
+        row_getter: Callable[[Record], dict[str, Any]],
+        schema: pa.Schema,
+        has_external_ids: bool,
+        has_meta: bool,
+    ) -> EntityExport:
+        """
+        Return a flat tabular parquet file for the provided query. Optionally include
+        metadata and external_ids columns.
+
+        The query is paged by primary key (see `_iterate_pages`), and each page is
+        written as a parquet row group, so the export generates an async iterator of
+        parquet bytes that only ever holds one row group in memory (or None if the
+        table is empty). The `schema` describes the columns returned by `row_getter`.
+        """
+        version = await self.get_table_version(table_name, project)
+
+        async def generate() -> AsyncIterator[bytes] | None:
+            columns = await self._get_export_columns(
+                table_name=table_name,
+                project=project,
+                query=query,
+                has_external_ids=has_external_ids,
+                has_meta=has_meta,
+                version=version,
             )
-            # Prefix all meta columns with `meta_` to avoid clashes with the main table
-            meta_columns = """
-                ,COLUMNS(mt.*) as 'meta_\\0'
-            """
-            meta_join = 'POSITIONAL JOIN meta_table mt'
-
-        # parse the json for the external_id table
-        external_id_columns = ''
-        external_id_join = ''
-        if has_external_ids:
-            duck.register(
-                'external_id_table',
-                duck.read_json(
-                    external_id_rows_str,
-                    format='newline_delimited',
-                ).arrow(),
+            if columns is None:
+                return None
+
+            return self._parquet_chunks(
+                project=project,
+                query=query,
+                row_getter=row_getter,
+                schema=schema,
+                meta_columns=columns[0] if has_meta else None,
+                external_id_columns=columns[1] if has_external_ids else None,
             )
 
+        return EntityExport(
+            table_name=table_name,
+            project=project,
+            version=version,
+            generate=generate,
+        )
+
+    async def _parquet_chunks(
+        self,
+        project: int,
+        query: str,
+        row_getter: Callable[[Record], dict[str, Any]],
+        schema: pa.Schema,
+        meta_columns: dict[str, str] | None,
+        external_id_columns: dict[str, str] | None,
+    ) -> AsyncIterator[bytes]:
+        """Write each page of the query as a row group, yielding the bytes"""
+        duck = duckdb.connect()
+        sink = _ParquetChunkSink()
+        writer: pq.ParquetWriter | None = None
+        try:
+            async for rows in self._iterate_pages(project, query):
+                table = self._page_to_table(
+                    duck,
+                    rows,
+                    row_getter=row_getter,
+                    schema=schema,
+                    meta_columns=meta_columns,
+                    external_id_columns=external_id_columns,
+                )
+                if writer is None:
+                    writer = pq.ParquetWriter(sink, table.schema)
+                writer.write_table(table, row_group_size=len(rows))
+                yield sink.drain()
+
+            if writer is not None:
+                writer.close()
+                writer = None
+                yield sink.drain()
+        finally:
+            if writer is not None:
+                writer.close()
+            duck.close()
+
+    @staticmethod
+    def _page_to_table(
+        duck,
+        rows: list[Record],
+        row_getter: Callable[[Record], dict[str, Any]],
+        schema: pa.Schema,
+        meta_columns: dict[str, str] | None,
+        external_id_columns: dict[str, str] | None,
+    ) -> pa.Table:
+        """
+        Convert a page of rows to an arrow table, parsing the json columns with
+        the (fixed) export columns so every page has the same schema
+        """
+        table = pa.Table.from_pylist([row_getter(row) for row in rows], schema=schema)
+
+        if external_id_columns:
+            external_id_table = duck.read_json(
+                MetaTable._json_lines(
+                    rows, 'external_ids', f'{{"{EXTERNAL_ORG_SENTINEL}": null}}'
+                ),
+                format='newline_delimited',
+                columns=external_id_columns,
+            ).arrow()
             # call the primary external_id column `external_id` and prefix all other
             # columns with `external_id_` to avoid clashes with the main table
-            external_id_columns = f"""
-                ,et.{EXTERNAL_ORG_SENTINEL} as external_id
-                ,COLUMNS(et.* EXCLUDE {EXTERNAL_ORG_SENTINEL}) as 'external_id_\\0'
-            """
-            external_id_join = 'POSITIONAL JOIN external_id_table et'
-
-        # combine the three tables together, if they are populated
-        combined = duck.query(f"""
-            SELECT
-                m.*
-                {external_id_columns}
-                {meta_columns}
-
-            FROM main_table m
-            {external_id_join}
-            {meta_join}
-        """)
+            for name in external_id_columns:
+                column_name = (
+                    'external_id'
+                    if name == EXTERNAL_ORG_SENTINEL
+                    else f'external_id_{name}'
+                )
+                table = table.append_column(column_name, external_id_table[name])
 
-        buffer = BytesIO()
-        pq.write_table(combined.arrow(), buffer)
+        if meta_columns:
+            meta_table = duck.read_json(
+                MetaTable._json_lines(rows, 'meta', 'null'),
+                format='newline_delimited',
+                columns=meta_columns,
+            ).arrow()
+            # Prefix all meta columns with `meta_` to avoid clashes with the main table
+            for name in meta_columns:
+                table = table.append_column(f'meta_{name}', meta_table[name])
 
-        duck.close()
-        return buffer
+        return table
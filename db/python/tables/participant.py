@@ -3,9 +3,11 @@ import json
 from collections import defaultdict
 from typing import Any
 
+import pyarrow as pa
+
 from db.python.filters import GenericFilter
 from db.python.filters.participant import ParticipantFilter
-from db.python.tables.base import DbBase
+from db.python.tables.base import DbBase, insert_many
 from db.python.tables.meta_table import MetaTable
 from db.python.utils import NotFoundError, escape_like_term, to_db_json
 from models.models import PRIMARY_EXTERNAL_ORG, ParticipantInternal, ProjectId
@@ -299,11 +301,14 @@ class ParticipantTable(DbBase):
             FROM participant p
             LEFT JOIN participant_external_id peid
             ON peid.participant_id = p.id
-            WHERE p.project = :project
+            WHERE p.project = :project AND p.id > :last_id
             GROUP BY p.id
+            ORDER BY p.id
+            LIMIT :limit
         """
 
         return await mt.entity_meta_table(
+            table_name=self.table_name,
             project=project,
             query=query,
             row_getter=lambda row: {
@@ -312,6 +317,14 @@ class ParticipantTable(DbBase):
                 'reported_gender': row['reported_gender'],
                 'karyotype': row['karyotype'],
             },
+            schema=pa.schema(
+                [
+                    ('participant_id', pa.int64()),
+                    ('reported_sex', pa.int64()),
+                    ('reported_gender', pa.string()),
+                    ('karyotype', pa.string()),
+                ]
+            ),
             has_external_ids=True,
             has_meta=True,
         )
@@ -375,6 +388,53 @@ RETURNING id
 
         return new_id
 
+    async def create_participants(
+        self,
+        external_ids: list[dict[str, str]],
+        project: ProjectId = None,
+    ) -> list[int]:
+        """
+        Create many (otherwise empty) participants with multi-row inserts,
+        returns the new internal IDs in the same order as external_ids
+        """
+        _project = project or self.project_id
+        if not _project:
+            raise ValueError('Must provide project to create participants')
+
+        if any(
+            not eids or eids.get(PRIMARY_EXTERNAL_ORG, None) is None
+            for eids in external_ids
+        ):
+            raise ValueError('Participant must have primary external_id')
+
+        if not external_ids:
+            return []
+
+        audit_log_id = await self.audit_log_id()
+        meta = to_db_json({})
+        rows = await insert_many(
+            self.connection,
+            'participant',
+            ['meta', 'audit_log_id', 'project'],
+            [(meta, audit_log_id, _project)] * len(external_ids),
+            returning='id',
+        )
+        new_ids = [r['id'] for r in rows]
+
+        await insert_many(
+            self.connection,
+            'participant_external_id',
+            ['project', 'participant_id', 'name', 'external_id', 'audit_log_id'],
+            (
+                (_project, pid, name.lower(), eid, audit_log_id)
+                for pid, eids in zip(new_ids, external_ids)
+                for name, eid in eids.items()
+                if eid is not None
+            ),
+        )
+
+        return new_ids
+
     async def update_participants(
         self,
         participant_ids: list[int],
@@ -2,7 +2,7 @@ import json
 from collections import defaultdict
 from typing import Any, Dict, List, Tuple
 
-from db.python.tables.base import DbBase
+from db.python.tables.base import DbBase, insert_many
 
 
 class ParticipantPhenotypeTable(DbBase):
@@ -14,34 +14,31 @@ class ParticipantPhenotypeTable(DbBase):
 
     async def add_key_value_rows(self, rows: List[Tuple[int, str, Any]]) -> None:
         """
-        Create a new sample, and add it to database
+        Insert (or update) (participant_id, description, value) rows,
+        CREATE_MANY_CHUNK_SIZE rows per statement
         """
         if not rows:
             return None
-        _query = """
-INSERT INTO participant_phenotypes
-    (participant_id, description, value, audit_log_id, hpo_term)
-VALUES
-    (:participant_id, :description, :value, :audit_log_id, 'DESCRIPTION')
-ON DUPLICATE KEY UPDATE
-    description=:description, value=:value, audit_log_id=:audit_log_id
-        """
 
         audit_log_id = await self.audit_log_id()
-        formatted_rows = [
-            {
-                'participant_id': r[0],
-                'description': r[1],
-                'value': json.dumps(r[2]),
-                'audit_log_id': audit_log_id,
-            }
-            for r in rows
-        ]
-
-        return await self.connection.execute_many(
-            _query,
-            formatted_rows,
+        await insert_many(
+            self.connection,
+            'participant_phenotypes',
+            ['participant_id', 'description', 'value', 'audit_log_id', 'hpo_term'],
+            (
+                (
+                    participant_id,
+                    description,
+                    json.dumps(value),
+                    audit_log_id,
+                    'DESCRIPTION',
+                )
+                for participant_id, description, value in rows
+            ),
+            suffix='ON DUPLICATE KEY UPDATE '
+            'value=VALUES(value), audit_log_id=VALUES(audit_log_id)',
         )
+        return None
 
     async def get_key_value_rows_for_participant_ids(
         self, participant_ids: List[int]
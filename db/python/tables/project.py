@@ -13,6 +13,7 @@ from models.models.project import (
 # Avoid circular import for type definition
 if TYPE_CHECKING:
     from db.python.connect import Connection
+    from db.python.tables.bulk_operation import BatchedStatement, BulkOperation
 else:
     Connection = object
 
@@ -21,6 +22,8 @@ logger = get_logger()
 GROUP_NAME_PROJECT_CREATORS = 'project-creators'
 GROUP_NAME_MEMBERS_ADMIN = 'members-admin'
 
+DELETE_PROJECT_DATA_OPERATION = 'delete-project-data'
+
 
 class ProjectPermissionsTable:
     """
@@ -226,107 +229,214 @@ class ProjectPermissionsTable:
 
         await self.connection.execute(_query, fields)
 
-    async def delete_project_data(self, project: Project) -> bool:
+    async def start_delete_project_data(self, project: Project) -> 'BulkOperation':
         """
-        Delete data in metamist project, requires project_creator_permissions
+        Get the (resumable) operation to delete the data in a metamist project,
+        requires project_creator_permissions
         """
+        # pylint: disable=import-outside-toplevel
+        # the bulk operation table imports the connection, which imports this table
+        from db.python.tables.bulk_operation import BulkOperationTable
+
         if not project.is_test_project:
             raise ValueError('2025-12-04: refusing to delete non-test project')
 
-        async with self.connection.transaction():
-            _query = """
-DELETE FROM comment WHERE id IN (
-    SELECT ac.comment_id FROM assay_comment ac
-    INNER JOIN assay a ON ac.assay_id = a.id
-    INNER JOIN sample s ON a.sample_id = s.id
-    WHERE s.project = :project
-
-    UNION
-    SELECT fc.comment_id FROM family_comment fc
-    INNER JOIN family f ON fc.family_id = f.id
-    WHERE f.project = :project
-
-    UNION
-    SELECT pc.comment_id FROM participant_comment pc
-    INNER JOIN participant p ON pc.participant_id = p.id
-    WHERE p.project = :project
-
-    UNION
-    SELECT comment_id FROM project_comment
-    WHERE project_id = :project
-
-    UNION
-    SELECT sc.comment_id FROM sample_comment sc
-    INNER JOIN sample s ON sc.sample_id = s.id
-    WHERE s.project = :project
-
-    UNION
-    SELECT sgc.comment_id FROM sequencing_group_comment sgc
-    INNER JOIN sequencing_group sg ON sgc.sequencing_group_id = sg.id
-    INNER JOIN sample s ON sg.sample_id = s.id
-    WHERE s.project = :project
-);
--- Deletion from `comment` cascades to the various `*_comment` tables
-DELETE FROM project_member WHERE project_id = :project;
-DELETE FROM participant_phenotypes where participant_id IN (
-    SELECT id FROM participant WHERE project = :project
-);
-DELETE FROM family_participant WHERE family_id IN (
-    SELECT id FROM family where project = :project
-);
-DELETE FROM family_external_id WHERE project = :project;
-DELETE FROM family WHERE project = :project;
-DELETE FROM sequencing_group_external_id WHERE project = :project;
-DELETE FROM sample_external_id WHERE project = :project;
-DELETE FROM participant_external_id WHERE project = :project;
-DELETE FROM assay_external_id WHERE project = :project;
-DELETE FROM sequencing_group_assay WHERE sequencing_group_id IN (
-    SELECT sg.id FROM sequencing_group sg
-    INNER JOIN sample ON sample.id = sg.sample_id
-    WHERE sample.project = :project
-);
-DELETE FROM analysis_sequencing_group WHERE sequencing_group_id in (
-    SELECT sg.id FROM sequencing_group sg
-    INNER JOIN sample ON sample.id = sg.sample_id
-    WHERE sample.project = :project
-);
-DELETE FROM analysis_sample WHERE sample_id in (
-    SELECT s.id FROM sample s
-    WHERE s.project = :project
-);
-DELETE FROM output_file WHERE id IN (
-    SELECT file_id FROM analysis_outputs ao
-    INNER JOIN analysis a ON ao.analysis_id = a.id
-    WHERE a.project = :project
-);
--- Deletion from `output_file` cascades to `analysis_outputs`
-DELETE FROM analysis_sequencing_group WHERE analysis_id in (
-    SELECT id FROM analysis WHERE project = :project
-);
-DELETE FROM analysis_sample WHERE analysis_id in (
-    SELECT id FROM analysis WHERE project = :project
-);
-DELETE FROM analysis_cohort WHERE cohort_id IN (
-    SELECT id FROM cohort WHERE project = :project
-);
-DELETE FROM cohort_sequencing_group WHERE cohort_id IN (
-    SELECT id FROM cohort WHERE project = :project
-);
-DELETE FROM cohort_template WHERE project = :project;
-DELETE FROM cohort WHERE project = :project;
-DELETE FROM assay WHERE sample_id in (SELECT id FROM sample WHERE project = :project);
-DELETE FROM sequencing_group WHERE sample_id IN (
-    SELECT id FROM sample WHERE project = :project
-);
-DELETE FROM sample WHERE project = :project;
-DELETE FROM participant WHERE project = :project;
-DELETE FROM analysis WHERE project = :project;
-            """
-
-            await self.connection.execute(_query, {'project': project.id})
+        return await BulkOperationTable(self._connection).get_or_create_operation(
+            kind=DELETE_PROJECT_DATA_OPERATION, project=project.id
+        )
+
+    async def delete_project_data(
+        self,
+        project: Project,
+        operation: 'BulkOperation | None' = None,
+        batch_size: int | None = None,
+    ) -> bool:
+        """
+        Delete data in metamist project, requires project_creator_permissions.
+        Rows are deleted in batches (each in a short transaction), in foreign key
+        order, recording progress against the operation. If the deletion is
+        interrupted, running it again resumes where it got to.
+        """
+        # pylint: disable=import-outside-toplevel
+        from db.python.tables.bulk_operation import (
+            BULK_OPERATION_BATCH_SIZE,
+            BulkOperationStatus,
+            BulkOperationTable,
+        )
 
+        if operation is None:
+            operation = await self.start_delete_project_data(project)
+
+        optable = BulkOperationTable(self._connection)
+        try:
+            await optable.run_batched(
+                operation,
+                self._project_data_delete_statements(),
+                {'project': project.id},
+                batch_size=batch_size or BULK_OPERATION_BATCH_SIZE,
+            )
+        except Exception as e:
+            await optable.set_status(operation, BulkOperationStatus.FAILED, str(e))
+            raise
+
+        await optable.set_status(operation, BulkOperationStatus.COMPLETED)
         return True
 
+    @staticmethod
+    def _project_data_delete_statements() -> list['BatchedStatement']:
+        """Statements that delete a project's data, in foreign key order"""
+        # pylint: disable=import-outside-toplevel
+        from db.python.tables.bulk_operation import BatchedStatement, order_by_fk_deps
+
+        comment_tables = (
+            'assay_comment',
+            'family_comment',
+            'participant_comment',
+            'project_comment',
+            'sample_comment',
+            'sequencing_group_comment',
+        )
+        project_sg_ids = """
+            SELECT sg.id FROM sequencing_group sg
+            INNER JOIN sample s ON s.id = sg.sample_id
+            WHERE s.project = :project
+        """
+        project_analysis_ids = 'SELECT id FROM analysis WHERE project = :project'
+        project_cohort_ids = 'SELECT id FROM cohort WHERE project = :project'
+
+        def by_project(table: str, column: str = 'project', order_by: str = ''):
+            return BatchedStatement(
+                table,
+                f'DELETE FROM {table} WHERE {column} = :project {order_by} '
+                'LIMIT :batch_size',
+            )
+
+        def by_ids(table: str, column: str, ids_query: str, name: str | None = None):
+            return BatchedStatement(
+                table,
+                f'DELETE FROM {table} WHERE {column} IN ({ids_query}) '
+                'LIMIT :batch_size',
+                name=name,
+            )
+
+        statements = [
+            # deletion from `comment` cascades to the various `*_comment` tables,
+            # replies are deleted before the comments they reply to
+            BatchedStatement(
+                'comment',
+                """
+                DELETE FROM comment WHERE id IN (
+                    SELECT ac.comment_id FROM assay_comment ac
+                    INNER JOIN assay a ON ac.assay_id = a.id
+                    INNER JOIN sample s ON a.sample_id = s.id
+                    WHERE s.project = :project
+
+                    UNION
+                    SELECT fc.comment_id FROM family_comment fc
+                    INNER JOIN family f ON fc.family_id = f.id
+                    WHERE f.project = :project
+
+                    UNION
+                    SELECT pc.comment_id FROM participant_comment pc
+                    INNER JOIN participant p ON pc.participant_id = p.id
+                    WHERE p.project = :project
+
+                    UNION
+                    SELECT comment_id FROM project_comment
+                    WHERE project_id = :project
+
+                    UNION
+                    SELECT sc.comment_id FROM sample_comment sc
+                    INNER JOIN sample s ON sc.sample_id = s.id
+                    WHERE s.project = :project
+
+                    UNION
+                    SELECT sgc.comment_id FROM sequencing_group_comment sgc
+                    INNER JOIN sequencing_group sg ON sgc.sequencing_group_id = sg.id
+                    INNER JOIN sample s ON sg.sample_id = s.id
+                    WHERE s.project = :project
+                )
+                ORDER BY id DESC
+                LIMIT :batch_size
+                """,
+                cascades_to=comment_tables,
+            ),
+            by_project('project_member', column='project_id'),
+            by_ids(
+                'participant_phenotypes',
+                'participant_id',
+                'SELECT id FROM participant WHERE project = :project',
+            ),
+            by_ids(
+                'family_participant',
+                'family_id',
+                'SELECT id FROM family WHERE project = :project',
+            ),
+            by_project('family_external_id'),
+            by_project('family'),
+            by_project('sequencing_group_external_id'),
+            by_project('sample_external_id'),
+            by_project('participant_external_id'),
+            by_project('assay_external_id'),
+            by_ids('sequencing_group_assay', 'sequencing_group_id', project_sg_ids),
+            by_ids(
+                'analysis_sequencing_group',
+                'sequencing_group_id',
+                project_sg_ids,
+                name='analysis_sequencing_group:sequencing_group',
+            ),
+            by_ids(
+                'analysis_sequencing_group',
+                'analysis_id',
+                project_analysis_ids,
+                name='analysis_sequencing_group:analysis',
+            ),
+            by_ids(
+                'analysis_sample',
+                'sample_id',
+                'SELECT id FROM sample WHERE project = :project',
+                name='analysis_sample:sample',
+            ),
+            by_ids(
+                'analysis_sample',
+                'analysis_id',
+                project_analysis_ids,
+                name='analysis_sample:analysis',
+            ),
+            # deletion from `output_file` cascades to `analysis_outputs`
+            BatchedStatement(
+                'output_file',
+                f"""
+                DELETE FROM output_file WHERE id IN (
+                    SELECT ao.file_id FROM analysis_outputs ao
+                    WHERE ao.analysis_id IN ({project_analysis_ids})
+                )
+                ORDER BY id DESC
+                LIMIT :batch_size
+                """,
+                cascades_to=('analysis_outputs',),
+            ),
+            by_ids('analysis_cohort', 'cohort_id', project_cohort_ids),
+            by_ids('cohort_sequencing_group', 'cohort_id', project_cohort_ids),
+            by_project('cohort_template'),
+            by_project('cohort'),
+            by_ids(
+                'assay', 'sample_id', 'SELECT id FROM sample WHERE project = :project'
+            ),
+            by_ids(
+                'sequencing_group',
+                'sample_id',
+                'SELECT id FROM sample WHERE project = :project',
+            ),
+            # nested samples are deleted before the samples they're nested in
+            by_project('sample', order_by='ORDER BY id DESC'),
+            by_project('participant'),
+            by_project('analysis'),
+            by_project('project_storage_proportion_daily'),
+            by_project('seqr_sync_digest'),
+        ]
+        return order_by_fk_deps(statements)
+
     async def set_project_members(
         self, project: Project, members: list[ProjectMemberUpdate]
     ):
@@ -3,11 +3,18 @@ from collections import defaultdict
 from datetime import date
 from typing import Any, Iterable
 
+import pyarrow as pa
 from dateutil.relativedelta import relativedelta
 
 from db.python.filters import GenericFilter
 from db.python.filters.sample import SampleFilter
 from db.python.tables.base import DbBase
+from db.python.tables.bulk_operation import (
+    BULK_OPERATION_BATCH_SIZE,
+    BatchedStatement,
+    BulkOperationStatus,
+    BulkOperationTable,
+)
 from db.python.tables.meta_table import MetaTable
 from db.python.utils import NotFoundError, escape_like_term, to_db_json
 from models.base import parse_sql_bool
@@ -15,6 +22,9 @@ from models.models import PRIMARY_EXTERNAL_ORG, ProjectId
 from models.models.sample import SampleInternal, sample_id_format
 
 
+MERGE_SAMPLES_OPERATION = 'merge-samples'
+
+
 class SampleTable(DbBase):
     """
     Capture Sample table operations and queries
@@ -238,11 +248,14 @@ class SampleTable(DbBase):
             FROM sample s
             LEFT JOIN sample_external_id seid
             ON seid.sample_id = s.id
-            WHERE s.project = :project
+            WHERE s.project = :project AND s.id > :last_id
             GROUP BY s.id
+            ORDER BY s.id
+            LIMIT :limit
         """
 
         return await mt.entity_meta_table(
+            table_name=self.table_name,
             project=project,
             query=query,
             row_getter=lambda row: {
@@ -261,6 +274,16 @@ class SampleTable(DbBase):
                     else None
                 ),
             },
+            schema=pa.schema(
+                [
+                    ('sample_id', pa.string()),
+                    ('participant_id', pa.int64()),
+                    ('type', pa.string()),
+                    ('active', pa.bool_()),
+                    ('sample_root_id', pa.string()),
+                    ('sample_parent_id', pa.string()),
+                ]
+            ),
             has_external_ids=True,
             has_meta=True,
         )
@@ -432,10 +455,15 @@ class SampleTable(DbBase):
         self,
         id_keep: int = None,
         id_merge: int = None,
+        batch_size: int = BULK_OPERATION_BATCH_SIZE,
     ):
-        """Merge two samples together"""
+        """
+        Merge two samples together, by pointing everything that references the
+        merged sample at the kept sample (in batches, recording progress against a
+        bulk operation), then deleting the merged sample.
+        """
         sid_merge = sample_id_format(id_merge)
-        (_, sample_keep), (_, sample_merge) = await asyncio.gather(
+        (project_keep, sample_keep), (_, sample_merge) = await asyncio.gather(
             self.get_sample_by_id(id_keep),
             self.get_sample_by_id(id_merge),
         )
@@ -472,37 +500,57 @@ class SampleTable(DbBase):
             meta_original.get('merged_from'), sid_merge
         )
         meta: dict[str, Any] = dict_merge(meta_original, sample_merge.meta)
+        operation_table = BulkOperationTable(self._connection)
+        operation = await operation_table.get_or_create_operation(
+            kind=MERGE_SAMPLES_OPERATION,
+            project=project_keep,
+            target={'id_keep': id_keep, 'id_merge': id_merge},
+        )
         audit_log_id = await self.audit_log_id()
-        values: dict[str, Any] = {
-            'sample': {
-                'id': id_keep,
-                'audit_log_id': audit_log_id,
-                'meta': to_db_json(meta),
-            },
-            'ids': {
-                'id_keep': id_keep,
-                'id_merge': id_merge,
-                'audit_log_id': audit_log_id,
-            },
+        values = {
+            'id_keep': id_keep,
+            'id_merge': id_merge,
+            'audit_log_id': audit_log_id,
         }
 
+        def repoint(table: str, column: str, extra: str = ''):
+            return BatchedStatement(
+                table,
+                f"""
+                UPDATE {extra} {table}
+                SET {column} = :id_keep, audit_log_id = :audit_log_id
+                WHERE {column} = :id_merge
+                LIMIT :batch_size
+                """,
+                name=f'{table}:{column}',
+            )
+
+        statements = [
+            repoint('assay', 'sample_id'),
+            repoint('sequencing_group', 'sample_id'),
+            repoint('analysis_sample', 'sample_id'),
+            repoint('sample_comment', 'sample_id'),
+            repoint('sample', 'sample_parent_id'),
+            repoint('sample', 'sample_root_id'),
+            # external IDs move unless the kept sample has one from the same org
+            repoint('sample_external_id', 'sample_id', extra='IGNORE'),
+            BatchedStatement(
+                'sample_external_id',
+                """
+                DELETE FROM sample_external_id
+                WHERE sample_id = :id_merge
+                LIMIT :batch_size
+                """,
+                name='sample_external_id:conflicting',
+            ),
+        ]
+
         _query = """
             UPDATE sample
             SET audit_log_id = :audit_log_id,
                 meta = :meta
             WHERE id = :id
         """
-        _query_seqs = """
-            UPDATE assay
-            SET sample_id = :id_keep, audit_log_id = :audit_log_id
-            WHERE sample_id = :id_merge
-        """
-        # TODO: merge sequencing groups I guess?
-        _query_analyses = """
-            UPDATE analysis_sequencing_group
-            SET sample_id = :id_keep, audit_log_id = :audit_log_id
-            WHERE sample_id = :id_merge
-        """
         _query_update_sample_with_audit_log = """
             UPDATE sample
             SET audit_log_id = :audit_log_id
@@ -513,17 +561,31 @@ class SampleTable(DbBase):
             WHERE id = :id_merge
         """
 
-        async with self.connection.transaction():
-            await self.connection.execute(_query, {**values['sample']})
-            await self.connection.execute(_query_seqs, {**values['ids']})
-            await self.connection.execute(_query_analyses, {**values['ids']})
-            await self.connection.execute(
-                _query_update_sample_with_audit_log,
-                {'id_merge': id_merge, 'audit_log_id': audit_log_id},
+        try:
+            await operation_table.run_batched(
+                operation, statements, values, batch_size=batch_size
             )
-            await self.connection.execute(
-                _del_sample, {'id_merge': id_merge, 'audit_log_id': audit_log_id}
+            async with self.connection.transaction():
+                await self.connection.execute(
+                    _query,
+                    {
+                        'id': id_keep,
+                        'audit_log_id': audit_log_id,
+                        'meta': to_db_json(meta),
+                    },
+                )
+                await self.connection.execute(
+                    _query_update_sample_with_audit_log,
+                    {'id_merge': id_merge, 'audit_log_id': audit_log_id},
+                )
+                await self.connection.execute(_del_sample, {'id_merge': id_merge})
+        except Exception as e:
+            await operation_table.set_status(
+                operation, BulkOperationStatus.FAILED, str(e)
             )
+            raise
+
+        await operation_table.set_status(operation, BulkOperationStatus.COMPLETED)
 
         project, new_sample = await self.get_sample_by_id(id_keep)
         new_sample.project = project
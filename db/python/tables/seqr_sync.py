@@ -0,0 +1,87 @@
+import dataclasses
+
+from db.python.tables.base import DbBase
+from db.python.utils import from_db_json, to_db_json
+from models.models.project import ProjectId
+
+
+@dataclasses.dataclass
+class SeqrPushDigest:
+    """Digest of a section of a seqr sync payload, and of each of its rows"""
+
+    digest: str
+    row_digests: dict[str, str] = dataclasses.field(default_factory=dict)
+
+
+class SeqrSyncDigestTable(DbBase):
+    """
+    Digests of the payloads last pushed to each seqr project, by section
+    (eg: pedigree, families, individual_metadata)
+    """
+
+    table_name = 'seqr_sync_digest'
+
+    async def get_digests(
+        self, project: ProjectId, sequencing_type: str, seqr_guid: str
+    ) -> dict[str, SeqrPushDigest]:
+        """
+        Get the digests of the last payloads pushed, by section. Digests
+        pushed to a different seqr project are ignored.
+        """
+        rows = await self.connection.fetch_all(
+            """
+            SELECT section, digest, row_digests
+            FROM seqr_sync_digest
+            WHERE
+                project = :project
+                AND sequencing_type = :sequencing_type
+                AND seqr_guid = :seqr_guid
+            """,
+            {
+                'project': project,
+                'sequencing_type': sequencing_type,
+                'seqr_guid': seqr_guid,
+            },
+        )
+        return {
+            r['section']: SeqrPushDigest(
+                digest=r['digest'],
+                row_digests=from_db_json(r['row_digests']) if r['row_digests'] else {},
+            )
+            for r in rows
+        }
+
+    async def set_digests(
+        self,
+        project: ProjectId,
+        sequencing_type: str,
+        seqr_guid: str,
+        digests: dict[str, SeqrPushDigest],
+    ):
+        """Record the digests of the payloads just pushed, by section"""
+        if not digests:
+            return
+        await self.connection.execute_many(
+            """
+            INSERT INTO seqr_sync_digest
+                (project, sequencing_type, section, seqr_guid, digest, row_digests)
+            VALUES
+                (:project, :sequencing_type, :section, :seqr_guid, :digest, :row_digests)
+            ON DUPLICATE KEY UPDATE
+                seqr_guid = VALUES(seqr_guid),
+                digest = VALUES(digest),
+                row_digests = VALUES(row_digests),
+                updated_at = CURRENT_TIMESTAMP
+            """,
+            [
+                {
+                    'project': project,
+                    'sequencing_type': sequencing_type,
+                    'section': section,
+                    'seqr_guid': seqr_guid,
+                    'digest': digest.digest,
+                    'row_digests': to_db_json(digest.row_digests),
+                }
+                for section, digest in digests.items()
+            ],
+        )
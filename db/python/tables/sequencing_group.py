@@ -7,7 +7,7 @@ from typing import Any
 
 from db.python.filters.generic import GenericFilter
 from db.python.filters.sequencing_group import SequencingGroupFilter
-from db.python.tables.base import DbBase
+from db.python.tables.base import DbBase, insert_many
 from db.python.utils import NoOpAenter, to_db_json
 from models.models.project import ProjectId
 from models.models.sequencing_group import (
@@ -409,82 +409,112 @@ class SequencingGroupTable(DbBase):
         open_transaction=True,
     ) -> int:
         """Create sequence group"""
-        assert sample_id is not None
-        assert type_ is not None
-        assert technology is not None
-        assert platform is not None
+        sequencing_group_ids = await self.create_sequencing_groups(
+            [
+                {
+                    'sample_id': sample_id,
+                    'type_': type_,
+                    'technology': technology,
+                    'platform': platform,
+                    'assay_ids': assay_ids,
+                    'meta': meta,
+                }
+            ],
+            open_transaction=open_transaction,
+        )
+        return sequencing_group_ids[0]
+
+    async def create_sequencing_groups(
+        self,
+        sequencing_groups: list[dict[str, Any]],
+        open_transaction=True,
+    ) -> list[int]:
+        """
+        Create many sequencing groups (each a dict of the create_sequencing_group
+        arguments) with multi-row inserts, returns the new IDs in the same order.
+
+        Like create_sequencing_group, any active sequencing group of the same
+        (sample, type, technology, platform) is archived, including earlier
+        sequencing groups in this list (which are inserted archived).
+        """
+        if not sequencing_groups:
+            return []
+
+        rows: list[dict[str, Any]] = []
+        for sg in sequencing_groups:
+            row = {
+                'sample_id': sg.get('sample_id'),
+                'type': sg.get('type_'),
+                'technology': sg.get('technology'),
+                'platform': sg.get('platform'),
+            }
+            # check if any values are None and raise an exception if so
+            bad_keys = [k for k, v in row.items() if v is None]
+            if bad_keys:
+                raise ValueError(f'Must provide values for {", ".join(bad_keys)}')
+            row['type'] = row['type'].lower()
+            row['technology'] = row['technology'].lower()
+            row['platform'] = row['platform'].lower()
+            row['meta'] = to_db_json(sg.get('meta') or {})
+            rows.append(row)
+
+        def key(row) -> tuple:
+            return row['sample_id'], row['type'], row['technology'], row['platform']
+
+        # the last sequencing group of each key is the active one
+        last_index_by_key = {key(row): idx for idx, row in enumerate(rows)}
+        for idx, row in enumerate(rows):
+            row['archived'] = last_index_by_key[key(row)] != idx
 
         get_existing_query = """
-        SELECT id
+        SELECT id, sample_id, type, technology, platform
         FROM sequencing_group
-        WHERE
-            sample_id = :sample_id
-            AND type = :type
-            AND technology = :technology
-            AND platform = :platform
-            AND NOT archived
-        """
-        existing_sg_ids = await self.connection.fetch_all(
-            get_existing_query,
-            {
-                'sample_id': sample_id,
-                'type': type_.lower(),
-                'technology': technology.lower(),
-                'platform': platform.lower(),
-            },
-        )
-
-        _query = """
-        INSERT INTO sequencing_group
-            (sample_id, type, technology, platform, meta, audit_log_id, archived)
-        VALUES
-            (:sample_id, :type, :technology, :platform, :meta, :audit_log_id, false)
-        RETURNING id;
-        """
-
-        _seqg_linker_query = """
-        INSERT INTO sequencing_group_assay
-            (sequencing_group_id, assay_id, audit_log_id)
-        VALUES
-            (:seqgroup, :assayid, :audit_log_id)
-        """
-
-        values = {
-            'sample_id': sample_id,
-            'type': type_.lower(),
-            'technology': technology.lower(),
-            'platform': platform.lower(),
-            'meta': to_db_json(meta or {}),
-        }
-        # check if any values are None and raise an exception if so
-        bad_keys = [k for k, v in values.items() if v is None]
-        if bad_keys:
-            raise ValueError(f'Must provide values for {", ".join(bad_keys)}')
+        WHERE sample_id IN :sample_ids AND NOT archived
+        """
 
         with_function = self.connection.transaction if open_transaction else NoOpAenter
 
         async with with_function():
+            existing_rows = await self.connection.fetch_all(
+                get_existing_query,
+                {'sample_ids': list({row['sample_id'] for row in rows})},
+            )
+            existing_sg_ids = [
+                r['id'] for r in existing_rows if key(dict(r)) in last_index_by_key
+            ]
             if existing_sg_ids:
-                await self.archive_sequencing_groups([s['id'] for s in existing_sg_ids])
-
-            id_of_seq_group = await self.connection.fetch_val(
-                _query,
-                {**values, 'audit_log_id': await self.audit_log_id()},
+                await self.archive_sequencing_groups(existing_sg_ids)
+
+            audit_log_id = await self.audit_log_id()
+            columns = [
+                'sample_id',
+                'type',
+                'technology',
+                'platform',
+                'meta',
+                'archived',
+            ]
+            inserted = await insert_many(
+                self.connection,
+                'sequencing_group',
+                [*columns, 'audit_log_id'],
+                ((*(row[c] for c in columns), audit_log_id) for row in rows),
+                returning='id',
+            )
+            new_ids = [r['id'] for r in inserted]
+
+            await insert_many(
+                self.connection,
+                'sequencing_group_assay',
+                ['sequencing_group_id', 'assay_id', 'audit_log_id'],
+                (
+                    (sg_id, assay_id, audit_log_id)
+                    for sg_id, sg in zip(new_ids, sequencing_groups)
+                    for assay_id in sg.get('assay_ids') or []
+                ),
             )
-            if assay_ids:
-                assay_id_insert_values = [
-                    {
-                        'seqgroup': id_of_seq_group,
-                        'assayid': s,
-                        'audit_log_id': await self.audit_log_id(),
-                    }
-                    for s in assay_ids
-                ]
-                await self.connection.execute_many(
-                    _seqg_linker_query, assay_id_insert_values
-                )
 
-            return id_of_seq_group
+            return new_ids
 
     async def update_sequencing_group(
         self, sequencing_group_id: int, meta: dict, platform: str
@@ -0,0 +1,186 @@
+import datetime
+
+from db.python.tables.base import DbBase, insert_many
+from models.models import ProportionalDateTemporalMethod
+from models.models.project import ProjectId
+
+# (project, sequencing_type)
+StorageProportionKey = tuple[ProjectId, str]
+
+
+class StorageProportionTable(DbBase):
+    """
+    Precomputed cram sizes by project / sequencing_type for the proportionate map,
+    stored as a step function (a row for each day the size changes)
+    """
+
+    table_name = 'project_storage_proportion_daily'
+
+    async def get_refresh_state(
+        self, method: ProportionalDateTemporalMethod
+    ) -> tuple[datetime.date, int | None] | None:
+        """
+        Get (refreshed_through, analysis_audit_log_id) for the method, or None
+        if it's never been refreshed
+        """
+        row = await self.connection.fetch_one(
+            """
+            SELECT refreshed_through, analysis_audit_log_id
+            FROM project_storage_proportion_refresh
+            WHERE temporal_method = :method
+            """,
+            {'method': method.value},
+        )
+        if not row:
+            return None
+        return row['refreshed_through'], row['analysis_audit_log_id']
+
+    async def set_refresh_state(
+        self,
+        method: ProportionalDateTemporalMethod,
+        refreshed_through: datetime.date,
+        analysis_audit_log_id: int | None,
+    ):
+        """Record how far the method has been refreshed"""
+        await self.connection.execute(
+            """
+            INSERT INTO project_storage_proportion_refresh
+                (temporal_method, refreshed_through, analysis_audit_log_id)
+            VALUES (:method, :refreshed_through, :analysis_audit_log_id)
+            ON DUPLICATE KEY UPDATE
+                refreshed_through = :refreshed_through,
+                analysis_audit_log_id = :analysis_audit_log_id
+            """,
+            {
+                'method': method.value,
+                'refreshed_through': refreshed_through,
+                'analysis_audit_log_id': analysis_audit_log_id,
+            },
+        )
+
+    async def get_project_names(self) -> dict[ProjectId, str]:
+        """Get the names of all projects (regardless of access)"""
+        rows = await self.connection.fetch_all('SELECT id, name FROM project')
+        return {r['id']: r['name'] for r in rows}
+
+    async def get_max_analysis_audit_log_id(self) -> int | None:
+        """Every write to an analysis sets a new audit_log_id"""
+        return await self.connection.fetch_val('SELECT MAX(audit_log_id) FROM analysis')
+
+    async def get_projects_affected_since(
+        self, analysis_audit_log_id: int, refreshed_through: datetime.date
+    ) -> dict[ProjectId, datetime.date]:
+        """
+        Find the projects with cram / es-index / joint-calling analyses written since
+        the audit_log_id, and the earliest day each project's sizes could have
+        changed from. A cram can change the size from its sample's create date.
+
+        Analyses completed after the previous refreshed_through are always included,
+        as they only affected days that weren't precomputed at the time.
+        """
+        _query = """
+            WITH changed AS (
+                SELECT
+                    a.type,
+                    COALESCE(s.project, a.project) AS project,
+                    s.id AS sample_id,
+                    COALESCE(DATE(a.timestamp_completed), CURDATE()) AS completed
+                FROM analysis a
+                LEFT JOIN analysis_sequencing_group asg ON asg.analysis_id = a.id
+                LEFT JOIN sequencing_group sg ON sg.id = asg.sequencing_group_id
+                LEFT JOIN sample s ON s.id = sg.sample_id
+                WHERE
+                    (
+                        a.audit_log_id > :analysis_audit_log_id
+                        OR DATE(a.timestamp_completed) > :refreshed_through
+                    )
+                    AND a.type IN ('cram', 'es-index', 'joint-calling')
+            ),
+            sample_created AS (
+                SELECT id, DATE(MIN(row_start)) AS created
+                FROM sample FOR SYSTEM_TIME ALL
+                WHERE id IN (SELECT sample_id FROM changed WHERE type = 'cram')
+                GROUP BY id
+            )
+            SELECT
+                changed.project,
+                MIN(LEAST(changed.completed, COALESCE(sc.created, changed.completed)))
+                    AS affected_from
+            FROM changed
+            LEFT JOIN sample_created sc
+                ON changed.type = 'cram' AND sc.id = changed.sample_id
+            GROUP BY changed.project
+        """
+        rows = await self.connection.fetch_all(
+            _query,
+            {
+                'analysis_audit_log_id': analysis_audit_log_id,
+                'refreshed_through': refreshed_through,
+            },
+        )
+        return {r['project']: r['affected_from'] for r in rows}
+
+    async def get_sizes(
+        self,
+        method: ProportionalDateTemporalMethod,
+        projects: list[ProjectId],
+        sequencing_types: list[str] | None,
+        end_date: datetime.date,
+    ) -> list[tuple[datetime.date, StorageProportionKey, int]]:
+        """
+        Get the (date, (project, sequencing_type), size) steps up to the end date,
+        ordered by date
+        """
+        _query = f"""
+            SELECT date, project, sequencing_type, size
+            FROM project_storage_proportion_daily
+            WHERE
+                temporal_method = :method
+                AND project IN :projects
+                AND date <= :end_date
+                {'AND sequencing_type IN :sequencing_types' if sequencing_types else ''}
+            ORDER BY date
+        """
+        values: dict = {
+            'method': method.value,
+            'projects': projects,
+            'end_date': end_date,
+        }
+        if sequencing_types:
+            values['sequencing_types'] = sequencing_types
+
+        rows = await self.connection.fetch_all(_query, values)
+        return [
+            (r['date'], (r['project'], r['sequencing_type']), r['size']) for r in rows
+        ]
+
+    async def replace_sizes_from(
+        self,
+        method: ProportionalDateTemporalMethod,
+        projects: list[ProjectId],
+        from_date: datetime.date,
+        sizes: list[tuple[datetime.date, StorageProportionKey, int]],
+    ):
+        """
+        Replace the steps of the projects on / after from_date with the new steps
+        """
+        async with self.connection.transaction():
+            await self.connection.execute(
+                """
+                DELETE FROM project_storage_proportion_daily
+                WHERE
+                    temporal_method = :method
+                    AND project IN :projects
+                    AND date >= :from_date
+                """,
+                {'method': method.value, 'projects': projects, 'from_date': from_date},
+            )
+            await insert_many(
+                self.connection,
+                'project_storage_proportion_daily',
+                ['temporal_method', 'project', 'sequencing_type', 'date', 'size'],
+                (
+                    (method.value, project, sequencing_type, date, size)
+                    for date, (project, sequencing_type), size in sizes
+                ),
+            )
@@ -2,7 +2,7 @@ import json
 import logging
 import os
 import re
-from typing import Any, TypeVar
+from typing import Any, Iterable, Iterator, TypeVar
 
 T = TypeVar('T')
 X = TypeVar('X')
@@ -132,6 +132,21 @@ def split_generic_terms(string: str) -> list[str]:
     return filenames
 
 
+def chunk(iterable: Iterable[T], chunk_size=50) -> Iterator[list[T]]:
+    """
+    Chunk a sequence by yielding lists of `chunk_size`
+    """
+    chnk: list[T] = []
+    for element in iterable:
+        chnk.append(element)
+        if len(chnk) >= chunk_size:
+            yield chnk
+            chnk = []
+
+    if chnk:
+        yield chnk
+
+
 def escape_like_term(query: str):
     """
     Escape meaningful keys when using LIKE with a user supplied input
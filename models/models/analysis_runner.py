@@ -1,3 +1,4 @@
+import base64
 import datetime
 
 from models.base import SMBase, parse_sql_dict
@@ -21,11 +22,12 @@ class AnalysisRunnerInternal(SMBase):
     driver_image: str
     config_path: str | None
     cwd: str | None
-    environment: str
+    # environment / config_path / meta are None if the heavy fields weren't fetched
+    environment: str | None
     hail_version: str | None
     batch_url: str
     submitting_user: str
-    meta: dict[str, str]
+    meta: dict[str, str] | None
 
     # on insert
     audit_log_id: int | None = None
@@ -60,6 +62,29 @@ class AnalysisRunnerInternal(SMBase):
             output_path=kwargs.pop('output_path'),
         )
 
+    @property
+    def cursor(self) -> str:
+        """
+        Opaque position of this record in the (timestamp, ar_guid) descending
+        order of logs, to request the page of logs that follow it
+        """
+        timestamp = self.timestamp.isoformat() if self.timestamp else ''
+        return base64.urlsafe_b64encode(f'{timestamp}|{self.ar_guid}'.encode()).decode()
+
+    @staticmethod
+    def parse_cursor(cursor: str) -> tuple[datetime.datetime | None, str]:
+        """Parse a cursor (from AnalysisRunnerInternal.cursor) to (timestamp, ar_guid)"""
+        try:
+            timestamp, ar_guid = (
+                base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+            )
+            return (
+                datetime.datetime.fromisoformat(timestamp) if timestamp else None,
+                ar_guid,
+            )
+        except ValueError as e:
+            raise ValueError(f'Invalid analysis-runner cursor {cursor!r}') from e
+
     def to_external(self, project_map: dict[ProjectId, str]):
         """Convert to transport model"""
         return AnalysisRunner(
@@ -81,6 +106,7 @@ class AnalysisRunnerInternal(SMBase):
             submitting_user=self.submitting_user,
             meta=self.meta,
             audit_log_id=self.audit_log_id,
+            cursor=self.cursor,
         )
 
 
@@ -98,12 +124,14 @@ class AnalysisRunner(SMBase):
     script: str
     description: str
     driver_image: str
-    config_path: str
+    config_path: str | None
     cwd: str | None
-    environment: str
+    environment: str | None
     hail_version: str | None
     batch_url: str
     submitting_user: str
-    meta: dict[str, str]
+    meta: dict[str, str] | None
     project: str
     audit_log_id: int | None
+    # pass as `after` to get the logs submitted before this one
+    cursor: str | None = None
@@ -45,7 +45,8 @@ class CommentInternal(SMBase):
     requested_entity_id: int
     comment_entity_type: CommentEntityType
     comment_entity_id: int
-    versions: list[CommentVersionInternal]
+    # previous versions of the comment, None if the history wasn't loaded
+    versions: list[CommentVersionInternal] | None
     thread: list['CommentInternal']
     status: CommentStatus
 
@@ -54,16 +55,40 @@ class CommentInternal(SMBase):
         self.thread.append(comment)
 
     @staticmethod
-    def from_db_versions(versions: list[dict[str, Any]]):
+    def from_db(
+        row: dict[str, Any],
+        requested_entity_id: int,
+        comment_entity_type: CommentEntityType,
+        comment_entity_id: int,
+    ):
         """
-        Convert from a list of ordered comment versions to a
-        single comment instance with version
+        Convert from the current version of a comment (with the author and timestamp
+        of its first and latest versions) to a comment instance, without history
         """
+        return CommentInternal(
+            id=row['id'],
+            parent_id=row['parent_id'],
+            requested_entity_id=requested_entity_id,
+            comment_entity_type=comment_entity_type,
+            comment_entity_id=comment_entity_id,
+            content=row['content'],
+            author=row['author'],
+            created_at=assume_utc(row['created_at']),
+            updated_at=assume_utc(row['updated_at']),
+            thread=[],
+            versions=None,
+            status=row['status'],
+        )
 
-        first_version = versions[0]
-        last_version = versions[-1]
-
-        history = [
+    @staticmethod
+    def history_from_db_versions(
+        versions: list[dict[str, Any]],
+    ) -> list[CommentVersionInternal]:
+        """
+        Convert from a list of ordered comment versions to the history of the
+        comment, ie: every version except the current one
+        """
+        return [
             CommentVersionInternal(
                 author=v.get('author'),
                 timestamp=assume_utc(v.get('timestamp')),
@@ -73,21 +98,6 @@ class CommentInternal(SMBase):
             for v in versions[0:-1]
         ]
 
-        return CommentInternal(
-            id=first_version.get('comment_id'),
-            parent_id=last_version.get('parent_id'),
-            requested_entity_id=first_version.get('requested_entity_id'),
-            comment_entity_type=first_version.get('comment_entity_type'),
-            comment_entity_id=first_version.get('comment_entity_id'),
-            content=last_version.get('content'),
-            author=first_version.get('author'),
-            created_at=assume_utc(first_version.get('timestamp')),
-            updated_at=assume_utc(last_version.get('timestamp')),
-            thread=[],
-            versions=history,
-            status=last_version.get('status'),
-        )
-
 
 class DiscussionInternal(SMBase):
     """
@@ -0,0 +1,149 @@
+import dataclasses
+from typing import Iterable
+
+from api.settings import (
+    COHORT_CHECKSUM_OFFSET,
+    COHORT_PREFIX,
+    COHORT_TEMPLATE_CHECKSUM_OFFSET,
+    COHORT_TEMPLATE_PREFIX,
+    SAMPLE_CHECKSUM_OFFSET,
+    SAMPLE_PREFIX,
+    SEQUENCING_GROUP_CHECKSUM_OFFSET,
+    SEQUENCING_GROUP_PREFIX,
+)
+from models.utils.luhn import luhn_compute_many
+
+# invalid identifiers listed in the message of an InvalidIdentifiersError
+MAX_REPORTED_ERRORS = 10
+
+
+class InvalidIdentifiersError(ValueError):
+    """
+    Some identifiers in a list are invalid, errors is a list of
+    (position, identifier, reason) for every invalid identifier
+    """
+
+    def __init__(self, kind: str, errors: list[tuple[int, object, str]]):
+        self.errors = errors
+        details = '; '.join(
+            f'[{position}] {identifier!r}: {reason}'
+            for position, identifier, reason in errors[:MAX_REPORTED_ERRORS]
+        )
+        if len(errors) > MAX_REPORTED_ERRORS:
+            details += f'; and {len(errors) - MAX_REPORTED_ERRORS} more'
+        super().__init__(f'{len(errors)} invalid {kind} identifier(s): {details}')
+
+
+@dataclasses.dataclass(frozen=True)
+class IdCodec:
+    """
+    Formats raw (int) identifiers as {PREFIX}{id}{luhn check digit}, and parses
+    them back, a whole list at a time
+    """
+
+    kind: str
+    prefix: str
+    checksum_offset: int
+
+    def format(self, identifier: int | str) -> str:
+        """Format a single raw identifier"""
+        return self.format_list([identifier])[0]
+
+    def format_list(self, identifiers: Iterable[int | str]) -> list[str]:
+        """
+        Format a list of raw identifiers, identifiers that are already formatted
+        are returned as they are
+        """
+        raw: list[int] = []
+        formatted: dict[int, str] = {}
+        for position, identifier in enumerate(identifiers):
+            if isinstance(identifier, int):
+                if identifier < 0:
+                    raise ValueError(
+                        f'Unexpected negative {self.kind} identifier {identifier} '
+                        f'(at position {position})'
+                    )
+                raw.append(identifier)
+            elif identifier.isdigit():
+                raw.append(int(identifier))
+            elif identifier.startswith(self.prefix):
+                formatted[position] = identifier
+                raw.append(0)
+            else:
+                raise ValueError(
+                    f'Unexpected format for {self.kind} identifier {identifier!r} '
+                    f'(at position {position})'
+                )
+
+        check_digits = luhn_compute_many(raw, offset=self.checksum_offset)
+        prefix = self.prefix
+        if not formatted:
+            return [f'{prefix}{n}{c}' for n, c in zip(raw, check_digits)]
+        return [
+            formatted.get(position) or f'{prefix}{n}{c}'
+            for position, (n, c) in enumerate(zip(raw, check_digits))
+        ]
+
+    def parse(self, identifier: int | str, strict: bool = True) -> int:
+        """Parse a single formatted identifier to its raw (int) identifier"""
+        return self.parse_list([identifier], strict=strict)[0]
+
+    def parse_list(
+        self, identifiers: Iterable[int | str], strict: bool = True
+    ) -> list[int]:
+        """
+        Parse a list of formatted identifiers to their raw (int) identifiers,
+        validating the prefix and check digit of each. Every invalid identifier
+        (with its position) is reported in one InvalidIdentifiersError. If not
+        strict, raw (int) identifiers are returned as they are.
+        """
+        prefix = self.prefix
+        prefix_len = len(prefix)
+        raw: list[int] = []
+        given_check_digits: list[int | None] = []
+        errors: list[tuple[int, object, str]] = []
+        identifiers = list(identifiers)
+        for position, identifier in enumerate(identifiers):
+            if isinstance(identifier, int) and not strict:
+                raw.append(identifier)
+                given_check_digits.append(None)
+                continue
+            if not isinstance(identifier, str):
+                expected_type = 'str' if strict else 'str or int'
+                raise TypeError(
+                    f'Expected {self.kind} identifier type to be {expected_type}, '
+                    f'received {type(identifier)!r} (at position {position})'
+                )
+
+            digits = identifier[prefix_len:]
+            if not identifier.startswith(prefix):
+                errors.append((position, identifier, f'expected prefix {prefix}'))
+            elif len(digits) < 2 or not digits.isdigit() or not digits.isascii():
+                errors.append((position, identifier, 'invalid identifier'))
+            else:
+                raw.append(int(digits[:-1]))
+                given_check_digits.append(int(digits[-1]))
+                continue
+            raw.append(0)
+            given_check_digits.append(None)
+
+        check_digits = luhn_compute_many(raw, offset=self.checksum_offset)
+        for position, (given, expected) in enumerate(
+            zip(given_check_digits, check_digits)
+        ):
+            if given is not None and given != expected:
+                errors.append((position, identifiers[position], 'invalid checksum'))
+
+        if errors:
+            raise InvalidIdentifiersError(self.kind, sorted(errors, key=lambda e: e[0]))
+        return raw
+
+
+SAMPLE_ID_CODEC = IdCodec('sample', SAMPLE_PREFIX, SAMPLE_CHECKSUM_OFFSET)
+SEQUENCING_GROUP_ID_CODEC = IdCodec(
+    'sequencing-group', SEQUENCING_GROUP_PREFIX, SEQUENCING_GROUP_CHECKSUM_OFFSET
+)
+COHORT_ID_CODEC = IdCodec('cohort', COHORT_PREFIX, COHORT_CHECKSUM_OFFSET)
+COHORT_TEMPLATE_ID_CODEC = IdCodec(
+    'cohort template', COHORT_TEMPLATE_PREFIX, COHORT_TEMPLATE_CHECKSUM_OFFSET
+)
@@ -1,3 +1,6 @@
+from typing import Iterable
+
+
 def luhn_is_valid(n: int, offset: int = 0):
     """
     Based on: https://stackoverflow.com/a/21079551
@@ -39,3 +42,52 @@ def luhn_compute(n: int, offset: int = 0):
     result = sum(m) + sum(d + (d >= 5) for d in m[::2])
     checksum = ((-result % 10) + offset) % 10
     return checksum
+
+
+def _luhn_pair_sum(pair: int) -> int:
+    """Luhn sum of a two digit block, where the lower digit is doubled"""
+    low, high = pair % 10, pair // 10
+    return 2 * low - 9 * (low >= 5) + high
+
+
+# Luhn sum of every 4 digit block (an even number of digits, so a block's lower
+# digit is always doubled), so a number is summed a block at a time
+_LUHN_BLOCK = 10_000
+_LUHN_BLOCK_SUMS = [
+    _luhn_pair_sum(block % 100) + _luhn_pair_sum(block // 100)
+    for block in range(_LUHN_BLOCK)
+]
+
+
+def luhn_compute_many(ns: Iterable[int], offset: int = 0) -> list[int]:
+    """
+    Compute the Luhn check digit of many numbers at once, the same as
+    luhn_compute, but summing 4 digits at a time. Numbers must not be negative.
+
+    >>> luhn_compute_many([453201511283036, 601151443354620, 677154949558680])
+    [6, 1, 2]
+
+    >>> luhn_compute_many([-1])
+    Traceback (most recent call last):
+    ...
+    ValueError: Cannot compute the Luhn check digit of a negative number: -1
+
+    >>> all(
+    ...     luhn_compute_many([n], offset=3) == [luhn_compute(n, offset=3)]
+    ...     for n in range(0, 200_000, 7)
+    ... )
+    True
+    """
+    block_sums = _LUHN_BLOCK_SUMS
+    check_digits = []
+    for n in ns:
+        if n < 0:
+            raise ValueError(
+                f'Cannot compute the Luhn check digit of a negative number: {n}'
+            )
+        total = 0
+        while n:
+            n, block = divmod(n, _LUHN_BLOCK)
+            total += block_sums[block]
+        check_digits.append((offset - total) % 10)
+    return check_digits
@@ -3,13 +3,25 @@
 GraphQL utilities for Metamist, allows you to:
     - construct queries using the `gql` function (which validates graphql syntax)
     - validate queries with metamist schema (by fetching the schema)
+    - batch concurrent `query_async` calls into fewer requests, with
+      `configure_batching`
+
+The schema is only fetched (by an introspection query) if this package wasn't
+built with the server's version of the schema, and it isn't already cached on
+disk (in SM_GRAPHQL_SCHEMA_CACHE, default: ~/.cache/metamist/graphql) for the
+server's version.
 """
 
+import asyncio
+import functools
+import hashlib
+import importlib.metadata
 import os
 from json.decoder import JSONDecodeError
 from typing import Any, Dict
 
 import backoff
+import requests
 from gql import Client
 from gql import gql as gql_constructor
 from gql.transport.aiohttp import AIOHTTPTransport
@@ -19,15 +31,37 @@ from gql.transport.requests import RequestsHTTPTransport
 from gql.transport.requests import log as requests_logger
 
 # this does not import itself, it imports the module
-from graphql import DocumentNode  # type: ignore
+from graphql import (  # type: ignore
+    DocumentNode,
+    build_client_schema,
+    get_introspection_query,
+    print_schema,
+)
 from requests.exceptions import HTTPError
 
 from cpg_utils.cloud import get_google_identity_token
 
 import metamist.configuration
+from metamist.graphql.batching import (
+    DEFAULT_BATCH_WINDOW,
+    DEFAULT_MAX_BATCH_SIZE,
+    DEFAULT_MAX_IN_FLIGHT,
+    QueryBatcher,
+    is_query,
+)
 
 _sync_client: Client | None = None
 _async_client: Client | None = None
+_batcher: QueryBatcher | None = None
+
+SCHEMA_CACHE_DIR = os.getenv(
+    'SM_GRAPHQL_SCHEMA_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'metamist', 'graphql'),
+)
+# the metamist server sets this header on every response
+VERSION_HEADER = 'X-Metamist-Version'
+# number of parsed query strings to keep
+GQL_CACHE_SIZE = 256
 
 
 def get_local_schema() -> str:
@@ -43,12 +77,97 @@ def get_sm_url():
     return os.path.join(metamist.configuration.sm_url, 'graphql')
 
 
+def get_client_version() -> str | None:
+    """Version of this package (and so of the bundled schema)"""
+    try:
+        return importlib.metadata.version('metamist')
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def get_server_version(url: str, headers: dict[str, str]) -> str | None:
+    """Version of the metamist server, from the response to a trivial query"""
+    try:
+        response = requests.post(
+            url, json={'query': '{ __typename }'}, headers=headers, timeout=30
+        )
+        response.raise_for_status()
+    except requests.RequestException:
+        return None
+    return response.headers.get(VERSION_HEADER)
+
+
+def fetch_schema(url: str, headers: dict[str, str]) -> str:
+    """Fetch the schema from the server with an introspection query"""
+    response = requests.post(
+        url, json={'query': get_introspection_query()}, headers=headers, timeout=120
+    )
+    response.raise_for_status()
+    return print_schema(build_client_schema(response.json()['data']))
+
+
+def _schema_cache_path(url: str, version: str) -> str:
+    url_key = hashlib.sha256(url.encode()).hexdigest()[:16]
+    return os.path.join(SCHEMA_CACHE_DIR, f'{url_key}-{version}.graphql')
+
+
+def get_schema(url: str, headers: dict[str, str]) -> str | None:
+    """
+    Get the schema of the server, without an introspection query if possible:
+        - the bundled schema, if the server is the same version as this package
+        - the schema cached on disk for the server's version
+    otherwise fetch it, and cache it for the next process. Returns None if the
+    server doesn't report its version (so the client has to fetch the schema).
+    """
+    version = get_server_version(url, headers)
+    if not version:
+        return None
+
+    if version == get_client_version():
+        try:
+            return get_local_schema()
+        except FileNotFoundError:
+            pass
+
+    path = _schema_cache_path(url, version)
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        pass
+
+    schema = fetch_schema(url, headers)
+    try:
+        os.makedirs(SCHEMA_CACHE_DIR, exist_ok=True)
+        # many jobs might start at once, so write the cache atomically
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(schema)
+        os.replace(tmp_path, path)
+    except OSError:
+        # eg: read-only home directory, the schema just isn't cached
+        pass
+
+    return schema
+
+
+def _get_headers(auth_token: str | None) -> dict[str, str]:
+    env = os.getenv('SM_ENVIRONMENT', 'PRODUCTION').lower()
+    if env == 'local':
+        return {}
+    token = auth_token or get_google_identity_token(
+        target_audience=metamist.configuration.sm_url
+    )
+    return {'Authorization': f'Bearer {token}'}
+
+
 def configure_sync_client(
     url: str = None,
     schema: str = None,
     auth_token: str = None,
     force_recreate=False,
     use_local_schema: bool = False,
+    use_schema_cache: bool = True,
 ):
     """Get sync gql Client"""
     global _sync_client
@@ -61,17 +180,11 @@ def configure_sync_client(
     if _sync_client and not force_recreate:
         return _sync_client
 
-    env = os.getenv('SM_ENVIRONMENT', 'PRODUCTION').lower()
-    if env == 'local':
-        transport = RequestsHTTPTransport(url=url or get_sm_url())
-    else:
-        token = auth_token or get_google_identity_token(
-            target_audience=metamist.configuration.sm_url
-        )
-        transport = RequestsHTTPTransport(
-            url=url or get_sm_url(),
-            headers={'Authorization': f'Bearer {token}'},
-        )
+    url = url or get_sm_url()
+    headers = _get_headers(auth_token)
+    transport = RequestsHTTPTransport(url=url, headers=headers or None)
+    if schema is None and use_schema_cache:
+        schema = get_schema(url, headers)
 
     _sync_client = Client(
         transport=transport, schema=schema, fetch_schema_from_transport=schema is None
@@ -82,7 +195,11 @@ def configure_sync_client(
 
 
 async def configure_async_client(
-    url: str = None, schema: str = None, auth_token: str = None, force_recreate=False
+    url: str = None,
+    schema: str = None,
+    auth_token: str = None,
+    force_recreate=False,
+    use_schema_cache: bool = True,
 ) -> Client:
     """Configure an async client for use with the Metamist GraphQL API"""
     global _async_client
@@ -90,17 +207,12 @@ async def configure_async_client(
     if _async_client and not force_recreate:
         return _async_client
 
-    env = os.getenv('SM_ENVIRONMENT', 'PRODUCTION').lower()
-    if env == 'local':
-        transport = AIOHTTPTransport(url=url or get_sm_url())
-    else:
-        token = auth_token or get_google_identity_token(
-            target_audience=metamist.configuration.sm_url
-        )
-        transport = AIOHTTPTransport(
-            url=url or get_sm_url(),
-            headers={'Authorization': f'Bearer {token}'},
-        )
+    url = url or get_sm_url()
+    headers = _get_headers(auth_token)
+    transport = AIOHTTPTransport(url=url, headers=headers or None)
+    if schema is None and use_schema_cache:
+        # get_schema makes (blocking) requests, so don't block the event loop
+        schema = await asyncio.to_thread(get_schema, url, headers)
 
     _async_client = Client(
         transport=transport, schema=schema, fetch_schema_from_transport=schema is None
@@ -114,14 +226,61 @@ async def get_async_client():
     return await configure_async_client()
 
 
+def configure_batching(
+    url: str = None,
+    auth_token: str = None,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    batch_window: float = DEFAULT_BATCH_WINDOW,
+    compress: bool = False,
+) -> QueryBatcher:
+    """
+    Send concurrent `query_async` calls (that don't specify a client) to the
+    server in batches, eg:
+
+        configure_batching()
+        results = await asyncio.gather(*(query_async(q, v) for v in variables))
+        await stop_batching()
+
+    Queries aren't validated against the schema before they're sent, and
+    mutations are still sent on their own.
+    """
+    global _batcher
+
+    _batcher = QueryBatcher(
+        url=url or get_sm_url(),
+        headers=_get_headers(auth_token),
+        max_batch_size=max_batch_size,
+        max_in_flight=max_in_flight,
+        batch_window=batch_window,
+        compress=compress,
+    )
+    return _batcher
+
+
+async def stop_batching():
+    """Send any queued queries, and stop batching `query_async` calls"""
+    global _batcher
+
+    if _batcher is not None:
+        await _batcher.close()
+        _batcher = None
+
+
+@functools.lru_cache(maxsize=GQL_CACHE_SIZE)
+def _parse(request_string: str) -> DocumentNode:
+    return gql_constructor(request_string)
+
+
 def gql(
     request_string: str, should_validate=False, use_local_schema=False
 ) -> DocumentNode:
     """
-    Given a String containing a GraphQL request, parse it into a Document.
+    Given a String containing a GraphQL request, parse it into a Document
+    (which is cached, so repeated requests are only parsed once).
     Optionally validate by fetching schema from metamist at SM_URL / SM_ENVIRONMENT
     """
-    doc = gql_constructor(request_string)
+    doc = _parse(request_string)
     if should_validate:
         validate(doc, use_local_schema=use_local_schema)
     return doc
@@ -198,13 +357,16 @@ async def query_async(
     if log_response:
         aiohttp_logger.setLevel('WARNING')
 
-    if not client:
-        client = await configure_async_client()
+    if not client and _batcher is not None and is_query(_query):
+        response = await _batcher.query(_query, variables)
+    else:
+        if not client:
+            client = await configure_async_client()
 
-    response = await client.execute_async(
-        _query if isinstance(_query, DocumentNode) else gql(_query),
-        variable_values=variables,
-    )
+        response = await client.execute_async(
+            _query if isinstance(_query, DocumentNode) else gql(_query),
+            variable_values=variables,
+        )
 
     if log_response:
         aiohttp_logger.setLevel(current_level)
@@ -0,0 +1,160 @@
+"""
+Coalesce concurrent GraphQL queries into batched requests, see
+`metamist.graphql.configure_batching`.
+"""
+
+import asyncio
+import gzip
+import json
+from typing import Any, Dict
+
+import aiohttp
+from gql.transport.exceptions import TransportQueryError, TransportServerError
+from graphql import (  # type: ignore
+    DocumentNode,
+    OperationDefinitionNode,
+    OperationType,
+    parse,
+    print_ast,
+)
+
+# operations sent in one request (the server accepts up to 100)
+DEFAULT_MAX_BATCH_SIZE = 50
+# batched requests in flight at once
+DEFAULT_MAX_IN_FLIGHT = 4
+# how long (in seconds) to wait for more queries before sending a batch
+DEFAULT_BATCH_WINDOW = 0.005
+
+
+def is_query(document: DocumentNode | str) -> bool:
+    """
+    Does the document only contain query operations (the server doesn't batch
+    mutations, as they'd be run concurrently on one connection)
+    """
+    if isinstance(document, str):
+        document = parse(document)
+    return all(
+        definition.operation == OperationType.QUERY
+        for definition in document.definitions
+        if isinstance(definition, OperationDefinitionNode)
+    )
+
+
+class QueryBatcher:
+    """
+    Collects queries made (concurrently) within batch_window of each other, and
+    sends them to {url}/batch in one request, with at most max_in_flight
+    requests at once, over a kept-alive connection. If compress, the request
+    body is gzip compressed (responses are compressed regardless).
+    """
+
+    def __init__(
+        self,
+        url: str,
+        headers: dict[str, str] | None = None,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        batch_window: float = DEFAULT_BATCH_WINDOW,
+        compress: bool = False,
+        timeout: float = 300,
+    ):
+        self.url = url.rstrip('/') + '/batch'
+        self.headers = headers or {}
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.compress = compress
+        self.timeout = timeout
+
+        self._pending: list[tuple[dict[str, Any], asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._session: aiohttp.ClientSession | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def query(
+        self, document: DocumentNode | str, variables: Dict | None = None
+    ) -> Dict[str, Any]:
+        """Queue the query for the next batch, and wait for its result"""
+        operation: dict[str, Any] = {
+            'query': document if isinstance(document, str) else print_ast(document),
+            'variables': variables or {},
+        }
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((operation, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._send(batch))
+        # keep a reference so the task isn't garbage collected
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(keepalive_timeout=60),
+            )
+        return self._session
+
+    async def _send(self, batch: list[tuple[dict[str, Any], asyncio.Future]]):
+        body = json.dumps([operation for operation, _ in batch]).encode()
+        headers = {'Content-Type': 'application/json'}
+        if self.compress:
+            body = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+
+        try:
+            async with self._semaphore:
+                async with self._get_session().post(
+                    self.url, data=body, headers=headers
+                ) as response:
+                    if response.status >= 500:
+                        raise TransportServerError(
+                            f'{response.status}: {await response.text()}',
+                            response.status,
+                        )
+                    response.raise_for_status()
+                    results = await response.json()
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if result.get('errors'):
+                future.set_exception(
+                    TransportQueryError(
+                        str(result['errors'][0]),
+                        errors=result['errors'],
+                        data=result.get('data'),
+                    )
+                )
+            else:
+                future.set_result(result['data'])
+
+    async def close(self):
+        """Send any queued queries, and close the connection"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,153 @@
+"""
+Write parsed records to metamist in size-bounded batches, sent concurrently,
+with the concurrency adapted to the observed latency (and errors) of the server.
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Any, Awaitable, Callable, Iterable, Iterator, TypeVar
+
+logger = logging.getLogger(__file__)
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# records (participants, samples, sequencing groups, assays) per upsert request
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_INITIAL_CONCURRENCY = 2
+DEFAULT_MAX_CONCURRENCY = 8
+# requests slower than this (in seconds) reduce the concurrency
+DEFAULT_TARGET_LATENCY = 30.0
+DEFAULT_MAX_RETRIES = 3
+# seconds to wait before the first retry, doubled for each subsequent retry
+DEFAULT_RETRY_BACKOFF = 2.0
+
+
+class AdaptiveLimiter:
+    """
+    Limits the number of concurrent requests, adapting the limit to the server:
+    the limit grows by one for each request faster than target_latency, and is
+    halved for each request that's slower or fails (additive increase,
+    multiplicative decrease).
+    """
+
+    def __init__(
+        self,
+        initial: int = DEFAULT_INITIAL_CONCURRENCY,
+        minimum: int = 1,
+        maximum: int = DEFAULT_MAX_CONCURRENCY,
+        target_latency: float = DEFAULT_TARGET_LATENCY,
+    ):
+        if not 1 <= minimum <= initial <= maximum:
+            raise ValueError(
+                f'Expected 1 <= minimum ({minimum}) <= initial ({initial}) '
+                f'<= maximum ({maximum})'
+            )
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+
+        self.in_flight = 0
+        self._condition: asyncio.Condition | None = None
+
+    def record(self, latency: float, ok: bool = True):
+        """Adjust the limit from the result of a request"""
+        if ok and latency <= self.target_latency:
+            self.limit = min(self.maximum, self.limit + 1)
+        else:
+            self.limit = max(self.minimum, self.limit // 2)
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """Wait for (and hold) one of the limited concurrent slots"""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+
+def size_bounded_batches(
+    items: Iterable[T], size: Callable[[T], int], max_size: int
+) -> Iterator[list[T]]:
+    """
+    Split items into batches whose total size is at most max_size, keeping their
+    order. An item larger than max_size is a batch on its own.
+    """
+    batch: list[T] = []
+    batch_size = 0
+    for item in items:
+        item_size = size(item)
+        if batch and batch_size + item_size > max_size:
+            yield batch
+            batch, batch_size = [], 0
+        batch.append(item)
+        batch_size += item_size
+
+    if batch:
+        yield batch
+
+
+async def write_batches(
+    batches: list[T],
+    write: Callable[[T], Awaitable[R]],
+    limiter: AdaptiveLimiter,
+    is_retryable: Callable[[Exception], bool] = lambda _: True,
+    before_retry: Callable[[T], Awaitable[Any]] | None = None,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    retry_backoff: float = DEFAULT_RETRY_BACKOFF,
+) -> list[R]:
+    """
+    Write every batch, concurrently (as allowed by the limiter), returning the
+    results in the order of the batches. A batch that fails with a retryable
+    error is retried (with exponential backoff), calling before_retry first so
+    the batch can be made safe to resend, eg: by matching records that were
+    created by an attempt that failed after the server had committed it.
+
+    Every batch is attempted before the first error is raised.
+    """
+
+    async def _write(idx: int, batch: T) -> R:
+        attempt = 0
+        while True:
+            if attempt and before_retry:
+                await before_retry(batch)
+            async with limiter.slot():
+                start = time.monotonic()
+                try:
+                    result = await write(batch)
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    limiter.record(time.monotonic() - start, ok=False)
+                    if attempt >= max_retries or not is_retryable(e):
+                        raise
+                    error = e
+                else:
+                    limiter.record(time.monotonic() - start)
+                    return result
+
+            delay = retry_backoff * 2**attempt
+            logger.warning(
+                f'Batch {idx + 1}/{len(batches)} failed ({error!r}), retrying in '
+                f'{delay}s with a concurrency of {limiter.limit}'
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    results = await asyncio.gather(
+        *(_write(idx, batch) for idx, batch in enumerate(batches)),
+        return_exceptions=True,
+    )
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        logger.error(f'{len(errors)} of {len(batches)} batches failed to write')
+        raise errors[0]
+    return results  # type: ignore[return-value]
@@ -22,10 +22,13 @@ from typing import (
     TypeVar,
 )
 
+import urllib3
 from cloudpathlib import AnyPath
 from tabulate import tabulate
 
+from metamist.api_client import ApiClient
 from metamist.apis import AnalysisApi, AssayApi, ParticipantApi, SampleApi
+from metamist.exceptions import ApiException
 from metamist.graphql import gql, query_async
 from metamist.models import (
     Analysis,
@@ -35,6 +38,14 @@ from metamist.models import (
     SampleUpsert,
     SequencingGroupUpsert,
 )
+from metamist.parser.batch_writer import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_INITIAL_CONCURRENCY,
+    DEFAULT_MAX_CONCURRENCY,
+    AdaptiveLimiter,
+    size_bounded_batches,
+    write_batches,
+)
 from metamist.parser.cloudhelper import CloudHelper, group_by
 
 logging.basicConfig(level=logging.WARNING)
@@ -60,6 +71,9 @@ ALL_EXTENSIONS = (
 )
 RNA_SEQ_TYPES = ['polyarna', 'totalrna', 'singlecellrna']
 
+# statuses of a failed upsert request that are worth retrying
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
 # construct rmatch string to capture all fastq patterns
 rmatch_str = (
     r'(?:[<>]|\/|_|\.|-|[0-9]|[a-z]|[A-Z])+'
@@ -489,6 +503,8 @@ class GenericParser(CloudHelper):  # pylint: disable=too-many-public-methods,too
         ignore_extra_keys=False,
         skip_checking_gcs_objects=False,
         verbose=True,
+        upsert_batch_size: int = DEFAULT_BATCH_SIZE,
+        max_upsert_concurrency: int = DEFAULT_MAX_CONCURRENCY,
     ):
         self.path_prefix = path_prefix
         self.skip_checking_gcs_objects = skip_checking_gcs_objects
@@ -516,9 +532,17 @@ class GenericParser(CloudHelper):  # pylint: disable=too-many-public-methods,too
         self._client = None
         self.bucket_clients: dict[str, Any] = {}
 
-        self.papi = ParticipantApi()
-        self.sapi = SampleApi()
-        self.asapi = AssayApi()
+        self.upsert_batch_size = upsert_batch_size
+        self.upsert_limiter = AdaptiveLimiter(
+            initial=min(DEFAULT_INITIAL_CONCURRENCY, max_upsert_concurrency),
+            maximum=max_upsert_concurrency,
+        )
+
+        # share one client (and its pool of kept-alive connections) between apis
+        self.api_client = ApiClient()
+        self.papi = ParticipantApi(self.api_client)
+        self.sapi = SampleApi(self.api_client)
+        self.asapi = AssayApi(self.api_client)
 
         super().__init__(search_paths)
 
@@ -675,15 +699,9 @@ class GenericParser(CloudHelper):  # pylint: disable=too-many-public-methods,too
             logger.info(message)
 
         if participants:
-            result = await self.papi.upsert_participants_async(
-                self.project,
-                [p.to_sm() for p in participants],
-            )
+            result = await self.upsert_participants(participants)
         else:
-            result = await self.sapi.upsert_samples_async(
-                self.project,
-                [s.to_sm() for s in samples],
-            )
+            result = await self.upsert_samples(samples)
 
         if self.verbose:
             logger.info(json.dumps(result, indent=2))
@@ -692,6 +710,99 @@ class GenericParser(CloudHelper):  # pylint: disable=too-many-public-methods,too
 
         return result
 
+    # region UPSERTS
+
+    @staticmethod
+    def _count_sample_records(sample: ParsedSample) -> int:
+        """Records (sample, sequencing groups, assays) upserted for a sample"""
+        return sum(
+            1
+            + len(s.sequencing_groups)
+            + sum(len(sg.assays or []) for sg in s.sequencing_groups)
+            for s in ParsedSample.get_all_samples_from([sample])
+        )
+
+    @staticmethod
+    def _is_retryable_upsert_error(error: Exception) -> bool:
+        if isinstance(error, ApiException):
+            return not error.status or error.status in RETRYABLE_STATUSES
+        # connection errors and timeouts
+        return isinstance(
+            error, (urllib3.exceptions.HTTPError, OSError, asyncio.TimeoutError)
+        )
+
+    async def _rematch_samples(self, samples: list[ParsedSample]):
+        """
+        Match the IDs of a batch of samples (and their sequencing groups and
+        assays) again, so records created by a failed (but committed) request
+        are updated rather than created again when it's retried
+        """
+        all_samples = ParsedSample.get_all_samples_from(samples)
+        sequencing_groups = [sg for s in all_samples for sg in s.sequencing_groups]
+        await self.match_sample_ids(samples)
+        await self.match_assay_ids([a for sg in sequencing_groups for a in sg.assays])
+        await self.match_sequencing_group_ids(sequencing_groups)
+
+    async def _rematch_participants(self, participants: list[ParsedParticipant]):
+        await self.match_participant_ids(participants)
+        await self._rematch_samples([s for p in participants for s in p.samples])
+
+    async def upsert_participants(self, participants: list[ParsedParticipant]):
+        """
+        Upsert participants (and their samples) in batches of about
+        upsert_batch_size records, sent concurrently
+        """
+        batches = list(
+            size_bounded_batches(
+                participants,
+                size=lambda p: 1 + sum(map(self._count_sample_records, p.samples)),
+                max_size=self.upsert_batch_size,
+            )
+        )
+        logger.info(
+            f'{self.project}: Upserting {len(participants)} participants '
+            f'in {len(batches)} batches'
+        )
+        results = await write_batches(
+            batches,
+            lambda batch: self.papi.upsert_participants_async(
+                self.project, [p.to_sm() for p in batch]
+            ),
+            limiter=self.upsert_limiter,
+            is_retryable=self._is_retryable_upsert_error,
+            before_retry=self._rematch_participants,
+        )
+        return [r for batch_result in results for r in batch_result]
+
+    async def upsert_samples(self, samples: list[ParsedSample]):
+        """
+        Upsert samples in batches of about upsert_batch_size records,
+        sent concurrently
+        """
+        batches = list(
+            size_bounded_batches(
+                samples,
+                size=self._count_sample_records,
+                max_size=self.upsert_batch_size,
+            )
+        )
+        logger.info(
+            f'{self.project}: Upserting {len(samples)} samples '
+            f'in {len(batches)} batches'
+        )
+        results = await write_batches(
+            batches,
+            lambda batch: self.sapi.upsert_samples_async(
+                self.project, [s.to_sm() for s in batch]
+            ),
+            limiter=self.upsert_limiter,
+            is_retryable=self._is_retryable_upsert_error,
+            before_retry=self._rematch_samples,
+        )
+        return [r for batch_result in results for r in batch_result]
+
+    # endregion UPSERTS
+
     def _get_dict_reader(self, file_pointer, delimiter: str):
         """
         Return a DictReader from file_pointer
@@ -1322,7 +1433,7 @@ class GenericParser(CloudHelper):  # pylint: disable=too-many-public-methods,too
     async def add_analyses(self, analyses_to_add, external_to_internal_id_map):
         """Given an analyses dictionary add analyses"""
         proj = self.project
-        analysisapi = AnalysisApi()
+        analysisapi = AnalysisApi(self.api_client)
 
         logger.info(
             f'{proj}: Adding analysis entries for {len(analyses_to_add)} samples'
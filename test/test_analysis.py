@@ -1,6 +1,6 @@
 # pylint: disable=invalid-overridden-method
 import time
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 from api.routes.analysis import AnalysisUpdateModel, update_analysis
 from db.python.filters import GenericFilter
@@ -16,6 +16,7 @@ from models.models import (
     AnalysisInternal,
     AssayUpsertInternal,
     ParticipantUpsertInternal,
+    ProportionalDateTemporalMethod,
     SampleUpsertInternal,
     SequencingGroupUpsertInternal,
     parse_sql_bool,
@@ -281,6 +282,122 @@ class TestAnalysis(DbIsolatedTest):
         )
         self.assertIsInstance(id_map, list)
 
+    @run_as_sync
+    async def test_get_latest_complete_analysis_for_type(self):
+        """
+        Test the latest completed analysis is found, filtered by (indexed) meta
+        """
+        analysis_ids = {}
+        for sequencing_type, day in (('genome', 1), ('exome', 2), ('genome', 3)):
+            analysis_ids[(sequencing_type, day)] = await self.al.create_analysis(
+                AnalysisInternal(
+                    type='cram',
+                    status=AnalysisStatus.COMPLETED,
+                    sequencing_group_ids=[self.genome_sequencing_group_id],
+                    meta={'sequencing_type': sequencing_type, 'day': day},
+                    timestamp_completed=datetime(2024, 1, day),
+                )
+            )
+        await self.al.create_analysis(
+            AnalysisInternal(
+                type='cram',
+                status=AnalysisStatus.IN_PROGRESS,
+                sequencing_group_ids=[self.genome_sequencing_group_id],
+                meta={'sequencing_type': 'exome'},
+            )
+        )
+
+        latest = await self.al.get_latest_complete_analysis_for_type(
+            project=self.project_id, analysis_type='cram'
+        )
+        self.assertEqual(analysis_ids[('genome', 3)], latest.id)
+
+        latest = await self.al.get_latest_complete_analysis_for_type(
+            project=self.project_id,
+            analysis_type='cram',
+            meta={'sequencing_type': 'exome'},
+        )
+        self.assertEqual(analysis_ids[('exome', 2)], latest.id)
+
+        latest = await self.al.get_latest_complete_analysis_for_type(
+            project=self.project_id,
+            analysis_type='cram',
+            meta={'sequencing_type': 'genome', 'day': 1},
+        )
+        self.assertEqual(analysis_ids[('genome', 1)], latest.id)
+
+        incomplete = await self.al.get_incomplete_analyses(project=self.project_id)
+        self.assertEqual(1, len(incomplete))
+
+    @run_as_sync
+    async def test_get_all_sequencing_group_ids_without_analysis_type(self):
+        """
+        Test sequencing groups without an active analysis of a type are found
+        """
+        await self.al.create_analysis(
+            AnalysisInternal(
+                type='cram',
+                status=AnalysisStatus.COMPLETED,
+                sequencing_group_ids=[self.genome_sequencing_group_id],
+                meta={},
+            )
+        )
+
+        sg_ids = await self.al.get_all_sequencing_group_ids_without_analysis_type(
+            self.project_id, 'cram'
+        )
+        self.assertListEqual([self.exome_sequencing_group_id], sg_ids)
+
+    @run_as_sync
+    async def test_iterate_sample_cram_path_map_for_seqr(self):
+        """
+        Test the cram path map is paged, most recently completed first
+        """
+        await self.pl.upsert_participants(
+            [
+                ParticipantUpsertInternal(
+                    external_ids={PRIMARY_EXTERNAL_ORG: 'PEXT1'},
+                    meta={},
+                    samples=[SampleUpsertInternal(id=self.sample_id)],
+                ),
+            ],
+        )
+        analysis_ids = [
+            await self.al.create_analysis(
+                AnalysisInternal(
+                    type='cram',
+                    status=AnalysisStatus.COMPLETED,
+                    sequencing_group_ids=[self.genome_sequencing_group_id],
+                    meta={'sequencing_type': 'genome'},
+                    output=f'gs://bucket/{i}.cram',
+                )
+            )
+            for i in range(5)
+        ]
+        # two were never marked completed, and are returned last
+        timestamps = [datetime(2024, 1, 2), None, datetime(2024, 1, 3), None]
+        timestamps.append(datetime(2024, 1, 2))
+        for analysis_id, timestamp in zip(analysis_ids, timestamps):
+            await self.connection.connection.execute(
+                'UPDATE analysis SET timestamp_completed = :timestamp WHERE id = :id',
+                {'timestamp': timestamp, 'id': analysis_id},
+            )
+
+        pages = [
+            [row['output'] for row in page]
+            async for page in self.al.at.iterate_sample_cram_path_map_for_seqr(
+                self.project_id, ['genome'], page_size=2
+            )
+        ]
+        self.assertListEqual(
+            [
+                ['gs://bucket/2.cram', 'gs://bucket/4.cram'],
+                ['gs://bucket/0.cram', 'gs://bucket/3.cram'],
+                ['gs://bucket/1.cram'],
+            ],
+            pages,
+        )
+
     @run_as_sync
     async def test_get_sgs_by_analysis_id_with_no_eids(self):
         """
@@ -469,3 +586,42 @@ class TestAnalysis(DbIsolatedTest):
         self.assertEqual(1, len(analyses))
         self.assertEqual(analysis_id, analyses[0].id)
         self.assertFalse(analyses[0].active)
+
+    @run_as_sync
+    async def test_precomputed_cram_size_proportionate_map(self):
+        """
+        Test the proportionate map from the precomputed sizes matches a live compute,
+        and refreshing again only recomputes when analyses have changed
+        """
+        await self.al.create_analysis(
+            AnalysisInternal(
+                type='cram',
+                status=AnalysisStatus.COMPLETED,
+                sequencing_group_ids=[self.genome_sequencing_group_id],
+                meta={'sequencing_type': 'genome', 'size': 1024},
+            )
+        )
+        method = ProportionalDateTemporalMethod.SAMPLE_CREATE_DATE
+        start_date = date.today() - timedelta(days=7)
+
+        live = await self.al.compute_cram_size_proportionate_map(
+            project_name_map={self.project_id: self.project_name},
+            sequencing_types=None,
+            temporal_methods=[method],
+            start_date=start_date,
+            end_date=None,
+        )
+
+        refreshed = await self.al.refresh_storage_proportions()
+        self.assertEqual(1, refreshed[method])
+
+        precomputed = await self.al.get_cram_size_proportionate_map(
+            projects=[self.project_id],
+            sequencing_types=None,
+            temporal_methods=[method],
+            start_date=start_date,
+        )
+        self.assertEqual(live[method], precomputed[method])
+
+        refreshed = await self.al.refresh_storage_proportions()
+        self.assertEqual(0, refreshed[method])
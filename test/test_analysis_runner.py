@@ -123,3 +123,83 @@ class TestAnalysisRunner(DbIsolatedTest):
         )
         self.assertEqual(len(db_ars), 2)
         self.assertSetEqual({a.ar_guid for a in db_ars}, guids_to_query)
+
+    @run_as_sync
+    async def test_query_pages(self):
+        """
+        Test logs are returned most recent first, in pages, filtered by time,
+        and optionally without the heavy fields
+        """
+        for i in range(5):
+            await self.al.insert_analysis_runner_entry(
+                AnalysisRunnerInternal(
+                    ar_guid=f'<ar-guid-{i}>',
+                    project=self.project_id,
+                    output_path='output_path',
+                    timestamp=datetime.datetime(2024, 1, 1),
+                    access_level='test',
+                    repository='repository',
+                    config_path='config_path',
+                    environment='gcp',
+                    submitting_user='submitting_user',
+                    commit='commit',
+                    script='script',
+                    description='description',
+                    hail_version='1.0',
+                    cwd='cwd',
+                    driver_image='driver_image',
+                    batch_url='batch_url',
+                    meta={'meta': 'meta'},
+                )
+            )
+        # the insert timestamps the logs itself, so spread them out
+        for i in range(5):
+            await self.connection.connection.execute(
+                'UPDATE analysis_runner SET timestamp = :timestamp WHERE ar_guid = :ar_guid',
+                {
+                    'timestamp': datetime.datetime(2024, 1, 1 + i // 2),
+                    'ar_guid': f'<ar-guid-{i}>',
+                },
+            )
+
+        filter_ = AnalysisRunnerFilter(project=GenericFilter(eq=self.project_id))
+        pages: list[list[str]] = []
+        after = None
+        while True:
+            page = await self.al.query(filter_, limit=2, after=after)
+            if not page:
+                break
+            pages.append([ar.ar_guid for ar in page])
+            after = page[-1].cursor
+
+        self.assertListEqual(
+            [
+                ['<ar-guid-4>', '<ar-guid-3>'],
+                ['<ar-guid-2>', '<ar-guid-1>'],
+                ['<ar-guid-0>'],
+            ],
+            pages,
+        )
+
+        db_ars = await self.al.query(
+            AnalysisRunnerFilter(
+                project=GenericFilter(eq=self.project_id),
+                timestamp=GenericFilter(
+                    gte=datetime.datetime(2024, 1, 2),
+                    lt=datetime.datetime(2024, 1, 3),
+                ),
+            ),
+            include_heavy_fields=False,
+        )
+        self.assertListEqual(
+            ['<ar-guid-3>', '<ar-guid-2>'], [ar.ar_guid for ar in db_ars]
+        )
+        self.assertIsNone(db_ars[0].meta)
+        self.assertIsNone(db_ars[0].environment)
+        self.assertIsNone(db_ars[0].config_path)
+        self.assertEqual('repository', db_ars[0].repository)
+
+    def test_invalid_cursor(self):
+        """Test an invalid cursor is rejected"""
+        with self.assertRaises(ValueError):
+            AnalysisRunnerInternal.parse_cursor('not-a-cursor')
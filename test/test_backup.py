@@ -0,0 +1,105 @@
+import io
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from db.backup.backup import (
+    MANIFEST_NAME,
+    BackupManifest,
+    ChecksumMismatchError,
+    LocalBackupStore,
+    download_chunks,
+    get_backup_chain,
+    list_backups,
+    next_backup_kind,
+    upload_stream,
+)
+
+
+class TestBackupStreaming(TestCase):
+    """Test the chunked upload / download of streamed backups"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.store = LocalBackupStore(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write_backup(self, name, kind, timestamp, base=None, data=b'backup'):
+        chunks = upload_stream(io.BytesIO(data), self.store, name, chunk_size=4)
+        manifest = BackupManifest(
+            name=name,
+            kind=kind,
+            timestamp=timestamp,
+            chunks=chunks,
+            to_lsn=100,
+            base=base,
+        )
+        self.store.put(f'{name}/{MANIFEST_NAME}', manifest.to_json().encode())
+        return manifest
+
+    def test_upload_and_download_stream(self):
+        """Test a stream is uploaded in chunks, and reassembled in order"""
+        data = random.Random(1).randbytes(10_000)
+        chunks = upload_stream(
+            io.BytesIO(data), self.store, 'backup_1', chunk_size=1024, concurrency=3
+        )
+        self.assertEqual(10, len(chunks))
+        self.assertEqual(10_000, sum(c.size for c in chunks))
+        self.assertEqual('backup_1/chunk-000000', chunks[0].key)
+
+        manifest = BackupManifest(
+            name='backup_1', kind='full', timestamp='2024-01-01T00:00:00', chunks=chunks
+        )
+        parsed = BackupManifest.from_json(manifest.to_json())
+        self.assertEqual(manifest, parsed)
+        self.assertEqual(
+            data, b''.join(download_chunks(self.store, parsed, concurrency=2))
+        )
+
+    def test_download_checks_checksums(self):
+        """Test a corrupted chunk fails the download"""
+        manifest = self._write_backup('backup_1', 'full', '2024-01-01T00:00:00')
+        with open(
+            os.path.join(self.tmp_dir.name, 'backup_1', 'chunk-000001'), 'wb'
+        ) as f:
+            f.write(b'oops')
+
+        with self.assertRaises(ChecksumMismatchError):
+            list(download_chunks(self.store, manifest))
+
+    def test_backup_chain(self):
+        """Test incremental backups are restored on top of their full backup"""
+        self._write_backup('backup_1', 'full', '2024-01-01T00:00:00')
+        self._write_backup('backup_2', 'incremental', '2024-01-02T00:00:00', 'backup_1')
+        self._write_backup('backup_3', 'incremental', '2024-01-03T00:00:00', 'backup_2')
+        # interrupted, so has no manifest
+        upload_stream(io.BytesIO(b'partial'), self.store, 'backup_4', chunk_size=4)
+
+        self.assertEqual(
+            ['backup_1', 'backup_2', 'backup_3'],
+            [m.name for m in list_backups(self.store)],
+        )
+        self.assertEqual(
+            ['backup_1', 'backup_2', 'backup_3'],
+            [m.name for m in get_backup_chain(self.store)],
+        )
+        self.assertEqual(
+            ['backup_1', 'backup_2'],
+            [m.name for m in get_backup_chain(self.store, 'backup_2')],
+        )
+
+    def test_next_backup_kind(self):
+        """Test a full backup is taken weekly, and incrementals in between"""
+        self.assertEqual(('full', None), next_backup_kind([], datetime(2024, 1, 1)))
+
+        full = self._write_backup('backup_1', 'full', '2024-01-01T00:00:00')
+        kind, base = next_backup_kind([full], datetime(2024, 1, 2))
+        self.assertEqual('incremental', kind)
+        self.assertEqual('backup_1', base.name)
+
+        kind, base = next_backup_kind([full], datetime(2024, 1, 1) + timedelta(days=7))
+        self.assertEqual(('full', None), (kind, base))
@@ -0,0 +1,114 @@
+import json
+import zlib
+from unittest import TestCase
+
+from db.backup.verify import TableInfo, verify_databases
+
+
+class InMemorySource:
+    """A database to verify, with rows held in memory"""
+
+    def __init__(self, tables: dict[str, list[tuple]]):
+        self.tables = tables
+        self.n_queries = 0
+
+    def _rows(self, table: TableInfo, lo, hi):
+        self.n_queries += 1
+        return [
+            row
+            for row in self.tables.get(table.name, [])
+            if lo is None or lo <= row[0] < hi
+        ]
+
+    def bounds(self, table: TableInfo):
+        ids = [row[0] for row in self._rows(table, None, None)]
+        return (min(ids), max(ids)) if ids else None
+
+    def range_checksum(self, table: TableInfo, lo, hi):
+        rows = self._rows(table, lo, hi)
+        return len(rows), sum(zlib.crc32(repr(row).encode()) for row in rows)
+
+    def range_rows(self, table: TableInfo, lo, hi):
+        return {(row[0],): row for row in self._rows(table, lo, hi)}
+
+
+SAMPLE = TableInfo(
+    name='sample',
+    columns=['id', 'meta'],
+    primary_key=['id'],
+    rangeable=True,
+    system_versioned=True,
+)
+CHANGELOG = TableInfo(name='DATABASECHANGELOG', columns=['id'], primary_key=[])
+
+
+class TestBackupVerification(TestCase):
+    """Test verifying a restored database by checksums of primary key ranges"""
+
+    def test_matching_databases(self):
+        """Test identical databases verify, with every range checked"""
+        rows = {'sample': [(i, f'meta-{i}') for i in range(1, 1001)]}
+        report = verify_databases(
+            InMemorySource(rows), InMemorySource(rows), [SAMPLE], range_size=100
+        )
+        self.assertTrue(report.ok)
+        self.assertEqual(10, report.tables[0].ranges_checked)
+        self.assertEqual(1000, report.tables[0].rows_restored)
+        self.assertEqual(1000, report.tables[0].rows_production)
+
+    def test_finds_differing_rows(self):
+        """Test mismatching ranges are bisected down to the differing rows"""
+        production = {
+            'sample': [(i, f'meta-{i}') for i in range(1, 1001)],
+            'DATABASECHANGELOG': [(1,), (2,)],
+        }
+        restored_samples = [
+            (i, 'changed' if i == 350 else f'meta-{i}')
+            for i in range(1, 1001)
+            if i != 777
+        ]
+        restored_samples.append((1001, 'extra'))
+        restored = InMemorySource(
+            {'sample': restored_samples, 'DATABASECHANGELOG': [(1,), (2,)]}
+        )
+
+        report = verify_databases(
+            restored,
+            InMemorySource(production),
+            [SAMPLE, CHANGELOG],
+            range_size=100,
+            min_range_size=8,
+        )
+        self.assertFalse(report.ok)
+        sample_report, changelog_report = report.tables
+        self.assertTrue(changelog_report.ok)
+        self.assertEqual([(777,)], sample_report.missing_rows)
+        self.assertEqual([(1001,)], sample_report.extra_rows)
+        self.assertEqual([(350,)], sample_report.changed_rows)
+        # only the small ranges around the differing rows are compared by row
+        self.assertTrue(all(hi - lo <= 8 for lo, hi in sample_report.mismatched_ranges))
+        self.assertLess(restored.n_queries, 100)
+
+        parsed = json.loads(report.to_json())
+        self.assertFalse(parsed['ok'])
+        self.assertEqual('sample', parsed['tables'][0]['table'])
+        self.assertEqual([[777]], parsed['tables'][0]['missing_rows'])
+
+    def test_non_versioned_tables_are_informational(self):
+        """Test tables that aren't system versioned don't fail the verification"""
+        rows = {'sample': [(i, f'meta-{i}') for i in range(1, 101)]}
+        report = verify_databases(
+            InMemorySource({**rows, 'DATABASECHANGELOG': [(1,)]}),
+            InMemorySource({**rows, 'DATABASECHANGELOG': [(1,), (2,)]}),
+            [SAMPLE, CHANGELOG],
+        )
+        self.assertTrue(report.ok)
+        self.assertListEqual([], report.mismatched_tables)
+        changelog_report = report.tables[1]
+        self.assertTrue(changelog_report.informational)
+        self.assertFalse(changelog_report.ok)
+        self.assertEqual([(2,)], changelog_report.missing_rows)
+
+        parsed = json.loads(report.to_json())
+        self.assertTrue(parsed['ok'])
+        self.assertTrue(parsed['tables'][1]['informational'])
@@ -0,0 +1,58 @@
+import unittest
+from test.testbase import DbIsolatedTest, run_as_sync
+
+from benchmarks.generate_project import generate_project
+from benchmarks.suite import BENCHMARKS, BenchmarkContext, run_size
+
+
+class TestBenchmarks(DbIsolatedTest):
+    """Test the benchmark suite runs on a small generated project"""
+
+    @run_as_sync
+    async def test_generate_and_run_benchmarks(self):
+        """Test generating a project, and running each benchmark against it"""
+        counts = await generate_project(
+            self.connection, self.project_id, n_samples=30, n_es_indices=2
+        )
+        self.assertEqual(30, counts['sample'])
+        self.assertEqual(10, counts['family'])
+        self.assertEqual(30, await self.row_count('sequencing_group'))
+        self.assertEqual(32, await self.row_count('analysis'))
+
+        ctx = BenchmarkContext(
+            db=self,
+            connection=self.connection,
+            project=self.project_id_map[self.project_id],
+            n_samples=30,
+        )
+        for name, benchmark in BENCHMARKS.items():
+            with self.subTest(benchmark=name):
+                await benchmark(ctx)
+
+        participants, count = await BENCHMARKS['web_participant_grid'](ctx)
+        self.assertEqual(30 + 100, count)
+        self.assertTrue(participants)
+
+
+class TestRunSize(unittest.TestCase):
+    """
+    Test running the suite for a project size, as `python -m benchmarks.suite`
+    does (outside of the test event loop)
+    """
+
+    def test_run_size(self):
+        """Test a tiny project is generated, and the benchmarks are timed"""
+        results = run_size(
+            20,
+            ['web_participant_grid', 'search'],
+            repeats=1,
+            keep=False,
+            use_snapshots=False,
+        )
+        self.assertFalse(results['generate']['restored'])
+        self.assertEqual(20, results['generate']['rows']['sample'])
+        self.assertListEqual(
+            ['refresh_storage_proportions', 'web_participant_grid', 'search'],
+            list(results['benchmarks']),
+        )
+        self.assertEqual(1, len(results['benchmarks']['search']['times']))
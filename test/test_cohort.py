@@ -3,11 +3,13 @@ import datetime
 from pymysql.err import IntegrityError
 
 from db.python.filters import GenericFilter
-from db.python.layers import CohortLayer, SampleLayer
+from db.python.layers import AnalysisLayer, CohortLayer, SampleLayer
 from db.python.layers.sequencing_group import SequencingGroupLayer
 from db.python.tables.cohort import CohortFilter
+from models.enums import AnalysisStatus
 from models.models import (
     PRIMARY_EXTERNAL_ORG,
+    AnalysisInternal,
     SampleUpsertInternal,
     SequencingGroupUpsertInternal,
 )
@@ -597,3 +599,102 @@ class TestCohortGraphql(DbIsolatedTest):
         excl_archived_cohort = query_result_excl_archived['cohorts'][0]
         self.assertEqual(len(excl_archived_cohort['sequencingGroups']), 1)
         self.assertEqual(excl_archived_cohort['sequencingGroups'][0]['archived'], False)
+
+    @run_as_sync
+    async def test_cohorts_with_nested_fields(self):
+        """Test querying many cohorts, each with their SGs, analyses and template"""
+        samples = [
+            await self.samplel.upsert_sample(get_sample_model(eid))
+            for eid in ('N1', 'N2', 'N3')
+        ]
+        sg_ids = [s.sequencing_groups[0].id for s in samples]
+
+        template_id = await self.cohortl.create_cohort_template(
+            project=self.project_id,
+            cohort_template=CohortTemplateInternal(
+                id=None,
+                name='Nested template',
+                description='Template for nested query',
+                criteria=CohortCriteriaInternal(projects=[self.project_id]),
+                project=self.project_id,
+            ),
+        )
+        cohorts = []
+        for idx, cohort_sg_ids in enumerate([sg_ids[:1], sg_ids[1:], sg_ids]):
+            cohorts.append(
+                await self.cohortl.create_cohort_from_criteria(
+                    project_to_write=self.project_id,
+                    description=f'Nested cohort {idx}',
+                    cohort_name=f'Nested cohort {idx}',
+                    dry_run=False,
+                    cohort_criteria=CohortCriteriaInternal(
+                        projects=[self.project_id],
+                        sg_ids_internal_raw=cohort_sg_ids,
+                    ),
+                )
+            )
+        analysis_id = await AnalysisLayer(self.connection).create_analysis(
+            AnalysisInternal(
+                type='analysis-runner',
+                status=AnalysisStatus.COMPLETED,
+                cohort_ids=[cohorts[1].cohort_id, cohorts[2].cohort_id],
+                meta={},
+                project=self.project_id,
+            )
+        )
+
+        result = await self.run_graphql_query_async(
+            """
+            query Cohorts($project: String!) {
+                project(name: $project) {
+                    cohorts {
+                        name
+                        sequencingGroups { id }
+                        analyses { id }
+                    }
+                }
+            }
+            """,
+            {'project': self.project_name},
+        )
+        by_name = {c['name']: c for c in result['project']['cohorts']}
+        self.assertEqual(
+            [
+                [sequencing_group_id_format(sg) for sg in ids]
+                for ids in [sg_ids[:1], sg_ids[1:], sg_ids]
+            ],
+            [
+                [sg['id'] for sg in by_name[f'Nested cohort {idx}']['sequencingGroups']]
+                for idx in range(3)
+            ],
+        )
+        self.assertEqual(
+            [[], [analysis_id], [analysis_id]],
+            [
+                [a['id'] for a in by_name[f'Nested cohort {idx}']['analyses']]
+                for idx in range(3)
+            ],
+        )
+
+        # cohorts created from criteria have no template
+        self.assertIsNone(
+            (
+                await self.cohortl.get_templates_by_cohort_ids([cohorts[0].cohort_id])
+            ).get(cohorts[0].cohort_id)
+        )
+        from_template = await self.cohortl.create_cohort_from_criteria(
+            project_to_write=self.project_id,
+            description='Cohort from nested template',
+            cohort_name='Nested template cohort',
+            dry_run=False,
+            template_id=template_id,
+        )
+        result = await self.run_graphql_query_async(
+            """
+            query Cohort($id: StrGraphQLFilter) {
+                cohorts(id: $id) { template { name } }
+            }
+            """,
+            {'id': {'eq': cohort_id_format(from_template.cohort_id)}},
+        )
+        self.assertEqual('Nested template', result['cohorts'][0]['template']['name'])
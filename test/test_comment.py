@@ -2,6 +2,7 @@
 from typing import Any
 
 from db.python.layers.assay import AssayLayer
+from db.python.layers.comment import CommentLayer
 from db.python.layers.family import FamilyLayer
 from db.python.layers.participant import ParticipantLayer
 from db.python.layers.sample import SampleLayer
@@ -9,6 +10,7 @@ from db.python.layers.sequencing_group import SequencingGroupLayer
 from db.python.tables.project import ProjectPermissionsTable
 from models.models import PRIMARY_EXTERNAL_ORG, SampleUpsertInternal
 from models.models.assay import AssayUpsertInternal
+from models.models.comment import CommentEntityType
 from models.models.participant import ParticipantUpsertInternal
 from models.models.sequencing_group import SequencingGroupUpsertInternal
 from test.test_participant import get_participant_to_insert
@@ -1068,3 +1070,50 @@ class TestComment(DbIsolatedTest):
         self.assertEqual(await self.row_count('project_comment'), 0)
         self.assertEqual(await self.row_count('sample_comment'), 0)
         self.assertEqual(await self.row_count('sequencing_group_comment'), 0)
+
+    @run_as_sync
+    async def test_discussion_shared_between_requested_entities(self):
+        """
+        Test a related comment is included in the discussion of each requested
+        entity, without history, and the cached discussion is refreshed on update
+        """
+        participant = await self.player.upsert_participant(get_participant_to_insert())
+        sample = participant.samples[0]
+        other_sample = await self.slayer.upsert_sample(
+            SampleUpsertInternal(
+                external_ids={PRIMARY_EXTERNAL_ORG: 'Test02'},
+                type='blood',
+                active=True,
+                participant_id=participant.id,
+            )
+        )
+        participant_comment = await self.add_comment_to_participant(
+            participant.id, 'Participant Comment'
+        )
+
+        clayer = CommentLayer(self.connection)
+        discussions = await clayer.get_discussion_for_entity_ids(
+            CommentEntityType.sample, [sample.id, other_sample.id]
+        )
+        for sample_id, discussion in zip([sample.id, other_sample.id], discussions):
+            assert discussion
+            self.assertEqual([], discussion.direct_comments)
+            self.assertEqual(1, len(discussion.related_comments))
+            comment = discussion.related_comments[0]
+            self.assertEqual(participant_comment['id'], comment.id)
+            self.assertEqual(sample_id, comment.requested_entity_id)
+            self.assertIsNone(comment.versions)
+
+        await self.update_comment(participant_comment['id'], 'Updated Comment')
+        discussions = await clayer.get_discussion_for_entity_ids(
+            CommentEntityType.sample, [other_sample.id]
+        )
+        assert discussions[0]
+        self.assertEqual('Updated Comment', discussions[0].related_comments[0].content)
+        versions = await clayer.get_versions_for_comment_ids(
+            [participant_comment['id']]
+        )
+        self.assertEqual(
+            ['Participant Comment'],
+            [v.content for v in versions[participant_comment['id']]],
+        )
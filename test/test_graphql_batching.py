@@ -0,0 +1,135 @@
+import asyncio
+import gzip
+import json
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from aiohttp import web
+from fastapi import HTTPException
+from gql.transport.exceptions import TransportQueryError
+from metamist.graphql.batching import QueryBatcher, is_query
+
+from api.graphql.batch import MAX_BATCH_SIZE, decompress_gzip, parse_batch
+
+
+class TestParseBatch(TestCase):
+    """Test the server parses batched requests"""
+
+    def test_parse_batch(self):
+        """Test plain and gzip compressed batches are parsed"""
+        operations = [{'query': '{ __typename }', 'variables': {}}] * 3
+        body = json.dumps(operations).encode()
+        self.assertEqual(operations, parse_batch(body, None))
+        self.assertEqual(operations, parse_batch(gzip.compress(body), 'gzip'))
+
+    def test_parse_invalid_batch(self):
+        """Test invalid batches are rejected"""
+        too_many = [{'query': '{ __typename }'}] * (MAX_BATCH_SIZE + 1)
+        for body, encoding in (
+            (json.dumps({'query': '{ __typename }'}).encode(), None),
+            (json.dumps([{'variables': {}}]).encode(), None),
+            (json.dumps(too_many).encode(), None),
+            (b'not gzip', 'gzip'),
+            (b'[]', 'br'),
+        ):
+            with self.assertRaises(ValueError):
+                parse_batch(body, encoding)
+
+    def test_parse_batch_too_large(self):
+        """
+        Test bodies larger than the cap are rejected, including a small gzip
+        compressed body that would decompress past it
+        """
+        body = json.dumps([{'query': '{ __typename }' + ' ' * 1000}]).encode()
+        compressed = gzip.compress(body)
+        self.assertLess(len(compressed), 100)
+        for body_, encoding in ((body, None), (compressed, 'gzip')):
+            with self.assertRaises(HTTPException) as e:
+                parse_batch(body_, encoding, max_body_size=100)
+            self.assertEqual(413, e.exception.status_code)
+
+        self.assertEqual(body, decompress_gzip(compressed, max_size=len(body)))
+        with self.assertRaises(HTTPException):
+            decompress_gzip(compressed, max_size=len(body) - 1)
+        with self.assertRaises(ValueError):
+            decompress_gzip(compressed[:-4], max_size=len(body))
+
+    def test_parse_batch_with_mutation(self):
+        """
+        Test batches with a mutation are rejected, as the operations of a batch
+        are run concurrently on one connection
+        """
+        operations = [
+            {'query': '{ __typename }'},
+            {
+                'query': 'query Q { __typename } '
+                'mutation M { project { __typename } }',
+                'operationName': 'Q',
+            },
+        ]
+        with self.assertRaisesRegex(ValueError, 'operation 1 is a mutation'):
+            parse_batch(json.dumps(operations).encode(), None)
+
+    def test_is_query(self):
+        """Test the client only batches documents that are all queries"""
+        self.assertTrue(is_query('{ __typename }'))
+        self.assertTrue(is_query('query Q { __typename }'))
+        self.assertFalse(is_query('mutation M { project { __typename } }'))
+
+
+class TestQueryBatcher(IsolatedAsyncioTestCase):
+    """Test the client coalesces concurrent queries into batched requests"""
+
+    async def asyncSetUp(self):
+        self.requests: list[list[dict]] = []
+
+        async def handler(request: web.Request):
+            # aiohttp has already decompressed the body
+            operations = parse_batch(await request.read(), None)
+            self.requests.append(operations)
+            return web.json_response(
+                [
+                    (
+                        {'data': None, 'errors': [{'message': 'bad query'}]}
+                        if op['variables'].get('fail')
+                        else {'data': {'value': op['variables']['value']}}
+                    )
+                    for op in operations
+                ]
+            )
+
+        app = web.Application()
+        app.router.add_post('/graphql/batch', handler)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.url = f'http://127.0.0.1:{port}/graphql'
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+
+    async def test_concurrent_queries_batched(self):
+        """Test concurrent queries are sent together, and results returned in order"""
+        batcher = QueryBatcher(self.url, max_batch_size=10, compress=True)
+        results = await asyncio.gather(
+            *(batcher.query('{ __typename }', {'value': i}) for i in range(25))
+        )
+        await batcher.close()
+
+        self.assertListEqual([{'value': i} for i in range(25)], results)
+        self.assertListEqual([10, 10, 5], [len(r) for r in self.requests])
+
+    async def test_query_errors(self):
+        """Test a failing query raises, without failing the rest of the batch"""
+        batcher = QueryBatcher(self.url)
+        results = await asyncio.gather(
+            batcher.query('{ __typename }', {'value': 1}),
+            batcher.query('{ __typename }', {'fail': True}),
+            return_exceptions=True,
+        )
+        await batcher.close()
+
+        self.assertEqual({'value': 1}, results[0])
+        self.assertIsInstance(results[1], TransportQueryError)
+        self.assertEqual(1, len(self.requests))
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import threading
+from unittest import IsolatedAsyncioTestCase, TestCase, mock
+
+import metamist.graphql
+
+from api.graphql.schema import schema
+
+URL = 'https://metamist.example.com/graphql'
+
+
+class TestGraphQLSchemaCache(TestCase):
+    """Test the python client reuses the schema, rather than introspecting"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.patches = [
+            mock.patch.object(metamist.graphql, 'SCHEMA_CACHE_DIR', self.tmp_dir.name),
+            mock.patch.object(metamist.graphql, 'get_client_version', lambda: '1.0.0'),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def _mock_post(server_version: str | None):
+        def post(url, json, headers, timeout):  # pylint: disable=unused-argument
+            response = mock.Mock()
+            response.headers = (
+                {metamist.graphql.VERSION_HEADER: server_version}
+                if server_version
+                else {}
+            )
+            result = schema.execute_sync(json['query'])
+            response.json.return_value = {'data': result.data}
+            return response
+
+        return mock.patch.object(metamist.graphql.requests, 'post', side_effect=post)
+
+    def test_bundled_schema_for_same_version(self):
+        """Test the bundled schema is used if the server is the same version"""
+        with (
+            self._mock_post('1.0.0') as post,
+            mock.patch.object(
+                metamist.graphql, 'get_local_schema', return_value='bundled'
+            ),
+        ):
+            self.assertEqual('bundled', metamist.graphql.get_schema(URL, {}))
+        # just the version check
+        self.assertEqual(1, post.call_count)
+
+    def test_schema_cached_by_version(self):
+        """Test the schema is introspected once per server version"""
+        with self._mock_post('2.0.0') as post:
+            fetched = metamist.graphql.get_schema(URL, {})
+            self.assertEqual(2, post.call_count)
+            self.assertEqual(fetched, metamist.graphql.get_schema(URL, {}))
+            self.assertEqual(3, post.call_count)
+
+        self.assertIn('type Query', fetched)
+        self.assertEqual(1, len(os.listdir(self.tmp_dir.name)))
+
+        with self._mock_post('2.0.1') as post:
+            metamist.graphql.get_schema(URL, {})
+            self.assertEqual(2, post.call_count)
+
+    def test_unknown_server_version(self):
+        """Test the client fetches the schema if the server version is unknown"""
+        with self._mock_post(None):
+            self.assertIsNone(metamist.graphql.get_schema(URL, {}))
+
+    def test_gql_cached(self):
+        """Test repeated query strings are only parsed once"""
+        query = '{ myProjects { id } }'
+        self.assertIs(metamist.graphql.gql(query), metamist.graphql.gql(query))
+
+
+class TestAsyncClientSchema(IsolatedAsyncioTestCase):
+    """Test configuring the async client doesn't block the event loop"""
+
+    async def test_schema_fetched_in_thread(self):
+        """Test the (blocking) schema requests are made off the event loop"""
+        threads = []
+
+        def get_schema(url, headers):  # pylint: disable=unused-argument
+            threads.append(threading.get_ident())
+            return schema.as_str()
+
+        self.addCleanup(setattr, metamist.graphql, '_async_client', None)
+        with mock.patch.object(metamist.graphql, 'get_schema', get_schema):
+            await metamist.graphql.configure_async_client(
+                url=URL, auth_token='token', force_recreate=True
+            )
+
+        self.assertEqual(1, len(threads))
+        self.assertNotEqual(threading.get_ident(), threads[0])
@@ -0,0 +1,99 @@
+from unittest import TestCase
+
+from models.utils.id_codec import (
+    SAMPLE_ID_CODEC,
+    SEQUENCING_GROUP_ID_CODEC,
+    InvalidIdentifiersError,
+)
+from models.utils.luhn import luhn_compute
+from models.utils.sample_id_format import (
+    sample_id_format,
+    sample_id_transform_to_raw,
+    sample_id_transform_to_raw_list,
+)
+from models.utils.sequencing_group_id_format import (
+    sequencing_group_id_format_list,
+    sequencing_group_id_transform_to_raw,
+)
+
+
+class TestIdCodec(TestCase):
+    """Test formatting and parsing lists of internal IDs at once"""
+
+    def test_format_list_matches_single(self):
+        """Test the bulk format matches formatting one at a time"""
+        ids = [1, 9, 10, 99, 1234, 98765, 10_000, 123_456_789]
+        formatted = SAMPLE_ID_CODEC.format_list(ids)
+        self.assertEqual(
+            [
+                f'{SAMPLE_ID_CODEC.prefix}{i}'
+                f'{luhn_compute(i, offset=SAMPLE_ID_CODEC.checksum_offset)}'
+                for i in ids
+            ],
+            formatted,
+        )
+        self.assertEqual(
+            formatted, [sample_id_format(i) for i in [str(i) for i in ids]]
+        )
+        self.assertEqual(ids, sample_id_transform_to_raw_list(formatted))
+        self.assertEqual(ids, [sample_id_transform_to_raw(s) for s in formatted])
+
+    def test_format_list_keeps_formatted(self):
+        """Test already formatted IDs are returned as they are"""
+        formatted = sequencing_group_id_format_list([5, 6])
+        self.assertEqual(
+            [formatted[0], formatted[1], formatted[0]],
+            sequencing_group_id_format_list([formatted[0], 6, 5]),
+        )
+        with self.assertRaises(ValueError):
+            SEQUENCING_GROUP_ID_CODEC.format_list([5, 'NOTANID'])
+
+    def test_parse_list_reports_every_error(self):
+        """Test every invalid ID is reported, with its position"""
+        valid = SAMPLE_ID_CODEC.format_list([100, 200])
+        bad_checksum = valid[1][:-1] + str((int(valid[1][-1]) + 1) % 10)
+        with self.assertRaises(InvalidIdentifiersError) as ctx:
+            SAMPLE_ID_CODEC.parse_list(
+                [valid[0], 'NOPE123', bad_checksum, SAMPLE_ID_CODEC.prefix + 'abc']
+            )
+        self.assertEqual(
+            [
+                (1, 'NOPE123', f'expected prefix {SAMPLE_ID_CODEC.prefix}'),
+                (2, bad_checksum, 'invalid checksum'),
+                (3, SAMPLE_ID_CODEC.prefix + 'abc', 'invalid identifier'),
+            ],
+            ctx.exception.errors,
+        )
+
+    def test_parse_list_types(self):
+        """Test raw int IDs are only accepted when not strict"""
+        formatted = sequencing_group_id_format_list([42])[0]
+        self.assertEqual(
+            [42, 7], SEQUENCING_GROUP_ID_CODEC.parse_list([formatted, 7], strict=False)
+        )
+        with self.assertRaises(TypeError):
+            SEQUENCING_GROUP_ID_CODEC.parse_list([formatted, 7])
+        self.assertEqual(42, sequencing_group_id_transform_to_raw(formatted))
+
+    def test_parse_single_matches_list(self):
+        """Test single IDs are parsed by the codec, with the exact prefix"""
+        formatted = sample_id_format(1234)
+        self.assertEqual(1234, sample_id_transform_to_raw(formatted))
+        self.assertEqual(1234, sample_id_transform_to_raw(1234, strict=False))
+
+        # the old parser stripped the prefix's characters, not the prefix
+        prefix = SAMPLE_ID_CODEC.prefix
+        doubled_prefix = prefix + prefix[-1] + formatted[len(prefix) :]
+        for parse in (
+            sample_id_transform_to_raw,
+            lambda i: sample_id_transform_to_raw_list([i])[0],
+        ):
+            with self.assertRaises(InvalidIdentifiersError):
+                parse(doubled_prefix)
+
+    def test_negative_ids(self):
+        """Test negative IDs can't be formatted"""
+        with self.assertRaisesRegex(ValueError, 'negative'):
+            sample_id_format(-1)
+        with self.assertRaisesRegex(ValueError, 'negative'):
+            sequencing_group_id_format_list([1, -5])
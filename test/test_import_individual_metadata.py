@@ -2,7 +2,10 @@ from test.testbase import DbIsolatedTest, run_as_sync
 
 from databases.interfaces import Record
 
-from db.python.layers.participant import ParticipantLayer
+from db.python.layers.participant import (
+    ExtraParticipantImporterHandler,
+    ParticipantLayer,
+)
 from models.models import PRIMARY_EXTERNAL_ORG, ParticipantUpsertInternal
 
 
@@ -83,3 +86,131 @@ class TestImportIndividualMetadata(DbIsolatedTest):
         self.assertEqual('"Infantile onset"', second_p_rows[0]['value'])
         self.assertEqual('HPO Terms (present)', second_p_rows[1]['description'])
         self.assertEqual('"HP:00000021,HP:023"', second_p_rows[1]['value'])
+
+    @run_as_sync
+    async def test_import_adds_participants_and_families(self):
+        """Test missing participants + families are created in bulk"""
+        pl = ParticipantLayer(self.connection)
+
+        await pl.upsert_participant(
+            ParticipantUpsertInternal(external_ids={PRIMARY_EXTERNAL_ORG: 'TP01'})
+        )
+
+        headers = ['Family ID', 'Individual ID', 'Birth Year']
+        rows_to_insert = [
+            ['FAM01', 'TP01', '1990'],
+            ['FAM01', 'TP02', '1991'],
+            ['FAM02', 'TP03', ''],
+        ]
+
+        await pl.generic_individual_metadata_importer(
+            headers,
+            rows_to_insert,
+            extra_participants_method=ExtraParticipantImporterHandler.ADD,
+        )
+
+        pid_map = await pl.get_id_map_by_external_ids(
+            ['TP01', 'TP02', 'TP03'], project=self.project_id
+        )
+        self.assertEqual(3, len(pid_map))
+
+        family_rows = await self.connection.connection.fetch_all(
+            """
+            SELECT fp.participant_id, feid.external_id
+            FROM family_participant fp
+            INNER JOIN family_external_id feid ON feid.family_id = fp.family_id
+            """
+        )
+        self.assertDictEqual(
+            {
+                pid_map['TP01']: 'FAM01',
+                pid_map['TP02']: 'FAM01',
+                pid_map['TP03']: 'FAM02',
+            },
+            {r['participant_id']: r['external_id'] for r in family_rows},
+        )
+
+        phenotype_rows = await self.connection.connection.fetch_all(
+            'SELECT participant_id, description, value FROM participant_phenotypes'
+        )
+        self.assertDictEqual(
+            {pid_map['TP01']: '"1990"', pid_map['TP02']: '"1991"'},
+            {r['participant_id']: r['value'] for r in phenotype_rows},
+        )
+
+    @run_as_sync
+    async def test_import_ignores_extra_participants(self):
+        """Test extra participants are dropped with the IGNORE method"""
+        pl = ParticipantLayer(self.connection)
+
+        await pl.upsert_participant(
+            ParticipantUpsertInternal(external_ids={PRIMARY_EXTERNAL_ORG: 'TP01'})
+        )
+
+        headers = ['Individual ID', 'Age of Onset']
+        rows_to_insert = [['TP01', 'Adult'], ['TP99', 'Adult']]
+
+        await pl.generic_individual_metadata_importer(
+            headers,
+            rows_to_insert,
+            extra_participants_method=ExtraParticipantImporterHandler.IGNORE,
+        )
+
+        self.assertEqual(1, await self.row_count('participant'))
+        self.assertEqual(1, await self.row_count('participant_phenotypes'))
+
+    @run_as_sync
+    async def test_import_duplicate_participants(self):
+        """Test duplicate participants report their row numbers"""
+        pl = ParticipantLayer(self.connection)
+
+        headers = ['Individual ID', 'Age of Onset']
+        rows_to_insert = [['TP01', 'Adult'], ['TP02', ''], ['TP01', 'Adult']]
+
+        with self.assertRaisesRegex(ValueError, r"'TP01': \[1, 3\]"):
+            await pl.generic_individual_metadata_importer(headers, rows_to_insert)
+
+    @run_as_sync
+    async def test_import_in_chunks(self):
+        """Test rows are imported chunk_size at a time from an iterator"""
+        pl = ParticipantLayer(self.connection)
+
+        headers = ['Family ID', 'Individual ID', 'Birth Year']
+        rows_to_insert = iter(
+            [
+                ['FAM01', 'TP01', '1990'],
+                ['FAM01', 'TP02', '1991'],
+                ['FAM02', 'TP03', '1992'],
+                ['FAM01', 'TP04', '1993'],
+                ['FAM03', 'TP05', ''],
+            ]
+        )
+
+        summary = await pl.generic_individual_metadata_importer(
+            headers,
+            rows_to_insert,
+            extra_participants_method=ExtraParticipantImporterHandler.ADD,
+            chunk_size=2,
+        )
+
+        self.assertDictEqual({'rows': 5, 'participants_created': 5}, summary)
+        self.assertEqual(3, await self.row_count('family'))
+        self.assertEqual(5, await self.row_count('family_participant'))
+        self.assertEqual(4, await self.row_count('participant_phenotypes'))
+
+    @run_as_sync
+    async def test_import_duplicate_participants_across_chunks(self):
+        """Test duplicate participants in different chunks are found"""
+        pl = ParticipantLayer(self.connection)
+
+        headers = ['Individual ID', 'Age of Onset']
+        rows_to_insert = [['TP01', 'Adult'], ['TP02', ''], ['TP01', 'Adult']]
+
+        with self.assertRaisesRegex(ValueError, r"'TP01': \[1, 3\]"):
+            await pl.generic_individual_metadata_importer(
+                headers,
+                rows_to_insert,
+                extra_participants_method=ExtraParticipantImporterHandler.ADD,
+                chunk_size=2,
+            )
+        self.assertEqual(0, await self.row_count('participant'))
@@ -0,0 +1,53 @@
+from unittest import IsolatedAsyncioTestCase
+
+from db.python.tables.base import insert_many
+
+
+class FakeDatabase:
+    """Records the statements executed, returning an id for each inserted row"""
+
+    def __init__(self):
+        self.statements: list[tuple[str, dict]] = []
+
+    async def execute(self, query: str, values: dict):
+        self.statements.append((query, values))
+
+    async def fetch_all(self, query: str, values: dict):
+        self.statements.append((query, values))
+        n_rows = len(values) // 2
+        start = 10 * len(self.statements)
+        return [{'id': start + i} for i in range(n_rows)]
+
+
+class TestInsertMany(IsolatedAsyncioTestCase):
+    """Test building multi-row inserts"""
+
+    async def test_insert_many_chunks(self):
+        """Test rows are inserted chunk_size at a time, with every value bound"""
+        db = FakeDatabase()
+        rows = [(i, f'name{i}') for i in range(5)]
+        returned = await insert_many(
+            db,  # type: ignore
+            'family',
+            ['id', 'name'],
+            iter(rows),
+            suffix='ON DUPLICATE KEY UPDATE name=VALUES(name)',
+            returning='id',
+            chunk_size=2,
+        )
+
+        self.assertEqual(3, len(db.statements))
+        query, values = db.statements[0]
+        self.assertIn('INSERT INTO `family` (`id`, `name`)', query)
+        self.assertIn('VALUES (:v0_0, :v0_1), (:v1_0, :v1_1)', query)
+        self.assertIn('ON DUPLICATE KEY UPDATE name=VALUES(name) RETURNING id', query)
+        self.assertDictEqual(
+            {'v0_0': 0, 'v0_1': 'name0', 'v1_0': 1, 'v1_1': 'name1'}, values
+        )
+        self.assertListEqual([10, 11, 20, 21, 30], [r['id'] for r in returned])
+
+    async def test_insert_many_without_rows(self):
+        """Test nothing is executed without rows"""
+        db = FakeDatabase()
+        self.assertListEqual([], await insert_many(db, 't', ['a'], []))  # type: ignore
+        self.assertListEqual([], db.statements)
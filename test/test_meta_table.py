@@ -2,9 +2,11 @@
 
 import tempfile
 from io import BytesIO
-from typing import Any
+from typing import Any, AsyncIterator
+from unittest.mock import patch
 
 import duckdb
+import pyarrow.parquet as pq
 
 from db.python.layers.participant import ParticipantLayer
 from db.python.layers.sample import SampleLayer
@@ -38,6 +40,11 @@ def query_parquet(tables: dict[str, BytesIO], query: str) -> list[dict[str, Any]
         return duck.query(query).arrow().to_pylist()
 
 
+async def collect_parquet(chunks: AsyncIterator[bytes]) -> BytesIO:
+    """Collect the streamed parquet chunks into a single buffer"""
+    return BytesIO(b''.join([chunk async for chunk in chunks]))
+
+
 class TestMetaTable(DbIsolatedTest):
     """Test meta table operations"""
 
@@ -73,10 +80,11 @@ class TestMetaTable(DbIsolatedTest):
             ]
         )
 
-        pts = await self.pl.export_participant_table(self.project_id)
+        export = await self.pl.export_participant_table(self.project_id)
+        pts = await export.generate()
         assert pts
         result = query_parquet(
-            {'participants': pts},
+            {'participants': await collect_parquet(pts)},
             'SELECT * FROM participants order by participant_id',
         )
 
@@ -93,8 +101,8 @@ class TestMetaTable(DbIsolatedTest):
         Test that exporting an empty table returns none
         """
 
-        pts = await self.pl.export_participant_table(self.project_id)
-        self.assertIsNone(pts)
+        export = await self.pl.export_participant_table(self.project_id)
+        self.assertIsNone(await export.generate())
 
     @run_as_sync
     async def test_export_samples(self):
@@ -120,10 +128,11 @@ class TestMetaTable(DbIsolatedTest):
             )
         )
 
-        samples = await self.sl.export_sample_table(self.project_id)
+        export = await self.sl.export_sample_table(self.project_id)
+        samples = await export.generate()
         assert samples
         result = query_parquet(
-            {'samples': samples},
+            {'samples': await collect_parquet(samples)},
             'SELECT * FROM samples order by sample_id',
         )
 
@@ -132,3 +141,86 @@ class TestMetaTable(DbIsolatedTest):
         self.assertEqual('field_2_value', result[1]['meta_field_2'])
         self.assertEqual('Test01', result[0]['external_id'])
         self.assertEqual('Test02', result[1]['external_id'])
+
+    @run_as_sync
+    async def test_export_pages_as_row_groups(self):
+        """
+        Test each page of rows is written as a row group, and that meta fields
+        that only appear (or change type) in later pages are still exported
+        """
+        await self.pl.upsert_participants(
+            [
+                ParticipantUpsertInternal(
+                    external_ids={PRIMARY_EXTERNAL_ORG: 'EX01'},
+                    meta={'field': 1},
+                ),
+                ParticipantUpsertInternal(
+                    external_ids={PRIMARY_EXTERNAL_ORG: 'EX02', 'other': 'OTHER2'},
+                    meta={'field': 2.5, 'late_field': 'value'},
+                ),
+            ]
+        )
+
+        with patch('db.python.tables.meta_table.EXPORT_ROW_GROUP_SIZE', 1):
+            export = await self.pl.export_participant_table(self.project_id)
+            pts = await export.generate()
+            assert pts
+            table_bytes = await collect_parquet(pts)
+
+        self.assertEqual(2, pq.ParquetFile(table_bytes).num_row_groups)
+        result = query_parquet(
+            {'participants': table_bytes},
+            'SELECT * FROM participants order by participant_id',
+        )
+        self.assertEqual([1.0, 2.5], [r['meta_field'] for r in result])
+        self.assertEqual([None, 'value'], [r['meta_late_field'] for r in result])
+        self.assertEqual([None, 'OTHER2'], [r['external_id_other'] for r in result])
+
+    @run_as_sync
+    async def test_export_schema_refreshes_on_change(self):
+        """
+        Test the cached export columns are recomputed when the table changes
+        """
+        participants = await self.pl.upsert_participants(
+            [
+                ParticipantUpsertInternal(
+                    external_ids={PRIMARY_EXTERNAL_ORG: 'EX01'}, meta={'field': 1}
+                ),
+            ]
+        )
+        export = await self.pl.export_participant_table(self.project_id)
+        pts = await export.generate()
+        assert pts
+        await collect_parquet(pts)
+
+        await self.pl.upsert_participant(
+            ParticipantUpsertInternal(
+                id=participants[0].id, meta={'new_field': 'new_value'}
+            )
+        )
+        export = await self.pl.export_participant_table(self.project_id)
+        pts = await export.generate()
+        assert pts
+        result = query_parquet(
+            {'participants': await collect_parquet(pts)},
+            'SELECT * FROM participants',
+        )
+        self.assertEqual('new_value', result[0]['meta_new_field'])
+
+    @run_as_sync
+    async def test_export_version_changes(self):
+        """
+        Test the export ETag only changes when the table does
+        """
+        participants = await self.pl.upsert_participants(
+            [ParticipantUpsertInternal(external_ids={PRIMARY_EXTERNAL_ORG: 'EX01'})]
+        )
+        first = await self.pl.export_participant_table(self.project_id)
+        second = await self.pl.export_participant_table(self.project_id)
+        self.assertEqual(first.etag, second.etag)
+
+        await self.pl.upsert_participant(
+            ParticipantUpsertInternal(id=participants[0].id, meta={'field': 1})
+        )
+        third = await self.pl.export_participant_table(self.project_id)
+        self.assertNotEqual(first.etag, third.etag)
@@ -0,0 +1,206 @@
+import tempfile
+import time
+import unittest
+from typing import AsyncIterator
+from unittest.mock import patch
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from api.utils.parquet_route import parquet_table_route
+from api.utils.parquet_snapshot import ParquetSnapshotStore
+from db.python.tables.meta_table import EntityExport
+
+
+class FakeTable:
+    """Stand-in for an entity table, counts how many times it's exported"""
+
+    def __init__(self):
+        self.version = 1
+        self.content = b'PAR1-table-v1-PAR1'
+        self.n_generated = 0
+
+    async def export(self) -> EntityExport:
+        """Export the table, like MetaTable.entity_meta_table"""
+
+        async def generate() -> AsyncIterator[bytes] | None:
+            if not self.content:
+                return None
+            self.n_generated += 1
+            content = self.content
+
+            async def chunks():
+                for i in range(0, len(content), 4):
+                    yield content[i : i + 4]
+
+            return chunks()
+
+        return EntityExport(
+            table_name='fake',
+            project=1,
+            version=(self.version,),
+            generate=generate,
+        )
+
+
+class TestParquetRoute(unittest.TestCase):
+    """Test the conditional / snapshot behaviour of parquet_table_route"""
+
+    def setUp(self):
+        self.table = FakeTable()
+        router = APIRouter()
+
+        @parquet_table_route(
+            router=router, path='/{project}/table.parquet', operation_id='fake'
+        )
+        async def fake_route(project: str):  # pylint: disable=unused-argument
+            return await self.table.export()
+
+        self.app = FastAPI()
+        self.app.include_router(router)
+        self.client = TestClient(self.app)
+
+    def test_etag_and_not_modified(self):
+        """Test the ETag is returned, and If-None-Match returns a 304"""
+        response = self.client.get('/test/table.parquet')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(self.table.content, response.content)
+        etag = response.headers['etag']
+
+        response = self.client.get(
+            '/test/table.parquet', headers={'If-None-Match': etag}
+        )
+        self.assertEqual(304, response.status_code)
+
+        self.table.version = 2
+        response = self.client.get(
+            '/test/table.parquet', headers={'If-None-Match': etag}
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response.headers['etag'])
+
+    def test_empty_table(self):
+        """Test an empty table returns a 404"""
+        self.table.content = b''
+        response = self.client.get('/test/table.parquet')
+        self.assertEqual(404, response.status_code)
+
+    def test_snapshot_reused_until_changed(self):
+        """Test the snapshot is served until the table version changes"""
+        with (
+            tempfile.TemporaryDirectory() as td,
+            patch(
+                'api.utils.parquet_route.get_parquet_snapshot_store',
+                return_value=ParquetSnapshotStore(td),
+            ),
+        ):
+            first = self.client.get('/test/table.parquet')
+            second = self.client.get('/test/table.parquet')
+            self.assertEqual(first.content, second.content)
+            self.assertEqual(first.headers['etag'], second.headers['etag'])
+            self.assertEqual(1, self.table.n_generated)
+
+            self.table.version = 2
+            self.table.content = b'PAR1-table-v2-PAR1'
+            third = self.client.get('/test/table.parquet')
+            self.assertEqual(self.table.content, third.content)
+            self.assertEqual(2, self.table.n_generated)
+
+    def test_stale_snapshot_served_while_rebuilding(self):
+        """Test a recent stale snapshot is served, and rebuilt in the background"""
+        with (
+            tempfile.TemporaryDirectory() as td,
+            # keep the same event loop between requests, for the background task
+            TestClient(self.app) as client,
+        ):
+            store = ParquetSnapshotStore(td, max_staleness=3600)
+            with patch(
+                'api.utils.parquet_route.get_parquet_snapshot_store',
+                return_value=store,
+            ):
+                first = client.get('/test/table.parquet')
+
+                self.table.version = 2
+                self.table.content = b'PAR1-table-v2-PAR1'
+                stale = client.get('/test/table.parquet')
+                self.assertEqual(first.content, stale.content)
+                self.assertEqual(first.headers['etag'], stale.headers['etag'])
+
+                for _ in range(50):
+                    if not store._rebuilding:  # pylint: disable=protected-access
+                        break
+                    time.sleep(0.1)
+
+                fresh = client.get('/test/table.parquet')
+                self.assertEqual(self.table.content, fresh.content)
+                self.assertEqual(2, self.table.n_generated)
+
+    def _patch_random_access_store(self, directory: str):
+        """Only use a snapshot store for range / HEAD requests, like the default"""
+        store = ParquetSnapshotStore(directory)
+        return patch(
+            'api.utils.parquet_route.get_parquet_snapshot_store',
+            side_effect=lambda random_access=False: store if random_access else None,
+        )
+
+    def test_range_and_head_requests(self):
+        """Test range and HEAD requests are served from a single snapshot"""
+        with (
+            tempfile.TemporaryDirectory() as td,
+            self._patch_random_access_store(td),
+        ):
+            response = self.client.head('/test/table.parquet')
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(b'', response.content)
+            self.assertEqual(
+                str(len(self.table.content)), response.headers['content-length']
+            )
+            self.assertEqual('bytes', response.headers['accept-ranges'])
+            self.assertIn('last-modified', response.headers)
+
+            # read the "footer"
+            response = self.client.get(
+                '/test/table.parquet', headers={'Range': 'bytes=-4'}
+            )
+            self.assertEqual(206, response.status_code)
+            self.assertEqual(self.table.content[-4:], response.content)
+            self.assertEqual(
+                f'bytes 14-17/{len(self.table.content)}',
+                response.headers['content-range'],
+            )
+
+            response = self.client.get(
+                '/test/table.parquet', headers={'Range': 'bytes=100-'}
+            )
+            self.assertEqual(416, response.status_code)
+
+            self.assertEqual(1, self.table.n_generated)
+
+    def test_if_range_keeps_reading_snapshot(self):
+        """Test If-Range keeps serving the snapshot the client started reading"""
+        with (
+            tempfile.TemporaryDirectory() as td,
+            self._patch_random_access_store(td),
+        ):
+            old_content = self.table.content
+            response = self.client.get(
+                '/test/table.parquet', headers={'Range': 'bytes=0-3'}
+            )
+            etag = response.headers['etag']
+
+            self.table.version = 2
+            self.table.content = b'PAR1-table-v2-PAR1'
+            response = self.client.get(
+                '/test/table.parquet',
+                headers={'Range': 'bytes=5-9', 'If-Range': etag},
+            )
+            self.assertEqual(206, response.status_code)
+            self.assertEqual(old_content[5:10], response.content)
+            self.assertEqual(etag, response.headers['etag'])
+
+            response = self.client.get(
+                '/test/table.parquet', headers={'Range': 'bytes=5-9'}
+            )
+            self.assertEqual(206, response.status_code)
+            self.assertEqual(self.table.content[5:10], response.content)
+            self.assertNotEqual(etag, response.headers['etag'])
@@ -0,0 +1,115 @@
+import asyncio
+import unittest
+
+from metamist.parser.batch_writer import (
+    AdaptiveLimiter,
+    size_bounded_batches,
+    write_batches,
+)
+
+
+class TestSizeBoundedBatches(unittest.TestCase):
+    """Test splitting items into size-bounded batches"""
+
+    def test_batches(self):
+        """Test batches are at most max_size, keeping the order of items"""
+        batches = list(size_bounded_batches([2, 3, 1, 4, 9, 1], size=int, max_size=5))
+        self.assertListEqual([[2, 3], [1, 4], [9], [1]], batches)
+
+    def test_no_items(self):
+        """Test there are no batches without items"""
+        self.assertListEqual([], list(size_bounded_batches([], size=len, max_size=5)))
+
+
+class TestAdaptiveLimiter(unittest.IsolatedAsyncioTestCase):
+    """Test the concurrency limit adapts to the server"""
+
+    def test_record(self):
+        """Test fast requests increase the limit, slow or failed ones halve it"""
+        limiter = AdaptiveLimiter(initial=4, maximum=5, target_latency=1.0)
+        limiter.record(0.5)
+        limiter.record(0.5)
+        self.assertEqual(5, limiter.limit)
+        limiter.record(2.0)
+        self.assertEqual(2, limiter.limit)
+        limiter.record(0.5, ok=False)
+        limiter.record(0.5, ok=False)
+        self.assertEqual(1, limiter.limit)
+
+    async def test_slot(self):
+        """Test no more than limit requests hold a slot at once"""
+        limiter = AdaptiveLimiter(initial=2, maximum=2)
+        max_in_flight = 0
+
+        async def request():
+            nonlocal max_in_flight
+            async with limiter.slot():
+                max_in_flight = max(max_in_flight, limiter.in_flight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(request() for _ in range(6)))
+        self.assertEqual(2, max_in_flight)
+        self.assertEqual(0, limiter.in_flight)
+
+
+class TestWriteBatches(unittest.IsolatedAsyncioTestCase):
+    """Test writing batches concurrently, with retries"""
+
+    async def test_results_in_order(self):
+        """Test results are returned in the order of the batches"""
+
+        async def write(batch):
+            await asyncio.sleep(0.01 * (3 - len(batch)))
+            return batch
+
+        results = await write_batches(
+            [[1], [2, 3], [4, 5, 6]], write, limiter=AdaptiveLimiter(initial=3)
+        )
+        self.assertListEqual([[1], [2, 3], [4, 5, 6]], results)
+
+    async def test_retry(self):
+        """Test failed batches are retried, after calling before_retry"""
+        attempts: dict[int, int] = {}
+        rematched: list[int] = []
+
+        async def write(batch):
+            attempts[batch] = attempts.get(batch, 0) + 1
+            if batch == 2 and attempts[batch] < 3:
+                raise ConnectionError('server went away')
+            return batch
+
+        async def before_retry(batch):
+            rematched.append(batch)
+
+        limiter = AdaptiveLimiter(initial=4, maximum=4)
+        results = await write_batches(
+            [1, 2, 3],
+            write,
+            limiter=limiter,
+            before_retry=before_retry,
+            retry_backoff=0,
+        )
+        self.assertListEqual([1, 2, 3], results)
+        self.assertDictEqual({1: 1, 2: 3, 3: 1}, attempts)
+        self.assertListEqual([2, 2], rematched)
+        self.assertLess(limiter.limit, 4)
+
+    async def test_not_retryable(self):
+        """Test errors that aren't retryable are raised, after every batch is tried"""
+        written: list[int] = []
+
+        async def write(batch):
+            if batch == 1:
+                raise ValueError('bad batch')
+            written.append(batch)
+            return batch
+
+        with self.assertRaisesRegex(ValueError, 'bad batch'):
+            await write_batches(
+                [1, 2, 3],
+                write,
+                limiter=AdaptiveLimiter(),
+                is_retryable=lambda e: isinstance(e, ConnectionError),
+                retry_backoff=0,
+            )
+        self.assertListEqual([2, 3], sorted(written))
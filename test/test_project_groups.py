@@ -1,12 +1,15 @@
 import uuid
 from test.testbase import DbIsolatedTest, run_as_sync
 
+from db.python.layers import SampleLayer
+from db.python.tables.bulk_operation import BulkOperationStatus, BulkOperationTable
 from db.python.tables.project import (
     GROUP_NAME_MEMBERS_ADMIN,
     GROUP_NAME_PROJECT_CREATORS,
     ProjectPermissionsTable,
 )
 from db.python.utils import Forbidden
+from models.models import PRIMARY_EXTERNAL_ORG, SampleUpsertInternal
 from models.models.project import (
     FullWriteAccessRoles,
     ProjectMemberRole,
@@ -256,3 +259,42 @@ class TestProjectAccess(DbIsolatedTest):
             await self.pttable.delete_project_data(pid_map[main_pid])
 
         self.assertTrue(await self.pttable.delete_project_data(pid_map[test_pid]))
+
+    @run_as_sync
+    async def test_delete_project_data_in_batches(self):
+        """
+        Test deleting project data in batches records the progress, and an
+        interrupted deletion is resumed
+        """
+        await SampleLayer(self.connection).upsert_samples(
+            [
+                SampleUpsertInternal(
+                    external_ids={PRIMARY_EXTERNAL_ORG: f'S{i}'}, type='blood'
+                )
+                for i in range(5)
+            ]
+        )
+        project = self.project_id_map[self.project_id]
+
+        operation = await self.pttable.start_delete_project_data(project)
+        # resuming the unfinished deletion
+        resumed = await self.pttable.start_delete_project_data(project)
+        self.assertEqual(operation.id, resumed.id)
+
+        self.assertTrue(
+            await self.pttable.delete_project_data(
+                project, operation=operation, batch_size=2
+            )
+        )
+
+        self.assertEqual(
+            0, await self.connection.connection.fetch_val('SELECT COUNT(*) FROM sample')
+        )
+        saved = await BulkOperationTable(self.connection).get_operation(operation.id)
+        self.assertEqual(BulkOperationStatus.COMPLETED, saved.status)
+        self.assertEqual(5, saved.progress['sample'])
+        self.assertEqual(5, saved.progress['sample_external_id'])
+
+        # a completed deletion isn't resumed
+        new_operation = await self.pttable.start_delete_project_data(project)
+        self.assertNotEqual(operation.id, new_operation.id)
@@ -1,13 +1,16 @@
 from test.testbase import DbIsolatedTest, run_as_sync
 
 from db.python.layers import (
+    AnalysisLayer,
     AssayLayer,
     ParticipantLayer,
     ProjectInsightsLayer,
     SampleLayer,
 )
+from models.enums import AnalysisStatus
 from models.models import (
     PRIMARY_EXTERNAL_ORG,
+    AnalysisInternal,
     AssayUpsertInternal,
     ParticipantUpsertInternal,
     ProjectInsightsSummaryInternal,
@@ -122,3 +125,42 @@ class TestProjectInsights(DbIsolatedTest):
         _ = await self.pil.get_project_insights_details(
             project_names=[self.project_name], sequencing_types=['genome', 'exome']
         )
+
+    @run_as_sync
+    async def test_project_insights_summary_reflects_changes(self):
+        """Test the (cached) summary is updated as the project changes"""
+        participant = await self.partl.upsert_participant(get_test_participant())
+        sequencing_group_id = participant.samples[0].sequencing_groups[0].id
+
+        result = await self.pil.get_project_insights_summary(
+            project_names=[self.project_name], sequencing_types=['genome']
+        )
+        self.assertEqual(1, result[0].total_participants)
+        self.assertEqual(0, result[0].total_crams)
+
+        await AnalysisLayer(self.connection).create_analysis(
+            AnalysisInternal(
+                type='cram',
+                status=AnalysisStatus.COMPLETED,
+                sequencing_group_ids=[sequencing_group_id],
+                meta={'sequencing_type': 'genome'},
+            )
+        )
+        result = await self.pil.get_project_insights_summary(
+            project_names=[self.project_name], sequencing_types=['genome']
+        )
+        self.assertEqual(1, result[0].total_crams)
+
+        second_participant = get_test_participant()
+        second_participant.external_ids = {PRIMARY_EXTERNAL_ORG: 'Persephone'}
+        second_participant.samples[0].external_ids = {
+            PRIMARY_EXTERNAL_ORG: 'sample_id002'
+        }
+        await self.partl.upsert_participant(second_participant)
+
+        result = await self.pil.get_project_insights_summary(
+            project_names=[self.project_name], sequencing_types=['genome']
+        )
+        self.assertEqual(2, result[0].total_participants)
+        self.assertEqual(2, result[0].total_sequencing_groups)
+        self.assertEqual(1, result[0].total_crams)
@@ -0,0 +1,48 @@
+import datetime
+import unittest
+
+from benchmarks.proportionate_map import generate_data, naive_project_sizes_by_day
+from db.python.proportionate_map import cumulative_project_sizes_by_day
+
+d = datetime.date
+
+
+class TestProportionateMap(unittest.TestCase):
+    """Test the vectorised proportionate map engine"""
+
+    def test_cram_sizes_change_between_days(self):
+        """Test SGs are added on the day first seen, and resized on later crams"""
+        days = [d(2024, 1, 1), d(2024, 1, 5), d(2024, 1, 10)]
+        sizes = cumulative_project_sizes_by_day(
+            days=days,
+            sg_first_seen={'sg1': d(2024, 1, 1), 'sg2': d(2024, 1, 5), 'sg3': days[0]},
+            sizes_by_sg={
+                # single cram, applies regardless of the date
+                'sg1': [(d(2024, 1, 3), 10)],
+                # re-generated between es-indices
+                'sg2': [(d(2024, 1, 1), 20), (d(2024, 1, 7), 25)],
+                # not cram-ed by the first day, and re-generated after the last day
+                'sg3': [(d(2024, 1, 2), 5), (d(2024, 2, 1), 7)],
+                'sg4': [(d(2024, 1, 1), 100)],
+            },
+            sg_to_project={'sg1': 1, 'sg2': 2, 'sg3': 3},
+        )
+        self.assertListEqual(
+            [{1: 10}, {1: 10, 2: 20, 3: 5}, {1: 10, 2: 25, 3: 5}], sizes
+        )
+
+    def test_matches_naive_implementation(self):
+        """Test the engine matches walking every SG for every day"""
+        days, sg_first_seen, sizes_by_sg, sg_to_project = generate_data(
+            n_sequencing_groups=2_000, n_years=2, n_projects=5, n_es_index_days=30
+        )
+        self.assertListEqual(
+            naive_project_sizes_by_day(days, sg_first_seen, sizes_by_sg, sg_to_project),
+            cumulative_project_sizes_by_day(
+                days, sg_first_seen, sizes_by_sg, sg_to_project
+            ),
+        )
+
+    def test_no_days(self):
+        """Test no days returns no sizes"""
+        self.assertListEqual([], cumulative_project_sizes_by_day([], {}, {}, {}))
@@ -4,7 +4,12 @@ from test.testbase import DbIsolatedTest, run_as_sync
 from db.python.filters.generic import GenericFilter
 from db.python.filters.sample import SampleFilter
 from db.python.layers.sample import SampleLayer
-from models.models import PRIMARY_EXTERNAL_ORG, SampleUpsertInternal
+from models.models import (
+    PRIMARY_EXTERNAL_ORG,
+    AssayUpsertInternal,
+    SampleUpsertInternal,
+    SequencingGroupUpsertInternal,
+)
 
 
 class TestSample(DbIsolatedTest):
@@ -218,6 +223,67 @@ class TestSample(DbIsolatedTest):
         )
         self.assertEqual(0, len(post_delete_samples))
 
+    @run_as_sync
+    async def test_merge_samples(self):
+        """Test merging moves the sequencing groups and external IDs, in batches"""
+        sequencing_meta = {
+            'sequencing_type': 'genome',
+            'sequencing_technology': 'short-read',
+            'sequencing_platform': 'illumina',
+        }
+        keep, merge = await self.slayer.upsert_samples(
+            [
+                SampleUpsertInternal(
+                    external_ids={
+                        PRIMARY_EXTERNAL_ORG: eid,
+                        f'org-{eid}': f'{eid}-alt',
+                    },
+                    type='blood',
+                    meta={'name': eid},
+                    sequencing_groups=[
+                        SequencingGroupUpsertInternal(
+                            type='genome',
+                            technology='short-read',
+                            platform='illumina',
+                            assays=[
+                                AssayUpsertInternal(
+                                    type='sequencing', meta=sequencing_meta
+                                )
+                                for _ in range(3)
+                            ],
+                        )
+                    ],
+                )
+                for eid in ('Keep01', 'Merge01')
+            ]
+        )
+
+        merged = await self.slayer.st.merge_samples(
+            id_keep=keep.id, id_merge=merge.id, batch_size=2
+        )
+
+        self.assertEqual(['Keep01', 'Merge01'], merged.meta['name'])
+        # the kept sample's primary external ID wins
+        self.assertEqual(
+            {
+                PRIMARY_EXTERNAL_ORG: 'Keep01',
+                'org-Keep01': 'Keep01-alt',
+                'org-Merge01': 'Merge01-alt',
+            },
+            merged.external_ids,
+        )
+        rows = await self.connection.connection.fetch_all(
+            'SELECT DISTINCT sample_id FROM sequencing_group'
+        )
+        self.assertEqual([keep.id], [r['sample_id'] for r in rows])
+        rows = await self.connection.connection.fetch_all(
+            'SELECT DISTINCT sample_id FROM assay'
+        )
+        self.assertEqual([keep.id], [r['sample_id'] for r in rows])
+        self.assertEqual(
+            1, await self.connection.connection.fetch_val('SELECT COUNT(*) FROM sample')
+        )
+
 
 class TestSampleUnwrapping(unittest.TestCase):
     """Test unwrapping nested samples into an ordered list of rows"""
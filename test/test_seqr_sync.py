@@ -0,0 +1,218 @@
+import asyncio
+import unittest
+from typing import Any
+from unittest.mock import patch
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from db.python.layers import FamilyLayer, ParticipantLayer, SeqrLayer
+from db.python.filters import GenericFilter
+from db.python.layers.seqr import SeqrSession
+from db.python.tables.family import FamilyFilter
+from db.python.tables.project import ProjectPermissionsTable
+from models.models import (
+    PRIMARY_EXTERNAL_ORG,
+    AssayUpsertInternal,
+    ParticipantUpsertInternal,
+    SampleUpsertInternal,
+    SequencingGroupUpsertInternal,
+)
+from test.testbase import DbIsolatedTest, run_as_sync
+
+
+class MockSeqr:
+    """Local stand-in for the seqr API, records the requests it receives"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.requests: list[tuple[str, Any]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', self.handle)
+        self.server = TestServer(app)
+
+    @property
+    def url(self) -> str:
+        """Base URL of the mock server"""
+        return str(self.server.make_url('')).rstrip('/')
+
+    def paths(self) -> list[str]:
+        """Paths of the requests received so far"""
+        return [path for path, _ in self.requests]
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Record the request, and respond like seqr would"""
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            body = await request.json() if request.can_read_body else None
+            self.requests.append((request.path, body))
+            await asyncio.sleep(self.delay)
+            return web.json_response({})
+        finally:
+            self.in_flight -= 1
+
+
+class TestSeqrSession(unittest.TestCase):
+    """Test the shared seqr session against a mock seqr server"""
+
+    def test_request_limit(self):
+        """Test no more than max_concurrent_requests are in flight at once"""
+
+        async def run():
+            mock = MockSeqr(delay=0.05)
+            await mock.server.start_server()
+            try:
+                async with SeqrSession.create(max_concurrent_requests=3) as session:
+                    responses = await asyncio.gather(
+                        *[
+                            session.post(f'{mock.url}/api/{i}', json={'i': i})
+                            for i in range(12)
+                        ]
+                    )
+                    self.assertEqual({}, await responses[0].json())
+                    self.assertIsNotNone(session.latency)
+            finally:
+                await mock.server.close()
+            return mock
+
+        mock = asyncio.run(run())
+        self.assertEqual(12, len(mock.requests))
+        self.assertLessEqual(mock.max_in_flight, 3)
+
+
+class TestSeqrSync(DbIsolatedTest):
+    """Test syncing datasets to a mock seqr server"""
+
+    @run_as_sync
+    async def setUp(self) -> None:
+        super().setUp()
+        await ProjectPermissionsTable(self.connection).update_project(
+            project_name=self.project_name,
+            update={'meta': {'is_seqr': True, 'seqr-project-genome': 'R0001_test'}},
+            author=self.author,
+        )
+        await self.connection.refresh_projects()
+
+        await ParticipantLayer(self.connection).upsert_participants(
+            [
+                ParticipantUpsertInternal(
+                    external_ids={PRIMARY_EXTERNAL_ORG: pid},
+                    reported_sex=1,
+                    samples=[
+                        SampleUpsertInternal(
+                            external_ids={PRIMARY_EXTERNAL_ORG: f'{pid}_sample'},
+                            type='blood',
+                            sequencing_groups=[
+                                SequencingGroupUpsertInternal(
+                                    type='genome',
+                                    technology='short-read',
+                                    platform='illumina',
+                                    assays=[
+                                        AssayUpsertInternal(
+                                            type='sequencing',
+                                            meta={
+                                                'sequencing_type': 'genome',
+                                                'sequencing_technology': 'short-read',
+                                                'sequencing_platform': 'illumina',
+                                            },
+                                        )
+                                    ],
+                                )
+                            ],
+                        )
+                    ],
+                )
+                for pid in ('EX01', 'EX02')
+            ]
+        )
+        await FamilyLayer(self.connection).import_pedigree(
+            header=None,
+            rows=[
+                ['FAM01', 'EX01', '', '', '1', '2'],
+                ['FAM02', 'EX02', '', '', '1', '1'],
+            ],
+        )
+
+    def _patch_seqr(self, mock: MockSeqr):
+        """Point the seqr layer at the mock seqr server"""
+        return (
+            patch.multiple(
+                'db.python.layers.seqr',
+                SEQR_URL=mock.url,
+                SEQR_AUDIENCE='seqr-audience',
+            ),
+            patch.object(SeqrLayer, 'generate_seqr_auth_token', return_value='token'),
+        )
+
+    async def _sync(self):
+        """Sync all the seqr projects"""
+        return await SeqrLayer(self.connection).sync_datasets(
+            sequencing_types=['genome', 'exome'],
+            sync_es_index=False,
+            post_slack_notification=False,
+        )
+
+    @run_as_sync
+    async def test_sync_datasets_skips_unchanged(self):
+        """Test syncing all seqr projects, then again with nothing changed"""
+        mock = MockSeqr()
+        await mock.server.start_server()
+        patch_url, patch_token = self._patch_seqr(mock)
+        try:
+            with patch_url, patch_token:
+                results = await self._sync()
+                first_paths = mock.paths()
+                mock.requests.clear()
+
+                await self._sync()
+                second_paths = mock.paths()
+        finally:
+            await mock.server.close()
+
+        # only the genome seqr project is configured
+        self.assertEqual(1, len(results))
+        self.assertTrue(results[0]['success'], results[0])
+        self.assertEqual('genome', results[0]['sequencing_type'])
+
+        for section in ('individuals/sync', 'families/sync', 'individuals_metadata'):
+            self.assertTrue(any(section in p for p in first_paths), section)
+            self.assertFalse(any(section in p for p in second_paths), section)
+
+        # saved variants are always updated
+        self.assertTrue(any('saved_variant/update' in p for p in second_paths))
+
+    @run_as_sync
+    async def test_sync_only_changed_families(self):
+        """Test only the family that changed is pushed, without the pedigree"""
+        mock = MockSeqr()
+        await mock.server.start_server()
+        patch_url, patch_token = self._patch_seqr(mock)
+        try:
+            with patch_url, patch_token:
+                await self._sync()
+                mock.requests.clear()
+
+                flayer = FamilyLayer(self.connection)
+                families = await flayer.query(
+                    FamilyFilter(project=GenericFilter(eq=self.project_id))
+                )
+                fam01 = next(f for f in families if 'FAM01' in f.external_ids.values())
+                await flayer.update_family(fam01.id, description='updated')
+
+                await self._sync()
+        finally:
+            await mock.server.close()
+
+        family_bodies = [
+            body for path, body in mock.requests if 'families/sync' in path
+        ]
+        self.assertEqual(1, len(family_bodies))
+        self.assertEqual(
+            ['FAM01'], [f['familyId'] for f in family_bodies[0]['families']]
+        )
+        self.assertEqual('updated', family_bodies[0]['families'][0]['description'])
+        self.assertFalse(any('individuals/sync' in p for p in mock.paths()))
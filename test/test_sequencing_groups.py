@@ -161,6 +161,60 @@ class TestSequencingGroup(DbIsolatedTest):
         self.assertEqual(len(active_sgs), 1)
         self.assertEqual(updated_sample.sequencing_groups[0].id, active_sgs[0].id)
 
+    @run_as_sync
+    async def test_insert_many_sequencing_groups(self):
+        """
+        Test sequencing groups are created together, archiving existing (and
+        earlier duplicate) sequencing groups of the same sample / type
+        """
+        samples = [
+            await self.slayer.upsert_sample(
+                SampleUpsertInternal(
+                    meta={}, external_ids={PRIMARY_EXTERNAL_ORG: f'EX_ID{i}'}
+                )
+            )
+            for i in range(3)
+        ]
+        existing = await self.slayer.upsert_sample(get_sample_model())
+        assay_id = existing.sequencing_groups[0].assays[0].id
+
+        def sg_model(sample_id: int, type_: str, assays=None):
+            return SequencingGroupUpsertInternal(
+                sample_id=sample_id,
+                type=type_,
+                technology='short-read',
+                platform='ILLUMINA',
+                meta={'sample': sample_id},
+                assays=assays,
+            )
+
+        to_insert = [
+            *(sg_model(s.id, 'genome') for s in samples),
+            sg_model(samples[0].id, 'exome'),
+            # replaces the first genome sequencing group of samples[0]
+            sg_model(samples[0].id, 'genome'),
+            # replaces the existing sequencing group
+            sg_model(existing.id, 'genome', [AssayUpsertInternal(id=assay_id)]),
+        ]
+        inserted = await self.sglayer.upsert_sequencing_groups(to_insert)
+        sg_ids = [sg.id for sg in inserted]
+        self.assertEqual(len(set(sg_ids)), len(to_insert))
+
+        sgs = {
+            sg.id: sg
+            for sg in await self.sglayer.get_sequencing_groups_by_ids(
+                [*sg_ids, existing.sequencing_groups[0].id]
+            )
+        }
+        archived = {sg_id for sg_id, sg in sgs.items() if sg.archived}
+        self.assertSetEqual({sg_ids[0], existing.sequencing_groups[0].id}, archived)
+        self.assertDictEqual({'sample': samples[1].id}, sgs[sg_ids[1]].meta)
+
+        assays = await self.sglayer.seqgt.get_assay_ids_by_sequencing_group_ids(
+            [sg_ids[-1]]
+        )
+        self.assertListEqual([assay_id], list(assays[sg_ids[-1]]))
+
     @run_as_sync
     async def test_query_with_assay_metadata(self):
         """Test searching with an assay metadata filter"""
@@ -26,10 +26,24 @@ from db.python.connect import (
 )
 from db.python.tables.project import ProjectPermissionsTable
 from models.models.project import Project, ProjectId, ProjectMemberUpdate
+from test.testdb_clone import (
+    apply_liquibase,
+    clone_database,
+    create_database,
+    ensure_schema_template,
+    make_root_connection,
+)
 from test.testdb_container import TestDatabaseContainer
 
 TEST_PROJECT_NAME = 'test-test'
 
+# Clone each test class's database from a template (liquibase is applied once),
+# set SM_TEST_DB_CLONE_TEMPLATE=false to apply liquibase for every class instead
+CLONE_SCHEMA_TEMPLATE = os.getenv('SM_TEST_DB_CLONE_TEMPLATE', 'true').lower() not in (
+    'false',
+    '0',
+)
+
 # use this to determine where the db directory is relatively,
 # as pycharm runs in "test/" folder, and GH runs them in git root
 am_i_in_test_environment = os.getcwd().endswith('test')
@@ -114,46 +128,19 @@ class DbTest(unittest.TestCase):
                 # create the database
                 db_name = str(cls.__name__) + 'Db'
 
-                _root_connection = SMConnections.make_connection(
-                    CredentialedDatabaseConfiguration(
-                        host=db.get_container_host_ip(),
-                        port=str(db_port),
-                        username='root',
-                        password=db.password,
-                        dbname=db.dbname,
-                    ),
-                )
+                _root_connection = make_root_connection(db, db_port, db.dbname)
 
                 # create the database for each test class, and give permissions
                 await _root_connection.connect()
-                await _root_connection.execute(f'CREATE DATABASE {db_name};')
-                await _root_connection.execute(
-                    f"GRANT ALL PRIVILEGES ON `{db_name}`.* TO {db.username}@'%';"
-                )
-                await _root_connection.execute('FLUSH PRIVILEGES;')
+                await create_database(_root_connection, db, db_name)
                 await _root_connection.disconnect()
 
-                # mfranklin -> future dancoates: if you work out how to copy the
-                #       database instead of running liquibase, that would be great
-                lcon_string = (
-                    f'jdbc:mariadb://{db.get_container_host_ip()}:{db_port}/{db_name}'
-                )
-                # apply the liquibase schema
-                command = [
-                    'liquibase',
-                    *('--changeLogFile', db_prefix + '/project.xml'),
-                    *('--defaultsFile', db_prefix + '/liquibase.properties'),
-                    *('--url', lcon_string),
-                    *('--driver', 'org.mariadb.jdbc.Driver'),
-                    *(
-                        '--classpath',
-                        db_prefix + '/mariadb-java-client-3.0.3.jar',
-                    ),
-                    *('--username', db.username),
-                    *('--password', db.password),
-                    'update',
-                ]
-                subprocess.check_output(command, stderr=subprocess.STDOUT)
+                if CLONE_SCHEMA_TEMPLATE:
+                    # apply liquibase once, and copy the schema for each class
+                    template = await ensure_schema_template(db, db_port, db_prefix)
+                    await clone_database(db, db_port, source=template, target=db_name)
+                else:
+                    apply_liquibase(db, db_port, db_name, db_prefix)
 
                 cls.author = 'testuser'
 
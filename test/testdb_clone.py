@@ -0,0 +1,203 @@
+"""
+Provision test (and benchmark) databases by cloning, rather than applying the
+liquibase changelog to each one.
+
+The changelog is applied once to a template database (named by a digest of the
+changelog, so a changed schema gets a new template), and each test class gets a
+clone of it. Tables are cloned by replaying their SHOW CREATE TABLE (like
+`mariadb-dump --no-data`), which keeps the foreign keys and system versioning,
+then the template's rows (eg: the liquibase changelog, types and groups) are
+copied across.
+"""
+
+import hashlib
+import os
+import subprocess
+
+import databases
+
+from db.python.connect import CredentialedDatabaseConfiguration, SMConnections
+from test.testdb_container import ExistingDatabaseServer
+
+TEMPLATE_DB_PREFIX = 'sm_template_'
+# created in the template once liquibase has finished, so a partially applied
+# template isn't cloned
+TEMPLATE_READY_TABLE = '_template_ready'
+
+
+def admin_username(db) -> str:
+    """
+    User that creates (and clones) the test databases: root in the container,
+    or the configured user on an existing server (as its root password isn't known)
+    """
+    if isinstance(db, ExistingDatabaseServer):
+        return db.username
+    return 'root'
+
+
+def make_root_connection(db, db_port, dbname: str) -> databases.Database:
+    """Connection (as the admin user) to a database on the test server"""
+    return SMConnections.make_connection(
+        CredentialedDatabaseConfiguration(
+            host=db.get_container_host_ip(),
+            port=str(db_port),
+            username=admin_username(db),
+            password=db.password,
+            dbname=dbname,
+        )
+    )
+
+
+def changelog_digest(db_prefix: str) -> str:
+    """Digest of the liquibase changelog, identifies the schema it creates"""
+    with open(os.path.join(db_prefix, 'project.xml'), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def apply_liquibase(db, db_port, db_name: str, db_prefix: str):
+    """Apply the liquibase changelog to the database"""
+    lcon_string = f'jdbc:mariadb://{db.get_container_host_ip()}:{db_port}/{db_name}'
+    command = [
+        'liquibase',
+        *('--changeLogFile', db_prefix + '/project.xml'),
+        *('--defaultsFile', db_prefix + '/liquibase.properties'),
+        *('--url', lcon_string),
+        *('--driver', 'org.mariadb.jdbc.Driver'),
+        *('--classpath', db_prefix + '/mariadb-java-client-3.0.3.jar'),
+        *('--username', db.username),
+        *('--password', db.password),
+        'update',
+    ]
+    subprocess.check_output(command, stderr=subprocess.STDOUT)
+
+
+async def create_database(root_connection: databases.Database, db, db_name: str):
+    """Create an (empty) database, and give the test user access to it"""
+    await root_connection.execute(f'CREATE DATABASE `{db_name}`;')
+    if db.username == admin_username(db):
+        # the creator of a database already has access to it
+        return
+    await root_connection.execute(
+        f"GRANT ALL PRIVILEGES ON `{db_name}`.* TO {db.username}@'%';"
+    )
+    await root_connection.execute('FLUSH PRIVILEGES;')
+
+
+async def database_exists(root_connection: databases.Database, db_name: str) -> bool:
+    """Does the database exist on the server"""
+    return bool(
+        await root_connection.fetch_val(
+            'SELECT COUNT(*) FROM information_schema.SCHEMATA WHERE SCHEMA_NAME = :name',
+            {'name': db_name},
+        )
+    )
+
+
+async def get_tables(root_connection: databases.Database, db_name: str) -> list[str]:
+    """Tables (including system versioned tables) in the database"""
+    rows = await root_connection.fetch_all(
+        """
+        SELECT TABLE_NAME FROM information_schema.TABLES
+        WHERE
+            TABLE_SCHEMA = :schema
+            AND TABLE_TYPE IN ('BASE TABLE', 'SYSTEM VERSIONED')
+        ORDER BY TABLE_NAME
+        """,
+        {'schema': db_name},
+    )
+    return [r[0] for r in rows if r[0] != TEMPLATE_READY_TABLE]
+
+
+async def _create_statements(connection: databases.Database, tables: list[str]):
+    statements = []
+    for table in tables:
+        row = await connection.fetch_one(f'SHOW CREATE TABLE `{table}`')
+        statements.append(row[1])
+    return statements
+
+
+async def clone_database(
+    db, db_port, source: str, target: str, schema_only: bool = False
+):
+    """
+    Clone the source database (schema and rows) into the target database, which
+    must already exist. Row history of system versioned tables isn't copied.
+    """
+    source_connection = make_root_connection(db, db_port, source)
+    target_connection = make_root_connection(db, db_port, target)
+    await source_connection.connect()
+    await target_connection.connect()
+    try:
+        tables = await get_tables(source_connection, source)
+        statements = await _create_statements(source_connection, tables)
+        # foreign key checks are disabled, so the tables can be created and filled
+        # in any order (on the same connection, as it's a session variable)
+        await target_connection.execute(
+            ';\n'.join(
+                [
+                    'SET FOREIGN_KEY_CHECKS = 0',
+                    *statements,
+                    'SET FOREIGN_KEY_CHECKS = 1',
+                ]
+            )
+            + ';'
+        )
+    finally:
+        await source_connection.disconnect()
+        await target_connection.disconnect()
+
+    if not schema_only:
+        await copy_rows(db, db_port, source=source, target=target)
+
+
+async def copy_rows(db, db_port, source: str, target: str):
+    """
+    Replace the rows of every table in the target database with the rows from
+    the source database (which must have the same schema)
+    """
+    target_connection = make_root_connection(db, db_port, target)
+    await target_connection.connect()
+    try:
+        tables = await get_tables(target_connection, source)
+        statements = ['SET FOREIGN_KEY_CHECKS = 0']
+        for table in tables:
+            statements.append(f'DELETE FROM `{table}`')
+            statements.append(
+                f'INSERT INTO `{table}` SELECT * FROM `{source}`.`{table}`'
+            )
+        statements.append('SET FOREIGN_KEY_CHECKS = 1')
+        await target_connection.execute(';\n'.join(statements) + ';')
+    finally:
+        await target_connection.disconnect()
+
+
+async def ensure_schema_template(db, db_port, db_prefix: str) -> str:
+    """
+    Get the name of the template database for the current changelog, applying
+    liquibase to create it if it doesn't exist (or is incomplete)
+    """
+    template = TEMPLATE_DB_PREFIX + changelog_digest(db_prefix)
+    root_connection = make_root_connection(db, db_port, db.dbname)
+    await root_connection.connect()
+    try:
+        if await database_exists(root_connection, template):
+            is_ready = await root_connection.fetch_val(
+                """
+                SELECT COUNT(*) FROM information_schema.TABLES
+                WHERE TABLE_SCHEMA = :schema AND TABLE_NAME = :table
+                """,
+                {'schema': template, 'table': TEMPLATE_READY_TABLE},
+            )
+            if is_ready:
+                return template
+            await root_connection.execute(f'DROP DATABASE `{template}`;')
+
+        await create_database(root_connection, db, template)
+        apply_liquibase(db, db_port, template, db_prefix)
+        await root_connection.execute(
+            f'CREATE TABLE `{template}`.`{TEMPLATE_READY_TABLE}` (id INT)'
+        )
+    finally:
+        await root_connection.disconnect()
+
+    return template
@@ -1,7 +1,27 @@
+import os
 import socket
+
 from testcontainers.mysql import MySqlContainer
 
 
+class ExistingDatabaseServer:
+    """
+    An already running MariaDB server to use instead of starting a container, so
+    schema templates and benchmark snapshots are kept between runs. Configured
+    with SM_TEST_DB_HOST, SM_TEST_DB_PORT, SM_TEST_DB_USER and SM_TEST_DB_PASSWORD.
+    """
+
+    def __init__(self, host: str, username: str, password: str, dbname: str):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.dbname = dbname
+
+    def get_container_host_ip(self):
+        """Host of the database server"""
+        return self.host
+
+
 class TestDatabaseContainer:
     """
     Logic to create a singleton MYSQL MariaDB test database container
@@ -26,6 +46,14 @@ class TestDatabaseContainer:
 
     def start(self):
         """Set up the test database container"""
+        if self._db_container is None and os.getenv('SM_TEST_DB_HOST'):
+            self._db_container = ExistingDatabaseServer(
+                host=os.environ['SM_TEST_DB_HOST'],
+                username=os.getenv('SM_TEST_DB_USER', 'root'),
+                password=os.getenv('SM_TEST_DB_PASSWORD', ''),
+                dbname='mysql',
+            )
+            self._db_port = int(os.getenv('SM_TEST_DB_PORT', '3306'))
         if self._db_container is None:
             self._db_container = MySqlContainer('mariadb:11.2.2', password='test')
             self._db_port = self._find_free_port()
@@ -34,8 +62,9 @@ class TestDatabaseContainer:
 
     def teardown(self):
         """Stop the test database container"""
-        if self._db_container is not None:
+        if isinstance(self._db_container, MySqlContainer):
             self._db_container.stop()
+        if self._db_container is not None:
             self._db_container = None
             self._db_port = None
 